@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import logging
+import os
 from dataclasses import dataclass
 from typing import Optional
 
 import cv2
 import numpy as np
 
+logger = logging.getLogger("camera_orientation_monitor")
 
 @dataclass
 class CameraShiftResult:
@@ -15,16 +18,35 @@ class CameraShiftResult:
     scale_delta: float = 0.0
     inlier_ratio: float = 0.0
     reason: str = ""
+    baseline: str = ""
+
+
+@dataclass
+class _Baseline:
+    """Đặc trưng đã tính sẵn của một baseline (không cần giữ ảnh gốc)."""
+
+    name: str
+    points: np.ndarray        # (N, 2) float32 – toạ độ keypoint ORB
+    descriptors: np.ndarray   # (N, 32) uint8
+    small: np.ndarray         # ảnh xám thu nhỏ cho fast-path
 
 
 class CameraOrientationMonitor:
     """Giám sát camera có lệch khỏi góc gốc ban đầu hay không.
 
-    - Lưu một baseline frame khi hệ thống ổn định.
-    - So khớp ORB + RANSAC giữa frame hiện tại và baseline.
+    - Lưu baseline khi hệ thống ổn định; keypoint/descriptor ORB của baseline chỉ tính một
+      lần và có thể lưu xuống đĩa (`baseline_path`) để restart không phải chụp lại.
+    - Hỗ trợ nhiều baseline (vd: "day" / "ir" ban đêm); mỗi lần kiểm tra tự chọn baseline
+      giống frame hiện tại nhất theo NCC trên ảnh thu nhỏ.
+    - Baseline khác tỉ lệ khung hình với frame hiện tại (vd: stream đổi độ phân giải sau
+      restart) bị bỏ và chụp lại từ frame hiện tại.
+    - Fast-path: NCC + phase correlation trên ảnh thu nhỏ; chỉ khi có dấu hiệu lệch mới
+      chạy ORB + RANSAC đầy đủ.
     - Cảnh báo khi vượt ngưỡng liên tiếp N frame để chống false-positive.
     """
 
+    SMALL_WIDTH = 160
+
     def __init__(
         self,
         check_every_n_frames: int = 8,
@@ -34,6 +56,9 @@ class CameraOrientationMonitor:
         max_scale_delta: float = 0.08,
         required_consecutive_alerts: int = 3,
         min_keypoints: int = 80,
+        baseline_path: Optional[str] = None,
+        fast_path_min_ncc: float = 0.85,
+        ir_max_saturation: float = 12.0,
     ) -> None:
         self.check_every_n_frames = max(1, check_every_n_frames)
         self.min_inlier_ratio = min_inlier_ratio
@@ -42,47 +67,160 @@ class CameraOrientationMonitor:
         self.max_scale_delta = max_scale_delta
         self.required_consecutive_alerts = max(1, required_consecutive_alerts)
         self.min_keypoints = min_keypoints
+        self.baseline_path = baseline_path
+        self.fast_path_min_ncc = fast_path_min_ncc
+        self.ir_max_saturation = ir_max_saturation
 
-        self._baseline_gray: Optional[np.ndarray] = None
+        self._baselines: dict[str, _Baseline] = {}
         self._frame_counter = 0
         self._consecutive_alerts = 0
+        self.stats = {"fast_path": 0, "full_checks": 0}
 
         self._orb = cv2.ORB_create(nfeatures=600)
         self._matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
 
-    def set_baseline(self, frame_bgr: np.ndarray) -> bool:
+        if baseline_path and os.path.exists(baseline_path):
+            self.load_baselines(baseline_path)
+
+    # ------------------------------------------------------------------
+    def has_baseline(self, name: Optional[str] = None) -> bool:
+        return name in self._baselines if name is not None else bool(self._baselines)
+
+    def baseline_names(self) -> list[str]:
+        return list(self._baselines)
+
+    def frame_mode(self, frame_bgr: np.ndarray) -> str:
+        """"ir" nếu frame gần như không màu (camera chuyển hồng ngoại), ngược lại "day"."""
+        small = cv2.resize(frame_bgr, (64, max(1, int(64 * frame_bgr.shape[0] / frame_bgr.shape[1]))))
+        saturation = float(cv2.cvtColor(small, cv2.COLOR_BGR2HSV)[:, :, 1].mean())
+        return "ir" if saturation < self.ir_max_saturation else "day"
+
+    def set_baseline(self, frame_bgr: np.ndarray, name: Optional[str] = None) -> bool:
+        """Chụp baseline `name` (mặc định theo frame_mode) và tính sẵn đặc trưng ORB."""
+        name = name or self.frame_mode(frame_bgr)
         gray = self._preprocess(frame_bgr)
-        keypoints, _ = self._orb.detectAndCompute(gray, None)
-        if keypoints is None or len(keypoints) < self.min_keypoints:
+        keypoints, descriptors = self._orb.detectAndCompute(gray, None)
+        if keypoints is None or descriptors is None or len(keypoints) < self.min_keypoints:
             return False
-        self._baseline_gray = gray
+        self._baselines[name] = _Baseline(
+            name=name,
+            points=np.float32([kp.pt for kp in keypoints]),
+            descriptors=descriptors,
+            small=self._downscale(gray),
+        )
         self._consecutive_alerts = 0
+        if self.baseline_path:
+            self.save_baselines(self.baseline_path)
         return True
 
+    def save_baselines(self, path: str) -> None:
+        arrays = {"names": np.array(list(self._baselines))}
+        for i, b in enumerate(self._baselines.values()):
+            arrays[f"points_{i}"] = b.points
+            arrays[f"descriptors_{i}"] = b.descriptors
+            arrays[f"small_{i}"] = b.small
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    def load_baselines(self, path: str) -> bool:
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                self._baselines = {
+                    str(name): _Baseline(
+                        name=str(name),
+                        points=data[f"points_{i}"],
+                        descriptors=data[f"descriptors_{i}"],
+                        small=data[f"small_{i}"],
+                    )
+                    for i, name in enumerate(data["names"])
+                }
+            return True
+        except Exception:
+            self._baselines = {}
+            return False
+
+    # ------------------------------------------------------------------
     def evaluate(self, frame_bgr: np.ndarray) -> Optional[CameraShiftResult]:
         self._frame_counter += 1
         if self._frame_counter % self.check_every_n_frames != 0:
             return None
-        if self._baseline_gray is None:
+        if not self._baselines:
             return None
 
         gray = self._preprocess(frame_bgr)
-        kp1, des1 = self._orb.detectAndCompute(self._baseline_gray, None)
+        small = self._downscale(gray)
+        if self._drop_mismatched_baselines(small.shape):
+            self._consecutive_alerts = 0
+            recaptured = self.set_baseline(frame_bgr)
+            if not recaptured and self.baseline_path:
+                self.save_baselines(self.baseline_path)
+            if recaptured or not self._baselines:
+                reason = "baseline_recaptured" if recaptured else "baseline_size_mismatch"
+                return CameraShiftResult(is_shifted=False, reason=reason)
+
+        baseline, ncc = self._select_baseline(small)
+        if baseline is None:
+            return self._update_alarm(
+                CameraShiftResult(is_shifted=False, reason="baseline_size_mismatch")
+            )
+
+        # Fast-path: ảnh thu nhỏ gần như trùng baseline và không có dịch chuyển đáng kể
+        if ncc >= self.fast_path_min_ncc:
+            (dx, dy), _ = cv2.phaseCorrelate(np.float32(baseline.small), np.float32(small))
+            shift_px = float(np.hypot(dx, dy)) * gray.shape[1] / small.shape[1]
+            if shift_px <= self.max_translation_px * 0.5:
+                self.stats["fast_path"] += 1
+                return self._update_alarm(
+                    CameraShiftResult(
+                        is_shifted=False,
+                        translation_px=shift_px,
+                        inlier_ratio=1.0,
+                        reason="fast_path",
+                        baseline=baseline.name,
+                    )
+                )
+
+        self.stats["full_checks"] += 1
+        result = self._full_check(baseline, gray)
+        result.baseline = baseline.name
+        return self._update_alarm(result)
+
+    def _drop_mismatched_baselines(self, shape: tuple) -> bool:
+        """Bỏ các baseline có ảnh thu nhỏ khác kích thước frame hiện tại; True nếu có bỏ."""
+        stale = [name for name, b in self._baselines.items() if b.small.shape != shape]
+        for name in stale:
+            logger.warning(
+                "Camera baseline '%s' có kích thước %s khác frame hiện tại %s — bỏ và chụp lại",
+                name, self._baselines[name].small.shape, shape,
+            )
+            del self._baselines[name]
+        return bool(stale)
+
+    def _select_baseline(self, small: np.ndarray) -> tuple[Optional[_Baseline], float]:
+        """Baseline có NCC cao nhất với frame hiện tại (bỏ qua baseline khác kích thước)."""
+        best, best_ncc = None, -1.0
+        for b in self._baselines.values():
+            if b.small.shape != small.shape:
+                continue
+            ncc = float(cv2.matchTemplate(small, b.small, cv2.TM_CCOEFF_NORMED)[0, 0])
+            if ncc > best_ncc:
+                best, best_ncc = b, ncc
+        return best, best_ncc
+
+    def _full_check(self, baseline: _Baseline, gray: np.ndarray) -> CameraShiftResult:
         kp2, des2 = self._orb.detectAndCompute(gray, None)
 
         if (
-            kp1 is None
-            or kp2 is None
-            or des1 is None
+            kp2 is None
             or des2 is None
-            or len(kp1) < self.min_keypoints
+            or len(baseline.points) < self.min_keypoints
             or len(kp2) < self.min_keypoints
         ):
-            return self._update_alarm(
-                CameraShiftResult(is_shifted=False, reason="insufficient_keypoints")
-            )
+            return CameraShiftResult(is_shifted=False, reason="insufficient_keypoints")
 
-        knn_matches = self._matcher.knnMatch(des1, des2, k=2)
+        knn_matches = self._matcher.knnMatch(baseline.descriptors, des2, k=2)
         good = []
         for pair in knn_matches:
             if len(pair) < 2:
@@ -92,11 +230,9 @@ class CameraOrientationMonitor:
                 good.append(m)
 
         if len(good) < 12:
-            return self._update_alarm(
-                CameraShiftResult(is_shifted=False, reason="insufficient_matches")
-            )
+            return CameraShiftResult(is_shifted=False, reason="insufficient_matches")
 
-        src_pts = np.float32([kp1[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
+        src_pts = baseline.points[[m.queryIdx for m in good]].reshape(-1, 1, 2)
         dst_pts = np.float32([kp2[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
 
         affine, inliers = cv2.estimateAffinePartial2D(
@@ -108,9 +244,7 @@ class CameraOrientationMonitor:
             confidence=0.99,
         )
         if affine is None or inliers is None:
-            return self._update_alarm(
-                CameraShiftResult(is_shifted=False, reason="affine_failed")
-            )
+            return CameraShiftResult(is_shifted=False, reason="affine_failed")
 
         inlier_ratio = float(inliers.sum() / max(1, len(inliers)))
         a, b, tx = affine[0]
@@ -127,14 +261,12 @@ class CameraOrientationMonitor:
             or translation_px > self.max_translation_px
             or scale_delta > self.max_scale_delta
         )
-        return self._update_alarm(
-            CameraShiftResult(
-                is_shifted=shifted_now,
-                rotation_deg=rotation_deg,
-                translation_px=translation_px,
-                scale_delta=scale_delta,
-                inlier_ratio=inlier_ratio,
-            )
+        return CameraShiftResult(
+            is_shifted=shifted_now,
+            rotation_deg=rotation_deg,
+            translation_px=translation_px,
+            scale_delta=scale_delta,
+            inlier_ratio=inlier_ratio,
         )
 
     def _update_alarm(self, result: CameraShiftResult) -> CameraShiftResult:
@@ -151,3 +283,8 @@ class CameraOrientationMonitor:
         resized = cv2.resize(frame_bgr, (640, int(640 * frame_bgr.shape[0] / frame_bgr.shape[1])))
         gray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
         return cv2.GaussianBlur(gray, (3, 3), 0)
+
+    @classmethod
+    def _downscale(cls, gray: np.ndarray) -> np.ndarray:
+        h = max(1, int(cls.SMALL_WIDTH * gray.shape[0] / gray.shape[1]))
+        return cv2.resize(gray, (cls.SMALL_WIDTH, h), interpolation=cv2.INTER_AREA)
@@ -0,0 +1,264 @@
+"""
+core/event_sink.py – Ghi event DB + gửi Telegram bất đồng bộ cho main loop
+
+Cách dùng:
+    sink = EventSink(db, notify_telegram, notify_telegram_photo)
+    sink.start()
+    sink.log_event("IN", msg, trucks, people, notify=msg)    # không bao giờ block
+    sink.notify("Hệ thống đã khởi động.", important=True)
+    sink.stats()                                            # queue depth, dropped, ...
+
+Logic:
+    - Main loop chỉ put vào queue có giới hạn (put_nowait); queue đầy → bỏ event, tăng counter dropped.
+    - Writer thread gom tối đa `batch_size` event (hoặc chờ `flush_interval` giây) rồi ghi
+      bằng một lệnh multi-row INSERT (DatabaseManager.log_events_batch).
+    - Sau khi ghi DB, notification được đẩy sang queue riêng, do `notify_workers` thread gửi
+      song song để HTTP chậm không làm chậm việc ghi DB.
+    - `on_logged(event_id)` chạy trong writer thread, dùng cho các bước phụ cần event_id
+      (vd: add_pending_plate).
+    - stop(): writer ghi hết queue rồi dừng trước, sau đó mới dừng notify worker → notification
+      của batch cuối không bị mất.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+logger = logging.getLogger("event_sink")
+
+
+@dataclass
+class _PendingEvent:
+    event_type: str
+    description: str
+    trucks: int
+    people: int
+    event_time: datetime
+    notify: Optional[str] = None
+    important: bool = False
+    on_logged: Optional[Callable[[Optional[int]], None]] = None
+
+
+@dataclass
+class _PendingNotification:
+    message: str
+    important: bool = False
+    photo_path: Optional[str] = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class EventSink:
+    """
+    Bounded queue + background writer cho event log và thông báo Telegram.
+
+    Args:
+        db:               DatabaseManager (cần log_events_batch).
+        notify_fn:        Hàm gửi text, chữ ký notify_fn(message, important=False).
+        notify_photo_fn:  Hàm gửi ảnh, chữ ký notify_photo_fn(photo_path, caption, important=False).
+        max_queue:        Số event tối đa chờ ghi; vượt quá sẽ bị drop.
+        batch_size:       Số event tối đa trong một lệnh INSERT.
+        flush_interval:   Thời gian (giây) tối đa gom batch trước khi ghi.
+        notify_workers:   Số thread gửi thông báo song song.
+    """
+
+    def __init__(
+        self,
+        db,
+        notify_fn: Callable[..., None],
+        notify_photo_fn: Optional[Callable[..., None]] = None,
+        max_queue: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 0.5,
+        notify_workers: int = 2,
+        max_notify_queue: int = 200,
+    ) -> None:
+        self._db = db
+        self._notify_fn = notify_fn
+        self._notify_photo_fn = notify_photo_fn
+        self._batch_size = max(1, batch_size)
+        self._flush_interval = flush_interval
+        self._notify_workers = max(1, notify_workers)
+
+        self._events: queue.Queue[_PendingEvent] = queue.Queue(maxsize=max(1, max_queue))
+        self._notifications: queue.Queue[_PendingNotification] = queue.Queue(maxsize=max(1, max_notify_queue))
+        self._stop = threading.Event()          # writer: ghi hết queue rồi dừng
+        self._stop_notify = threading.Event()   # notify worker: chỉ set sau khi writer đã dừng
+        self._writer: Optional[threading.Thread] = None
+        self._notify_threads: list[threading.Thread] = []
+
+        self._lock = threading.Lock()
+        self._counters = {
+            "events_enqueued": 0,
+            "events_dropped": 0,
+            "events_written": 0,
+            "events_failed": 0,
+            "batches_written": 0,
+            "notifications_enqueued": 0,
+            "notifications_dropped": 0,
+            "notifications_sent": 0,
+            "notifications_failed": 0,
+        }
+        self._last_batch_ms = 0.0
+
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True, name="event-writer")
+        self._writer.start()
+        for i in range(self._notify_workers):
+            self._notify_threads.append(
+                threading.Thread(target=self._notify_loop, daemon=True, name=f"event-notify-{i}")
+            )
+        for t in self._notify_threads:
+            t.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Dừng thread sau khi đã ghi hết event còn trong queue (tối đa `timeout` giây)."""
+        deadline = time.monotonic() + timeout
+        while not self._events.empty() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._stop.set()
+        # Writer có thể đang ghi batch cuối và chỉ đẩy notification của batch đó sau khi ghi xong
+        if self._writer is not None:
+            self._writer.join(timeout=max(0.0, deadline - time.monotonic()))
+        self._stop_notify.set()
+        for t in self._notify_threads:
+            t.join(timeout=max(0.0, deadline - time.monotonic()))
+
+    # ------------------------------------------------------------------
+    def log_event(
+        self,
+        event_type: str,
+        description: str,
+        trucks: int,
+        people: int,
+        notify: Optional[str] = None,
+        important: bool = False,
+        on_logged: Optional[Callable[[Optional[int]], None]] = None,
+    ) -> bool:
+        """Đưa event vào queue ghi DB. Trả về False nếu queue đầy (event bị drop)."""
+        event = _PendingEvent(
+            event_type=event_type,
+            description=description,
+            trucks=trucks,
+            people=people,
+            event_time=datetime.now(timezone.utc),
+            notify=notify,
+            important=important,
+            on_logged=on_logged,
+        )
+        try:
+            self._events.put_nowait(event)
+        except queue.Full:
+            self._bump("events_dropped")
+            logger.warning("Event queue full — dropped %s", event_type)
+            return False
+        self._bump("events_enqueued")
+        return True
+
+    def notify(self, message: str, important: bool = False) -> bool:
+        """Gửi thông báo text bất đồng bộ (không ghi DB)."""
+        return self._enqueue_notification(_PendingNotification(message=message, important=important))
+
+    def notify_photo(self, photo_path: str, caption: str, important: bool = False) -> bool:
+        """Gửi ảnh kèm caption bất đồng bộ; không có notify_photo_fn thì gửi text."""
+        return self._enqueue_notification(
+            _PendingNotification(message=caption, important=important, photo_path=photo_path)
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._counters)
+            data["last_batch_ms"] = round(self._last_batch_ms, 2)
+        data["event_queue_depth"] = self._events.qsize()
+        data["notify_queue_depth"] = self._notifications.qsize()
+        return data
+
+    # ------------------------------------------------------------------
+    def _bump(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[key] += n
+
+    def _enqueue_notification(self, item: _PendingNotification) -> bool:
+        try:
+            self._notifications.put_nowait(item)
+        except queue.Full:
+            self._bump("notifications_dropped")
+            return False
+        self._bump("notifications_enqueued")
+        return True
+
+    def _drain_batch(self) -> list[_PendingEvent]:
+        try:
+            first = self._events.get(timeout=self._flush_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self._flush_interval
+        while len(batch) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._events.get_nowait())
+                else:
+                    batch.append(self._events.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _writer_loop(self) -> None:
+        while not (self._stop.is_set() and self._events.empty()):
+            batch = self._drain_batch()
+            if not batch:
+                continue
+
+            rows = [(e.event_type, e.description, e.trucks, e.people, e.event_time) for e in batch]
+            t0 = time.perf_counter()
+            try:
+                ids = self._db.log_events_batch(rows)
+            except Exception as e:
+                logger.error("Event batch write failed: %s", e)
+                ids = None
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+
+            with self._lock:
+                self._last_batch_ms = elapsed_ms
+                if ids is None:
+                    self._counters["events_failed"] += len(batch)
+                else:
+                    self._counters["events_written"] += len(batch)
+                    self._counters["batches_written"] += 1
+            if ids is None:
+                ids = [None] * len(batch)
+
+            for event, event_id in zip(batch, ids):
+                if event.on_logged is not None:
+                    try:
+                        event.on_logged(event_id)
+                    except Exception as e:
+                        logger.error("on_logged callback error (%s): %s", event.event_type, e)
+                if event.notify:
+                    self._enqueue_notification(
+                        _PendingNotification(message=event.notify, important=event.important)
+                    )
+
+    def _notify_loop(self) -> None:
+        while not (self._stop_notify.is_set() and self._notifications.empty()):
+            try:
+                item = self._notifications.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                if item.photo_path and self._notify_photo_fn is not None:
+                    self._notify_photo_fn(item.photo_path, item.message, important=item.important)
+                else:
+                    self._notify_fn(item.message, important=item.important)
+                self._bump("notifications_sent")
+            except Exception as e:
+                self._bump("notifications_failed")
+                logger.error("Notification error: %s", e)
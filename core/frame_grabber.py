@@ -0,0 +1,205 @@
+"""
+core/frame_grabber.py – Thread đọc camera tách rời main loop, chỉ giữ frame mới nhất
+
+Cách dùng:
+    grabber = LatestFrameGrabber(RTSP_URL)
+    if not grabber.start():
+        ...                                      # không mở được nguồn video
+    grabbed = grabber.read(timeout=1.0)          # GrabbedFrame hoặc None (mất tín hiệu)
+    lag = grabbed.age()                          # độ trễ từ lúc decode tới hiện tại (giây)
+
+Logic:
+    - Thread nền gọi cap.read() liên tục để RTSP buffer không bị dồn.
+    - Chỉ giữ 1 slot frame mới nhất; frame cũ chưa được lấy sẽ bị ghi đè (tính là dropped).
+    - Mỗi frame có sequence number tăng dần → main loop biết đã bỏ qua bao nhiêu frame.
+    - Mất kết nối → tự mở lại sau `reconnect_delay` giây.
+    - Nguồn là file video (file_mode, mặc định tự nhận theo đường dẫn có tồn tại): đọc tuần tự,
+      thread decode chờ main loop lấy frame trước rồi mới đọc tiếp → không bỏ frame nào
+      (tripwire không mất lượt qua vạch); hết file thì dừng hẳn, không mở lại / phát lại từ đầu,
+      read() trả None như mất tín hiệu.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("frame_grabber")
+
+
+@dataclass
+class GrabbedFrame:
+    frame: np.ndarray
+    seq: int
+    captured_at: float  # time.monotonic() lúc decode xong
+
+    def age(self) -> float:
+        """Số giây từ lúc frame được decode tới hiện tại."""
+        return time.monotonic() - self.captured_at
+
+
+class LatestFrameGrabber:
+    """
+    Đọc video trong thread riêng và chỉ expose frame mới nhất.
+
+    Args:
+        source:           RTSP URL, đường dẫn video hoặc index webcam.
+        reconnect_delay:  Số giây chờ trước khi mở lại stream khi mất kết nối.
+        capture_factory:  Hàm tạo capture (mặc định cv2.VideoCapture), thay được khi test.
+        file_mode:        True = đọc file video tuần tự, dừng ở EOF; None = tự nhận (source là file có sẵn).
+    """
+
+    def __init__(
+        self,
+        source: Any,
+        reconnect_delay: float = 2.0,
+        capture_factory: Callable[[Any], Any] = cv2.VideoCapture,
+        file_mode: Optional[bool] = None,
+    ) -> None:
+        self._source = source
+        self._reconnect_delay = reconnect_delay
+        self._capture_factory = capture_factory
+        self._file_mode = (isinstance(source, str) and os.path.isfile(source)) if file_mode is None else file_mode
+        self._eof = False
+
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._cap = None
+
+        self._latest: Optional[GrabbedFrame] = None
+        self._seq = 0
+        self._consumed_seq = 0
+
+        # Counters
+        self._decoded = 0
+        self._consumed = 0
+        self._dropped = 0
+        self._reconnects = 0
+
+    # ------------------------------------------------------------------
+    def start(self) -> bool:
+        """Mở nguồn video và khởi chạy thread đọc. Trả về False nếu không mở được lần đầu."""
+        cap = self._open()
+        if cap is None:
+            return False
+        self._cap = cap
+        self._thread = threading.Thread(target=self._run, daemon=True, name="frame-grabber")
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    # ------------------------------------------------------------------
+    def read(self, timeout: float = 1.0) -> Optional[GrabbedFrame]:
+        """
+        Chờ tối đa `timeout` giây để lấy frame mới hơn frame đã lấy lần trước.
+        Trả về None nếu không có frame mới (mất tín hiệu hoặc đã stop).
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._latest is None or self._latest.seq <= self._consumed_seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop.is_set() or self._eof:
+                    return None
+                self._cond.wait(remaining)
+            grabbed = self._latest
+            self._consumed_seq = grabbed.seq
+            self._consumed += 1
+            self._cond.notify_all()  # file_mode: thread decode đang chờ frame này được lấy
+            return grabbed
+
+    @property
+    def file_mode(self) -> bool:
+        return self._file_mode
+
+    @property
+    def finished(self) -> bool:
+        """True khi file video đã đọc hết (chỉ có ở file_mode)."""
+        return self._eof
+
+    def stats(self) -> dict:
+        """Counters cho giám sát: số frame decode / đã xử lý / bị bỏ qua, độ tuổi frame mới nhất."""
+        with self._cond:
+            latest = self._latest
+            return {
+                "decoded": self._decoded,
+                "consumed": self._consumed,
+                "dropped": self._dropped,
+                "reconnects": self._reconnects,
+                "eof": self._eof,
+                "last_seq": latest.seq if latest is not None else 0,
+                "latest_age_s": round(latest.age(), 3) if latest is not None else None,
+            }
+
+    # ------------------------------------------------------------------
+    def _open(self):
+        cap = self._capture_factory(self._source)
+        if cap is None or not cap.isOpened():
+            return None
+        try:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # tránh buffer lag phía decoder
+        except Exception:
+            pass
+        return cap
+
+    def _run(self) -> None:
+        cap = self._cap
+        while not self._stop.is_set():
+            if cap is None:
+                if self._stop.wait(self._reconnect_delay):
+                    break
+                cap = self._open()
+                if cap is not None:
+                    self._reconnects += 1
+                    logger.info("Frame grabber reconnected (#%d)", self._reconnects)
+                continue
+
+            if self._file_mode and not self._wait_consumed():
+                break
+
+            ret, frame = cap.read()
+            if not ret or frame is None:
+                if self._file_mode:
+                    logger.info("Frame grabber: hết file video sau %d frame", self._decoded)
+                    with self._cond:
+                        self._eof = True
+                        self._cond.notify_all()
+                    break
+                logger.warning("Frame grabber read failed — reconnecting")
+                cap.release()
+                cap = None
+                continue
+
+            now = time.monotonic()
+            with self._cond:
+                self._seq += 1
+                self._decoded += 1
+                if self._latest is not None and self._latest.seq > self._consumed_seq:
+                    self._dropped += 1  # frame trước chưa được main loop lấy → bị ghi đè
+                self._latest = GrabbedFrame(frame=frame, seq=self._seq, captured_at=now)
+                self._cond.notify_all()
+
+        if cap is not None:
+            cap.release()
+
+    def _wait_consumed(self) -> bool:
+        """file_mode: chờ main loop lấy frame mới nhất trước khi decode frame tiếp. False nếu đã stop."""
+        with self._cond:
+            while self._latest is not None and self._latest.seq > self._consumed_seq:
+                if self._stop.is_set():
+                    return False
+                self._cond.wait(0.5)
+        return not self._stop.is_set()
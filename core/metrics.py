@@ -0,0 +1,65 @@
+"""
+core/metrics.py – Metric primitives dùng chung (histogram kiểu Prometheus)
+
+Cách dùng:
+    hist = Histogram()
+    hist.observe(0.0123)          # giây
+    hist.snapshot()               # {"buckets": {...}, "count": n, "sum": s}
+    render_histogram("db_query_seconds", {"op": "log_event"}, hist.snapshot())  # dòng Prometheus
+"""
+
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from typing import Sequence
+
+# Bucket mặc định (giây): từ 0.5ms tới 10s, đủ cho query DB lẫn stage xử lý frame
+DEFAULT_LATENCY_BUCKETS: tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    """Histogram bucket cố định, thread-safe. Bucket là cận trên (le) như Prometheus."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        self._bounds = tuple(sorted(buckets))
+        self._counts = [0] * (len(self._bounds) + 1)  # phần tử cuối = +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        idx = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> dict:
+        """Trả về bucket cộng dồn (cumulative) theo định dạng Prometheus."""
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+            total_count = self._count
+        cumulative: dict[str, int] = {}
+        running = 0
+        for bound, c in zip(self._bounds, counts):
+            running += c
+            cumulative[repr(bound)] = running
+        cumulative["+Inf"] = total_count
+        return {"buckets": cumulative, "count": total_count, "sum": round(total_sum, 6)}
+
+
+def render_histogram(name: str, labels: dict[str, str], snapshot: dict) -> list[str]:
+    """Các dòng Prometheus text (_bucket/_sum/_count) của một snapshot; chưa gồm HELP/TYPE."""
+    base = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    sep = "," if base else ""
+    lines = [
+        f'{name}_bucket{{{base}{sep}le="{le}"}} {count}' for le, count in snapshot["buckets"].items()
+    ]
+    suffix = f"{{{base}}}" if base else ""
+    lines.append(f"{name}_sum{suffix} {snapshot['sum']}")
+    lines.append(f"{name}_count{suffix} {snapshot['count']}")
+    return lines
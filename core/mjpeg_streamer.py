@@ -1,9 +1,15 @@
 import cv2
 import threading
 import time
-import queue
+
 
 class MJPEGStreamer:
+    """
+    MJPEG broadcast: một encoder thread encode mỗi frame mới đúng một lần,
+    mọi client dùng chung JPEG đã cache và được đánh thức qua condition variable.
+    Không có client nào xem → encoder ngủ, không tốn CPU encode.
+    """
+
     def __init__(self, stream_width=960, fps=8, jpeg_quality=68):
         self.frame = None
         self.lock = threading.Lock()
@@ -12,46 +18,129 @@ class MJPEGStreamer:
         self.frame_interval = 1.0 / max(1, int(fps))
         self.jpeg_quality = max(35, min(90, int(jpeg_quality)))
 
+        # frame_version tăng mỗi lần update_frame; jpeg_version = version của frame đã encode
+        self._cond = threading.Condition(self.lock)
+        self._frame_version = 0
+        self._jpeg = None
+        self._jpeg_version = 0
+        self._clients = 0
+        self._encoder = None
+        self._encodes = 0
+        self._skipped_versions = 0
+
     def update_frame(self, frame):
-        """Cập nhật frame mới nhất từ Main Loop"""
+        """Cập nhật frame mới nhất từ Main Loop (không encode, không chờ client)"""
         if frame is None:
             return
-        
-        frame_to_store = frame
+
         if self.stream_width > 0 and frame.shape[1] > self.stream_width:
             ratio = self.stream_width / float(frame.shape[1])
             new_h = max(1, int(frame.shape[0] * ratio))
             frame_to_store = cv2.resize(frame, (self.stream_width, new_h), interpolation=cv2.INTER_AREA)
+        else:
+            frame_to_store = frame.copy()
 
-        with self.lock:
-            self.frame = frame_to_store.copy()
+        with self._cond:
+            self.frame = frame_to_store
+            self._frame_version += 1
+            if self._clients:
+                self._cond.notify_all()
 
     def generate(self):
-        """Generator trả về chuỗi byte MJPEG cho client"""
-        while not self.stop_event.is_set():
-            with self.lock:
-                if self.frame is None:
-                    time.sleep(0.1)
-                    continue
-                
-                # Encode JPEG
-                (flag, encodedImage) = cv2.imencode(".jpg", self.frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
-                if not flag:
-                    continue
-                
-            # Yield frame data
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + bytearray(encodedImage) + b'\r\n')
-            
-            # Giới hạn FPS gửi đi
-            time.sleep(self.frame_interval)
+        """Generator trả về chuỗi byte MJPEG cho client; chỉ gửi frame client chưa nhận"""
+        last_seen = 0
+        with self._cond:
+            self._clients += 1
+            self._ensure_encoder()
+            self._cond.notify_all()
+        try:
+            while not self.stop_event.is_set():
+                with self._cond:
+                    self._cond.wait_for(
+                        lambda: self._jpeg_version > last_seen or self.stop_event.is_set(), timeout=1.0
+                    )
+                    if self._jpeg_version <= last_seen:
+                        continue
+                    jpeg = self._jpeg
+                    last_seen = self._jpeg_version
+
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+        finally:
+            with self._cond:
+                self._clients -= 1
 
     def get_snapshot(self):
-        """Trả về ảnh tĩnh (bytes)"""
-        with self.lock:
+        """Trả về ảnh tĩnh (bytes); dùng lại JPEG đã cache nếu đúng frame hiện tại"""
+        with self._cond:
             if self.frame is None:
                 return None
-            (flag, encodedImage) = cv2.imencode(".jpg", self.frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
-            if not flag:
-                return None
-            return bytearray(encodedImage)
+            if self._jpeg is not None and self._jpeg_version == self._frame_version:
+                return bytearray(self._jpeg)
+            frame = self.frame
+        jpeg = self._encode(frame)
+        return bytearray(jpeg) if jpeg is not None else None
+
+    def stats(self):
+        with self._cond:
+            return {
+                "clients": self._clients,
+                "frame_version": self._frame_version,
+                "jpeg_version": self._jpeg_version,
+                "encodes": self._encodes,
+                "skipped_versions": self._skipped_versions,
+                "jpeg_bytes": len(self._jpeg) if self._jpeg is not None else 0,
+            }
+
+    def stop(self):
+        self.stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    # ------------------------------------------------------------------
+    def _ensure_encoder(self):
+        # Gọi khi đang giữ self._cond
+        if self._encoder is None or not self._encoder.is_alive():
+            self._encoder = threading.Thread(target=self._encode_loop, daemon=True, name="mjpeg-encoder")
+            self._encoder.start()
+
+    def _encode(self, frame):
+        (flag, encodedImage) = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+        if not flag:
+            return None
+        return encodedImage.tobytes()
+
+    def _encode_loop(self):
+        """Encoder duy nhất: encode frame mới khi có client, tối đa `fps` lần/giây"""
+        next_encode_at = 0.0
+        while not self.stop_event.is_set():
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: (self._clients > 0 and self._frame_version > self._jpeg_version)
+                    or self.stop_event.is_set(),
+                    timeout=1.0,
+                )
+                if self.stop_event.is_set():
+                    break
+                if self._clients == 0 or self._frame_version <= self._jpeg_version:
+                    continue
+
+            # Giới hạn FPS gửi đi: chờ tới lượt rồi lấy frame mới nhất tại thời điểm đó
+            delay = next_encode_at - time.monotonic()
+            if delay > 0:
+                self.stop_event.wait(delay)
+
+            with self._cond:
+                frame = self.frame
+                version = self._frame_version
+            jpeg = self._encode(frame)
+            next_encode_at = time.monotonic() + self.frame_interval
+            if jpeg is None:
+                continue
+
+            with self._cond:
+                self._skipped_versions += max(0, version - self._jpeg_version - 1)
+                self._jpeg = jpeg
+                self._jpeg_version = version
+                self._encodes += 1
+                self._cond.notify_all()
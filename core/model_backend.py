@@ -0,0 +1,353 @@
+"""
+core/model_backend.py – Load model YOLO bằng backend nhanh nhất có sẵn (OpenVINO / ONNX Runtime / NCNN)
+
+Cách dùng:
+    model = load_model("./models/bien_so_xe.pt", imgsz=640, name="plate")   # API như YOLO(): track(), predict()
+    LOADED_MODELS["plate"]                                   # backend đã chọn, latency, parity (mặc định key = weights_path)
+
+Logic:
+    - Backend ứng viên theo MODEL_BACKENDS ("auto" = theo kiến trúc CPU: ARM ưu tiên NCNN,
+      x86 ưu tiên OpenVINO), chỉ giữ backend có package runtime; PyTorch (.pt) luôn là fallback.
+    - Artifact export được cache trong MODEL_CACHE_DIR theo sha256 weights + imgsz + opset
+      (+ dynamic) → đổi weights / imgsz / opset là export lại, không thì dùng lại.
+    - Lần chọn đầu: export từng backend, so detections với PyTorch trên ảnh mẫu
+      (MODEL_PARITY_SAMPLES_DIR; khớp class + IoU >= 0.5 + lệch conf <= 0.05) và đo latency;
+      chọn backend nhanh nhất đạt parity, lưu vào selection.json để lần sau load thẳng.
+    - Export/load/parity lỗi → bỏ backend đó; không backend nào đạt → load .pt như cũ.
+    - Không có ảnh mẫu: không kiểm parity được → giữ .pt, không export và không ghi selection.json
+      (lần khởi động sau có ảnh mẫu sẽ chọn lại). Ảnh mẫu: vài frame thật từ camera (có xe/biển số)
+      chép vào MODEL_PARITY_SAMPLES_DIR, xem README.
+    - Nhiều model cùng weights + imgsz (vd. "general" và "plate" load song song từ registry) dùng
+      chung cache_dir → load_model khóa theo cache_dir: lần load sau chờ, rồi đọc selection.json
+      của lần trước thay vì export chồng lên cùng thư mục.
+"""
+
+from __future__ import annotations
+
+import glob
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import platform
+import shutil
+import threading
+import time
+from typing import Any, Callable, Optional, Sequence
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("model_backend")
+
+# backend -> (format của YOLO.export, module runtime cần có)
+BACKEND_FORMATS = {
+    "openvino": ("openvino", "openvino"),
+    "onnx": ("onnx", "onnxruntime"),
+    "ncnn": ("ncnn", "ncnn"),
+    "pytorch": (None, "torch"),
+}
+ARM_BACKEND_ORDER = ("ncnn", "onnx", "openvino", "pytorch")
+X86_BACKEND_ORDER = ("openvino", "onnx", "ncnn", "pytorch")
+
+PARITY_IOU = 0.5
+PARITY_CONF_TOL = 0.05
+PARITY_MAX_SAMPLES = 8
+LATENCY_RUNS = 3
+SAMPLE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# name (mặc định weights_path) -> thông tin backend đã load (cho log / báo cáo khởi động)
+LOADED_MODELS: dict[str, dict] = {}
+
+# cache_dir -> lock: export / chọn backend cho cùng một cache_dir chạy tuần tự
+_cache_locks: dict[str, threading.Lock] = {}
+_cache_locks_guard = threading.Lock()
+
+_hash_cache: dict[tuple[str, float, int], str] = {}
+
+
+# ----------------------------------------------------------------------
+# Chọn thứ tự backend
+# ----------------------------------------------------------------------
+
+def default_backend_order(machine: Optional[str] = None) -> tuple[str, ...]:
+    machine = (machine or platform.machine()).lower()
+    if machine.startswith(("arm", "aarch64")):
+        return ARM_BACKEND_ORDER
+    return X86_BACKEND_ORDER
+
+
+def backend_available(backend: str) -> bool:
+    module = BACKEND_FORMATS[backend][1]
+    return importlib.util.find_spec(module) is not None
+
+
+def resolve_backend_order(spec: str = "auto", machine: Optional[str] = None,
+                          available: Callable[[str], bool] = backend_available) -> list[str]:
+    """'auto' hoặc 'onnx,pytorch' → list backend khả dụng, luôn kết thúc bằng 'pytorch'."""
+    spec = (spec or "auto").strip().lower()
+    if spec == "auto":
+        wanted = list(default_backend_order(machine))
+    else:
+        wanted = [b.strip() for b in spec.split(",") if b.strip()]
+        unknown = [b for b in wanted if b not in BACKEND_FORMATS]
+        if unknown:
+            logger.warning("Bỏ qua backend không hỗ trợ: %s", unknown)
+    order = [b for b in wanted if b in BACKEND_FORMATS and b != "pytorch" and available(b)]
+    return order + ["pytorch"]
+
+
+# ----------------------------------------------------------------------
+# Cache key
+# ----------------------------------------------------------------------
+
+def weights_hash(path: str) -> str:
+    """sha256 của file weights (nhớ theo mtime + size để không hash lại trong cùng process)."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime, st.st_size)
+    cached = _hash_cache.get(key)
+    if cached is None:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        cached = _hash_cache[key] = digest.hexdigest()
+    return cached
+
+
+def cache_dir_for(weights_path: str, cache_root: str, imgsz: int, opset: int, dynamic: bool = False) -> str:
+    stem = os.path.splitext(os.path.basename(weights_path))[0]
+    name = f"{stem}-{weights_hash(weights_path)[:16]}-{imgsz}-op{opset}" + ("-dyn" if dynamic else "")
+    return os.path.join(cache_root, name)
+
+
+# ----------------------------------------------------------------------
+# Parity
+# ----------------------------------------------------------------------
+
+def _as_numpy(value) -> np.ndarray:
+    if hasattr(value, "cpu"):
+        value = value.cpu().numpy()
+    return np.asarray(value, dtype=np.float64)
+
+
+def detections(result) -> np.ndarray:
+    """(N, 6) [x1, y1, x2, y2, conf, cls] từ một Results của Ultralytics."""
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return np.zeros((0, 6))
+    xyxy = _as_numpy(boxes.xyxy).reshape(-1, 4)
+    conf = _as_numpy(boxes.conf).reshape(-1, 1)
+    cls = _as_numpy(boxes.cls).reshape(-1, 1)
+    return np.hstack([xyxy, conf, cls])
+
+
+def _iou(box: np.ndarray, others: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(box[0], others[:, 0])
+    y1 = np.maximum(box[1], others[:, 1])
+    x2 = np.minimum(box[2], others[:, 2])
+    y2 = np.minimum(box[3], others[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (others[:, 2] - others[:, 0]) * (others[:, 3] - others[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def match_ratio(reference: np.ndarray, candidate: np.ndarray,
+                iou_thr: float = PARITY_IOU, conf_tol: float = PARITY_CONF_TOL) -> float:
+    """Tỉ lệ box khớp (cùng class, IoU >= iou_thr, lệch conf <= conf_tol) trên max(N, M)."""
+    if len(reference) == 0 and len(candidate) == 0:
+        return 1.0
+    used = np.zeros(len(candidate), dtype=bool)
+    matched = 0
+    for box in reference[np.argsort(-reference[:, 4])]:
+        ok = (~used) & (candidate[:, 5] == box[5]) & (np.abs(candidate[:, 4] - box[4]) <= conf_tol)
+        if not ok.any():
+            continue
+        ious = np.where(ok, _iou(box, candidate), 0.0)
+        best = int(ious.argmax())
+        if ious[best] >= iou_thr:
+            used[best] = True
+            matched += 1
+    return matched / max(len(reference), len(candidate))
+
+
+def load_parity_samples(samples_dir: Optional[str], limit: int = PARITY_MAX_SAMPLES) -> list[np.ndarray]:
+    if not samples_dir or not os.path.isdir(samples_dir):
+        return []
+    paths = sorted(p for p in glob.glob(os.path.join(samples_dir, "*")) if p.lower().endswith(SAMPLE_EXTENSIONS))
+    images = [cv2.imread(p) for p in paths[:limit]]
+    return [img for img in images if img is not None]
+
+
+def _run_samples(model, samples: Sequence[np.ndarray], imgsz: int) -> tuple[list[np.ndarray], float]:
+    """Detections + latency trung bình (ms/ảnh, sau một lần chạy khởi động)."""
+    outputs = [detections(model.predict(img, imgsz=imgsz, verbose=False)[0]) for img in samples]
+    t0 = time.perf_counter()
+    for _ in range(LATENCY_RUNS):
+        for img in samples:
+            model.predict(img, imgsz=imgsz, verbose=False)
+    latency_ms = (time.perf_counter() - t0) * 1000 / max(1, LATENCY_RUNS * len(samples))
+    return outputs, latency_ms
+
+
+# ----------------------------------------------------------------------
+# Export + load
+# ----------------------------------------------------------------------
+
+def _default_yolo_cls():
+    from ultralytics import YOLO
+    return YOLO
+
+
+def export_cached(reference, backend: str, cache_dir: str, imgsz: int, opset: int, dynamic: bool) -> str:
+    """Đường dẫn artifact của backend trong cache_dir; chưa có thì export từ model PyTorch."""
+    target = os.path.join(cache_dir, backend)
+    if os.path.exists(target):
+        entries = os.listdir(target)
+        if entries:
+            return os.path.join(target, entries[0])
+
+    fmt = BACKEND_FORMATS[backend][0]
+    kwargs: dict[str, Any] = {"format": fmt, "imgsz": imgsz}
+    if backend == "onnx":
+        kwargs.update(opset=opset, simplify=False)
+    if backend in ("onnx", "openvino") and dynamic:
+        kwargs["dynamic"] = True
+    started = time.perf_counter()
+    exported = str(reference.export(**kwargs))
+
+    tmp = f"{target}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    shutil.move(exported, os.path.join(tmp, os.path.basename(exported.rstrip(os.sep))))
+    os.replace(tmp, target)
+    logger.info("Exported %s → %s (%.1fs)", backend, target, time.perf_counter() - started)
+    entries = os.listdir(target)
+    return os.path.join(target, entries[0])
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _cache_lock(cache_dir: str) -> threading.Lock:
+    with _cache_locks_guard:
+        return _cache_locks.setdefault(os.path.abspath(cache_dir), threading.Lock())
+
+
+def load_model(
+    weights_path: str,
+    imgsz: int = 640,
+    *,
+    name: Optional[str] = None,
+    backends: Optional[str] = None,
+    cache_root: Optional[str] = None,
+    opset: Optional[int] = None,
+    dynamic: bool = False,
+    samples_dir: Optional[str] = None,
+    min_match: Optional[float] = None,
+    task: str = "detect",
+    yolo_cls=None,
+    available: Callable[[str], bool] = backend_available,
+):
+    """Load model YOLO bằng backend nhanh nhất đạt parity; lỗi thì fallback về .pt.
+
+    Tham số None lấy theo core/config (MODEL_BACKENDS, MODEL_CACHE_DIR, MODEL_ONNX_OPSET,
+    MODEL_PARITY_SAMPLES_DIR, MODEL_PARITY_MIN_MATCH). name: key trong LOADED_MODELS
+    (vd. tên trong registry), mặc định weights_path.
+    """
+    from core import config
+
+    backends = config.MODEL_BACKENDS if backends is None else backends
+    cache_root = config.MODEL_CACHE_DIR if cache_root is None else cache_root
+    opset = config.MODEL_ONNX_OPSET if opset is None else opset
+    samples_dir = config.MODEL_PARITY_SAMPLES_DIR if samples_dir is None else samples_dir
+    min_match = config.MODEL_PARITY_MIN_MATCH if min_match is None else min_match
+    yolo_cls = yolo_cls or _default_yolo_cls()
+
+    order = resolve_backend_order(backends, available=available)
+    info: dict[str, Any] = {"backend": "pytorch", "path": weights_path, "candidates": {}}
+    LOADED_MODELS[name or weights_path] = info
+    if order == ["pytorch"] or not os.path.exists(weights_path):
+        return yolo_cls(weights_path)
+
+    cache_dir = cache_dir_for(weights_path, cache_root, imgsz, opset, dynamic)
+    # "general" và "plate" có thể cùng cache_dir → không export / ghi selection.json chồng nhau
+    with _cache_lock(cache_dir):
+        selection_path = os.path.join(cache_dir, "selection.json")
+        selection = _read_json(selection_path)
+        if selection and selection.get("backend") in order:
+            backend = selection["backend"]
+            if backend == "pytorch":
+                info.update(selection)
+                return yolo_cls(weights_path)
+            try:
+                model = yolo_cls(selection["artifact"], task=task)
+                info.update(selection, path=selection["artifact"])
+                logger.info("Model %s: dùng backend %s từ cache", weights_path, backend)
+                return model
+            except Exception as e:
+                logger.warning("Không load được artifact %s đã cache (%s), chọn lại backend", backend, e)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        reference = yolo_cls(weights_path)
+        samples = load_parity_samples(samples_dir)
+        if not samples:
+            # Backend chưa kiểm parity có thể lệch detections → không chọn, cũng không lưu lựa chọn
+            logger.warning("Không có ảnh mẫu trong %s: giữ PyTorch, không chọn backend khác", samples_dir)
+            info["parity_checked"] = False
+            return reference
+
+        ref_outputs, ref_latency = _run_samples(reference, samples, imgsz)
+        candidates: dict[str, dict] = {"pytorch": {"latency_ms": round(ref_latency, 2), "parity": 1.0}}
+        best: Optional[tuple[float, str, str, Any]] = None  # (latency, backend, artifact, model)
+        for backend in order[:-1]:
+            try:
+                artifact = export_cached(reference, backend, cache_dir, imgsz, opset, dynamic)
+                model = yolo_cls(artifact, task=task)
+                outputs, latency = _run_samples(model, samples, imgsz)
+            except Exception as e:
+                logger.warning("Backend %s lỗi, bỏ qua: %s", backend, e)
+                candidates[backend] = {"error": str(e)}
+                continue
+            parity = min(match_ratio(r, c) for r, c in zip(ref_outputs, outputs))
+            candidates[backend] = {"latency_ms": round(latency, 2), "parity": parity, "artifact": artifact}
+            if parity < min_match:
+                logger.warning("Backend %s lệch kết quả so với PyTorch (parity=%.2f), bỏ qua", backend, parity)
+                continue
+            if best is None or latency < best[0]:
+                best = (latency, backend, artifact, model)
+
+        if best is not None and best[0] < ref_latency:
+            latency, backend, artifact, model = best
+            result = {"backend": backend, "artifact": artifact, "latency_ms": round(latency, 2)}
+        else:
+            model, backend = reference, "pytorch"
+            result = {"backend": "pytorch", "artifact": weights_path, "latency_ms": round(ref_latency, 2)}
+        result.update(
+            weights=os.path.abspath(weights_path),
+            imgsz=imgsz,
+            opset=opset,
+            dynamic=dynamic,
+            parity_checked=True,
+            candidates=candidates,
+            selected_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        )
+        _write_json(selection_path, result)
+        info.update(result, path=result["artifact"])
+        logger.info("Model %s: chọn backend %s (%s)", weights_path, backend,
+                    ", ".join(f"{k}={v.get('latency_ms', 'lỗi')}ms" for k, v in candidates.items()))
+        return model
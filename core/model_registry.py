@@ -0,0 +1,248 @@
+"""
+core/model_registry.py – Registry model: load song song + warm-up, load lười cho thành phần tùy chọn, timeline khởi động
+
+Cách dùng:
+    registry.register("plate", lambda: load_model(PLATE_MODEL_PATH), warmup=warmup_yolo(640))
+    registry.register("door", lambda: load_model(DOOR_MODEL_PATH), lazy=True, required=False)
+    registry.start()                       # các model không lazy load song song trong thread pool
+    with registry.step("mqtt"):            # bước khởi động khác cũng được ghi vào timeline
+        mqtt_manager.start()
+    plate_model = registry.get("plate")    # chờ tới khi load + warm-up xong
+    door_model = registry.get("door", wait=False)   # lần đầu: load nền, trả None tới khi sẵn sàng
+    registry.mark("first frame")
+    registry.write_timeline("./data/startup_timeline.json")
+
+Logic:
+    - Mỗi entry: loader() → model, rồi warmup(model) chạy một lần inference giả để lần gọi thật
+      đầu tiên không phải trả chi phí khởi tạo (cấp phát, JIT, autotune...).
+    - Entry lazy chỉ load khi get() lần đầu; wait=False → load trong thread nền, caller dùng
+      đường fallback tới khi xong (không chặn main loop).
+    - Loader lỗi: entry required → get() raise lại lỗi; không required → get() trả None.
+      Warm-up lỗi chỉ được ghi vào timeline, model vẫn dùng được.
+    - Timeline: thời điểm bắt đầu / kết thúc (giây kể từ lúc tạo registry) của từng model
+      (load, warm-up, thread) và từng bước / mốc khởi động.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from core.config import MODEL_LOAD_WORKERS
+
+
+def warmup_yolo(imgsz: int = 640) -> Callable[[Any], None]:
+    """Warm-up cho model Ultralytics: một lần predict trên ảnh xám imgsz x imgsz."""
+    def _warmup(model) -> None:
+        model.predict(np.full((imgsz, imgsz, 3), 114, dtype=np.uint8), imgsz=imgsz, verbose=False)
+    return _warmup
+
+
+class _Entry:
+    def __init__(self, name: str, loader: Callable[[], Any], warmup: Optional[Callable[[Any], None]],
+                 lazy: bool, required: bool) -> None:
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.lazy = lazy
+        self.required = required
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.started = False
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        self.timing: dict[str, Any] = {}
+
+
+class ModelRegistry:
+    def __init__(self, max_workers: int = 3) -> None:
+        self._max_workers = max_workers
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._entries: dict[str, _Entry] = {}
+        self._steps: list[dict] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    # ------------------------------------------------------------------
+    # Đăng ký + load
+    # ------------------------------------------------------------------
+
+    def register(self, name: str, loader: Callable[[], Any], *, warmup: Optional[Callable[[Any], None]] = None,
+                 lazy: bool = False, required: bool = True) -> None:
+        """Đăng ký (hoặc thay) một model; chưa load cho tới start() / get()."""
+        with self._lock:
+            self._entries[name] = _Entry(name, loader, warmup, lazy, required)
+
+    def start(self) -> None:
+        """Load + warm-up song song mọi entry không lazy (không chặn)."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="model-load")
+            entries = [e for e in self._entries.values() if not e.lazy]
+        for entry in entries:
+            self._submit(entry)
+
+    def _submit(self, entry: _Entry) -> None:
+        with entry.lock:
+            if entry.started:
+                return
+            entry.started = True
+        if self._executor is None:
+            threading.Thread(target=self._load, args=(entry,), daemon=True, name=f"model-{entry.name}").start()
+        else:
+            self._executor.submit(self._load, entry)
+
+    def _load(self, entry: _Entry) -> None:
+        start = time.perf_counter()
+        timing: dict[str, Any] = {"thread": threading.current_thread().name, "lazy": entry.lazy}
+        try:
+            value = entry.loader()
+            loaded = time.perf_counter()
+            timing["load_secs"] = round(loaded - start, 3)
+            if entry.warmup is not None and value is not None:
+                # Warm-up lỗi không làm hỏng model đã load: lần gọi thật đầu tiên chỉ chậm hơn
+                try:
+                    entry.warmup(value)
+                except Exception as e:  # noqa: BLE001
+                    timing["warmup_error"] = str(e)
+                    print(f"⚠️ Warm-up model '{entry.name}' lỗi: {e}")
+                timing["warmup_secs"] = round(time.perf_counter() - loaded, 3)
+            entry.value = value
+            timing["status"] = "ok"
+        except Exception as e:  # noqa: BLE001 – lỗi được giữ lại và báo ở get()/timeline
+            entry.error = e
+            timing.update(status="error", error=str(e))
+        timing["start_s"] = round(start - self._t0, 3)
+        timing["end_s"] = round(time.perf_counter() - self._t0, 3)
+        entry.timing = timing
+        entry.done.set()
+        if entry.error is not None:
+            level = "❌" if entry.required else "⚠️"
+            print(f"{level} Load model '{entry.name}' lỗi: {entry.error}")
+
+    def get(self, name: str, wait: bool = True, timeout: Optional[float] = None):
+        """Model đã load. Entry lazy chưa load thì load ngay (wait=True) hoặc ở nền (wait=False).
+
+        Trả về None nếu chưa xong (wait=False / hết timeout) hoặc entry không required bị lỗi.
+        """
+        entry = self._entries[name]
+        if not entry.done.is_set():
+            if not entry.started:
+                if wait:
+                    with entry.lock:
+                        run_here = not entry.started
+                        entry.started = True
+                    if run_here:
+                        self._load(entry)
+                else:
+                    self._submit(entry)
+            if not wait or not entry.done.wait(timeout):
+                return None
+        if entry.error is not None:
+            if entry.required:
+                raise entry.error
+            return None
+        return entry.value
+
+    def is_ready(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry.done.is_set() and entry.error is None
+
+    def wait_all(self, timeout: Optional[float] = None) -> bool:
+        """Chờ mọi entry đã bắt đầu load; True nếu tất cả xong trong timeout."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for entry in list(self._entries.values()):
+            if not entry.started:
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            if not entry.done.wait(remaining):
+                return False
+        return True
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    # ------------------------------------------------------------------
+    # Timeline khởi động
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def step(self, name: str):
+        """Ghi một bước khởi động (DB, MQTT, API...) vào timeline."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self._steps.append({
+                    "name": name,
+                    "kind": "step",
+                    "start_s": round(start - self._t0, 3),
+                    "end_s": round(end - self._t0, 3),
+                    "secs": round(end - start, 3),
+                    "thread": threading.current_thread().name,
+                })
+
+    def mark(self, name: str) -> None:
+        """Mốc tức thời (vd. 'first frame') trên timeline."""
+        at = round(time.perf_counter() - self._t0, 3)
+        with self._lock:
+            self._steps.append({"name": name, "kind": "mark", "start_s": at, "end_s": at, "secs": 0.0,
+                                "thread": threading.current_thread().name})
+
+    def timeline(self) -> list[dict]:
+        """Model đã load xong + bước + mốc, sắp theo thời điểm bắt đầu."""
+        with self._lock:
+            rows = list(self._steps)
+            entries = list(self._entries.values())
+        for entry in entries:
+            if entry.done.is_set():
+                timing = dict(entry.timing)
+                timing["secs"] = round(timing["end_s"] - timing["start_s"], 3)
+                rows.append({"name": entry.name, "kind": "model", **timing})
+            elif entry.started:
+                rows.append({"name": entry.name, "kind": "model", "status": "loading"})
+        return sorted(rows, key=lambda r: r.get("start_s", float("inf")))
+
+    def report_lines(self) -> list[str]:
+        lines = ["⏱️ Startup timeline:"]
+        for row in self.timeline():
+            if row.get("status") == "loading":
+                lines.append(f"   {'…':>7}  model {row['name']} (đang load)")
+                continue
+            detail = ""
+            if row["kind"] == "model":
+                detail = f" load={row.get('load_secs', 0):.2f}s"
+                if "warmup_secs" in row:
+                    detail += f" warmup={row['warmup_secs']:.2f}s"
+                if row.get("status") == "error":
+                    detail += f" LỖI: {row.get('error')}"
+                detail += f" [{row['thread']}]"
+            if row["kind"] == "mark":
+                lines.append(f"   {row['start_s']:7.2f}s ● {row['name']}")
+            else:
+                lines.append(f"   {row['start_s']:7.2f}s → {row['end_s']:7.2f}s  {row['kind']} {row['name']}{detail}")
+        return lines
+
+    def write_timeline(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "timeline": self.timeline()},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+# Registry dùng chung trong process (services đăng ký model lazy của mình lúc import)
+registry = ModelRegistry(max_workers=MODEL_LOAD_WORKERS)
@@ -0,0 +1,150 @@
+"""
+core/motion_gate.py – Chỉ chạy YOLO khi có chuyển động trong ROI
+
+Cách dùng:
+    gate = MotionGate(roi_polygon_norm=[(0.1, 0.3), (0.9, 0.3), (0.9, 1.0), (0.1, 1.0)])
+    if gate.should_infer(frame):
+        results = general_model.track(frame, ...)
+    gate.stats()   # frames, inferred, skipped, heartbeats, skip_ratio, active
+
+Logic:
+    - Frame được thu nhỏ (`diff_width`) + xám; so với frame trước bằng absdiff → blur →
+      threshold → mask ROI → dilate → contour lớn nhất (như parking_hpc/grabber.py).
+    - Hysteresis: vào trạng thái "active" khi diện tích chuyển động >= min_area; đang active
+      thì chỉ cần >= min_area * exit_ratio để tiếp tục.
+    - Hold-over: hết chuyển động vẫn chạy thêm `hold_secs` giây để xe/người đang qua vạch
+      không bị cắt track giữa chừng.
+    - Cảnh tĩnh: vẫn chạy một frame mỗi `heartbeat_secs` giây (đếm lại, phát hiện vật đứng yên).
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Callable, Optional, Sequence
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Args:
+        roi_polygon_norm:  Đa giác ROI, toạ độ chuẩn hoá [0..1]; None = toàn frame.
+        min_area:          Diện tích contour (px² trên frame gốc) để coi là có chuyển động.
+        exit_ratio:        Ngưỡng thoát = min_area * exit_ratio (hysteresis).
+        hold_secs:         Thời gian tiếp tục inference sau chuyển động cuối cùng.
+        heartbeat_secs:    Chu kỳ inference tối thiểu khi cảnh tĩnh.
+        diff_width:        Chiều rộng ảnh thu nhỏ dùng để so sánh.
+        clock:             Nguồn thời gian (giây) khi không truyền `now` (bench dùng đồng hồ theo frame).
+    """
+
+    def __init__(
+        self,
+        roi_polygon_norm: Optional[Sequence[tuple[float, float]]] = None,
+        min_area: float = 1500.0,
+        exit_ratio: float = 0.5,
+        hold_secs: float = 3.0,
+        heartbeat_secs: float = 2.0,
+        diff_width: int = 320,
+        blur_ksize: int = 11,
+        dilate_iter: int = 2,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._roi_norm = list(roi_polygon_norm) if roi_polygon_norm else None
+        self._min_area = min_area
+        self._exit_ratio = exit_ratio
+        self._hold = hold_secs
+        self._heartbeat = heartbeat_secs
+        self._diff_width = diff_width
+        self._blur_ksize = blur_ksize | 1
+        self._dilate_iter = dilate_iter
+        self._clock = clock
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+        self._prev_gray: Optional[np.ndarray] = None
+        self._mask: Optional[np.ndarray] = None
+        self._area_scale = 1.0
+        self._active = False
+        self._last_motion = 0.0
+        self._last_infer = 0.0
+        self.last_area = 0.0
+
+        self._counters = {"frames": 0, "inferred": 0, "skipped": 0, "heartbeats": 0, "motion_frames": 0}
+
+    # ------------------------------------------------------------------
+    def should_infer(self, frame: np.ndarray, now: Optional[float] = None) -> bool:
+        now = self._clock() if now is None else now
+        self._counters["frames"] += 1
+
+        gray = self._prepare(frame)
+        prev, self._prev_gray = self._prev_gray, gray
+        if prev is not None and prev.shape == gray.shape:
+            self.last_area = self._motion_area(prev, gray)
+        else:
+            self.last_area = float("inf")  # frame đầu / đổi kích thước → coi như có chuyển động
+
+        threshold = self._min_area * (self._exit_ratio if self._active else 1.0)
+        if self.last_area >= threshold:
+            self._active = True
+            self._last_motion = now
+            self._counters["motion_frames"] += 1
+        elif self._active and now - self._last_motion > self._hold:
+            self._active = False
+
+        if self._active:
+            run = True
+        elif now - self._last_infer >= self._heartbeat:
+            run = True
+            self._counters["heartbeats"] += 1
+        else:
+            run = False
+
+        if run:
+            self._last_infer = now
+            self._counters["inferred"] += 1
+        else:
+            self._counters["skipped"] += 1
+        return run
+
+    @property
+    def active(self) -> bool:
+        return self._active
+
+    def stats(self) -> dict:
+        data = dict(self._counters)
+        data["skip_ratio"] = round(data["skipped"] / data["frames"], 3) if data["frames"] else 0.0
+        data["active"] = self._active
+        return data
+
+    # ------------------------------------------------------------------
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        h, w = frame.shape[:2]
+        if self._diff_width > 0 and w > self._diff_width:
+            small_h = max(1, int(h * self._diff_width / float(w)))
+            frame = cv2.resize(frame, (self._diff_width, small_h), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if self._mask is None or self._mask.shape != gray.shape:
+            self._mask = self._build_mask(*gray.shape)
+            self._area_scale = (gray.shape[1] / float(w)) ** 2
+        return gray
+
+    def _build_mask(self, h: int, w: int) -> Optional[np.ndarray]:
+        if not self._roi_norm:
+            return None
+        pts = np.array([(int(x * w), int(y * h)) for x, y in self._roi_norm], dtype=np.int32)
+        mask = np.zeros((h, w), dtype=np.uint8)
+        cv2.fillPoly(mask, [pts], 255)
+        return mask
+
+    def _motion_area(self, prev_gray: np.ndarray, curr_gray: np.ndarray) -> float:
+        """Diện tích contour chuyển động lớn nhất trong ROI, quy đổi về px² của frame gốc."""
+        diff = cv2.absdiff(prev_gray, curr_gray)
+        blurred = cv2.GaussianBlur(diff, (self._blur_ksize, self._blur_ksize), 0)
+        _, thresh = cv2.threshold(blurred, 25, 255, cv2.THRESH_BINARY)
+        if self._mask is not None:
+            thresh = cv2.bitwise_and(thresh, thresh, mask=self._mask)
+        dilated = cv2.dilate(thresh, self._kernel, iterations=self._dilate_iter)
+        contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return 0.0
+        return max(cv2.contourArea(c) for c in contours) / self._area_scale
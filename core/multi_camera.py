@@ -0,0 +1,155 @@
+"""
+core/multi_camera.py – Nhận diện YOLO theo batch cho nhiều camera
+
+Cách dùng:
+    detector = MultiCameraDetector(general_model, imgsz=640, conf=0.35,
+                                   tripwire_factory=lambda st: TripwireTracker(...))
+    frames = detector.select_new(camera_manager.get_latest_frames())   # {cam_id: frame}
+    results = detector.detect(frames)                                 # {cam_id: Results}
+    detector.state("cam2").tripwire.update(obj_id, center_y)
+
+Logic:
+    - Frame mới nhất của mọi camera được đưa vào MỘT lần model.predict() (một forward pass,
+      một bản model trong RAM) thay vì N lần model.track() tuần tự.
+    - model.track() trên list ảnh dùng chung một tracker cho cả batch nên ID sẽ lẫn giữa
+      các camera; vì vậy tracker (ByteTrack/BoT-SORT của Ultralytics) được giữ riêng cho
+      từng camera và áp lên kết quả sau khi tách batch, giống callback track của Ultralytics.
+    - Mỗi camera có CameraTrackState riêng: tracker, TripwireTracker, bộ đếm IN/OUT.
+    - select_new() bỏ qua camera chưa có frame mới (cùng frame_seq) để tracker không bị
+      cập nhật lặp trên cùng một ảnh.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+
+@dataclass
+class CameraTrackState:
+    """Trạng thái tracking riêng của một camera."""
+
+    cam_id: str
+    tracker: Any
+    tripwire: Any = None
+    frame_height: int = 0
+    last_seq: int = -1
+    frames: int = 0
+    truck_count: int = 0
+    person_count: int = 0
+
+
+def ultralytics_tracker_factory(tracker_cfg: str = "bytetrack.yaml", frame_rate: int = 30) -> Callable[[], Any]:
+    """Tạo factory sinh tracker Ultralytics (BYTETracker/BOTSORT) từ file cấu hình tracker."""
+    from ultralytics.trackers.track import TRACKER_MAP
+    from ultralytics.utils import IterableSimpleNamespace, yaml_load
+    from ultralytics.utils.checks import check_yaml
+
+    cfg = IterableSimpleNamespace(**yaml_load(check_yaml(tracker_cfg)))
+    tracker_cls = TRACKER_MAP[cfg.tracker_type]
+    return lambda: tracker_cls(args=cfg, frame_rate=frame_rate)
+
+
+def apply_tracker(tracker, result):
+    """Gán track ID cho một Results bằng tracker riêng (như on_predict_postprocess_end)."""
+    det = result.boxes.cpu().numpy()
+    if len(det) == 0:
+        return result
+    tracks = tracker.update(det, result.orig_img)
+    if len(tracks) == 0:
+        return result
+    import torch
+
+    idx = tracks[:, -1].astype(int)
+    tracked = result[idx]
+    tracked.update(boxes=torch.as_tensor(tracks[:, :-1]))
+    return tracked
+
+
+class MultiCameraDetector:
+    """
+    Chạy một model YOLO cho nhiều camera trong một batch, tracking tách riêng theo camera.
+
+    Args:
+        model:             Model Ultralytics (đã load một lần).
+        imgsz, conf:       Tham số predict, giống model.track() của luồng đơn camera.
+        tracker_factory:   Callable() -> tracker mới; mặc định dùng `tracker_cfg` của Ultralytics.
+        tracker_cfg:       File cấu hình tracker (bytetrack.yaml / botsort.yaml).
+        tripwire_factory:  Callable(CameraTrackState) -> TripwireTracker cho camera (tùy chọn).
+        apply_tracker_fn:  Hàm gán ID từ tracker lên Results (thay được khi test).
+    """
+
+    def __init__(
+        self,
+        model,
+        imgsz: int = 640,
+        conf: float = 0.35,
+        tracker_factory: Optional[Callable[[], Any]] = None,
+        tracker_cfg: str = "bytetrack.yaml",
+        tripwire_factory: Optional[Callable[[CameraTrackState], Any]] = None,
+        apply_tracker_fn: Callable[[Any, Any], Any] = apply_tracker,
+    ) -> None:
+        self._model = model
+        self._imgsz = imgsz
+        self._conf = conf
+        self._tracker_factory = tracker_factory or ultralytics_tracker_factory(tracker_cfg)
+        self._tripwire_factory = tripwire_factory
+        self._apply_tracker = apply_tracker_fn
+        self._states: dict[str, CameraTrackState] = {}
+
+        self._batches = 0
+        self._frames_batched = 0
+        self._last_batch_ms = 0.0
+
+    # ------------------------------------------------------------------
+    def state(self, cam_id: str) -> CameraTrackState:
+        st = self._states.get(cam_id)
+        if st is None:
+            st = CameraTrackState(cam_id=cam_id, tracker=self._tracker_factory())
+            if self._tripwire_factory is not None:
+                st.tripwire = self._tripwire_factory(st)
+            self._states[cam_id] = st
+        return st
+
+    def select_new(self, latest: dict[str, tuple[int, np.ndarray]]) -> dict[str, np.ndarray]:
+        """Lọc {cam_id: (seq, frame)} chỉ giữ camera có frame chưa xử lý."""
+        fresh = {}
+        for cam_id, (seq, frame) in latest.items():
+            st = self.state(cam_id)
+            if seq != st.last_seq:
+                st.last_seq = seq
+                fresh[cam_id] = frame
+        return fresh
+
+    def detect(self, frames: dict[str, np.ndarray]) -> dict[str, Any]:
+        """Một forward pass cho toàn bộ frames, trả về Results đã tracking theo từng camera."""
+        if not frames:
+            return {}
+        cam_ids = list(frames.keys())
+        images = [frames[c] for c in cam_ids]
+
+        t0 = time.perf_counter()
+        results = self._model.predict(images, verbose=False, imgsz=self._imgsz, conf=self._conf)
+        self._last_batch_ms = (time.perf_counter() - t0) * 1000
+        self._batches += 1
+        self._frames_batched += len(images)
+
+        routed = {}
+        for cam_id, image, result in zip(cam_ids, images, results):
+            st = self.state(cam_id)
+            st.frames += 1
+            st.frame_height = image.shape[0]
+            routed[cam_id] = self._apply_tracker(st.tracker, result)
+        return routed
+
+    def stats(self) -> dict:
+        return {
+            "cameras": len(self._states),
+            "batches": self._batches,
+            "avg_batch_size": round(self._frames_batched / self._batches, 2) if self._batches else 0.0,
+            "last_batch_ms": round(self._last_batch_ms, 2),
+            "frames_per_camera": {c: st.frames for c, st in self._states.items()},
+        }
@@ -0,0 +1,659 @@
+"""
+core/pipeline_engine.py – Xử lý một frame của main loop (tách khỏi main.py để chạy/bench độc lập)
+
+Cách dùng:
+    engine = PipelineEngine(
+        general_model, plate_model, ocr_plate, event_sink, mqtt_manager, plate_whitelist, streamer,
+        camera_monitor=camera_monitor, check_faces_fn=check_faces, check_plate_fn=check_plate,
+        door_state_fn=check_door_state,
+    )
+    while True:
+        frame = grabber.read(...)
+        if frame is None:
+            engine.on_no_frame()          # cảnh báo mất tín hiệu
+            continue
+        engine.process_frame(frame)       # track → tripwire → face → plate → door → overlay → stream
+    engine.report_lines()                 # dòng log định kỳ (pipeline, cache, DB pool...)
+
+Logic:
+    - Engine giữ toàn bộ trạng thái main loop (đếm người/xe, cửa, cảnh báo, tracker, cache).
+    - Mọi I/O đi qua đối tượng được truyền vào (event_sink, mqtt_manager, plate_whitelist,
+      streamer, db) → main.py dùng bản thật, `main.py bench` dùng bản in-memory.
+    - Hàm của services/ (khuôn mặt, cửa, biển số ủy quyền) cũng được truyền vào để core/
+      không phụ thuộc services/.
+    - Từng stage đo bằng PipelineMetrics như trước; `stage_runs` đếm số frame mà stage có
+      điều kiện (track / face / plate) thực sự chạy.
+    - Mọi gate theo thời gian (throttle khuôn mặt, cảnh báo cửa/mất tín hiệu, cooldown tripwire)
+      đọc `clock`; `main.py bench` truyền đồng hồ theo số frame để hai lần replay giống hệt nhau.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+import cv2
+
+from core.config import (
+    LINE_Y_PIXELS, LINE_Y_RATIO, SIGNAL_LOSS_TIMEOUT, FACE_RECOGNITION_AVAILABLE,
+    authorized_plates, normalize_plate,
+    CAMERA_SHIFT_CHECK_EVERY_FRAMES,
+    PROCESS_WIDTH, GENERAL_DETECT_IMGSZ, GENERAL_DETECT_CONF, PLATE_DETECT_EVERY_N_FRAMES,
+    TRIPWIRE_BUFFER_FRAMES, TRIPWIRE_COOLDOWN_SECS, PLATE_OCR_MIN_CONF,
+    FACES_TEMP_DIR, ACTIVE_LEARNING_DIR,
+)
+from core.pipeline_metrics import PipelineMetrics
+from core.plate_track_cache import PlateTrackCache, match_plate_to_track
+from core.tripwire import TripwireTracker
+
+# Màu hiển thị vùng nhận diện theo yêu cầu vận hành
+PERSON_BOX_COLOR = (0, 255, 255)  # vàng
+VEHICLE_BOX_COLOR = (255, 0, 0)   # xanh dương
+
+# Cửa mở quá bấy nhiêu phút mà không có người → cảnh báo
+DOOR_OPEN_ALERT_MINUTES = 5
+
+
+def resolve_class_ids(model):
+    """Tìm class id cho person/xe từ model names để tránh hard-code sai model."""
+    names = getattr(model, "names", {}) or {}
+    person_ids = set()
+    vehicle_ids = set()
+
+    person_aliases = {"person", "nguoi", "người"}
+    vehicle_aliases = {
+        "truck",
+        "car",
+        "vehicle",
+        "van",
+        "bus",
+        "motorcycle",
+        "motorbike",
+        "bike",
+        "bicycle",
+        "xe",
+        "xe_tai",
+        "xe tai",
+        "oto",
+        "ô tô",
+    }
+
+    for idx, raw_name in names.items():
+        label = str(raw_name).strip().lower()
+        if label in person_aliases:
+            person_ids.add(int(idx))
+        if label in vehicle_aliases or label.startswith("xe"):
+            vehicle_ids.add(int(idx))
+
+    # fallback cho model COCO nếu names không có/khớp như kỳ vọng
+    if not person_ids:
+        person_ids.add(0)
+    if not vehicle_ids:
+        coco_vehicle_ids = {1, 2, 3, 5, 7}
+        vehicle_ids = {idx for idx in coco_vehicle_ids if idx < len(names)} or {7}
+
+    return person_ids, vehicle_ids
+
+
+def resize_for_process(frame, target_width):
+    if target_width <= 0 or frame.shape[1] <= target_width:
+        return frame
+    ratio = target_width / float(frame.shape[1])
+    new_h = max(1, int(frame.shape[0] * ratio))
+    return cv2.resize(frame, (target_width, new_h), interpolation=cv2.INTER_AREA)
+
+
+def resolve_line_y(frame_height: int) -> int:
+    """Tính vị trí vạch đỏ theo pixel override hoặc theo % chiều cao frame."""
+    if LINE_Y_PIXELS > 0:
+        return max(0, min(frame_height - 1, LINE_Y_PIXELS))
+    ratio = max(0.0, min(1.0, LINE_Y_RATIO))
+    return max(0, min(frame_height - 1, int(frame_height * ratio)))
+
+
+class PipelineEngine:
+    """
+    Trạng thái + xử lý từng frame của main loop.
+
+    Args:
+        general_model:    YOLO người/xe (track()).
+        plate_model:      YOLO biển số (gọi trực tiếp model(frame)).
+        ocr_fn:           ocr_fn(crop) -> (text, prob).
+        ocr_batch_fn:     ocr_batch_fn([crop, ...]) -> [(text, prob), ...]; có thì mọi biển số
+                          trong frame được OCR bằng một lần gọi (None = gọi ocr_fn từng crop).
+        event_sink:       EventSink (log_event, notify_photo, stats).
+        mqtt_manager:     Cần ocr_enabled, publish_state, publish_trigger_open.
+        plate_whitelist:  PlateWhitelistCache (contains).
+        streamer:         MJPEGStreamer của camera chính (update_frame).
+        db:               DatabaseManager (add_pending_plate, pool_stats).
+        camera_monitor:   CameraOrientationMonitor (None = tắt giám sát lệch góc).
+        check_faces_fn:   check_faces(frame, person_boxes, cache) của services.face_service.
+        face_cache:       FaceTrackCache dùng chung với check_faces_fn.
+        check_plate_fn:   check_plate(text, authorized_plates) -> (is_auth, matched).
+        door_state_fn:    door_state_fn(frame) -> 'open' | 'closed' | 'unknown'.
+        door_stats_fn:    Thống kê model cửa cho report_lines() (tùy chọn).
+        metrics:          PipelineMetrics (mặc định tạo mới).
+        plate_cache:      PlateTrackCache (mặc định tạo mới với PLATE_OCR_MIN_CONF).
+        motion_gate:      MotionGate (None = luôn chạy YOLO).
+        multi_detector:   MultiCameraDetector (None = chỉ camera chính, model.track()).
+        camera_manager:   CameraManager, cần khi có multi_detector.
+        face_enabled:     Bật nhận diện khuôn mặt (mặc định FACE_RECOGNITION_AVAILABLE).
+        stranger_dir:     Nơi lưu ảnh mặt người lạ chờ duyệt (None = không ghi file, chỉ log + notify text).
+        active_learning_dir: Nơi lưu crop biển số OCR kém (None = không lưu).
+        clock:            Nguồn thời gian (giây) cho các gate theo thời gian; nên dùng chung với
+                          face_cache / motion_gate / door_state_fn.
+    """
+
+    def __init__(
+        self,
+        general_model,
+        plate_model,
+        ocr_fn: Callable[[Any], tuple[str, float]],
+        event_sink,
+        mqtt_manager,
+        plate_whitelist,
+        streamer,
+        *,
+        db=None,
+        camera_monitor=None,
+        check_faces_fn: Optional[Callable] = None,
+        face_cache=None,
+        check_plate_fn: Optional[Callable] = None,
+        door_state_fn: Optional[Callable] = None,
+        door_stats_fn: Optional[Callable[[], dict]] = None,
+        metrics: Optional[PipelineMetrics] = None,
+        plate_cache: Optional[PlateTrackCache] = None,
+        motion_gate=None,
+        multi_detector=None,
+        camera_manager=None,
+        face_enabled: bool = FACE_RECOGNITION_AVAILABLE,
+        ocr_batch_fn: Optional[Callable[[list], list[tuple[str, float]]]] = None,
+        stranger_dir: Optional[str] = FACES_TEMP_DIR,
+        active_learning_dir: Optional[str] = ACTIVE_LEARNING_DIR,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.general_model = general_model
+        self.plate_model = plate_model
+        self.ocr_fn = ocr_fn
+        self.ocr_batch_fn = ocr_batch_fn
+        self.event_sink = event_sink
+        self.mqtt_manager = mqtt_manager
+        self.plate_whitelist = plate_whitelist
+        self.streamer = streamer
+        self.db = db
+        self.camera_monitor = camera_monitor
+        self.check_faces_fn = check_faces_fn
+        self.face_cache = face_cache
+        self.check_plate_fn = check_plate_fn
+        self.door_state_fn = door_state_fn
+        self.door_stats_fn = door_stats_fn
+        self.metrics = metrics if metrics is not None else PipelineMetrics()
+        self.plate_cache = plate_cache if plate_cache is not None else PlateTrackCache(min_conf=PLATE_OCR_MIN_CONF)
+        self.motion_gate = motion_gate
+        self.multi_detector = multi_detector
+        self.camera_manager = camera_manager
+        self.face_enabled = face_enabled and check_faces_fn is not None and face_cache is not None
+        self.stranger_dir = stranger_dir
+        self.active_learning_dir = active_learning_dir
+        self.clock = clock
+        self.stage_runs: Counter[str] = Counter()
+
+        self.person_class_ids, self.vehicle_class_ids = resolve_class_ids(general_model)
+
+        # --- Trạng thái main loop ---
+        self.truck_count = 0
+        self.person_count = 0
+        self.door_open = True
+        self.frame_count = 0
+        self.last_frame_time = clock()
+        self.last_person_seen_time = clock()
+        self.notification_sent = False
+        self.signal_loss_alerted = False
+        self.camera_shift_alerted = False
+        # Baseline đã lưu trên đĩa → restart không cần chụp lại
+        self.camera_baseline_ready = camera_monitor.has_baseline() if camera_monitor is not None else False
+        # Tripwire camera chính: khởi tạo lazy khi có frame đầu tiên (cần chiều cao frame)
+        self.tripwire: Optional[TripwireTracker] = None
+        self._frame_height = 0
+
+    # ------------------------------------------------------------------
+    def get_state(self):
+        """Trả về trạng thái hiện tại cho API và Telegram."""
+        return self.person_count, self.truck_count, self.door_open
+
+    def get_counts(self):
+        """Trả về số lượng cho Telegram."""
+        return self.truck_count, self.person_count
+
+    def evict_track_caches(self, track_ids):
+        """Track biến mất khỏi TripwireTracker → xóa cache OCR biển số và khuôn mặt của nó."""
+        self.plate_cache.evict(track_ids)
+        if self.face_cache is not None:
+            self.face_cache.evict(track_ids)
+
+    def make_tripwire(self, height_fn: Callable[[], int], on_evict=None) -> TripwireTracker:
+        return TripwireTracker(
+            line_y_fn=lambda: resolve_line_y(height_fn()),
+            buffer_frames=TRIPWIRE_BUFFER_FRAMES,
+            cooldown_secs=TRIPWIRE_COOLDOWN_SECS,
+            on_evict=on_evict,
+            clock=self.clock,
+        )
+
+    # ------------------------------------------------------------------
+    def on_no_frame(self) -> None:
+        """Gọi khi không đọc được frame: cảnh báo mất tín hiệu một lần sau SIGNAL_LOSS_TIMEOUT."""
+        if not self.signal_loss_alerted and (self.clock() - self.last_frame_time) > SIGNAL_LOSS_TIMEOUT:
+            msg = "CẢNH BÁO: Mất tín hiệu camera!"
+            self.event_sink.log_event("SIGNAL_LOSS", msg, self.truck_count, self.person_count, notify=msg, important=True)
+            self.signal_loss_alerted = True
+
+    def process_frame(self, frame):
+        """Chạy toàn bộ pipeline cho một frame camera chính; trả về frame đã vẽ overlay."""
+        self.signal_loss_alerted = False
+        self.last_frame_time = now = self.clock()
+        self.frame_count += 1
+
+        frame = resize_for_process(frame, PROCESS_WIDTH)
+        self._frame_height = frame.shape[0]
+        line_y = resolve_line_y(frame.shape[0])
+        metrics = self.metrics
+
+        # 0. Giám sát camera có lệch khỏi góc ban đầu hay không
+        with metrics.stage("shift_check"):
+            self._check_camera_shift(frame)
+
+        # 1. Nhận diện người/xe (YOLO tracking)
+        with metrics.stage("track"):
+            run_main, results = self._detect(frame)
+
+        # Đếm IN/OUT qua vạch + vẽ box
+        with metrics.stage("tripwire"):
+            vehicle_tracks, person_tracks = self._count_and_draw(frame, results, run_main)
+
+        # 2. Nhận diện khuôn mặt (mỗi 2 giây)
+        with metrics.stage("face"):
+            if self.face_enabled and person_tracks and int(now) % 2 == 0:
+                self.stage_runs["face"] += 1
+                self._check_faces(frame, person_tracks)
+
+        # 3. Nhận diện biển số (chỉ chạy nếu OCR được bật)
+        with metrics.stage("plate"):
+            if (
+                run_main
+                and self.mqtt_manager.ocr_enabled
+                and self.frame_count % max(1, PLATE_DETECT_EVERY_N_FRAMES) == 0
+            ):
+                self.stage_runs["plate"] += 1
+                self._check_plates(frame, vehicle_tracks)
+
+        # 4. Kiểm tra trạng thái cửa cuốn
+        with metrics.stage("door"):
+            self._check_door(frame)
+
+        # 5. Cảnh báo cửa mở quá 5 phút không có người
+        if self.door_open and self.person_count == 0:
+            idle_minutes = (now - self.last_person_seen_time) / 60
+            if idle_minutes > DOOR_OPEN_ALERT_MINUTES and not self.notification_sent:
+                msg = "CẢNH BÁO: Cửa mở nhưng không có người quá 5 phút!"
+                self.event_sink.log_event("ALERT", msg, self.truck_count, self.person_count, notify=msg, important=True)
+                self.notification_sent = True
+
+        # MQTT Update
+        self.mqtt_manager.publish_state(self.person_count, self.truck_count, self.door_open)
+
+        # GUI
+        with metrics.stage("overlay"):
+            self._draw_overlay(frame, line_y)
+
+        # Cập nhật Streamer
+        with metrics.stage("stream"):
+            self.streamer.update_frame(frame)
+        metrics.frame_done()
+        return frame
+
+    # ------------------------------------------------------------------
+    def _check_camera_shift(self, frame) -> None:
+        monitor = self.camera_monitor
+        if monitor is None:
+            return
+        if not self.camera_baseline_ready:
+            self.camera_baseline_ready = monitor.set_baseline(frame)
+            if self.camera_baseline_ready:
+                print("✅ Camera baseline đã được chụp để theo dõi lệch góc.")
+            return
+
+        # Camera chuyển chế độ (ngày ↔ hồng ngoại) lần đầu → chụp thêm baseline cho chế độ đó
+        if self.frame_count % CAMERA_SHIFT_CHECK_EVERY_FRAMES == 0 and not self.camera_shift_alerted:
+            mode = monitor.frame_mode(frame)
+            if not monitor.has_baseline(mode) and monitor.set_baseline(frame, mode):
+                print(f"✅ Đã chụp thêm camera baseline cho chế độ '{mode}'.")
+        shift_result = monitor.evaluate(frame)
+        if shift_result is None:
+            return
+        if shift_result.is_shifted and not self.camera_shift_alerted:
+            self.camera_shift_alerted = True
+            msg = (
+                "🚨 CẢNH BÁO: Camera có dấu hiệu lệch góc khỏi vị trí ban đầu "
+                f"(rot={shift_result.rotation_deg:.2f}°, "
+                f"trans={shift_result.translation_px:.1f}px, "
+                f"inlier={shift_result.inlier_ratio:.2f})."
+            )
+            print(msg)
+            self.event_sink.log_event("CAMERA_SHIFT", msg, self.truck_count, self.person_count, notify=msg, important=True)
+        elif not shift_result.is_shifted and self.camera_shift_alerted:
+            self.camera_shift_alerted = False
+            msg = "✅ Camera đã quay lại gần góc ban đầu."
+            print(msg)
+            self.event_sink.log_event("CAMERA_SHIFT_RECOVERED", msg, self.truck_count, self.person_count, notify=msg)
+
+    def _detect(self, frame):
+        # Không có chuyển động trong ROI (ngoài hold-over/heartbeat) → bỏ qua YOLO camera chính
+        run_main = self.motion_gate is None or self.motion_gate.should_infer(frame)
+        if run_main:
+            self.stage_runs["track"] += 1
+        if self.multi_detector is not None:
+            # Camera chính + frame mới của các camera phụ chạy chung một forward pass
+            batch_frames = {"main": frame} if run_main else {}
+            latest = self.camera_manager.get_latest_frames(exclude=("main",))
+            for cam_id, cam_frame in self.multi_detector.select_new(latest).items():
+                batch_frames[cam_id] = resize_for_process(cam_frame, PROCESS_WIDTH)
+            batch_results = self.multi_detector.detect(batch_frames)
+            results = [batch_results.pop("main")] if run_main else []
+            for cam_id, cam_result in batch_results.items():
+                self.process_secondary_camera(cam_id, cam_result)
+            self.tripwire = self.multi_detector.state("main").tripwire
+        elif run_main:
+            results = self.general_model.track(
+                frame, persist=True, verbose=False, imgsz=GENERAL_DETECT_IMGSZ, conf=GENERAL_DETECT_CONF
+            )
+        else:
+            results = []
+        return run_main, results
+
+    def _count_and_draw(self, frame, results, run_main):
+        # Khởi tạo TripwireTracker lần đầu (cần biết line_y_fn runtime)
+        if self.tripwire is None:
+            self.tripwire = self.make_tripwire(lambda: self._frame_height, on_evict=self.evict_track_caches)
+            print(f"✅ TripwireTracker khởi tạo: buffer={TRIPWIRE_BUFFER_FRAMES} frames, cooldown={TRIPWIRE_COOLDOWN_SECS}s")
+
+        active_ids: set[int] = set()
+        vehicle_tracks: dict[int, tuple[int, int, int, int]] = {}  # track_id -> bbox, dùng gán biển số
+        person_tracks: dict[int, tuple[int, int, int, int]] = {}   # track_id -> bbox, dùng tìm khuôn mặt
+
+        for r in results:
+            for bbox in r.boxes:
+                x1, y1, x2, y2 = map(int, bbox.xyxy[0])
+                obj_id = int(bbox.id[0]) if bbox.id is not None else None
+                cls = int(bbox.cls[0])
+                center_y = (y1 + y2) // 2
+                is_person = cls in self.person_class_ids
+                is_vehicle = cls in self.vehicle_class_ids
+
+                if obj_id is not None:
+                    active_ids.add(obj_id)
+                    if is_vehicle:
+                        vehicle_tracks[obj_id] = (x1, y1, x2, y2)
+                    elif is_person:
+                        person_tracks[obj_id] = (x1, y1, x2, y2)
+
+                crossed_red_line = False
+                if obj_id is not None and (is_person or is_vehicle):
+                    direction = self.tripwire.update(obj_id, center_y)
+                    if direction is not None:
+                        crossed_red_line = True
+                        self._count_crossing(obj_id, direction, is_vehicle, is_person)
+
+                if is_person:
+                    self.last_person_seen_time = self.clock()
+                    self.notification_sent = False
+
+                # Hiển thị label vùng nhận diện: người vàng, xe xanh
+                if is_person or is_vehicle:
+                    box_color = PERSON_BOX_COLOR if is_person else VEHICLE_BOX_COLOR
+                    label_name = "NGUOI" if is_person else "XE"
+                    if crossed_red_line:
+                        label_name += " QUA VACH DO"
+                    display_id = obj_id if obj_id is not None else "NA"
+                    cv2.rectangle(frame, (x1, y1), (x2, y2), box_color, 2)
+                    cv2.putText(
+                        frame,
+                        f"{label_name} #{display_id}",
+                        (x1, max(20, y1 - 8)),
+                        cv2.FONT_HERSHEY_SIMPLEX,
+                        0.55,
+                        box_color,
+                        2,
+                    )
+
+        # Xóa tracking của object đã biến mất
+        # Frame bị motion gate bỏ qua không có detection → chỉ xóa theo timeout
+        self.tripwire.cleanup_stale(active_ids if run_main else None)
+        return vehicle_tracks, person_tracks
+
+    def _count_crossing(self, obj_id, direction, is_vehicle, is_person) -> None:
+        event_msg = ""
+        if direction == "IN":
+            if is_vehicle:
+                self.truck_count += 1
+                event_msg = f"🚛 Xe #{obj_id} đi VÀO (IN). Tổng xe: {self.truck_count}"
+            elif is_person:
+                self.person_count += 1
+                event_msg = f"🚶 Người #{obj_id} đi VÀO (IN). Tổng người: {self.person_count}"
+        elif direction == "OUT":
+            if is_vehicle:
+                self.truck_count = max(0, self.truck_count - 1)
+                event_msg = f"🚛 Xe #{obj_id} đi RA (OUT). Tổng xe: {self.truck_count}"
+            elif is_person:
+                self.person_count = max(0, self.person_count - 1)
+                event_msg = f"🚶 Người #{obj_id} đi RA (OUT). Tổng người: {self.person_count}"
+
+        if event_msg:
+            self.event_sink.log_event(direction, event_msg, self.truck_count, self.person_count, notify=event_msg)
+
+    def process_secondary_camera(self, cam_id, result) -> None:
+        """Đếm IN/OUT qua vạch cho camera phụ bằng tracker + tripwire riêng của camera đó."""
+        state = self.multi_detector.state(cam_id)
+        cam_name = self.camera_manager.get_camera_name(cam_id)
+        active = set()
+        for bbox in result.boxes:
+            if bbox.id is None:
+                continue
+            obj_id = int(bbox.id[0])
+            cls = int(bbox.cls[0])
+            is_person = cls in self.person_class_ids
+            is_vehicle = cls in self.vehicle_class_ids
+            active.add(obj_id)
+            if not (is_person or is_vehicle):
+                continue
+            _, y1, _, y2 = map(int, bbox.xyxy[0])
+            direction = state.tripwire.update(obj_id, (y1 + y2) // 2)
+            if direction is None:
+                continue
+            delta = 1 if direction == "IN" else -1
+            if is_vehicle:
+                state.truck_count = max(0, state.truck_count + delta)
+                event_msg = f"🚛 [{cam_name}] Xe #{obj_id} đi {'VÀO' if delta > 0 else 'RA'} ({direction}). Tổng xe: {state.truck_count}"
+            else:
+                state.person_count = max(0, state.person_count + delta)
+                event_msg = f"🚶 [{cam_name}] Người #{obj_id} đi {'VÀO' if delta > 0 else 'RA'} ({direction}). Tổng người: {state.person_count}"
+            self.event_sink.log_event(direction, event_msg, state.truck_count, state.person_count, notify=event_msg)
+        state.tripwire.cleanup_stale(active)
+
+    def _check_faces(self, frame, person_tracks) -> None:
+        # Chỉ tìm mặt trong phần trên bbox người; người đã nhận ra thì lấy từ cache theo track
+        for track_id, name, loc, is_new in self.check_faces_fn(frame, person_tracks, self.face_cache):
+            if name == "STRANGER":
+                if not is_new or loc is None:
+                    continue  # mỗi track người lạ chỉ cảnh báo một lần
+                face_id = f"{int(time.time())}_{track_id}"
+                top, right, bottom, left = loc
+                face_img = frame[top:bottom, left:right]
+                if face_img.size > 0:
+                    msg = f"Người lạ phát hiện! ID: `{face_id}`\nDuyệt: `/staff_face {face_id} Ten_Nhan_Vien`"
+                    if self.stranger_dir is None:
+                        self.event_sink.log_event("STRANGER", msg, self.truck_count, self.person_count, notify=msg)
+                        continue
+                    os.makedirs(self.stranger_dir, exist_ok=True)
+                    temp_path = os.path.join(self.stranger_dir, f"{face_id}.jpg")
+                    cv2.imwrite(temp_path, face_img)
+                    self.event_sink.log_event("STRANGER", msg, self.truck_count, self.person_count)
+                    self.event_sink.notify_photo(temp_path, msg)
+            else:
+                x1, y1 = (loc[3], loc[0]) if loc is not None else person_tracks[track_id][:2]
+                cv2.putText(frame, name, (x1, max(20, y1 - 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+
+    def _check_plates(self, frame, vehicle_tracks) -> None:
+        # Lượt 1: gom biển số trong frame, xác định crop nào cần OCR (cache theo track)
+        plates = []  # [box, crop, track_id, cần_ocr]
+        plate_results = self.plate_model(frame, verbose=False)
+        for pr in plate_results:
+            for pbox in pr.boxes:
+                px1, py1, px2, py2 = map(int, pbox.xyxy[0])
+                cls = int(pbox.cls[0])
+                if cls != 1:  # license_plate
+                    continue
+                plate_crop = frame[py1:py2, px1:px2]
+                track_id, needs_ocr = None, False
+                if plate_crop.size > 0:
+                    # Xe đã có kết quả OCR đủ tốt → dùng lại, không OCR crop tương đương
+                    track_id = match_plate_to_track((px1, py1, px2, py2), vehicle_tracks)
+                    needs_ocr = track_id is None or self.plate_cache.needs_ocr(track_id, plate_crop)
+                plates.append(((px1, py1, px2, py2), plate_crop, track_id, needs_ocr))
+
+        # Lượt 2: OCR mọi crop cần đọc trong một lần gọi batch (nếu có)
+        crops = [p[1] for p in plates if p[3]]
+        if not crops:
+            reads = iter(())
+        elif self.ocr_batch_fn is not None:
+            reads = iter(self.ocr_batch_fn(crops))
+        else:
+            reads = iter([self.ocr_fn(crop) for crop in crops])
+
+        # Lượt 3: cập nhật cache, whitelist/cảnh báo, vẽ theo đúng thứ tự detect
+        for (px1, py1, px2, py2), plate_crop, track_id, needs_ocr in plates:
+            plate_text, prob = "", 0.0
+            is_new_read = False
+            if needs_ocr:
+                plate_text, prob = next(reads)
+                is_new_read = self.plate_cache.update(track_id, plate_text, prob, plate_crop)
+
+                if prob < PLATE_OCR_MIN_CONF and plate_text and self.active_learning_dir is not None:
+                    save_path = os.path.join(self.active_learning_dir, f"plate_{int(time.time())}.jpg")
+                    os.makedirs(self.active_learning_dir, exist_ok=True)
+                    cv2.imwrite(save_path, plate_crop)
+                    print(f"📀 Saved Active Learning sample: {plate_text} ({prob:.2f})")
+            elif plate_crop.size > 0:
+                cached = self.plate_cache.get(track_id)
+                plate_text, prob = cached.text, cached.prob
+
+            if plate_text:
+                plate_norm = normalize_plate(plate_text)
+                # Chỉ xử lý whitelist/cảnh báo khi xe có biển số mới đọc được
+                if plate_norm and is_new_read:
+                    self._handle_new_plate(frame, plate_text, plate_norm, px1, py1)
+                cv2.putText(frame, f"BS: {plate_text}", (px1, py1 - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 200, 255), 2)
+            cv2.rectangle(frame, (px1, py1), (px2, py2), (255, 0, 255), 2)
+
+    def _handle_new_plate(self, frame, plate_text, plate_norm, px1, py1) -> None:
+        is_auth = False
+        if self.check_plate_fn is not None:
+            is_auth, _matched = self.check_plate_fn(plate_text, authorized_plates)
+        is_whitelisted = is_auth or self.plate_whitelist.contains(plate_norm)
+        if is_whitelisted:
+            print(f"✅ Xe quen: {plate_norm} -> MỞ CỬA")
+            self.mqtt_manager.publish_trigger_open()
+            cv2.putText(frame, "BIEN SO HOP LE - MO CUA!", (px1, py1 - 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+            return
+
+        msg = f"Xe lạ phát hiện: {plate_norm}"
+        pending_id = str(uuid.uuid4())
+        first_seen_utc = datetime.utcnow().isoformat()
+        db = self.db
+
+        def _add_pending(event_id, plate_raw=plate_text, plate_norm=plate_norm,
+                         pending_id=pending_id, first_seen_utc=first_seen_utc):
+            if db is None:
+                return
+            db.add_pending_plate(
+                pending_id=pending_id,
+                event_id=event_id,
+                plate_raw=plate_raw,
+                plate_norm=plate_norm,
+                first_seen_utc=first_seen_utc
+            )
+
+        self.event_sink.log_event(
+            "UNKNOWN_PLATE", msg, self.truck_count, self.person_count,
+            notify=f"{msg}\nXác nhận:\n/mine {plate_norm}\n/staff {plate_norm}\n/reject {plate_norm}",
+            on_logged=_add_pending,
+        )
+
+    def _check_door(self, frame) -> None:
+        if self.door_state_fn is None:
+            return
+        current_door_state = self.door_state_fn(frame)
+        if current_door_state == 'unknown':
+            return
+        new_door_open = (current_door_state == 'open')
+        if new_door_open != self.door_open:
+            self.door_open = new_door_open
+            state_msg = "Cửa cuốn đã MỞ." if self.door_open else "Cửa cuốn đã ĐÓNG."
+            self.event_sink.log_event("DOOR_STATE", state_msg, self.truck_count, self.person_count, notify=state_msg)
+
+    def _draw_overlay(self, frame, line_y) -> None:
+        door_status = "🔓 MỞ" if self.door_open else "🔒 ĐÓNG"
+        cv2.line(frame, (0, line_y), (frame.shape[1], line_y), (0, 0, 255), 5)
+        cv2.putText(frame, f"Qua vach do - Xe: {self.truck_count} | Nguoi: {self.person_count}", (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.85, (0, 0, 255), 2)
+        cv2.putText(frame, f"Cua: {door_status}", (10, 80), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3)
+
+        # Cập nhật thông tin thời gian thực
+        now_str = datetime.now().strftime("%H:%M:%S - %d/%m/%Y")
+        cv2.putText(frame, now_str, (frame.shape[1] - 380, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+
+    # ------------------------------------------------------------------
+    def report_lines(self) -> list[str]:
+        """Các dòng log định kỳ: event sink, stage chậm nhất, cửa, motion gate, cache, DB pool."""
+        lines = []
+        es = self.event_sink.stats()
+        lines.append(
+            f"ℹ️ Event sink: queue={es['event_queue_depth']} written={es['events_written']} "
+            f"dropped={es['events_dropped']} notify_queue={es['notify_queue_depth']}"
+        )
+        pm = self.metrics.summary()
+        slowest = sorted(pm["stages"].items(), key=lambda kv: kv[1]["p95_ms"], reverse=True)[:3]
+        lines.append(
+            f"ℹ️ Pipeline: {pm['fps']:.1f} fps | p95 "
+            + ", ".join(f"{name}={st['p95_ms']:.1f}ms" for name, st in slowest)
+        )
+        if self.door_stats_fn is not None:
+            ds = self.door_stats_fn()
+            lines.append(f"ℹ️ Door: runs={ds['model_runs']} skipped={ds['skipped']} ({ds['skip_ratio']:.0%})")
+        if self.motion_gate is not None:
+            mg = self.motion_gate.stats()
+            lines.append(
+                f"ℹ️ Motion gate: inferred={mg['inferred']} skipped={mg['skipped']} "
+                f"({mg['skip_ratio']:.0%}) heartbeats={mg['heartbeats']} active={mg['active']}"
+            )
+        pc = self.plate_cache.stats()
+        lines.append(f"ℹ️ Plate OCR cache: tracked={pc['tracked']} ocr={pc['ocr_runs']} hits={pc['cache_hits']}")
+        if self.multi_detector is not None:
+            ms = self.multi_detector.stats()
+            lines.append(
+                f"ℹ️ Multi-camera: cameras={ms['cameras']} avg_batch={ms['avg_batch_size']} "
+                f"last_batch={ms['last_batch_ms']:.0f}ms"
+            )
+        ps = self.db.pool_stats() if self.db is not None else {}
+        if ps.get("pooled"):
+            wait = ps["wait_seconds"]
+            lines.append(
+                f"ℹ️ DB pool: in_use={ps['in_use']} idle={ps['idle']} reconnects={ps['reconnects']} "
+                f"avg_wait={wait['sum'] / max(1, wait['count']) * 1000:.1f}ms"
+            )
+        return lines
@@ -0,0 +1,204 @@
+"""
+core/pipeline_metrics.py – Đo latency từng stage của main loop + FPS, xuất Prometheus/JSONL
+
+Cách dùng:
+    metrics = PipelineMetrics(jsonl_path="./data/metrics/pipeline.jsonl")
+    with metrics.stage("track"):
+        results = general_model.track(frame, ...)
+    metrics.frame_done()                  # cuối mỗi vòng lặp
+    metrics.summary()                     # {"fps": ..., "stages": {"track": {"p50_ms": ...}}}
+    metrics.render_prometheus()           # text cho GET /api/metrics
+    metrics.add_collector(db.render_prometheus)  # nối thêm metric của thành phần khác (DB pool...)
+
+Logic:
+    - Mỗi stage có một context object dựng sẵn (không cấp phát mỗi frame), chỉ gọi
+      perf_counter_ns() hai lần và append vào deque → vài trăm ns, << 1% stage cỡ ms.
+    - p50/p95/p99 tính trên cửa sổ trượt `window` mẫu gần nhất, chỉ khi có người đọc.
+    - FPS tính trên cửa sổ thời điểm kết thúc frame; frames_total là counter cộng dồn.
+    - jsonl_path (tùy chọn): mỗi frame ghi một dòng {"ts", "frame", "stages": {tên: ms}}
+      qua file buffer, dùng cho phân tích offline.
+    - Thread-safety: ghi chỉ từ main loop; đọc (API thread) chụp bản sao deque.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from collections import deque
+from typing import Callable, Optional
+
+# Thứ tự stage của main.py (stage khác vẫn dùng được, tự thêm khi gặp lần đầu)
+PIPELINE_STAGES = (
+    "shift_check",
+    "track",
+    "tripwire",
+    "face",
+    "plate",
+    "door",
+    "overlay",
+    "stream",
+)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _StageTimer:
+    __slots__ = ("_samples", "_frame", "_name", "_t0", "count", "total_ns")
+
+    def __init__(self, name: str, window: int, frame: dict) -> None:
+        self._name = name
+        self._samples: deque[int] = deque(maxlen=window)
+        self._frame = frame
+        self._t0 = 0
+        self.count = 0
+        self.total_ns = 0
+
+    def __enter__(self) -> "_StageTimer":
+        self._t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter_ns() - self._t0
+        self._samples.append(elapsed)
+        self.count += 1
+        self.total_ns += elapsed
+        self._frame[self._name] = self._frame.get(self._name, 0) + elapsed
+
+    def quantiles_ns(self) -> list[int]:
+        samples = sorted(list(self._samples))
+        if not samples:
+            return [0] * len(QUANTILES)
+        last = len(samples) - 1
+        return [samples[min(last, int(round(q * last)))] for q in QUANTILES]
+
+
+class PipelineMetrics:
+    """
+    Timer theo stage cho main loop.
+
+    Args:
+        window:      Số mẫu gần nhất dùng tính percentile và FPS.
+        jsonl_path:  Nếu có, append từng frame (ms theo stage) ra file JSONL.
+        stages:      Danh sách stage khai báo trước (giữ thứ tự khi xuất).
+    """
+
+    def __init__(
+        self,
+        window: int = 1024,
+        jsonl_path: Optional[str] = None,
+        stages: tuple[str, ...] = PIPELINE_STAGES,
+    ) -> None:
+        self._window = max(2, window)
+        self._current: dict[str, int] = {}
+        self._stages: dict[str, _StageTimer] = {}
+        for name in stages:
+            self.stage(name)
+        self._frame_times: deque[float] = deque(maxlen=self._window)
+        self.frames_total = 0
+        self._started_at = time.time()
+        self._collectors: list[Callable[[], str]] = []
+
+        self._jsonl = None
+        if jsonl_path:
+            os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+            self._jsonl = open(jsonl_path, "a", encoding="utf-8", buffering=1 << 16)
+
+        self.timer_overhead_ns = self._calibrate()
+
+    # ------------------------------------------------------------------
+    def stage(self, name: str) -> _StageTimer:
+        timer = self._stages.get(name)
+        if timer is None:
+            timer = _StageTimer(name, self._window, self._current)
+            self._stages[name] = timer
+        return timer
+
+    def frame_done(self) -> None:
+        now = time.perf_counter()
+        self._frame_times.append(now)
+        self.frames_total += 1
+        if self._jsonl is not None and self._current:
+            record = {
+                "ts": round(time.time(), 3),
+                "frame": self.frames_total,
+                "stages": {k: round(v / 1e6, 3) for k, v in self._current.items()},
+            }
+            self._jsonl.write(json.dumps(record) + "\n")
+        self._current.clear()
+
+    def fps(self) -> float:
+        times = list(self._frame_times)
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def summary(self) -> dict:
+        stages = {}
+        for name, timer in list(self._stages.items()):
+            if timer.count == 0:
+                continue
+            p50, p95, p99 = timer.quantiles_ns()
+            stages[name] = {
+                "count": timer.count,
+                "p50_ms": round(p50 / 1e6, 3),
+                "p95_ms": round(p95 / 1e6, 3),
+                "p99_ms": round(p99 / 1e6, 3),
+            }
+        return {
+            "fps": round(self.fps(), 2),
+            "frames_total": self.frames_total,
+            "timer_overhead_ns": self.timer_overhead_ns,
+            "stages": stages,
+        }
+
+    def add_collector(self, render_fn: Callable[[], str]) -> None:
+        """render_fn() trả về Prometheus text được nối vào cuối render_prometheus()."""
+        self._collectors.append(render_fn)
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP pipeline_stage_seconds Latency của từng stage main loop (cửa sổ trượt).",
+            "# TYPE pipeline_stage_seconds summary",
+        ]
+        for name, timer in list(self._stages.items()):
+            if timer.count == 0:
+                continue
+            for q, value in zip(QUANTILES, timer.quantiles_ns()):
+                lines.append(f'pipeline_stage_seconds{{stage="{name}",quantile="{q}"}} {value / 1e9:.9f}')
+            lines.append(f'pipeline_stage_seconds_sum{{stage="{name}"}} {timer.total_ns / 1e9:.9f}')
+            lines.append(f'pipeline_stage_seconds_count{{stage="{name}"}} {timer.count}')
+        lines += [
+            "# HELP pipeline_frames_total Số frame main loop đã xử lý.",
+            "# TYPE pipeline_frames_total counter",
+            f"pipeline_frames_total {self.frames_total}",
+            "# HELP pipeline_fps FPS main loop (cửa sổ trượt).",
+            "# TYPE pipeline_fps gauge",
+            f"pipeline_fps {self.fps():.3f}",
+            "# HELP pipeline_timer_overhead_seconds Chi phí ước tính của một lần đo stage.",
+            "# TYPE pipeline_timer_overhead_seconds gauge",
+            f"pipeline_timer_overhead_seconds {self.timer_overhead_ns / 1e9:.9f}",
+            "# HELP pipeline_start_time_seconds Thời điểm khởi động (unix time).",
+            "# TYPE pipeline_start_time_seconds gauge",
+            f"pipeline_start_time_seconds {self._started_at:.3f}",
+        ]
+        text = "\n".join(lines) + "\n"
+        for render_fn in self._collectors:
+            text += render_fn()
+        return text
+
+    def close(self) -> None:
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _calibrate(iterations: int = 2000) -> int:
+        """Ước lượng chi phí (ns) của một lần `with timer:` rỗng."""
+        timer = _StageTimer("_calibrate", 16, {})
+        t0 = time.perf_counter_ns()
+        for _ in range(iterations):
+            with timer:
+                pass
+        return (time.perf_counter_ns() - t0) // iterations
@@ -0,0 +1,123 @@
+"""
+core/plate_track_cache.py – Cache kết quả OCR biển số theo track ID của xe
+
+Cách dùng:
+    cache = PlateTrackCache(min_conf=0.7)
+    track_id = match_plate_to_track(plate_xyxy, vehicle_boxes)   # {track_id: xyxy}
+    if track_id is None or cache.needs_ocr(track_id, crop):
+        text, prob = ocr_plate(crop)
+        changed = cache.update(track_id, text, prob, crop)        # True nếu biển số của xe đổi
+    else:
+        entry = cache.get(track_id)                               # dùng lại kết quả cũ
+    cache.evict(stale_ids)   # gắn vào TripwireTracker(on_evict=cache.evict)
+
+Logic:
+    - Biển số được gán cho xe (track của general_model.track) có bbox chứa tâm biển số.
+    - Mỗi xe chỉ OCR lại khi: kết quả hiện có dưới `min_conf`, hoặc crop mới lớn hơn
+      `area_gain` lần / nét hơn `sharpness_gain` lần so với crop tốt nhất đã OCR.
+    - Giữ text có prob cao nhất; mốc chất lượng (diện tích, độ nét) luôn tăng dần để
+      xe đứng yên không bị OCR lặp.
+    - Entry bị xóa cùng lúc TripwireTracker xóa track (cleanup_stale → on_evict).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+@dataclass
+class PlateRead:
+    text: str
+    prob: float
+    area: int
+    sharpness: float
+    ocr_runs: int = 1
+
+
+def plate_sharpness(crop: np.ndarray) -> float:
+    """Độ nét = phương sai Laplacian trên ảnh xám."""
+    gray = crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def match_plate_to_track(plate_xyxy, track_boxes: dict[int, tuple[int, int, int, int]]) -> Optional[int]:
+    """Track có bbox chứa tâm biển số (bbox nhỏ nhất nếu nhiều xe chồng nhau), hoặc None."""
+    px1, py1, px2, py2 = plate_xyxy
+    cx, cy = (px1 + px2) / 2.0, (py1 + py2) / 2.0
+    best_id, best_area = None, None
+    for track_id, (x1, y1, x2, y2) in track_boxes.items():
+        if x1 <= cx <= x2 and y1 <= cy <= y2:
+            area = (x2 - x1) * (y2 - y1)
+            if best_area is None or area < best_area:
+                best_id, best_area = track_id, area
+    return best_id
+
+
+class PlateTrackCache:
+    """
+    Kết quả OCR tốt nhất của từng xe đang được track.
+
+    Args:
+        min_conf:        Dưới ngưỡng này vẫn OCR lại ở lần phát hiện tiếp theo.
+        area_gain:       Crop lớn hơn bao nhiêu lần thì OCR lại.
+        sharpness_gain:  Crop nét hơn bao nhiêu lần thì OCR lại.
+    """
+
+    def __init__(self, min_conf: float = 0.7, area_gain: float = 1.3, sharpness_gain: float = 1.5) -> None:
+        self._min_conf = min_conf
+        self._area_gain = area_gain
+        self._sharpness_gain = sharpness_gain
+        self._reads: dict[int, PlateRead] = {}
+        self._counters = {"ocr_runs": 0, "cache_hits": 0, "evictions": 0}
+
+    # ------------------------------------------------------------------
+    def get(self, track_id: int) -> Optional[PlateRead]:
+        return self._reads.get(track_id)
+
+    def needs_ocr(self, track_id: int, crop: np.ndarray) -> bool:
+        entry = self._reads.get(track_id)
+        if entry is None or entry.prob < self._min_conf or not entry.text:
+            return True
+        area = crop.shape[0] * crop.shape[1]
+        if area >= entry.area * self._area_gain:
+            return True
+        if plate_sharpness(crop) > entry.sharpness * self._sharpness_gain:
+            return True
+        self._counters["cache_hits"] += 1
+        return False
+
+    def update(self, track_id: Optional[int], text: str, prob: float, crop: np.ndarray) -> bool:
+        """Ghi kết quả OCR mới. Trả về True nếu text của xe khác với kết quả đã biết."""
+        self._counters["ocr_runs"] += 1
+        if track_id is None:
+            return True
+        area = crop.shape[0] * crop.shape[1]
+        sharpness = plate_sharpness(crop)
+        entry = self._reads.get(track_id)
+        if entry is None:
+            self._reads[track_id] = PlateRead(text=text or "", prob=prob if text else 0.0,
+                                              area=area, sharpness=sharpness)
+            return bool(text)
+
+        entry.ocr_runs += 1
+        entry.area = max(entry.area, area)
+        entry.sharpness = max(entry.sharpness, sharpness)
+        if not text or (entry.text and prob <= entry.prob):
+            return False
+        changed = text != entry.text
+        entry.text, entry.prob = text, prob
+        return changed
+
+    def evict(self, track_ids) -> None:
+        for track_id in track_ids:
+            if self._reads.pop(track_id, None) is not None:
+                self._counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        data = dict(self._counters)
+        data["tracked"] = len(self._reads)
+        return data
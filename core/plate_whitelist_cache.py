@@ -0,0 +1,192 @@
+"""
+core/plate_whitelist_cache.py – Whitelist biển số trong RAM, cập nhật qua Postgres LISTEN/NOTIFY
+
+Cách dùng:
+    cache = PlateWhitelistCache(db)
+    cache.start()                      # full load + thread lắng nghe NOTIFY
+    if cache.contains(plate_norm): ... # tra cứu trong set, không round trip DB
+    cache.stats()                      # size, số lần resync, notify, ...
+
+Logic:
+    - Khi start: nạp toàn bộ plate_whitelist (is_active = TRUE) vào một frozenset.
+    - DatabaseManager.upsert_vehicle_whitelist gửi pg_notify(WHITELIST_NOTIFY_CHANNEL, plate_norm)
+      trong cùng transaction; thread nền LISTEN kênh đó, gom các biển số vừa đổi rồi chỉ
+      query lại trạng thái của đúng những biển đó (incremental).
+    - Mỗi `resync_interval` giây (hoặc sau khi mất kết nối LISTEN) nạp lại toàn bộ để bù
+      notification bị lỡ.
+    - Set được thay bằng frozenset mới (copy-on-write) nên contains() không cần lock.
+    - Chưa nạp được lần nào (DB lỗi lúc khởi động) → contains() hỏi thẳng DB như cũ.
+"""
+
+from __future__ import annotations
+
+import logging
+import select
+import threading
+import time
+from typing import Iterable, Optional
+
+from core.database import WHITELIST_NOTIFY_CHANNEL
+
+logger = logging.getLogger("plate_whitelist_cache")
+
+
+class PlateWhitelistCache:
+    """
+    Bản sao plate_whitelist trong bộ nhớ process.
+
+    Args:
+        db:               DatabaseManager (get_active_whitelist_plates, get_whitelist_status,
+                          open_listen_connection, is_plate_whitelisted).
+        resync_interval:  Chu kỳ (giây) full resync dự phòng.
+        poll_timeout:     Thời gian (giây) tối đa chờ NOTIFY mỗi vòng lặp.
+        reconnect_delay:  Thời gian (giây) chờ trước khi mở lại connection LISTEN bị lỗi.
+    """
+
+    def __init__(
+        self,
+        db,
+        resync_interval: float = 300.0,
+        poll_timeout: float = 0.5,
+        reconnect_delay: float = 5.0,
+        channel: str = WHITELIST_NOTIFY_CHANNEL,
+    ) -> None:
+        self._db = db
+        self._resync_interval = resync_interval
+        self._poll_timeout = poll_timeout
+        self._reconnect_delay = reconnect_delay
+        self._channel = channel
+
+        self._plates: Optional[frozenset[str]] = None
+        self._last_resync = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._write_lock = threading.Lock()
+
+        self._counters = {
+            "full_resyncs": 0,
+            "incremental_updates": 0,
+            "notifications": 0,
+            "listen_errors": 0,
+            "db_fallback_lookups": 0,
+        }
+
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        self.resync()
+        self._thread = threading.Thread(target=self._listen_loop, daemon=True, name="whitelist-listen")
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def contains(self, plate_norm: str) -> bool:
+        plates = self._plates
+        if plates is None:
+            self._counters["db_fallback_lookups"] += 1
+            return self._db.is_plate_whitelisted(plate_norm)
+        return plate_norm in plates
+
+    __contains__ = contains
+
+    def resync(self) -> bool:
+        """Nạp lại toàn bộ whitelist. Trả về False nếu DB lỗi (giữ nguyên dữ liệu cũ)."""
+        plates = self._db.get_active_whitelist_plates()
+        self._last_resync = time.monotonic()
+        if plates is None:
+            return False
+        with self._write_lock:
+            self._plates = frozenset(plates)
+        self._counters["full_resyncs"] += 1
+        return True
+
+    def apply_changes(self, plates: Iterable[str]) -> bool:
+        """Cập nhật trạng thái của các biển số vừa thay đổi (payload NOTIFY)."""
+        plates = {p for p in plates if p}
+        if not plates:
+            return True
+        status = self._db.get_whitelist_status(plates)
+        if status is None:
+            return False
+        with self._write_lock:
+            current = set(self._plates or ())
+            for plate, active in status.items():
+                if active:
+                    current.add(plate)
+                else:
+                    current.discard(plate)
+            self._plates = frozenset(current)
+        self._counters["incremental_updates"] += 1
+        return True
+
+    def stats(self) -> dict:
+        data = dict(self._counters)
+        plates = self._plates
+        data["loaded"] = plates is not None
+        data["size"] = len(plates) if plates is not None else 0
+        data["last_resync_age_s"] = round(time.monotonic() - self._last_resync, 1) if self._last_resync else None
+        return data
+
+    # ------------------------------------------------------------------
+    def _resync_due(self) -> bool:
+        return self._plates is None or time.monotonic() - self._last_resync >= self._resync_interval
+
+    def _listen_loop(self) -> None:
+        conn = None
+        listened_once = False
+        while not self._stop.is_set():
+            if conn is None:
+                try:
+                    conn = self._db.open_listen_connection(self._channel)
+                    # Reconnect: có thể đã lỡ NOTIFY trong lúc mất kết nối → nạp lại toàn bộ
+                    if listened_once or self._plates is None:
+                        self.resync()
+                    listened_once = True
+                except Exception as e:
+                    self._counters["listen_errors"] += 1
+                    logger.warning("Whitelist LISTEN connect failed: %s", e)
+                    conn = None
+                    if self._resync_due():
+                        self.resync()
+                    self._stop.wait(self._reconnect_delay)
+                    continue
+
+            try:
+                changed = self._wait_notifications(conn)
+            except Exception as e:
+                self._counters["listen_errors"] += 1
+                logger.warning("Whitelist LISTEN connection lost: %s", e)
+                self._close_quietly(conn)
+                conn = None
+                continue
+
+            if "" in changed:
+                self.resync()  # NOTIFY không kèm biển số → không biết gì đổi, nạp lại toàn bộ
+            elif changed and not self.apply_changes(changed):
+                self.resync()
+            if self._resync_due():
+                self.resync()
+
+        self._close_quietly(conn)
+
+    def _wait_notifications(self, conn) -> set[str]:
+        ready, _, _ = select.select([conn], [], [], self._poll_timeout)
+        if not ready:
+            return set()
+        conn.poll()
+        changed = set()
+        while conn.notifies:
+            changed.add(conn.notifies.pop(0).payload)
+        self._counters["notifications"] += len(changed)
+        return changed
+
+    @staticmethod
+    def _close_quietly(conn) -> None:
+        if conn is None:
+            return
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,303 @@
+"""
+core/replay_bench.py – Replay video/ảnh qua PipelineEngine để đo throughput offline
+
+Cách dùng (qua main.py):
+    python main.py bench --source ./samples/gate.mp4 --report ./data/bench/report.json
+    python main.py bench --source ./samples/frames/ --baseline ./data/bench/baseline.json
+    python main.py bench --source ./samples/gate.mp4 --save-baseline ./data/bench/baseline.json
+
+Logic:
+    - Frame đọc tuần tự từ file video / thư mục ảnh / một ảnh, chạy nhanh nhất có thể
+      (không LatestFrameGrabber, không bỏ frame).
+    - DatabaseManager, MQTTManager, notify_telegram được thay bằng bản in-memory chỉ đếm
+      lời gọi → không cần Postgres, broker MQTT hay Telegram.
+    - Gate theo thời gian (throttle khuôn mặt, motion heartbeat, cache khuôn mặt, cooldown
+      tripwire, hạn model cửa) đọc FrameClock: thời gian = số frame đã replay / FPS nguồn,
+      không phải wall-clock → hai lần replay cùng frame chạy đúng cùng số stage.
+    - Report JSON: FPS, p50/p95/p99 từng stage (PipelineMetrics), số lần stage có điều kiện
+      thực sự chạy, peak RSS, số event theo loại.
+    - So với baseline đã lưu: FPS giảm / p95 stage tăng / RSS tăng quá `tolerance` → regression.
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Iterator, Optional
+
+import cv2
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Cửa sổ PipelineMetrics khi bench: đủ lớn để percentile tính trên toàn bộ lần chạy
+BENCH_METRICS_WINDOW = 100_000
+
+# p95 tăng dưới mức này (ms) không tính là regression (nhiễu đo của stage rất nhanh)
+MIN_STAGE_REGRESSION_MS = 0.5
+
+# FPS của FrameClock khi nguồn không cho biết (thư mục ảnh, video thiếu metadata)
+DEFAULT_REPLAY_FPS = 25.0
+
+
+# ----------------------------------------------------------------------
+# Stand-in in-memory
+# ----------------------------------------------------------------------
+
+class InMemoryDatabase:
+    """Thay DatabaseManager: ghi event vào RAM, whitelist rỗng, không có pool."""
+
+    def __init__(self, whitelist: Optional[set[str]] = None) -> None:
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self.whitelist = set(whitelist or ())
+        self.events: Counter[str] = Counter()
+        self.pending_plates: list[dict] = []
+
+    def log_events_batch(self, rows):
+        with self._lock:
+            ids = list(range(self._next_id, self._next_id + len(rows)))
+            self._next_id += len(rows)
+            for event_type, *_rest in rows:
+                self.events[event_type] += 1
+        return ids
+
+    def log_event(self, event_type, description, trucks, people):
+        return self.log_events_batch([(event_type, description, trucks, people, None)])[0]
+
+    def add_pending_plate(self, pending_id, event_id, plate_raw, plate_norm, first_seen_utc):
+        with self._lock:
+            self.pending_plates.append({"pending_id": pending_id, "event_id": event_id, "plate_norm": plate_norm})
+        return True
+
+    def is_plate_whitelisted(self, plate_norm):
+        return plate_norm in self.whitelist
+
+    def get_active_whitelist_plates(self):
+        return set(self.whitelist)
+
+    def get_whitelist_status(self, plates):
+        return {p: p in self.whitelist for p in plates}
+
+    def pool_stats(self):
+        return {"pooled": False}
+
+
+class InMemoryMQTT:
+    """Thay MQTTManager: OCR luôn bật, chỉ đếm số lần publish."""
+
+    def __init__(self, ocr_enabled: bool = True) -> None:
+        self.ocr_enabled = ocr_enabled
+        self.ptz_mode = "gate"
+        self.state_publishes = 0
+        self.open_triggers = 0
+        self.last_state = None
+
+    def publish_state(self, people_count, vehicle_count, door_open):
+        self.state_publishes += 1
+        self.last_state = (people_count, vehicle_count, door_open)
+
+    def publish_trigger_open(self):
+        self.open_triggers += 1
+
+
+class RecordingNotifier:
+    """Thay notify_telegram / notify_telegram_photo: chỉ đếm tin nhắn."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.messages = 0
+        self.photos = 0
+
+    def notify(self, message, important=False):
+        with self._lock:
+            self.messages += 1
+
+    def notify_photo(self, photo_path, caption, important=False):
+        with self._lock:
+            self.photos += 1
+
+
+class FrameClock:
+    """Đồng hồ giả cho replay: thời gian (giây) = số frame đã advance() / fps.
+
+    Truyền vào chỗ time.monotonic (PipelineEngine, MotionGate, FaceTrackCache...).
+    """
+
+    def __init__(self, fps: float = DEFAULT_REPLAY_FPS) -> None:
+        self.fps = fps if fps > 0 else DEFAULT_REPLAY_FPS
+        self.frame_index = 0
+
+    def __call__(self) -> float:
+        return self.frame_index / self.fps
+
+    def advance(self) -> None:
+        self.frame_index += 1
+
+
+# ----------------------------------------------------------------------
+# Nguồn frame
+# ----------------------------------------------------------------------
+
+def source_fps(source: str) -> float:
+    """FPS khai báo trong file video; thư mục ảnh / ảnh đơn / không đọc được → DEFAULT_REPLAY_FPS."""
+    if os.path.isdir(source) or source.lower().endswith(IMAGE_EXTENSIONS):
+        return DEFAULT_REPLAY_FPS
+    cap = cv2.VideoCapture(source)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) if cap.isOpened() else 0.0
+    finally:
+        cap.release()
+    return float(fps) if fps and 0 < fps <= 240 else DEFAULT_REPLAY_FPS
+
+
+def iter_replay_frames(source: str, limit: int = 0, loops: int = 1) -> Iterator:
+    """Frame BGR từ file video, thư mục ảnh (sắp theo tên) hoặc một ảnh; `limit`=0 là không giới hạn."""
+    emitted = 0
+    for _ in range(max(1, loops)):
+        for frame in _iter_source_once(source):
+            yield frame
+            emitted += 1
+            if limit and emitted >= limit:
+                return
+
+
+def _iter_source_once(source: str) -> Iterator:
+    if os.path.isdir(source):
+        paths = sorted(
+            p for p in glob.glob(os.path.join(source, "*")) if p.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not paths:
+            raise ValueError(f"Thư mục không có ảnh: {source}")
+        for path in paths:
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield frame
+        return
+
+    if source.lower().endswith(IMAGE_EXTENSIONS):
+        frame = cv2.imread(source)
+        if frame is None:
+            raise ValueError(f"Không đọc được ảnh: {source}")
+        yield frame
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise ValueError(f"Không mở được video: {source}")
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+
+# ----------------------------------------------------------------------
+# Chạy + report
+# ----------------------------------------------------------------------
+
+def peak_rss_mb() -> float:
+    """Peak RSS của process (ru_maxrss: KB trên Linux, byte trên macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def run_replay(engine, frames, warmup: int = 0, metrics_factory=None, clock: Optional[FrameClock] = None) -> dict:
+    """Chạy toàn bộ frames qua engine.process_frame; `warmup` frame đầu không tính vào số đo.
+
+    metrics_factory: callable tạo PipelineMetrics mới sau warm-up (bỏ mẫu của lần chạy model đầu).
+    clock: FrameClock dùng chung với engine, được advance() trước mỗi frame.
+    Trả về {"frames", "warmup_frames", "wall_secs", "fps"}.
+    """
+    frames = iter(frames)
+    warmed = 0
+    while warmed < warmup:
+        frame = next(frames, None)
+        if frame is None:
+            break
+        if clock is not None:
+            clock.advance()
+        engine.process_frame(frame)
+        warmed += 1
+    if warmed and metrics_factory is not None:
+        engine.metrics = metrics_factory()
+        engine.stage_runs.clear()
+
+    count = 0
+    t0 = time.perf_counter()
+    for frame in frames:
+        if clock is not None:
+            clock.advance()
+        engine.process_frame(frame)
+        count += 1
+    wall = time.perf_counter() - t0
+    return {
+        "frames": count,
+        "warmup_frames": warmed,
+        "wall_secs": round(wall, 3),
+        "fps": round(count / wall, 2) if wall > 0 else 0.0,
+    }
+
+
+def build_report(run: dict, engine, db: InMemoryDatabase, mqtt: InMemoryMQTT, notifier: RecordingNotifier,
+                 source: str = "") -> dict:
+    summary = engine.metrics.summary()
+    return {
+        "source": source,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        **run,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": summary["stages"],
+        "stage_runs": dict(sorted(engine.stage_runs.items())),
+        "events": dict(sorted(db.events.items())),
+        "counts": {"trucks": engine.truck_count, "people": engine.person_count},
+        "pending_plates": len(db.pending_plates),
+        "notifications": notifier.messages,
+        "notification_photos": notifier.photos,
+        "mqtt": {"state_publishes": mqtt.state_publishes, "open_triggers": mqtt.open_triggers},
+        "plate_cache": engine.plate_cache.stats(),
+    }
+
+
+def compare_to_baseline(report: dict, baseline: dict, tolerance: float = 0.10) -> list[str]:
+    """Danh sách regression (rỗng = đạt) của report so với baseline."""
+    regressions = []
+    base_fps = baseline.get("fps") or 0.0
+    if base_fps and report.get("fps", 0.0) < base_fps * (1 - tolerance):
+        regressions.append(f"fps {report.get('fps', 0.0):.2f} < baseline {base_fps:.2f} (-{tolerance:.0%})")
+
+    for name, base_stage in (baseline.get("stages") or {}).items():
+        stage = (report.get("stages") or {}).get(name)
+        if stage is None:
+            continue
+        base_p95, p95 = base_stage.get("p95_ms", 0.0), stage.get("p95_ms", 0.0)
+        if p95 > base_p95 * (1 + tolerance) and p95 - base_p95 > MIN_STAGE_REGRESSION_MS:
+            regressions.append(f"stage {name} p95 {p95:.2f}ms > baseline {base_p95:.2f}ms (+{tolerance:.0%})")
+
+    base_rss = baseline.get("peak_rss_mb") or 0.0
+    if base_rss and report.get("peak_rss_mb", 0.0) > base_rss * (1 + tolerance):
+        regressions.append(f"peak RSS {report['peak_rss_mb']:.1f}MB > baseline {base_rss:.1f}MB (+{tolerance:.0%})")
+    return regressions
+
+
+def write_json(path: str, data: dict) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_json(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
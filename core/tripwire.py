@@ -5,19 +5,40 @@ Cách dùng:
     tracker = TripwireTracker(line_y_fn=lambda: resolve_line_y(frame.shape[0]))
     direction = tracker.update(obj_id, center_y)  # "IN", "OUT", hoặc None
     tracker.cleanup_stale(active_obj_ids)          # gọi cuối mỗi frame
+    TripwireTracker(..., on_evict=plate_cache.evict)  # dọn state gắn theo obj_id cùng lúc
 
 Logic:
     - Mỗi object (obj_id) có một buffer N frames tích lũy vị trí (trên/dưới vạch).
     - Khi tất cả N frame cuối nhất nhất quán sang phía khác → fire event.
     - Cooldown per-object tránh fire lặp khi object đứng trên vạch.
     - Stale cleanup xóa tracking của object đã biến mất.
+
+Nhiều vạch (polyline) + vùng (polygon), xử lý cả frame một lần bằng NumPy:
+    tracker = MultiTripwireTracker([
+        TripwireLine("gate", [(0.0, 0.55), (0.6, 0.5), (1.0, 0.62)], normalized=True),
+        TripwireZone("dock", [(0.1, 0.6), (0.4, 0.6), (0.4, 1.0), (0.1, 1.0)], normalized=True),
+    ])
+    events = tracker.update_batch(track_ids, cx, cy, frame_size=(w, h))
+    # [TripwireEvent(track_id=7, wire="gate", direction="IN"), ...]
+    tracker.cleanup_stale(active_ids)
+
+    - Cùng ngữ nghĩa buffer/cooldown với TripwireTracker, tính riêng cho từng cặp (object, vạch).
+    - Phía "IN" của vạch: bên phải khi đi theo thứ tự điểm (toạ độ ảnh, y hướng xuống) –
+      vạch trái→phải thì IN là phía dưới, như TripwireTracker. Polyline nhiều đoạn: lấy
+      phía của đoạn gần điểm nhất. Vùng polygon: IN = đi vào trong vùng.
+    - Trạng thái lưu trong mảng (object x vạch), lịch sử N frame là bitmask thay cho deque.
+    - Opt-in: PipelineEngine vẫn dùng TripwireTracker một vạch ngang cho từng camera; dùng
+      MultiTripwireTracker khi cần nhiều vạch/vùng cho một camera.
 """
 
 from __future__ import annotations
 
 import time
 from collections import deque
-from typing import Callable
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional, Sequence
+
+import numpy as np
 
 
 class TripwireTracker:
@@ -29,6 +50,8 @@ class TripwireTracker:
         buffer_frames:  Số frame liên tiếp cùng phía để xác nhận hướng (giảm noise).
         cooldown_secs:  Thời gian (giây) chờ sau khi fire trước khi fire lại cùng object.
         stale_secs:     Sau bao nhiêu giây không thấy object thì xóa trạng thái.
+        on_evict:       Callable(list obj_id) gọi khi cleanup_stale xóa object (tùy chọn).
+        clock:          Nguồn thời gian cho cooldown/stale (None = time.monotonic lúc gọi).
     """
 
     def __init__(
@@ -37,11 +60,15 @@ class TripwireTracker:
         buffer_frames: int = 3,
         cooldown_secs: float = 3.0,
         stale_secs: float = 30.0,
+        on_evict: Callable[[list[int]], None] | None = None,
+        clock: Callable[[], float] | None = None,
     ) -> None:
         self._line_y_fn = line_y_fn
+        self._clock = clock
         self._buffer = max(1, buffer_frames)
         self._cooldown = cooldown_secs
         self._stale = stale_secs
+        self._on_evict = on_evict
 
         # obj_id -> deque of bool: True = bên dưới vạch (inward side), False = bên trên
         self._positions: dict[int, deque[bool]] = {}
@@ -62,7 +89,7 @@ class TripwireTracker:
             "OUT" – object đi từ dưới (trong) lên trên (ra ngoài)
             None  – chưa xác định / đang ở giữa
         """
-        now = time.monotonic()
+        now = (self._clock or time.monotonic)()
         line_y = self._line_y_fn()
         below = center_y >= line_y  # True = bên trong (phía dưới)
 
@@ -117,7 +144,7 @@ class TripwireTracker:
         Xóa tracking của các object đã biến mất quá `stale_secs`.
         Truyền None để chỉ dựa vào timeout (không cần biết active_ids).
         """
-        now = time.monotonic()
+        now = (self._clock or time.monotonic)()
         stale_ids = [
             oid
             for oid, ts in self._last_seen.items()
@@ -128,8 +155,289 @@ class TripwireTracker:
             self._confirmed_side.pop(oid, None)
             self._last_fire.pop(oid, None)
             self._last_seen.pop(oid, None)
+        if stale_ids and self._on_evict is not None:
+            self._on_evict(stale_ids)
 
     # ------------------------------------------------------------------
     def active_count(self) -> int:
         """Số lượng object đang được tracking."""
         return len(self._positions)
+
+
+# ----------------------------------------------------------------------
+# Nhiều vạch / vùng, cập nhật theo batch
+# ----------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class TripwireLine:
+    """Vạch đếm dạng polyline (>= 2 điểm). normalized=True: toạ độ [0..1] theo frame."""
+
+    name: str
+    points: Sequence[tuple[float, float]]
+    normalized: bool = False
+
+    @classmethod
+    def horizontal(cls, name: str, y: float, normalized: bool = False) -> "TripwireLine":
+        """Vạch ngang như TripwireTracker (IN = phía dưới, y >= vạch)."""
+        return cls(name, ((0.0, y), (1.0, y)), normalized)
+
+
+@dataclass(frozen=True)
+class TripwireZone:
+    """Vùng đa giác (>= 3 điểm); IN = đi vào vùng, OUT = ra khỏi vùng."""
+
+    name: str
+    polygon: Sequence[tuple[float, float]]
+    normalized: bool = False
+
+
+@dataclass
+class TripwireEvent:
+    track_id: int
+    wire: str
+    direction: str  # "IN" | "OUT"
+
+
+def _padded(shapes: list[np.ndarray], degenerate: bool = False) -> np.ndarray:
+    """Gộp list mảng đoạn (k_i, 2, 2) thành (L, K, 2, 2) để tính một lần.
+
+    Đoạn đệm lặp lại đoạn cuối (không đổi đoạn gần nhất của polyline), hoặc là đoạn
+    suy biến một điểm khi degenerate=True (không cắt tia nào trong ray casting).
+    """
+    width = max(len(s) for s in shapes)
+    padded = []
+    for s in shapes:
+        pad = s[-1:, 1:].repeat(2, axis=1) if degenerate else s[-1:]
+        padded.append(np.concatenate([s, np.repeat(pad, width - len(s), axis=0)]))
+    return np.stack(padded)
+
+
+def _line_sides(px: np.ndarray, py: np.ndarray, segments: np.ndarray) -> np.ndarray:
+    """(M,) điểm x (L, K, 2, 2) đoạn → (M, L) bool: điểm nằm phía IN của đoạn gần nhất."""
+    ax, ay = segments[:, :, 0, 0], segments[:, :, 0, 1]
+    dx, dy = segments[:, :, 1, 0] - ax, segments[:, :, 1, 1] - ay
+    rx = px[:, None, None] - ax
+    ry = py[:, None, None] - ay
+    cross = dx * ry - dy * rx
+    if segments.shape[1] == 1:
+        return cross[:, :, 0] >= 0
+    length2 = np.maximum(dx * dx + dy * dy, 1e-12)
+    t = np.clip((rx * dx + ry * dy) / length2, 0.0, 1.0)
+    dist2 = (rx - t * dx) ** 2 + (ry - t * dy) ** 2
+    nearest = dist2.argmin(axis=2)[:, :, None]
+    return np.take_along_axis(cross, nearest, axis=2)[:, :, 0] >= 0
+
+
+def _zone_sides(px: np.ndarray, py: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Ray casting: (M,) điểm x (L, E, 2, 2) cạnh → (M, L) bool nằm trong vùng."""
+    xi, yi = edges[:, :, 0, 0], edges[:, :, 0, 1]
+    xj, yj = edges[:, :, 1, 0], edges[:, :, 1, 1]
+    qy = py[:, None, None]
+    spans = (yi > qy) != (yj > qy)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_cross = xi + (xj - xi) * (qy - yi) / (yj - yi)
+    hits = spans & (px[:, None, None] < x_cross)
+    return (hits.sum(axis=2) % 2) == 1
+
+
+class MultiTripwireTracker:
+    """
+    Theo dõi IN/OUT của mọi object qua nhiều vạch polyline + vùng polygon, một lần mỗi frame.
+
+    Args:
+        wires:          List TripwireLine / TripwireZone (tên không trùng nhau).
+        buffer_frames:  Số frame liên tiếp cùng phía để xác nhận hướng (tối đa 64).
+        cooldown_secs:  Thời gian chờ sau khi fire trước khi fire lại cùng (object, vạch).
+        stale_secs:     Sau bao nhiêu giây không thấy object thì xóa trạng thái.
+        on_evict:       Callable(list obj_id) gọi khi cleanup_stale xóa object (tùy chọn).
+        clock:          Nguồn thời gian khi không truyền `now` (None = time.monotonic lúc gọi).
+    """
+
+    def __init__(
+        self,
+        wires: Iterable[TripwireLine | TripwireZone],
+        buffer_frames: int = 3,
+        cooldown_secs: float = 3.0,
+        stale_secs: float = 30.0,
+        on_evict: Callable[[list[int]], None] | None = None,
+        clock: Callable[[], float] | None = None,
+    ) -> None:
+        self._wires = list(wires)
+        if not self._wires:
+            raise ValueError("MultiTripwireTracker cần ít nhất một vạch/vùng")
+        names = [w.name for w in self._wires]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Tên vạch/vùng bị trùng: {names}")
+        self._buffer = max(1, buffer_frames)
+        if self._buffer > 64:
+            raise ValueError("buffer_frames tối đa 64 (lịch sử lưu bằng bitmask uint64)")
+        self._full_mask = np.uint64((1 << self._buffer) - 1)
+        self._cooldown = cooldown_secs
+        self._stale = stale_secs
+        self._on_evict = on_evict
+        self._clock = clock
+
+        # Cột kết quả: các vạch trước, các vùng sau (giữ thứ tự để map về tên)
+        self._lines = [w for w in self._wires if isinstance(w, TripwireLine)]
+        self._zones = [w for w in self._wires if isinstance(w, TripwireZone)]
+        self._names = np.array([w.name for w in self._lines + self._zones], dtype=object)
+        self._geometry_size: Optional[tuple[int, int]] = None
+        self._segments: Optional[np.ndarray] = None
+        self._edges: Optional[np.ndarray] = None
+
+        # Trạng thái, hàng sắp theo id tăng dần để tra bằng searchsorted
+        n_wires = len(self._names)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._last_seen = np.zeros(0, dtype=np.float64)
+        self._history = np.zeros((0, n_wires), dtype=np.uint64)   # bit 1 = phía IN, bit 0 = frame mới nhất
+        self._seen = np.zeros((0, n_wires), dtype=np.uint8)       # số frame đã có (tối đa buffer)
+        self._confirmed = np.zeros((0, n_wires), dtype=np.int8)   # -1 chưa xác định, 0 ngoài, 1 trong
+        self._last_fire = np.zeros((0, n_wires), dtype=np.float64)
+
+    # ------------------------------------------------------------------
+    @property
+    def wire_names(self) -> list[str]:
+        return list(self._names)
+
+    def sides(self, cx, cy, frame_size: Optional[tuple[int, int]] = None) -> np.ndarray:
+        """(M, W) bool: mỗi điểm đang ở phía IN của từng vạch/vùng (thứ tự wire_names)."""
+        px = np.asarray(cx, dtype=np.float64).reshape(-1)
+        py = np.asarray(cy, dtype=np.float64).reshape(-1)
+        self._build_geometry(frame_size)
+        parts = []
+        if self._segments is not None:
+            parts.append(_line_sides(px, py, self._segments))
+        if self._edges is not None:
+            parts.append(_zone_sides(px, py, self._edges))
+        return np.concatenate(parts, axis=1)
+
+    def update_batch(
+        self,
+        track_ids,
+        cx,
+        cy,
+        frame_size: Optional[tuple[int, int]] = None,
+        now: Optional[float] = None,
+    ) -> list[TripwireEvent]:
+        """
+        Cập nhật mọi object của frame hiện tại (track_ids không trùng nhau) một lần.
+
+        Args:
+            track_ids, cx, cy: mảng/list cùng độ dài – ID và tâm (pixel) của từng object.
+            frame_size:        (width, height), bắt buộc khi có vạch/vùng normalized.
+
+        Returns:
+            List TripwireEvent của các lần vượt vạch / ra vào vùng trong frame này.
+        """
+        ids = np.asarray(track_ids, dtype=np.int64).reshape(-1)
+        if ids.size == 0:
+            return []
+        now = (self._clock or time.monotonic)() if now is None else now
+        inside = self.sides(cx, cy, frame_size)
+        rows = self._rows_for(ids)
+
+        history = ((self._history[rows] << np.uint64(1)) | inside.astype(np.uint64)) & self._full_mask
+        seen = np.minimum(self._seen[rows] + 1, self._buffer).astype(np.uint8)
+        self._history[rows] = history
+        self._seen[rows] = seen
+        self._last_seen[rows] = now
+
+        full = seen >= self._buffer
+        all_in = full & (history == self._full_mask)
+        consistent = all_in | (full & (history == 0))
+        new_side = all_in.astype(np.int8)
+        prev = self._confirmed[rows]
+
+        # Lần đầu xác định phía → ghi nhận, không fire; đổi phía → cập nhật ngay (kể cả trong cooldown)
+        changed = consistent & (prev != -1) & (new_side != prev)
+        self._confirmed[rows] = np.where(consistent & ((prev == -1) | changed), new_side, prev)
+
+        fire = changed & (now - self._last_fire[rows] >= self._cooldown)
+        if not fire.any():
+            return []
+        fire_rows, fire_cols = np.nonzero(fire)
+        self._last_fire[rows[fire_rows], fire_cols] = now
+        return [
+            TripwireEvent(int(ids[r]), self._names[c], "IN" if new_side[r, c] else "OUT")
+            for r, c in zip(fire_rows, fire_cols)
+        ]
+
+    # ------------------------------------------------------------------
+    def cleanup_stale(self, active_ids: set[int] | None = None) -> None:
+        """Như TripwireTracker.cleanup_stale: timeout `stale_secs` hoặc không còn trong active_ids."""
+        if self._ids.size == 0:
+            return
+        now = (self._clock or time.monotonic)()
+        stale = (now - self._last_seen) > self._stale
+        if active_ids is not None:
+            stale |= ~np.isin(self._ids, np.fromiter(active_ids, dtype=np.int64, count=len(active_ids)))
+        if not stale.any():
+            return
+        stale_ids = self._ids[stale].tolist()
+        self._keep(~stale)
+        if self._on_evict is not None:
+            self._on_evict(stale_ids)
+
+    def active_count(self) -> int:
+        """Số lượng object đang được tracking."""
+        return int(self._ids.size)
+
+    # ------------------------------------------------------------------
+    def _rows_for(self, ids: np.ndarray) -> np.ndarray:
+        """Chỉ số hàng của từng id; id mới được chèn (giữ thứ tự tăng dần)."""
+        pos = np.searchsorted(self._ids, ids)
+        known = pos < self._ids.size
+        known[known] = self._ids[pos[known]] == ids[known]
+        if not known.all():
+            new_ids = np.unique(ids[~known])
+            n_wires = len(self._names)
+            merged = np.concatenate([self._ids, new_ids])
+            order = np.argsort(merged, kind="stable")
+            self._ids = merged[order]
+            self._last_seen = np.concatenate([self._last_seen, np.zeros(new_ids.size)])[order]
+            self._history = np.concatenate([self._history, np.zeros((new_ids.size, n_wires), np.uint64)])[order]
+            self._seen = np.concatenate([self._seen, np.zeros((new_ids.size, n_wires), np.uint8)])[order]
+            self._confirmed = np.concatenate([self._confirmed, np.full((new_ids.size, n_wires), -1, np.int8)])[order]
+            self._last_fire = np.concatenate(
+                [self._last_fire, np.zeros((new_ids.size, n_wires))]  # như TripwireTracker: chưa fire = 0.0
+            )[order]
+            pos = np.searchsorted(self._ids, ids)
+        return pos
+
+    def _keep(self, mask: np.ndarray) -> None:
+        self._ids = self._ids[mask]
+        self._last_seen = self._last_seen[mask]
+        self._history = self._history[mask]
+        self._seen = self._seen[mask]
+        self._confirmed = self._confirmed[mask]
+        self._last_fire = self._last_fire[mask]
+
+    def _build_geometry(self, frame_size: Optional[tuple[int, int]]) -> None:
+        size = tuple(frame_size) if frame_size is not None else None
+        if self._geometry_size == size and (self._segments is not None or self._edges is not None):
+            return
+
+        def scaled(points, normalized):
+            pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+            if normalized:
+                if size is None:
+                    raise ValueError("Vạch/vùng normalized cần frame_size=(width, height)")
+                pts = pts * np.array(size, dtype=np.float64)
+            return pts
+
+        segments = []
+        for line in self._lines:
+            pts = scaled(line.points, line.normalized)
+            if len(pts) < 2:
+                raise ValueError(f"Vạch '{line.name}' cần ít nhất 2 điểm")
+            segments.append(np.stack([pts[:-1], pts[1:]], axis=1))
+        edges = []
+        for zone in self._zones:
+            pts = scaled(zone.polygon, zone.normalized)
+            if len(pts) < 3:
+                raise ValueError(f"Vùng '{zone.name}' cần ít nhất 3 điểm")
+            edges.append(np.stack([pts, np.roll(pts, -1, axis=0)], axis=1))
+
+        self._segments = _padded(segments) if segments else None
+        self._edges = _padded(edges, degenerate=True) if edges else None
+        self._geometry_size = size
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Microbenchmark FaceRecognizer search: vòng lặp Python cũ (embedding trung bình) vs FaceGallery (một phép nhân ma trận).
+
+Usage:
+    python deploy/scripts/bench_face_gallery.py --people 100 1000 5000 --per-person 3 --faces 1 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from parking_hpc.inference import FaceGallery  # noqa: E402
+
+DIM = 512
+
+
+def make_gallery(n_people: int, per_person: int, seed: int = 0) -> dict[str, list[np.ndarray]]:
+    rng = np.random.default_rng(seed)
+    embs = rng.normal(size=(n_people, per_person, DIM)).astype(np.float32)
+    embs /= np.linalg.norm(embs, axis=2, keepdims=True)
+    return {f"person_{i:05d}": list(embs[i]) for i in range(n_people)}
+
+
+def loop_identify(queries: np.ndarray, known_mean: dict[str, np.ndarray]) -> tuple[str, float]:
+    """Bản cũ của FaceRecognizer.identify: từng mặt x từng người, np.dot từng cặp."""
+    best_name, best_sim = "STRANGER", 0.0
+    for emb in queries:
+        for name, ref_emb in known_mean.items():
+            sim = float(np.dot(emb, ref_emb))
+            if sim > best_sim:
+                best_sim = sim
+                best_name = name if sim > 0.35 else "STRANGER"
+    return best_name, best_sim
+
+
+def loop_identify_all(queries: np.ndarray, known: dict[str, list[np.ndarray]]) -> tuple[str, float]:
+    """Vòng lặp Python trên cùng gallery nhiều embedding/người (so sánh cùng khối lượng tính)."""
+    best_name, best_sim = "STRANGER", 0.0
+    for emb in queries:
+        for name, refs in known.items():
+            for ref_emb in refs:
+                sim = float(np.dot(emb, ref_emb))
+                if sim > best_sim:
+                    best_sim = sim
+                    best_name = name if sim > 0.35 else "STRANGER"
+    return best_name, best_sim
+
+
+def time_per_call(fn, repeat: int) -> float:
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return float(np.median(samples))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--people", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--per-person", type=int, default=3)
+    parser.add_argument("--faces", type=int, nargs="+", default=[1, 4], help="Số mặt trong một frame")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'people':>7} {'embeds':>7} {'faces':>5} {'loop mean ms':>13} {'loop all ms':>12} "
+          f"{'gallery ms':>11} {'speedup':>8}")
+    for n_people in args.people:
+        known = make_gallery(n_people, args.per_person)
+        known_mean = {name: np.mean(embs, axis=0) for name, embs in known.items()}
+        gallery = FaceGallery.from_embeddings(known)
+        for n_faces in args.faces:
+            rng = np.random.default_rng(n_faces)
+            # Mặt trong frame = ảnh enroll + nhiễu (giống người thật đứng trước camera)
+            picks = rng.integers(0, n_people, n_faces)
+            queries = np.stack([known[f"person_{p:05d}"][0] for p in picks]) + rng.normal(0, 0.02, (n_faces, DIM))
+            queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+            loop_s = time_per_call(lambda: loop_identify(queries, known_mean), max(3, args.repeat // 10))
+            loop_all_s = time_per_call(lambda: loop_identify_all(queries, known), 3)
+            gallery_s = time_per_call(lambda: gallery.search(queries, args.k), args.repeat)
+            # speedup so với vòng lặp trên cùng gallery (nhiều embedding/người)
+            print(
+                f"{n_people:7d} {gallery.num_embeddings:7d} {n_faces:5d} {loop_s * 1000:13.3f} "
+                f"{loop_all_s * 1000:12.3f} {gallery_s * 1000:11.3f} {loop_all_s / gallery_s:7.1f}x"
+            )
+
+            idx, _ = gallery.search(queries, 1)
+            assert [gallery.names[i] for i in idx[:, 0]] == [f"person_{p:05d}" for p in picks]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Microbenchmark TripwireTracker (từng object) vs MultiTripwireTracker (batch NumPy).
+
+Usage:
+    python deploy/scripts/bench_tripwire.py --objects 10 100 300 1000 --frames 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from core.tripwire import MultiTripwireTracker, TripwireLine, TripwireTracker, TripwireZone  # noqa: E402
+
+FRAME_SIZE = (1280, 720)
+
+
+def make_tracks(n_objects: int, n_frames: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Random walk (n_frames, n_objects) cho cx, cy."""
+    rng = np.random.default_rng(seed)
+    start_x = rng.uniform(0, FRAME_SIZE[0], n_objects)
+    start_y = rng.uniform(0, FRAME_SIZE[1], n_objects)
+    cx = np.clip(start_x + rng.normal(0, 8, (n_frames, n_objects)).cumsum(axis=0), 0, FRAME_SIZE[0])
+    cy = np.clip(start_y + rng.normal(0, 8, (n_frames, n_objects)).cumsum(axis=0), 0, FRAME_SIZE[1])
+    return cx.round(), cy.round()
+
+
+def many_wires(n_lines: int, n_zones: int) -> list:
+    wires = []
+    for i in range(n_lines):
+        y = (i + 1) / (n_lines + 1)
+        wires.append(TripwireLine(f"line{i}", [(0.0, y), (0.5, y + 0.05), (1.0, y)], normalized=True))
+    for i in range(n_zones):
+        x0 = i / max(1, n_zones)
+        wires.append(TripwireZone(f"zone{i}", [(x0, 0.3), (x0 + 0.2, 0.3), (x0 + 0.2, 0.7), (x0, 0.7)], normalized=True))
+    return wires
+
+
+def bench_single(cx: np.ndarray, cy: np.ndarray, line_y: int) -> float:
+    tracker = TripwireTracker(line_y_fn=lambda: line_y, cooldown_secs=0.0)
+    ids = list(range(cx.shape[1]))
+    t0 = time.perf_counter()
+    for frame_y in cy:
+        for oid, y in zip(ids, frame_y.tolist()):
+            tracker.update(oid, y)
+        tracker.cleanup_stale(None)
+    return (time.perf_counter() - t0) / len(cy)
+
+
+def bench_multi(cx: np.ndarray, cy: np.ndarray, wires: list) -> float:
+    tracker = MultiTripwireTracker(wires, cooldown_secs=0.0)
+    ids = np.arange(cx.shape[1])
+    t0 = time.perf_counter()
+    for frame_x, frame_y in zip(cx, cy):
+        tracker.update_batch(ids, frame_x, frame_y, frame_size=FRAME_SIZE)
+        tracker.cleanup_stale(None)
+    return (time.perf_counter() - t0) / len(cy)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--objects", type=int, nargs="+", default=[10, 100, 300, 1000])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--lines", type=int, default=8)
+    parser.add_argument("--zones", type=int, default=4)
+    args = parser.parse_args()
+
+    line_y = FRAME_SIZE[1] // 2
+    wires = many_wires(args.lines, args.zones)
+    print(f"{'objects':>8} {'single 1 line':>16} {'batch 1 line':>14} {'batch ' + str(len(wires)) + ' wires':>16}")
+    for n in args.objects:
+        cx, cy = make_tracks(n, args.frames)
+        single = bench_single(cx, cy, line_y)
+        multi_one = bench_multi(cx, cy, [TripwireLine.horizontal("red", line_y)])
+        multi_many = bench_multi(cx, cy, wires)
+        print(f"{n:>8} {single * 1e6:>13.1f} µs {multi_one * 1e6:>11.1f} µs {multi_many * 1e6:>13.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -47,3 +47,72 @@ def test_camera_orientation_monitor_detects_shift_and_stable():
     moved_second = monitor.evaluate(moved)
     assert moved_second is not None
     assert moved_second.is_shifted
+
+
+def _color_pattern() -> np.ndarray:
+    img = _make_pattern()
+    img[:, :, 0] = (img[:, :, 0] * 0.3).astype(np.uint8)  # có màu → "day"
+    img[:, :, 2] = np.maximum(img[:, :, 2], 90)
+    return img
+
+
+def test_stable_frame_takes_fast_path_without_orb():
+    base = _make_pattern()
+    monitor = CameraOrientationMonitor(check_every_n_frames=1, min_keypoints=30)
+    assert monitor.set_baseline(base)
+
+    calls = []
+    orb = monitor._orb
+    monitor._orb = type("_CountingOrb", (), {
+        "detectAndCompute": lambda self, img, mask: calls.append(1) or orb.detectAndCompute(img, mask)
+    })()
+    result = monitor.evaluate(base)
+    assert result.reason == "fast_path" and not result.is_shifted
+    assert calls == [], "Fast-path không được chạy ORB"
+
+    monitor.evaluate(_shifted(base))
+    assert len(calls) == 1, "Full check chỉ tính ORB cho frame hiện tại, baseline đã cache"
+    assert monitor.stats == {"fast_path": 1, "full_checks": 1}
+
+
+def test_baselines_persist_to_disk(tmp_path):
+    path = str(tmp_path / "baseline.npz")
+    base = _make_pattern()
+    first = CameraOrientationMonitor(check_every_n_frames=1, min_keypoints=30, baseline_path=path)
+    assert first.set_baseline(base)
+
+    restarted = CameraOrientationMonitor(
+        check_every_n_frames=1, min_keypoints=30, required_consecutive_alerts=1, baseline_path=path
+    )
+    assert restarted.has_baseline()
+    assert restarted.evaluate(_shifted(base)).is_shifted
+
+
+def test_baseline_with_different_aspect_ratio_is_recaptured(tmp_path, caplog):
+    path = str(tmp_path / "baseline.npz")
+    first = CameraOrientationMonitor(check_every_n_frames=1, min_keypoints=30, baseline_path=path)
+    assert first.set_baseline(_make_pattern())
+
+    # Sau restart stream đổi sang 16:9 → baseline 4:3 trên đĩa không dùng được
+    wide = cv2.resize(_make_pattern()[60:420], (640, 360))
+    restarted = CameraOrientationMonitor(check_every_n_frames=1, min_keypoints=30, baseline_path=path)
+    with caplog.at_level("WARNING", logger="camera_orientation_monitor"):
+        result = restarted.evaluate(wide)
+    assert result.reason == "baseline_recaptured" and not result.is_shifted
+    assert "khác frame hiện tại" in caplog.text
+    assert restarted.evaluate(wide).reason == "fast_path"
+
+    reloaded = CameraOrientationMonitor(check_every_n_frames=1, min_keypoints=30, baseline_path=path)
+    assert reloaded.evaluate(wide).reason == "fast_path", "Baseline mới đã được lưu xuống đĩa"
+
+
+def test_best_matching_baseline_is_selected():
+    day, night = _color_pattern(), _make_pattern()
+    night = cv2.flip(night, 1)  # cảnh IR khác hẳn cảnh ban ngày
+    monitor = CameraOrientationMonitor(check_every_n_frames=1, min_keypoints=30)
+    assert monitor.frame_mode(day) == "day" and monitor.frame_mode(night) == "ir"
+    assert monitor.set_baseline(day) and monitor.set_baseline(night)
+    assert sorted(monitor.baseline_names()) == ["day", "ir"]
+
+    assert monitor.evaluate(night).baseline == "ir"
+    assert monitor.evaluate(day).baseline == "day"
@@ -0,0 +1,209 @@
+"""
+deploy/tests/test_database.py – Unit tests for DatabaseManager pool (pool + connection giả, không cần Postgres)
+Run: python -m pytest deploy/tests/test_database.py -v
+"""
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import psycopg2
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+import core.database as database
+from core.database import DatabaseManager
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self.connection = conn
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        conn = self.connection
+        if conn.fail_next:
+            conn.fail_next = False
+            conn.closed = 2
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        conn.executed.append(sql)
+        self._rows = [(1,)] if sql.startswith("EXECUTE") or sql == "SELECT 1" else []
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+class _FakeConnection:
+    """Như _PooledConnection: có `prepared`, `last_used`; `with conn:` commit/rollback."""
+
+    def __init__(self, name):
+        self.name = name
+        self.closed = 0
+        self.prepared = set()
+        self.last_used = time.monotonic()
+        self.executed = []
+        self.fail_next = False
+        self.commits = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.commits += 1
+        return False
+
+    def cursor(self, cursor_factory=None):
+        return _FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class _FakePool:
+    """Như ThreadedConnectionPool: getconn lấy connection rảnh, hết thì tạo mới."""
+
+    def __init__(self, conns=()):
+        self._pool = list(conns)
+        self._used = {}
+        self.created = []
+        self.discarded = []
+
+    def getconn(self):
+        if self._pool:
+            conn = self._pool.pop(0)
+        else:
+            conn = _FakeConnection(f"new-{len(self.created)}")
+            self.created.append(conn)
+        self._used[id(conn)] = conn
+        return conn
+
+    def putconn(self, conn, close=False):
+        self._used.pop(id(conn), None)
+        if close:
+            conn.close()
+            self.discarded.append(conn)
+        else:
+            self._pool.append(conn)
+
+
+def _pooled_db(pool):
+    db = DatabaseManager(dsn=f"postgresql://test/{uuid.uuid4().hex}", pool_min=0, pool_max=2)
+    db._pool_state.pool = pool
+    return db
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestConnectionPool:
+    def test_checkout_and_return(self):
+        conn = _FakeConnection("a")
+        pool = _FakePool([conn])
+        db = _pooled_db(pool)
+
+        assert db.is_plate_whitelisted("51A12345") is True
+        assert db.is_plate_whitelisted("51A12345") is True
+
+        assert pool.created == [] and pool._pool == [conn], "Dùng lại cùng connection, trả về pool"
+        assert conn.commits == 2
+        stats = db.pool_stats()
+        assert stats["in_use"] == 0 and stats["idle"] == 1 and stats["reconnects"] == 0
+        assert stats["wait_seconds"]["count"] == 2
+        assert stats["query_seconds"]["is_plate_whitelisted"]["count"] == 2
+
+    def test_stale_connection_failing_health_check_is_discarded(self, monkeypatch):
+        monkeypatch.setattr(database, "DB_POOL_HEALTHCHECK_SECS", 10.0)
+        stale = _FakeConnection("stale")
+        stale.last_used -= 60
+        stale.fail_next = True  # "SELECT 1" lỗi
+        pool = _FakePool([stale])
+        db = _pooled_db(pool)
+
+        assert db.is_plate_whitelisted("51A12345") is True
+        assert pool.discarded == [stale] and stale.closed
+        assert len(pool.created) == 1 and pool.created[0].executed[-1].startswith("EXECUTE")
+        assert db.pool_stats()["reconnects"] == 1
+
+    def test_connection_broken_mid_query_is_not_returned(self):
+        conn = _FakeConnection("a")
+        pool = _FakePool([conn])
+        db = _pooled_db(pool)
+        conn.fail_next = True
+
+        assert db.is_plate_whitelisted("51A12345") is False
+        assert pool.discarded == [conn] and pool._pool == []
+
+    def test_statement_is_prepared_again_after_reconnect(self):
+        first = _FakeConnection("a")
+        pool = _FakePool([first])
+        db = _pooled_db(pool)
+
+        db.is_plate_whitelisted("51A12345")
+        db.is_plate_whitelisted("51A12345")
+        prepares = [sql for sql in first.executed if sql.startswith("PREPARE")]
+        assert len(prepares) == 1, "PREPARE một lần cho mỗi connection"
+
+        first.fail_next = True
+        db.is_plate_whitelisted("51A12345")  # connection chết → bị bỏ
+        assert db.is_plate_whitelisted("51A12345") is True
+
+        second = pool.created[0]
+        assert second.executed[0].startswith("PREPARE is_plate_whitelisted")
+        assert second.prepared == {"is_plate_whitelisted"}
+
+    def test_pool_histograms_render_as_prometheus(self):
+        db = _pooled_db(_FakePool([_FakeConnection("a")]))
+        db.is_plate_whitelisted("51A12345")
+        text = db.render_prometheus()
+        assert "# TYPE db_pool_wait_seconds histogram" in text
+        assert "db_pool_wait_seconds_count 1" in text
+        assert 'db_query_seconds_count{op="is_plate_whitelisted"} 1' in text
+        assert DatabaseManager(dsn="postgresql://test/nopool", pool_max=0).render_prometheus() == ""
+
+
+class TestLogEventsBatch:
+    def test_ids_follow_row_order(self, monkeypatch):
+        calls = []
+
+        def fake_execute_values(cursor, sql, argslist, page_size=100, fetch=False):
+            calls.append((argslist, page_size, fetch))
+            return [(100 + i,) for i in range(len(argslist))]
+
+        monkeypatch.setattr(database, "execute_values", fake_execute_values)
+        db = _pooled_db(_FakePool([_FakeConnection("a")]))
+        rows = [(kind, "x", 0, 0, f"t{i}") for i, kind in enumerate(("IN", "OUT", "ALERT"))]
+
+        assert db.log_events_batch(rows) == [100, 101, 102]
+        argslist, page_size, fetch = calls[0]
+        assert [a[2] for a in argslist] == ["IN", "OUT", "ALERT"]
+        assert [a[0] for a in argslist] == ["t0", "t1", "t2"]
+        assert page_size == 3 and fetch, "Một lệnh INSERT cho cả batch"
+
+    def test_empty_batch_skips_database(self):
+        pool = _FakePool()
+        assert _pooled_db(pool).log_events_batch([]) == []
+        assert pool.created == []
+
+    def test_failure_returns_none(self, monkeypatch):
+        def broken(*args, **kwargs):
+            raise psycopg2.OperationalError("down")
+
+        monkeypatch.setattr(database, "execute_values", broken)
+        pool = _FakePool([_FakeConnection("a")])
+        assert _pooled_db(pool).log_events_batch([("IN", "x", 0, 0, "t")]) is None
+        assert len(pool.discarded) == 1
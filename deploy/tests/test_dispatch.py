@@ -0,0 +1,93 @@
+"""
+deploy/tests/test_dispatch.py – Unit tests for parking_hpc CameraDispatch (pool inference theo camera)
+Run: python -m pytest deploy/tests/test_dispatch.py -v
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from parking_hpc.dispatch import CameraDispatch
+
+
+def _token(cam_id, idx):
+    return {"cam_id": cam_id, "frame_idx": idx}
+
+
+def test_tokens_go_to_home_worker_in_order_and_drops_are_counted():
+    dispatch = CameraDispatch(["cam1", "cam2"], n_workers=2, queue_maxsize=3)
+    for i in range(5):
+        dispatch.submit("cam1", _token("cam1", i))
+    time.sleep(0.05)  # mp.Queue feeder thread
+
+    assert dispatch.acquire(1, timeout=0.05) is None, "cam1 thuộc worker 0, worker 1 đang rảnh không được cướp"
+    seen = []
+    while (lease := dispatch.acquire(0, timeout=0.05)) is not None:
+        cam_id, token, handover = lease
+        seen.append((cam_id, token["frame_idx"], handover))
+        dispatch.release(0, cam_id)
+    assert seen == [("cam1", 0, True), ("cam1", 1, False), ("cam1", 2, False)]
+
+    stats = dispatch.stats()["cam1"]
+    assert stats == {"enqueued": 3, "dropped": 2, "processed": 3, "stolen": 0, "depth": 0, "owner": 0}
+
+
+def test_one_token_in_flight_per_camera():
+    dispatch = CameraDispatch(["cam1"], n_workers=2)
+    dispatch.submit("cam1", _token("cam1", 0))
+    dispatch.submit("cam1", _token("cam1", 1))
+    first = dispatch.acquire(0, timeout=0.5)
+    assert first[1]["frame_idx"] == 0
+    # Worker 0 đang xử lý cam1 → frame 1 không được giao cho worker khác chạy song song
+    assert dispatch.acquire(1, timeout=0.1) is None
+    dispatch.release(0, "cam1")
+    assert dispatch.acquire(0, timeout=0.5)[1]["frame_idx"] == 1
+
+
+def test_idle_worker_steals_backlogged_camera_with_its_state():
+    # cam1, cam3 → worker 0; cam2 → worker 1
+    dispatch = CameraDispatch(["cam1", "cam2", "cam3"], n_workers=2)
+    dispatch.submit("cam3", _token("cam3", 0))
+    assert dispatch.acquire(0, timeout=0.5)[0] == "cam3"
+    dispatch.release(0, "cam3", state=b"votes-from-worker-0")
+
+    # Worker 0 bận với cam1 trong khi cam3 (cũng của nó) có backlog
+    dispatch.submit("cam1", _token("cam1", 0))
+    assert dispatch.acquire(0, timeout=0.5)[0] == "cam1"
+    dispatch.submit("cam3", _token("cam3", 1))
+
+    cam_id, token, handover = dispatch.acquire(1, timeout=0.5)
+    assert (cam_id, token["frame_idx"], handover) == ("cam3", 1, True)
+    assert dispatch.load_state("cam3") == b"votes-from-worker-0"
+    dispatch.release(1, "cam3", state=b"votes-from-worker-1")
+    dispatch.release(0, "cam1")
+
+    stats = dispatch.stats()
+    assert stats["cam3"]["stolen"] == 1 and stats["cam3"]["owner"] == 1
+    assert stats["cam1"]["owner"] == 0 and stats["cam1"]["processed"] == 1
+
+
+def test_reset_worker_frees_camera_held_by_dead_worker():
+    dispatch = CameraDispatch(["cam1"], n_workers=1)
+    dispatch.submit("cam1", _token("cam1", 0))
+    dispatch.submit("cam1", _token("cam1", 1))
+    assert dispatch.acquire(0, timeout=0.5)[1]["frame_idx"] == 0
+    # worker chết giữa chừng — không release
+    assert dispatch.acquire(0, timeout=0.05) is None
+
+    dispatch.reset_worker(0)
+    cam_id, token, handover = dispatch.acquire(0, timeout=0.5)
+    assert token["frame_idx"] == 1 and handover, "Worker thay thế phải nạp lại state"
+
+
+def test_submit_wakes_owner_immediately():
+    dispatch = CameraDispatch(["cam1"], n_workers=1)
+    got = []
+    t = threading.Thread(target=lambda: got.append(dispatch.acquire(0, timeout=2.0)))
+    t.start()
+    time.sleep(0.1)
+    t0 = time.monotonic()
+    dispatch.submit("cam1", _token("cam1", 7))
+    t.join()
+    assert got[0][1]["frame_idx"] == 7 and time.monotonic() - t0 < 0.5
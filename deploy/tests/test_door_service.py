@@ -0,0 +1,67 @@
+"""
+deploy/tests/test_door_service.py – Unit tests for change-driven door state detection
+Run: python -m pytest deploy/tests/test_door_service.py -v
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from services.door_service import DoorStateDetector
+
+
+class _Classifier:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, frame):
+        self.calls += 1
+        return "open" if frame.mean() > 80 else "closed"
+
+
+def _frame(value: int) -> np.ndarray:
+    return np.full((480, 640, 3), value, dtype=np.uint8)
+
+
+class TestDoorStateDetector:
+    def test_static_roi_skips_model(self):
+        clf = _Classifier()
+        det = DoorStateDetector(classify_fn=clf, change_threshold=6.0, max_staleness_secs=60)
+        states = [det.check(_frame(30)) for _ in range(50)]
+        assert set(states) == {"closed"}
+        assert clf.calls == 1
+        assert det.stats()["skipped"] == 49
+
+    def test_roi_change_triggers_model(self):
+        clf = _Classifier()
+        det = DoorStateDetector(classify_fn=clf, change_threshold=6.0, max_staleness_secs=60)
+        det.check(_frame(30))
+        assert det.check(_frame(200)) == "open"
+        assert clf.calls == 2
+        assert det.stats()["runs_on_change"] == 1
+
+    def test_staleness_forces_model(self):
+        clf = _Classifier()
+        det = DoorStateDetector(classify_fn=clf, change_threshold=6.0, max_staleness_secs=0.05)
+        det.check(_frame(30))
+        time.sleep(0.06)
+        det.check(_frame(30))
+        assert clf.calls == 2
+        assert det.stats()["runs_on_staleness"] == 1
+
+    def test_fallback_state_is_reclassified_once_model_is_ready(self):
+        clf = _Classifier()
+        ready = [False]
+        det = DoorStateDetector(classify_fn=clf, change_threshold=6.0, max_staleness_secs=60,
+                                model_ready_fn=lambda: ready[0])
+        det.check(_frame(30))
+        det.check(_frame(30))
+        assert clf.calls == 1
+
+        ready[0] = True  # model cửa vừa load xong → không giữ kết quả fallback
+        det.check(_frame(30))
+        det.check(_frame(30))
+        assert clf.calls == 2
+        assert det.stats()["runs_on_model_ready"] == 1
@@ -0,0 +1,110 @@
+"""
+deploy/tests/test_event_sink.py – Unit tests for EventSink
+Run: python -m pytest deploy/tests/test_event_sink.py -v
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from core.event_sink import EventSink
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+class _FakeDB:
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.batches: list[list[tuple]] = []
+        self._delay = delay
+        self._fail = fail
+        self._next_id = 1
+
+    def log_events_batch(self, rows):
+        time.sleep(self._delay)
+        if self._fail:
+            return None
+        self.batches.append(list(rows))
+        ids = list(range(self._next_id, self._next_id + len(rows)))
+        self._next_id += len(rows)
+        return ids
+
+
+class _Recorder:
+    def __init__(self):
+        self.messages: list[tuple[str, bool]] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, message, important=False):
+        with self._lock:
+            self.messages.append((message, important))
+
+
+def _wait_until(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestEventSink:
+    def test_events_are_batched_and_notified(self):
+        db, notifier = _FakeDB(), _Recorder()
+        sink = EventSink(db, notifier, batch_size=50, flush_interval=0.05)
+        sink.start()
+        for i in range(10):
+            assert sink.log_event("IN", f"msg {i}", i, 0, notify=f"msg {i}")
+        sink.stop()
+
+        written = [row for batch in db.batches for row in batch]
+        assert len(written) == 10
+        assert len(db.batches) < 10, "Các event gần nhau phải được gom thành batch"
+        assert _wait_until(lambda: len(notifier.messages) == 10)
+        assert sink.stats()["events_written"] == 10
+
+    def test_on_logged_receives_event_id(self):
+        db, notifier = _FakeDB(), _Recorder()
+        sink = EventSink(db, notifier, flush_interval=0.01)
+        sink.start()
+        received = []
+        sink.log_event("UNKNOWN_PLATE", "x", 0, 0, on_logged=received.append)
+        assert _wait_until(lambda: received == [1])
+        sink.stop()
+
+    def test_full_queue_drops_without_blocking(self):
+        db, notifier = _FakeDB(delay=0.5), _Recorder()
+        sink = EventSink(db, notifier, max_queue=2, batch_size=1, flush_interval=0.01)
+        sink.start()
+        t0 = time.perf_counter()
+        results = [sink.log_event("IN", "x", 0, 0) for _ in range(20)]
+        assert time.perf_counter() - t0 < 0.1, "log_event không được block main loop"
+        assert not all(results)
+        assert sink.stats()["events_dropped"] > 0
+
+    def test_db_failure_still_notifies(self):
+        db, notifier = _FakeDB(fail=True), _Recorder()
+        sink = EventSink(db, notifier, flush_interval=0.01)
+        sink.start()
+        sink.log_event("ALERT", "x", 0, 0, notify="alert", important=True)
+        assert _wait_until(lambda: notifier.messages == [("alert", True)])
+        assert sink.stats()["events_failed"] == 1
+        sink.stop()
+
+    def test_stop_delivers_notifications_of_last_batch(self):
+        # Writer vẫn đang ghi batch cuối khi stop() được gọi → notification của batch đó không được mất
+        db, notifier = _FakeDB(delay=1.0), _Recorder()  # lâu hơn chu kỳ poll 0.5s của notify worker
+        sink = EventSink(db, notifier, flush_interval=0.01, notify_workers=2)
+        sink.start()
+        sink.log_event("IN", "x", 1, 0, notify="xe vào")
+        assert _wait_until(lambda: sink.stats()["event_queue_depth"] == 0)
+        sink.stop()
+        assert notifier.messages == [("xe vào", False)]
+        assert sink.stats()["notifications_sent"] == 1
@@ -0,0 +1,72 @@
+"""
+deploy/tests/test_face_gallery.py – Unit tests for parking_hpc FaceGallery (matrix top-k face search)
+Run: python -m pytest deploy/tests/test_face_gallery.py -v
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from parking_hpc.inference import FaceGallery
+
+
+def _unit(v):
+    v = np.asarray(v, dtype=np.float64)
+    return v / np.linalg.norm(v)
+
+
+def _random_gallery(n_people=50, per_person=3, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    return {f"p{i:03d}": [_unit(rng.normal(size=dim)) for _ in range(per_person)] for i in range(n_people)}
+
+
+def test_scores_match_brute_force_max_over_embeddings():
+    known = _random_gallery()
+    gallery = FaceGallery.from_embeddings(known)
+    queries = np.random.default_rng(1).normal(size=(7, 64))
+
+    scores = gallery.scores(queries)
+    assert scores.shape == (7, 50)
+    for qi, q in enumerate(queries):
+        q = _unit(q)
+        for ii, name in enumerate(gallery.names):
+            expected = max(float(np.dot(q, emb)) for emb in known[name])
+            assert abs(scores[qi, ii] - expected) < 1e-5
+
+
+def test_search_returns_sorted_top_k():
+    gallery = FaceGallery.from_embeddings(_random_gallery())
+    queries = np.random.default_rng(2).normal(size=(5, 64))
+    idx, sims = gallery.search(queries, k=4)
+    full = gallery.scores(queries)
+
+    assert idx.shape == sims.shape == (5, 4)
+    assert np.all(np.diff(sims, axis=1) <= 0)
+    for row in range(5):
+        assert np.allclose(sims[row], np.sort(full[row])[::-1][:4])
+
+
+def test_multiple_embeddings_per_identity_beat_the_mean():
+    # Hai ảnh rất khác nhau của cùng một người: trung bình không giống ảnh nào, max-pooling thì có
+    front, side = _unit([1, 0, 0, 0]), _unit([0, 1, 0, 0])
+    gallery = FaceGallery.from_embeddings({"An": [front, side], "Binh": [_unit([0.6, 0.6, 0.5, 0.2])]})
+    idx, sims = gallery.search(side[None, :], k=1)
+    assert gallery.names[idx[0, 0]] == "An" and sims[0, 0] > 0.99
+
+
+def test_k_larger_than_gallery_and_empty_gallery():
+    gallery = FaceGallery.from_embeddings({"An": [_unit([1, 0])], "Binh": [_unit([0, 1])], "Empty": []})
+    assert gallery.names == ["An", "Binh"]
+    idx, sims = gallery.search(np.array([[0.2, 1.0]]), k=10)
+    assert [gallery.names[i] for i in idx[0]] == ["Binh", "An"]
+
+    empty = FaceGallery.from_embeddings({})
+    idx, sims = empty.search(np.ones((2, 512)), k=3)
+    assert idx.shape == (2, 0) and len(empty) == 0
+
+
+def test_matrix_is_contiguous_float32():
+    gallery = FaceGallery.from_embeddings(_random_gallery(n_people=4, per_person=2))
+    assert gallery.num_embeddings == 8
+    assert gallery._matrix.dtype == np.float32 and gallery._matrix.flags["C_CONTIGUOUS"]
@@ -0,0 +1,233 @@
+"""
+deploy/tests/test_face_service.py – Unit tests for vectorized, track-cached face recognition
+Run: python -m pytest deploy/tests/test_face_service.py -v
+"""
+import os
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+import services.face_service as fs
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+class _FakeFaceRecognition:
+    """Mặt = vùng có kênh R = 255; encoding = giá trị kênh G (mã hóa danh tính)."""
+
+    def __init__(self):
+        self.location_calls = 0
+        self.encoding_calls = 0
+
+    def face_locations(self, rgb):
+        self.location_calls += 1
+        mask = (rgb[:, :, 0] == 255).astype(np.uint8)
+        n, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        locs = []
+        for x, y, w, h, _ in stats[1:n]:
+            locs.append((int(y), int(x + w), int(y + h), int(x)))
+        return sorted(locs, key=lambda l: l[3])
+
+    def face_encodings(self, rgb, locations):
+        self.encoding_calls += 1
+        encs = []
+        for top, right, bottom, left in locations:
+            g = float(np.median(rgb[top:bottom, left:right, 1])) / 255.0
+            encs.append(np.full(128, g))
+        return encs
+
+
+def _person(frame, box, identity):
+    """Vẽ người: mặt (R=255, G=identity) ở phần trên bbox."""
+    x1, y1, x2, y2 = box
+    w = x2 - x1
+    fy1 = y1 + 5
+    frame[fy1:fy1 + w // 2, x1 + w // 4:x1 + 3 * w // 4] = (identity, identity, 255)  # BGR
+
+
+@pytest.fixture
+def fake_fr(monkeypatch):
+    fake = _FakeFaceRecognition()
+    monkeypatch.setattr(fs, "FACE_RECOGNITION_AVAILABLE", True)
+    monkeypatch.setattr(fs, "face_recognition", fake, raising=False)
+    monkeypatch.setattr(fs, "_gallery", (np.stack([np.full(128, 0.2), np.full(128, 0.6)]), ["An", "Binh"]))
+    monkeypatch.setattr(fs, "authorized_face_names", ["An", "Binh"])
+    monkeypatch.setattr(fs, "authorized_face_encodings", [np.full(128, 0.2), np.full(128, 0.6)])
+    monkeypatch.setattr(fs, "faces_version", max(fs.faces_version, 1))  # như đã load_faces()
+    return fake
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestMatchEncodings:
+    def test_distance_matrix_matches_nearest_known(self, fake_fr):
+        names = fs.match_encodings([np.full(128, 0.21), np.full(128, 0.59), np.full(128, 1.0)])
+        assert names == ["An", "Binh", "STRANGER"]
+
+    def test_no_known_faces(self, monkeypatch):
+        monkeypatch.setattr(fs, "_gallery", (np.zeros((0, 128)), []))
+        assert fs.match_encodings([np.zeros(128)]) == ["STRANGER"]
+
+
+class TestCheckFaces:
+    def test_batched_detection_routed_to_tracks(self, fake_fr):
+        frame = np.zeros((480, 640, 3), np.uint8)
+        boxes = {1: (20, 40, 140, 400), 2: (300, 60, 420, 420), 3: (480, 50, 600, 410)}
+        _person(frame, boxes[1], int(0.2 * 255))
+        _person(frame, boxes[2], int(0.6 * 255))
+        _person(frame, boxes[3], 250)
+        cache = fs.FaceTrackCache()
+        results = {tid: (name, loc, new) for tid, name, loc, new in fs.check_faces(frame, boxes, cache)}
+
+        assert fake_fr.location_calls == 1 and fake_fr.encoding_calls == 1, "Mọi crop đi chung một lần"
+        assert {tid: r[0] for tid, r in results.items()} == {1: "An", 2: "Binh", 3: "STRANGER"}
+        top, right, bottom, left = results[2][1]
+        assert boxes[2][0] <= left < right <= boxes[2][2]
+        assert boxes[2][1] <= top < bottom <= boxes[2][3]
+        assert all(r[2] for r in results.values())
+
+    def test_small_crop_keeps_aspect_ratio_and_maps_back(self, fake_fr):
+        # Crop phần trên chỉ cao 54px → upscale bị giới hạn ở FACE_MAX_UPSCALE (< 160px)
+        frame = np.zeros((480, 640, 3), np.uint8)
+        boxes = {1: (100, 100, 160, 220), 2: (300, 60, 420, 420)}
+        _person(frame, boxes[1], int(0.2 * 255))
+        _person(frame, boxes[2], int(0.6 * 255))
+        results = {tid: (name, loc) for tid, name, loc, _ in fs.check_faces(frame, boxes, fs.FaceTrackCache())}
+
+        assert results[1][0] == "An" and results[2][0] == "Binh"
+        # Mặt vẽ tại hàng 105..135, cột 115..145 trên frame
+        top, right, bottom, left = results[1][1]
+        for got, want in ((top, 105), (bottom, 135), (left, 115), (right, 145)):
+            assert abs(got - want) <= 2
+
+    def test_known_person_is_not_re_embedded(self, fake_fr):
+        frame = np.zeros((480, 640, 3), np.uint8)
+        boxes = {1: (20, 40, 140, 400)}
+        _person(frame, boxes[1], int(0.2 * 255))
+        cache = fs.FaceTrackCache()
+        fs.check_faces(frame, boxes, cache)
+        again = fs.check_faces(frame, boxes, cache)
+        assert again == [(1, "An", None, False)]
+        assert fake_fr.location_calls == 1
+
+    def test_stranger_rechecked_after_faces_reload(self, fake_fr, monkeypatch):
+        frame = np.zeros((480, 640, 3), np.uint8)
+        boxes = {1: (20, 40, 140, 400)}
+        _person(frame, boxes[1], 250)
+        cache = fs.FaceTrackCache(stranger_recheck_secs=60)
+        assert fs.check_faces(frame, boxes, cache)[0][1] == "STRANGER"
+        assert fs.check_faces(frame, boxes, cache)[0][3] is False
+        monkeypatch.setattr(fs, "faces_version", fs.faces_version + 1)
+        fs.check_faces(frame, boxes, cache)
+        assert fake_fr.location_calls == 2
+
+    def test_empty_gallery_reports_nobody(self, fake_fr, monkeypatch):
+        # Chưa có khuôn mặt nào được ủy quyền → không coi mọi người là người lạ
+        monkeypatch.setattr(fs, "_gallery", (np.zeros((0, 128)), []))
+        monkeypatch.setattr(fs, "authorized_face_names", [])
+        monkeypatch.setattr(fs, "authorized_face_encodings", [])
+        frame = np.zeros((480, 640, 3), np.uint8)
+        boxes = {1: (20, 40, 140, 400)}
+        _person(frame, boxes[1], 250)
+        assert fs.check_faces(frame, boxes, fs.FaceTrackCache()) == []
+        assert fake_fr.location_calls == 0
+
+    def test_evict(self):
+        cache = fs.FaceTrackCache()
+        cache.update(5, "An")
+        cache.evict([5])
+        assert cache.get(5) is None and cache.needs_check(5)
+
+
+class _FakeFileEncoder:
+    """load_image_file đọc byte đầu của file; encoding = byte đó / 255 (0 = ảnh không có mặt)."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def load_image_file(self, path):
+        self.encoded.append(Path(path).name)
+        return Path(path).read_bytes()[0]
+
+    def face_encodings(self, img, locations=None):
+        return [np.full(128, img / 255.0)] if img else []
+
+
+@pytest.fixture
+def face_dir(tmp_path, monkeypatch):
+    fake = _FakeFileEncoder()
+    faces = tmp_path / "faces"
+    faces.mkdir()
+    monkeypatch.setattr(fs, "FACE_RECOGNITION_AVAILABLE", True)
+    monkeypatch.setattr(fs, "face_recognition", fake, raising=False)
+    monkeypatch.setattr(fs, "FACES_DIR", str(faces))
+    monkeypatch.setattr(fs, "_gallery", fs._gallery)
+    monkeypatch.setattr(fs, "authorized_face_encodings", [])
+    monkeypatch.setattr(fs, "authorized_face_names", [])
+    monkeypatch.setattr(fs, "faces_version", fs.faces_version)
+    return faces, str(tmp_path / "cache" / "faces.npz"), fake
+
+
+class TestEmbeddingCache:
+    def test_reload_only_encodes_new_or_changed_images(self, face_dir):
+        faces, cache_path, fake = face_dir
+        (faces / "An.jpg").write_bytes(bytes([51]))
+        (faces / "Binh_Tran.png").write_bytes(bytes([153]))
+        (faces / "noface.jpg").write_bytes(bytes([0]))
+        (faces / "notes.txt").write_text("x")
+        assert fs.load_faces(cache_path) == 2
+        assert sorted(fake.encoded) == ["An.jpg", "Binh_Tran.png", "noface.jpg"]
+        assert fs.match_encodings([np.full(128, 0.6)]) == ["Binh Tran"]
+
+        fake.encoded.clear()
+        fs.load_faces(cache_path)
+        assert fake.encoded == [], "Không đổi gì → không encode lại (kể cả ảnh không có mặt)"
+
+        (faces / "Cuong.jpg").write_bytes(bytes([230]))
+        (faces / "An.jpg").write_bytes(bytes([102]))
+        (faces / "Binh_Tran.png").unlink()
+        version = fs.faces_version
+        fs.load_faces(cache_path)
+        assert sorted(fake.encoded) == ["An.jpg", "Cuong.jpg"]
+        assert fs.authorized_face_names == ["An", "Cuong"]
+        assert fs.match_encodings([np.full(128, 0.4), np.full(128, 0.6)]) == ["An", "STRANGER"]
+        assert fs.faces_version == version + 1
+
+    def test_touched_or_renamed_file_reuses_embedding_by_content_hash(self, face_dir):
+        faces, cache_path, fake = face_dir
+        (faces / "temp_1.jpg").write_bytes(bytes([51, 1, 2]))
+        fs.load_faces(cache_path)
+        fake.encoded.clear()
+
+        os.rename(faces / "temp_1.jpg", faces / "Dung.jpg")
+        os.utime(faces / "Dung.jpg", ns=(1, 1))
+        fs.load_faces(cache_path)
+        assert fake.encoded == []
+        assert fs.authorized_face_names == ["Dung"]
+
+    def test_corrupt_cache_is_rebuilt(self, face_dir):
+        faces, cache_path, fake = face_dir
+        (faces / "An.jpg").write_bytes(bytes([51]))
+        os.makedirs(os.path.dirname(cache_path))
+        Path(cache_path).write_bytes(b"not an npz")
+        assert fs.load_faces(cache_path) == 1
+        fake.encoded.clear()
+        fs.load_faces(cache_path)
+        assert fake.encoded == []
+
+    def test_gallery_is_swapped_as_one_object(self, face_dir):
+        faces, cache_path, _ = face_dir
+        (faces / "An.jpg").write_bytes(bytes([51]))
+        before = fs._gallery
+        fs.load_faces(cache_path)
+        matrix, names = fs._gallery
+        assert fs._gallery is not before
+        assert matrix.shape == (1, 128) and names == ["An"]
@@ -0,0 +1,126 @@
+"""
+deploy/tests/test_frame_grabber.py – Unit tests for LatestFrameGrabber
+Run: python -m pytest deploy/tests/test_frame_grabber.py -v
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from core.frame_grabber import LatestFrameGrabber
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+class _FakeCapture:
+    """Giả lập cv2.VideoCapture: trả về frame có pixel = số thứ tự frame."""
+
+    def __init__(self, total_frames: int = 1000, delay: float = 0.001, opened: bool = True):
+        self._total = total_frames
+        self._delay = delay
+        self._opened = opened
+        self._idx = 0
+        self.released = threading.Event()
+
+    def isOpened(self):
+        return self._opened
+
+    def set(self, prop, value):
+        return True
+
+    def read(self):
+        time.sleep(self._delay)
+        if self._idx >= self._total:
+            return False, None
+        self._idx += 1
+        return True, np.full((4, 4, 3), self._idx % 256, dtype=np.uint8)
+
+    def release(self):
+        self.released.set()
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestLatestFrameGrabber:
+    def test_start_fails_when_source_not_opened(self):
+        grabber = LatestFrameGrabber("x", capture_factory=lambda _: _FakeCapture(opened=False))
+        assert not grabber.start()
+
+    def test_read_returns_increasing_sequence(self):
+        grabber = LatestFrameGrabber("x", capture_factory=lambda _: _FakeCapture())
+        assert grabber.start()
+        try:
+            first = grabber.read(timeout=1.0)
+            second = grabber.read(timeout=1.0)
+            assert first is not None and second is not None
+            assert second.seq > first.seq
+            assert second.age() >= 0.0
+        finally:
+            grabber.stop()
+
+    def test_slow_consumer_gets_latest_and_drops_are_counted(self):
+        grabber = LatestFrameGrabber("x", capture_factory=lambda _: _FakeCapture(delay=0.001))
+        assert grabber.start()
+        try:
+            grabber.read(timeout=1.0)
+            time.sleep(0.1)  # main loop "bận" → nhiều frame bị ghi đè
+            grabbed = grabber.read(timeout=1.0)
+            stats = grabber.stats()
+            assert grabbed is not None
+            assert stats["dropped"] > 0
+            assert stats["decoded"] >= stats["consumed"] + stats["dropped"]
+            # Frame vừa đọc phải là frame mới nhất lúc đọc (không phải frame cũ trong buffer)
+            assert stats["last_seq"] - grabbed.seq <= 2
+        finally:
+            grabber.stop()
+
+    def test_read_times_out_when_stream_ends(self):
+        grabber = LatestFrameGrabber(
+            "x", reconnect_delay=10.0, capture_factory=lambda _: _FakeCapture(total_frames=1)
+        )
+        assert grabber.start()
+        try:
+            assert grabber.read(timeout=1.0) is not None
+            assert grabber.read(timeout=0.1) is None  # không có frame mới → mất tín hiệu
+        finally:
+            grabber.stop()
+
+    def test_file_source_is_read_in_order_and_stops_at_eof(self):
+        opened = []
+
+        def factory(source):
+            opened.append(source)
+            return _FakeCapture(total_frames=20, delay=0.0)
+
+        grabber = LatestFrameGrabber("clip.mp4", reconnect_delay=0.01, capture_factory=factory, file_mode=True)
+        assert grabber.start()
+        try:
+            seqs = []
+            while True:
+                grabbed = grabber.read(timeout=1.0)
+                if grabbed is None:
+                    break
+                seqs.append(grabbed.seq)
+                time.sleep(0.005)  # main loop chậm hơn decode
+            stats = grabber.stats()
+            assert seqs == list(range(1, 21)), "File video: không bỏ frame nào"
+            assert stats["dropped"] == 0 and stats["eof"] is True and grabber.finished
+            time.sleep(0.05)
+            assert opened == ["clip.mp4"] and stats["reconnects"] == 0, "Hết file không phát lại"
+            assert grabber.read(timeout=0.1) is None
+        finally:
+            grabber.stop()
+
+    def test_file_mode_detected_from_existing_path(self, tmp_path):
+        video = tmp_path / "clip.mp4"
+        video.write_bytes(b"")
+        assert LatestFrameGrabber(str(video)).file_mode
+        assert not LatestFrameGrabber("rtsp://cam/stream").file_mode
+        assert not LatestFrameGrabber(0).file_mode
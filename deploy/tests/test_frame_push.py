@@ -0,0 +1,103 @@
+"""
+deploy/tests/test_frame_push.py – Unit tests for parking_hpc FramePush (binary push theo subscriber, latest-frame-wins)
+Run: python -m pytest deploy/tests/test_frame_push.py -v
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from parking_hpc.frame_push import FramePush
+
+
+class _FakeSocket:
+    """Ghi lại (sid, cam, jpeg) đã gửi; ack do test gọi thủ công (client chậm)."""
+
+    def __init__(self):
+        self.sent = []
+        self.acks = {}
+
+    def send(self, sid, cam_id, jpeg, ack):
+        self.sent.append((sid, cam_id, jpeg))
+        self.acks[(sid, cam_id)] = ack
+
+    def ack(self, sid, cam_id):
+        self.acks.pop((sid, cam_id))()
+
+
+def _encoder(calls, payload=b"jpeg"):
+    def _encode():
+        calls.append(1)
+        return payload
+    return _encode
+
+
+def test_camera_without_subscribers_is_never_encoded():
+    sock = _FakeSocket()
+    push = FramePush(sock.send)
+    calls = []
+    assert not push.publish("cam1", _encoder(calls))
+    push.subscribe("a", "cam2")
+    assert not push.publish("cam1", _encoder(calls))
+
+    assert calls == [] and sock.sent == []
+    assert push.stats()["cameras"]["cam1"]["skipped_no_viewers"] == 2
+
+
+def test_one_encode_sent_as_bytes_to_each_subscriber():
+    sock = _FakeSocket()
+    push = FramePush(sock.send)
+    push.subscribe("a", "cam1")
+    push.subscribe("b", "cam1")
+    push.subscribe("c", "cam2")
+    calls = []
+    assert push.publish("cam1", _encoder(calls, b"\xff\xd8frame"))
+
+    assert calls == [1]
+    assert sorted(sock.sent) == [("a", "cam1", b"\xff\xd8frame"), ("b", "cam1", b"\xff\xd8frame")]
+    stats = push.stats()
+    assert stats["cameras"]["cam1"]["viewers"] == 2 and stats["cameras"]["cam1"]["encodes"] == 1
+    assert stats["viewers"]["a"]["bytes_sent"] == 7 and stats["viewers"]["c"]["frames_sent"] == 0
+
+
+def test_slow_client_gets_latest_frame_only():
+    sock = _FakeSocket()
+    push = FramePush(sock.send)
+    push.subscribe("slow", "cam1")
+    push.subscribe("fast", "cam1")
+    for i in range(4):
+        push.publish("cam1", lambda i=i: b"f%d" % i)
+        sock.ack("fast", "cam1")
+
+    slow = [jpeg for sid, _, jpeg in sock.sent if sid == "slow"]
+    assert slow == [b"f0"], "Chưa ack → không gửi thêm"
+    sock.ack("slow", "cam1")
+    slow = [jpeg for sid, _, jpeg in sock.sent if sid == "slow"]
+    assert slow == [b"f0", b"f3"], "Sau ack chỉ nhận frame mới nhất"
+
+    stats = push.stats()["viewers"]
+    assert stats["slow"]["dropped"] == 2 and stats["fast"]["dropped"] == 0
+    assert stats["fast"]["frames_sent"] == 4
+
+
+def test_unacked_frame_is_resent_after_timeout():
+    sock = _FakeSocket()
+    push = FramePush(sock.send, ack_timeout=0.0)
+    push.subscribe("a", "cam1")
+    push.publish("cam1", lambda: b"f0")
+    push.publish("cam1", lambda: b"f1")
+    assert [jpeg for _, _, jpeg in sock.sent] == [b"f0", b"f1"]
+
+
+def test_unsubscribe_and_disconnect_stop_delivery():
+    sock = _FakeSocket()
+    push = FramePush(sock.send)
+    push.subscribe("a", "cam1")
+    push.subscribe("a", "cam2")
+    push.unsubscribe("a", "cam1")
+    push.publish("cam1", lambda: b"x")
+    push.publish("cam2", lambda: b"y")
+    assert sock.sent == [("a", "cam2", b"y")]
+
+    push.disconnect("a")
+    sock.ack("a", "cam2")  # ack muộn sau khi ngắt kết nối: bỏ qua
+    assert push.subscribers("cam2") == [] and "a" not in push.stats()["viewers"]
@@ -0,0 +1,135 @@
+"""
+deploy/tests/test_inference_worker.py – Unit tests for parking_hpc InferenceWorker (đọc frame từ SharedMemory ring)
+Run: python -m pytest deploy/tests/test_inference_worker.py -v
+"""
+import pickle
+import queue
+import sys
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from parking_hpc import config as cfg
+from parking_hpc import inference
+from parking_hpc.shm_ring import FrameRing
+
+SHAPE = (48, 64, 3)
+
+
+class _FakeDetector:
+    def __init__(self):
+        self.frames = []
+        self.on_detect = None
+
+    def detect(self, frame):
+        self.frames.append(frame)
+        if self.on_detect:
+            self.on_detect()
+        return [(10, 10, 30, 20, 0.9)]
+
+
+class _FakeOCR:
+    def read(self, crop):
+        return "51A12345", 0.95
+
+
+class _FakeFace:
+    def identify(self, frame):
+        return "STRANGER", 0.0
+
+
+@pytest.fixture
+def worker(monkeypatch, tmp_path):
+    monkeypatch.setattr(inference, "PlateDetector", _FakeDetector)
+    monkeypatch.setattr(inference, "OCRReader", _FakeOCR)
+    monkeypatch.setattr(inference, "FaceRecognizer", _FakeFace)
+    monkeypatch.setattr(cfg, "SNAPSHOT_DIR", str(tmp_path))
+    w = inference.InferenceWorker(None, queue.Queue(maxsize=4), threading.Event())
+    w._voters["cam1"] = inference.PlateVoter(buffer_size=1)
+    yield w
+    w._rings.close()
+
+
+@pytest.fixture
+def ring():
+    r = FrameRing.create(f"test_worker_{uuid.uuid4().hex[:8]}", SHAPE, n_slots=3)
+    yield r
+    r.unlink()
+    r.close()
+
+
+def _token(ring, slot, seq, frame_idx=0):
+    return {"cam_id": "cam1", "shm_name": ring.name, "slot": slot, "seq": seq,
+            "gen": ring.generation, "frame_idx": frame_idx, "ts": 1.0}
+
+
+def test_inference_runs_on_shared_view_and_publishes_metadata_only(worker, ring):
+    display = FrameRing.create(f"test_display_{uuid.uuid4().hex[:8]}", SHAPE, n_slots=2)
+    worker.display_shm = {"cam1": display.name}
+    slot, seq = ring.write(np.full(SHAPE, 40, np.uint8), frame_idx=0)
+    worker._process(_token(ring, slot, seq))
+
+    seen = worker._plate_detector.frames[0]
+    assert not seen.flags.owndata and not seen.flags.writeable, "Detector nhận view, không phải bản copy"
+    result = worker.result_queue.get_nowait()
+    assert result.plate_text == "51A12345" and result.snapshot_path
+    assert result.detections == [(10, 10, 30, 20, "51A12345", 0.95)]
+    assert len(pickle.dumps(result)) < 2048, "Queue chỉ mang metadata, không mang frame"
+
+    # UI: map frame zero-copy, overlay vẽ trên bản copy riêng
+    shown = display.view(result.display_slot, result.display_seq)
+    assert result.display_shm == display.name and np.all(shown == 40)
+    assert inference.has_overlays(result)
+    canvas = shown.copy()
+    inference.draw_overlays(canvas, result)
+    assert canvas[10, 10].tolist() == [255, 0, 255] and np.all(shown == 40)
+    assert worker._rings.get(ring.name) is worker._rings.get(ring.name)
+    assert worker._rings.stats()["attach"] == 2
+    worker._rings.close()
+    display.unlink()
+    display.close()
+
+
+def test_without_display_ring_snapshot_still_saved(worker, ring):
+    slot, seq = ring.write(np.full(SHAPE, 40, np.uint8), frame_idx=0)
+    worker._process(_token(ring, slot, seq))
+    result = worker.result_queue.get_nowait()
+    assert result.snapshot_path and result.display_shm == "" and result.display_slot == -1
+
+
+def test_results_from_a_frame_overwritten_mid_inference_are_dropped(worker, ring):
+    slot, seq = ring.write(np.full(SHAPE, 40, np.uint8), frame_idx=0)
+    worker._plate_detector.on_detect = lambda: [ring.write(np.zeros(SHAPE, np.uint8), i) for i in range(1, 4)]
+    worker._process(_token(ring, slot, seq))
+
+    assert worker.result_queue.empty() and not worker._voters["cam1"]._buffer
+    assert worker._rings.stats()["read_torn"] == 1
+
+
+def test_stale_token_falls_back_to_newest_frame(worker, ring):
+    slot, seq = ring.write(np.full(SHAPE, 1, np.uint8), frame_idx=0)
+    for i in range(1, 5):
+        ring.write(np.full(SHAPE, 1 + i, np.uint8), frame_idx=i)
+    worker._process(_token(ring, slot, seq))
+
+    assert np.all(worker._plate_detector.frames[0] == 5)
+    assert worker._fallbacks == 1 and not worker.result_queue.empty()
+
+
+def test_camera_state_round_trips_between_workers(worker, ring):
+    slot, seq = ring.write(np.full(SHAPE, 40, np.uint8), frame_idx=0)
+    worker._voters["cam1"] = inference.PlateVoter(buffer_size=cfg.FRAME_BUFFER_SIZE)
+    worker._process(_token(ring, slot, seq))
+    worker._mark_seen("cam1", "30F99999")
+    blob = worker._camera_state("cam1")
+
+    other = inference.InferenceWorker(None, queue.Queue(), threading.Event(), worker_id=1)
+    other._load_camera_state("cam1", blob)
+    assert list(other._voters["cam1"]._buffer) == [("51A12345", pytest.approx(0.855))]
+    assert other._frame_counters["cam1"] == 1
+    assert not other._mark_seen("cam1", "30F99999") and other._mark_seen("cam2", "30F99999")
+    other._rings.close()
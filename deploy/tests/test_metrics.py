@@ -0,0 +1,38 @@
+"""
+deploy/tests/test_metrics.py – Unit tests for core.metrics
+Run: python -m pytest deploy/tests/test_metrics.py -v
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from core.metrics import Histogram, render_histogram
+
+
+class TestHistogram:
+    def test_buckets_are_cumulative(self):
+        hist = Histogram(buckets=(0.01, 0.1, 1.0))
+        for v in (0.005, 0.01, 0.05, 0.5, 5.0):
+            hist.observe(v)
+        snap = hist.snapshot()
+        assert snap["buckets"] == {"0.01": 2, "0.1": 3, "1.0": 4, "+Inf": 5}
+        assert snap["count"] == 5
+        assert abs(snap["sum"] - 5.565) < 1e-9
+
+    def test_empty_snapshot(self):
+        snap = Histogram(buckets=(1.0,)).snapshot()
+        assert snap == {"buckets": {"1.0": 0, "+Inf": 0}, "count": 0, "sum": 0.0}
+
+    def test_render_histogram_prometheus_lines(self):
+        hist = Histogram(buckets=(0.1, 1.0))
+        hist.observe(0.05)
+        hist.observe(2.0)
+        lines = render_histogram("db_query_seconds", {"op": "log_event"}, hist.snapshot())
+        assert lines == [
+            'db_query_seconds_bucket{op="log_event",le="0.1"} 1',
+            'db_query_seconds_bucket{op="log_event",le="1.0"} 1',
+            'db_query_seconds_bucket{op="log_event",le="+Inf"} 2',
+            'db_query_seconds_sum{op="log_event"} 2.05',
+            'db_query_seconds_count{op="log_event"} 2',
+        ]
+        assert render_histogram("db_pool_wait_seconds", {}, hist.snapshot())[0] == 'db_pool_wait_seconds_bucket{le="0.1"} 1'
@@ -0,0 +1,77 @@
+"""
+deploy/tests/test_mjpeg_streamer.py – Unit tests for MJPEGStreamer broadcast encoding
+Run: python -m pytest deploy/tests/test_mjpeg_streamer.py -v
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from core.mjpeg_streamer import MJPEGStreamer
+
+
+def _frame(value: int) -> np.ndarray:
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+def _wait_until(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestMJPEGStreamer:
+    def test_no_encoding_without_clients(self):
+        streamer = MJPEGStreamer(stream_width=0, fps=50)
+        for i in range(5):
+            streamer.update_frame(_frame(i))
+        time.sleep(0.05)
+        assert streamer.stats()["encodes"] == 0
+        assert streamer.get_snapshot() is not None
+
+    def test_one_encode_shared_by_all_clients(self):
+        streamer = MJPEGStreamer(stream_width=0, fps=50)
+        streamer.update_frame(_frame(10))
+        clients = [streamer.generate() for _ in range(5)]
+        chunks = []
+
+        def _pull(gen):
+            chunks.append(next(gen))
+
+        threads = [threading.Thread(target=_pull, args=(g,)) for g in clients]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=2.0)
+        try:
+            assert len(chunks) == 5
+            assert len(set(chunks)) == 1
+            assert streamer.stats()["encodes"] == 1
+            assert streamer.stats()["clients"] == 5
+        finally:
+            for g in clients:
+                g.close()
+            streamer.stop()
+        assert streamer.stats()["clients"] == 0
+
+    def test_client_only_receives_new_frames(self):
+        streamer = MJPEGStreamer(stream_width=0, fps=50)
+        streamer.update_frame(_frame(1))
+        gen = streamer.generate()
+        first = next(gen)
+        received = []
+        t = threading.Thread(target=lambda: received.append(next(gen)))
+        t.start()
+        time.sleep(0.1)
+        assert received == [], "Không có frame mới thì client không nhận lại frame cũ"
+        streamer.update_frame(_frame(200))
+        assert _wait_until(lambda: len(received) == 1)
+        assert received[0] != first
+        gen.close()
+        streamer.stop()
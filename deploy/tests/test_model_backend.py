@@ -0,0 +1,197 @@
+"""
+deploy/tests/test_model_backend.py – Unit tests for core/model_backend (chọn backend, cache export, parity)
+Run: python -m pytest deploy/tests/test_model_backend.py -v
+"""
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from core import model_backend
+from core.model_backend import cache_dir_for, load_model, match_ratio, resolve_backend_order
+
+REF_BOX = (10.0, 10.0, 50.0, 50.0, 0.90, 0.0)
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+class _Boxes:
+    def __init__(self, rows):
+        rows = np.asarray(rows, dtype=np.float32).reshape(-1, 6)
+        self.xyxy, self.conf, self.cls = rows[:, :4], rows[:, 4], rows[:, 5]
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+class _Result:
+    def __init__(self, rows):
+        self.boxes = _Boxes(rows)
+
+
+def _fake_yolo(behaviour, exports):
+    """Lớp giả YOLO: behaviour[backend] = {"delay", "box", "fail", "export_delay"}; exports đếm số lần export."""
+
+    class FakeYOLO:
+        def __init__(self, path, task=None):
+            self.path = str(path)
+            self.backend = "pytorch" if self.path.endswith(".pt") else Path(self.path).parent.name
+            spec = behaviour.get(self.backend, {})
+            if spec.get("fail") == "load":
+                raise RuntimeError(f"cannot load {self.backend}")
+            self.spec = spec
+
+        def predict(self, img, imgsz=640, verbose=False):
+            time.sleep(self.spec.get("delay", 0.0))
+            return [_Result([self.spec.get("box", REF_BOX)])]
+
+        def export(self, format, imgsz, **kwargs):
+            exports.append((format, imgsz, kwargs))
+            time.sleep(behaviour.get(format, {}).get("export_delay", 0.0))
+            if behaviour.get(format, {}).get("fail") == "export":
+                raise RuntimeError(f"export {format} failed")
+            out = Path(self.path).with_name(f"model_{format}.bin")
+            out.write_bytes(b"artifact")
+            return str(out)
+
+    return FakeYOLO
+
+
+@pytest.fixture
+def env(tmp_path):
+    weights = tmp_path / "model.pt"
+    weights.write_bytes(b"weights-v1")
+    samples = tmp_path / "samples"
+    samples.mkdir()
+    cv2.imwrite(str(samples / "a.png"), np.zeros((64, 64, 3), dtype=np.uint8))
+    exports = []
+
+    def load(behaviour, backends="onnx,openvino", **kwargs):
+        kwargs.setdefault("samples_dir", str(samples))
+        return load_model(
+            str(weights), imgsz=64, backends=backends, cache_root=str(tmp_path / "cache"), opset=17,
+            min_match=0.95, yolo_cls=_fake_yolo(behaviour, exports), available=lambda b: True, **kwargs,
+        )
+
+    return load, weights, exports, tmp_path
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+def test_resolve_backend_order_by_arch_and_spec():
+    everything = lambda b: True  # noqa: E731
+    assert resolve_backend_order("auto", machine="aarch64", available=everything)[0] == "ncnn"
+    assert resolve_backend_order("auto", machine="x86_64", available=everything)[0] == "openvino"
+    assert resolve_backend_order("onnx, bogus", available=everything) == ["onnx", "pytorch"]
+    assert resolve_backend_order("pytorch,onnx", available=everything) == ["onnx", "pytorch"]
+    assert resolve_backend_order("auto", machine="x86_64", available=lambda b: b == "onnx") == ["onnx", "pytorch"]
+
+
+def test_cache_dir_changes_with_weights_imgsz_and_opset(tmp_path):
+    weights = tmp_path / "m.pt"
+    weights.write_bytes(b"v1")
+    base = cache_dir_for(str(weights), "cache", 640, 17)
+    assert cache_dir_for(str(weights), "cache", 640, 17) == base
+    assert cache_dir_for(str(weights), "cache", 320, 17) != base
+    assert cache_dir_for(str(weights), "cache", 640, 18) != base
+    assert cache_dir_for(str(weights), "cache", 640, 17, dynamic=True) != base
+    weights.write_bytes(b"v2-different")
+    os.utime(weights, (time.time() + 5, time.time() + 5))
+    assert cache_dir_for(str(weights), "cache", 640, 17) != base
+
+
+def test_match_ratio_requires_class_iou_and_conf():
+    ref = np.array([REF_BOX])
+    assert match_ratio(ref, np.array([(11, 11, 51, 51, 0.88, 0)])) == 1.0
+    assert match_ratio(ref, np.array([(11, 11, 51, 51, 0.88, 1)])) == 0.0
+    assert match_ratio(ref, np.array([(11, 11, 51, 51, 0.70, 0)])) == 0.0
+    assert match_ratio(ref, np.array([(40, 40, 90, 90, 0.90, 0)])) == 0.0
+    assert match_ratio(ref, np.array([REF_BOX, (60, 60, 80, 80, 0.5, 0)])) == 0.5
+    assert match_ratio(np.zeros((0, 6)), np.zeros((0, 6))) == 1.0
+
+
+def test_fastest_matching_backend_is_selected_and_cached(env):
+    load, weights, exports, tmp_path = env
+    behaviour = {"pytorch": {"delay": 0.01}, "onnx": {"delay": 0.004}, "openvino": {"delay": 0.0}}
+    model = load(behaviour)
+    assert model.backend == "openvino"
+    assert model_backend.LOADED_MODELS[str(weights)]["backend"] == "openvino"
+    assert sorted(e[0] for e in exports) == ["onnx", "openvino"]
+    assert ("opset", 17) in exports[[e[0] for e in exports].index("onnx")][2].items()
+
+    selection_files = list((tmp_path / "cache").glob("*/selection.json"))
+    assert len(selection_files) == 1
+    selection = json.loads(selection_files[0].read_text())
+    assert selection["backend"] == "openvino" and selection["parity_checked"] is True
+    assert set(selection["candidates"]) == {"pytorch", "onnx", "openvino"}
+
+    exports.clear()
+    again = load(behaviour)
+    assert again.backend == "openvino" and exports == [], "Lần sau dùng artifact đã cache, không export lại"
+
+
+def test_backend_failing_parity_is_skipped(env):
+    load, weights, _, _ = env
+    behaviour = {
+        "pytorch": {"delay": 0.01},
+        "openvino": {"delay": 0.0, "box": (30, 30, 70, 70, 0.9, 0)},
+        "onnx": {"delay": 0.002},
+    }
+    assert load(behaviour).backend == "onnx"
+    assert model_backend.LOADED_MODELS[str(weights)]["candidates"]["openvino"]["parity"] == 0.0
+
+
+def test_falls_back_to_pytorch_when_no_backend_works(env):
+    load, weights, _, _ = env
+    failing = {"pytorch": {"delay": 0.0}, "onnx": {"fail": "export"}, "openvino": {"fail": "load"}}
+    model = load(failing)
+    assert model.backend == "pytorch" and model.path == str(weights)
+    info = model_backend.LOADED_MODELS[str(weights)]
+    assert "error" in info["candidates"]["onnx"] and "error" in info["candidates"]["openvino"]
+
+
+def test_without_samples_pytorch_is_kept_and_nothing_is_persisted(env):
+    load, weights, exports, tmp_path = env
+    behaviour = {"pytorch": {"delay": 0.01}, "onnx": {"delay": 0.0}, "openvino": {"delay": 0.0}}
+    model = load(behaviour, samples_dir=str(tmp_path / "missing"))
+    assert model.backend == "pytorch" and exports == []
+    assert model_backend.LOADED_MODELS[str(weights)]["parity_checked"] is False
+    assert list((tmp_path / "cache").glob("*/selection.json")) == []
+
+    # Có ảnh mẫu ở lần khởi động sau → chọn backend bình thường
+    assert load(behaviour).backend in ("onnx", "openvino")
+
+
+def test_concurrent_loads_sharing_cache_dir_export_once(env):
+    load, weights, exports, tmp_path = env
+    behaviour = {
+        "pytorch": {"delay": 0.01},
+        "onnx": {"delay": 0.004, "export_delay": 0.05},
+        "openvino": {"delay": 0.0, "export_delay": 0.05},
+    }
+    models = {}
+
+    def worker(name):
+        models[name] = load(behaviour, name=name)
+
+    threads = [threading.Thread(target=worker, args=(name,)) for name in ("general", "plate")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(e[0] for e in exports) == ["onnx", "openvino"], "Lần load thứ hai dùng selection.json, không export lại"
+    assert models["general"].backend == models["plate"].backend == "openvino"
+    assert model_backend.LOADED_MODELS["general"]["backend"] == "openvino"
+    assert model_backend.LOADED_MODELS["plate"]["backend"] == "openvino"
@@ -0,0 +1,115 @@
+"""
+deploy/tests/test_model_registry.py – Unit tests for ModelRegistry (load song song, lazy, timeline)
+Run: python -m pytest deploy/tests/test_model_registry.py -v
+"""
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from core.model_registry import ModelRegistry
+
+
+def _slow_loader(value, delay=0.2, calls=None):
+    def _load():
+        if calls is not None:
+            calls.append(value)
+        time.sleep(delay)
+        return value
+    return _load
+
+
+def test_models_load_in_parallel_and_are_warmed_up_once():
+    registry = ModelRegistry(max_workers=3)
+    warmed = []
+    for name in ("general", "plate", "ocr"):
+        registry.register(name, _slow_loader(name), warmup=warmed.append)
+
+    t0 = time.perf_counter()
+    registry.start()
+    values = [registry.get(name) for name in ("general", "plate", "ocr")]
+    elapsed = time.perf_counter() - t0
+
+    assert values == ["general", "plate", "ocr"]
+    assert elapsed < 0.45, f"3 model x 0.2s phải load song song (mất {elapsed:.2f}s)"
+    assert sorted(warmed) == ["general", "ocr", "plate"]
+    threads = {row["thread"] for row in registry.timeline() if row["kind"] == "model"}
+    assert len(threads) == 3
+    registry.shutdown()
+
+
+def test_lazy_entry_loads_only_on_first_use():
+    registry = ModelRegistry()
+    calls = []
+    registry.register("door", _slow_loader("door-model", delay=0.0, calls=calls), lazy=True)
+    registry.start()
+    time.sleep(0.05)
+    assert calls == [] and not registry.is_ready("door")
+
+    assert registry.get("door") == "door-model"
+    assert registry.get("door") == "door-model"
+    assert calls == ["door-model"]
+
+
+def test_get_without_wait_loads_in_background():
+    registry = ModelRegistry()
+    release = threading.Event()
+    registry.register("faces", lambda: release.wait(2) and "faces", lazy=True, required=False)
+
+    assert registry.get("faces", wait=False) is None, "Lần đầu chỉ kích hoạt load nền"
+    assert registry.get("faces", wait=False) is None
+    release.set()
+    assert registry.get("faces", timeout=2) == "faces"
+    assert registry.get("faces", wait=False) == "faces"
+
+
+def test_errors_raise_for_required_and_return_none_for_optional():
+    registry = ModelRegistry()
+
+    def _broken():
+        raise FileNotFoundError("model.pt")
+
+    registry.register("plate", _broken)
+    registry.register("door", _broken, lazy=True, required=False)
+    registry.start()
+    with pytest.raises(FileNotFoundError):
+        registry.get("plate")
+    assert registry.get("door") is None
+    errors = {row["name"]: row["status"] for row in registry.timeline() if row["kind"] == "model"}
+    assert errors == {"plate": "error", "door": "error"}
+
+
+def test_warmup_failure_keeps_model():
+    registry = ModelRegistry()
+
+    def _bad_warmup(model):
+        raise RuntimeError("no predict")
+
+    registry.register("general", lambda: "model", warmup=_bad_warmup)
+    assert registry.get("general") == "model"
+    row = next(r for r in registry.timeline() if r["name"] == "general")
+    assert row["status"] == "ok" and row["warmup_error"] == "no predict"
+
+
+def test_timeline_orders_steps_marks_and_models(tmp_path):
+    registry = ModelRegistry()
+    with registry.step("database"):
+        time.sleep(0.01)
+    registry.register("plate", _slow_loader("plate", delay=0.01))
+    registry.start()
+    registry.get("plate")
+    registry.mark("first frame")
+
+    rows = registry.timeline()
+    assert [r["name"] for r in rows] == ["database", "plate", "first frame"]
+    assert rows[0]["secs"] >= 0.01 and rows[2]["kind"] == "mark"
+    assert any("first frame" in line for line in registry.report_lines())
+
+    path = tmp_path / "startup" / "timeline.json"
+    registry.write_timeline(str(path))
+    assert [r["name"] for r in json.loads(path.read_text())["timeline"]] == ["database", "plate", "first frame"]
+    registry.shutdown()
@@ -0,0 +1,90 @@
+"""
+deploy/tests/test_motion_gate.py – Unit tests for MotionGate
+Run: python -m pytest deploy/tests/test_motion_gate.py -v
+"""
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Cho phép import core/ từ gốc project
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from core.motion_gate import MotionGate
+
+
+def _scene() -> np.ndarray:
+    return np.full((480, 640, 3), 60, dtype=np.uint8)
+
+
+def _with_box(x: int, y: int, size: int = 80) -> np.ndarray:
+    img = _scene()
+    cv2.rectangle(img, (x, y), (x + size, y + size), (230, 230, 230), -1)
+    return img
+
+
+def _gate(**kwargs) -> MotionGate:
+    params = dict(min_area=1500, hold_secs=1.0, heartbeat_secs=2.0)
+    params.update(kwargs)
+    return MotionGate(**params)
+
+
+def test_static_scene_runs_only_heartbeat():
+    gate = _gate()
+    static = _scene()
+    runs = [gate.should_infer(static, now=10.0 + i * 0.1) for i in range(51)]  # 5 giây
+    # Frame đầu (chưa có frame trước) kích hoạt + hold-over 1s; sau đó chỉ còn heartbeat mỗi 2s
+    assert all(runs[:11])
+    assert sum(runs[11:]) == 2
+    st = gate.stats()
+    assert st["heartbeats"] == 2
+    assert st["skip_ratio"] > 0.7
+    assert not gate.active
+
+
+def test_motion_activates_and_hold_over_keeps_running():
+    gate = _gate(hold_secs=1.0, heartbeat_secs=100.0)
+    gate.should_infer(_scene(), now=0.0)
+    assert not gate.should_infer(_scene(), now=5.0)  # hết hold-over của frame đầu
+
+    assert gate.should_infer(_with_box(200, 200), now=5.1)
+    assert gate.active
+    # Xe dừng lại: vẫn chạy trong hold_secs rồi mới tắt
+    assert gate.should_infer(_with_box(200, 200), now=5.6)
+    assert gate.should_infer(_with_box(200, 200), now=6.0)
+    assert not gate.should_infer(_with_box(200, 200), now=6.3)
+    assert not gate.active
+
+
+def test_hysteresis_keeps_small_motion_while_active():
+    gate = _gate(min_area=6000, exit_ratio=0.3, hold_secs=0.0, heartbeat_secs=100.0)
+    gate.should_infer(_scene(), now=0.0)
+    gate.should_infer(_scene(), now=1.0)
+    assert not gate.active
+
+    # Vật nhỏ (~40x40) dưới ngưỡng vào → không kích hoạt
+    assert not gate.should_infer(_with_box(300, 300, size=40), now=2.0)
+    assert not gate.should_infer(_scene(), now=2.1)
+    # Vật lớn kích hoạt, sau đó chuyển động nhỏ vẫn trên ngưỡng thoát
+    assert gate.should_infer(_with_box(100, 100, size=100), now=3.0)
+    assert gate.should_infer(_with_box(300, 300, size=40), now=3.1)
+    assert gate.active
+
+
+def test_motion_outside_roi_is_ignored():
+    roi = [(0.0, 0.5), (1.0, 0.5), (1.0, 1.0), (0.0, 1.0)]  # nửa dưới frame
+    gate = _gate(roi_polygon_norm=roi, hold_secs=0.0, heartbeat_secs=100.0)
+    gate.should_infer(_scene(), now=0.0)
+    gate.should_infer(_scene(), now=1.0)
+
+    assert not gate.should_infer(_with_box(200, 40), now=2.0), "Chuyển động ngoài ROI"
+    assert gate.last_area == 0.0
+    assert gate.should_infer(_with_box(200, 350), now=3.0), "Chuyển động trong ROI"
+
+
+def test_area_is_measured_in_full_frame_pixels():
+    gate = _gate(diff_width=160)
+    gate.should_infer(_scene(), now=0.0)
+    gate.should_infer(_with_box(200, 200, size=100), now=1.0)
+    # Blur + dilate làm contour lớn hơn một chút, nhưng cùng bậc với 100x100 px
+    assert 8000 < gate.last_area < 25000
@@ -0,0 +1,80 @@
+"""
+deploy/tests/test_multi_camera.py – Unit tests for MultiCameraDetector
+Run: python -m pytest deploy/tests/test_multi_camera.py -v
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from core.multi_camera import MultiCameraDetector
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+class _FakeModel:
+    def __init__(self):
+        self.calls: list[int] = []
+
+    def predict(self, images, **kwargs):
+        self.calls.append(len(images))
+        return [f"result-{img.shape[0]}" for img in images]
+
+
+class _FakeTracker:
+    def __init__(self):
+        self.updates = 0
+
+
+def _apply(tracker, result):
+    tracker.updates += 1
+    return (result, id(tracker), tracker.updates)
+
+
+def _detector(model):
+    return MultiCameraDetector(
+        model,
+        tracker_factory=_FakeTracker,
+        tripwire_factory=lambda st: f"tripwire-{st.cam_id}",
+        apply_tracker_fn=_apply,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestMultiCameraDetector:
+    def test_single_forward_pass_routed_per_camera(self):
+        model = _FakeModel()
+        det = _detector(model)
+        frames = {"main": np.zeros((480, 640, 3), np.uint8), "cam2": np.zeros((360, 640, 3), np.uint8)}
+        out = det.detect(frames)
+        assert model.calls == [2], "Tất cả camera phải đi chung một batch"
+        assert out["main"][0] == "result-480"
+        assert out["cam2"][0] == "result-360"
+        assert det.state("cam2").frame_height == 360
+
+    def test_tracker_and_tripwire_are_per_camera(self):
+        det = _detector(_FakeModel())
+        frame = np.zeros((10, 10, 3), np.uint8)
+        first = det.detect({"main": frame, "cam2": frame})
+        second = det.detect({"main": frame})
+        assert first["main"][1] != first["cam2"][1]
+        assert second["main"][2] == 2
+        assert det.state("cam2").tracker.updates == 1
+        assert det.state("cam2").tripwire == "tripwire-cam2"
+
+    def test_select_new_skips_unchanged_frames(self):
+        det = _detector(_FakeModel())
+        frame = np.zeros((10, 10, 3), np.uint8)
+        assert set(det.select_new({"cam2": (1, frame), "cam3": (5, frame)})) == {"cam2", "cam3"}
+        assert set(det.select_new({"cam2": (1, frame), "cam3": (6, frame)})) == {"cam3"}
+
+    def test_empty_batch_skips_model(self):
+        model = _FakeModel()
+        assert _detector(model).detect({}) == {}
+        assert model.calls == []
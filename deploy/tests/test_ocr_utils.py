@@ -0,0 +1,158 @@
+"""
+deploy/tests/test_ocr_utils.py – Unit tests for VNPlateOCR (profile tiền xử lý, rec-only, leo thang)
+Run: python -m pytest deploy/tests/test_ocr_utils.py -v
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from util.ocr_utils import VNPlateOCR
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _profile_of(img):
+    """Đoán profile từ ảnh đưa vào OCR: màu → none, nhị phân → full, còn lại → light."""
+    if not (np.array_equal(img[:, :, 0], img[:, :, 1]) and np.array_equal(img[:, :, 1], img[:, :, 2])):
+        return "none"
+    return "full" if set(np.unique(img)) <= {0, 255} else "light"
+
+
+class _FakePaddle:
+    """Điểm tin cậy theo profile; ghi lại (profile, det) của từng ảnh và số lần gọi ocr()."""
+
+    def __init__(self, scores, text="51A12345"):
+        self.scores = scores
+        self.text = text
+        self.calls = []
+        self.invocations = 0
+
+    def _read(self, img, det):
+        profile = _profile_of(img)
+        self.calls.append((profile, det))
+        text = self.text if self.text is not None else f"51A{img.shape[1]}"
+        return text, self.scores.get(profile, 0.0)
+
+    def ocr(self, img, det=True, rec=True, cls=True):
+        """Giống PaddleOCR 2.7: mỗi phần tử của list đầu vào là một trang, trả về một list kết quả/trang."""
+        self.invocations += 1
+        if det:
+            assert not isinstance(img, list), "PaddleOCR det không nhận list ảnh"
+            return [[[[[0, 0], [1, 0], [1, 1], [0, 1]], self._read(img, det)]]]
+        pages = img if isinstance(img, list) else [img]
+        return [
+            [self._read(i, det) for i in page] if isinstance(page, list) else [self._read(page, det)]
+            for page in pages
+        ]
+
+
+def _plate(h=30, w=120):
+    rng = np.random.default_rng(0)
+    img = rng.integers(60, 200, size=(h, w, 3), dtype=np.uint8)
+    img[:, :, 2] = 220  # ảnh màu thật (kênh khác nhau)
+    return img
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+def test_profiles_produce_expected_images():
+    ocr = VNPlateOCR(engine=_FakePaddle({}))
+    small = _plate(w=50)
+    assert ocr.preprocess(small, "none").shape[:2] == (60, 100), "Crop nhỏ vẫn được phóng to"
+    assert ocr.preprocess(small, "none").ndim == 3
+    light = ocr.preprocess(small, "light")
+    assert light.ndim == 2 and len(np.unique(light)) > 2
+    assert set(np.unique(ocr.preprocess(small, "full"))) <= {0, 255}
+    with pytest.raises(ValueError):
+        VNPlateOCR(profile="heavy", engine=_FakePaddle({}))
+
+
+def test_fixed_profile_with_rec_only_skips_detection():
+    engine = _FakePaddle({"light": 0.9})
+    ocr = VNPlateOCR(profile="light", rec_only=True, engine=engine)
+    assert ocr.read_plate_with_prob(_plate()) == ("51A12345", 0.9)
+    assert engine.calls == [("light", False)]
+    assert ocr.read_plate(_plate()) == "51A12345"
+
+
+def test_default_matches_legacy_full_path_with_detection():
+    engine = _FakePaddle({"full": 0.8})
+    text, score = VNPlateOCR(engine=engine).read_plate_with_prob(_plate())
+    assert (text, score) == ("51A12345", 0.8)
+    assert engine.calls == [("full", True)]
+
+
+def test_auto_stops_at_first_confident_step():
+    engine = _FakePaddle({"none": 0.95, "light": 0.99, "full": 0.99})
+    ocr = VNPlateOCR(profile="auto", escalate_conf=0.9, engine=engine)
+    assert ocr.read_plate_with_prob(_plate()) == ("51A12345", 0.95)
+    assert engine.calls == [("none", False)]
+    assert ocr.stats() == {"none:rec": 1}
+
+
+def test_auto_escalates_to_full_and_returns_best_result():
+    engine = _FakePaddle({"none": 0.3, "light": 0.6, "full": 0.5})
+    ocr = VNPlateOCR(profile="auto", escalate_conf=0.9, engine=engine)
+    assert ocr.read_plate_with_prob(_plate()) == ("51A12345", 0.6)
+    assert engine.calls == [("none", False), ("light", False), ("full", True)]
+    assert ocr.stats() == {"full:det": 1}
+
+
+def test_two_line_plate_escalates_both_lines_together():
+    engine = _FakePaddle({"none": 0.2, "light": 0.95})
+    ocr = VNPlateOCR(profile="auto", escalate_conf=0.9, engine=engine)
+    text, score = ocr.read_plate_with_prob(_plate(h=90, w=120))
+    assert text == "51A1234551A12345" and score == pytest.approx(0.95)
+    assert engine.calls == [("none", False)] * 2 + [("light", False)] * 2
+
+
+def test_batch_reads_every_line_of_every_plate_in_one_call():
+    engine = _FakePaddle({"none": 0.95}, text=None)
+    ocr = VNPlateOCR(profile="auto", escalate_conf=0.9, engine=engine)
+    plates = [_plate(w=120), _plate(h=120, w=140), np.zeros((0, 0, 3), np.uint8), _plate(w=160)]
+    results = ocr.read_plates_with_prob(plates)
+
+    assert engine.invocations == 1 and len(engine.calls) == 4
+    assert results == [("51A120", 0.95), ("51A14051A140", 0.95), ("", 0.0), ("51A160", 0.95)]
+    assert ocr.stats() == {"none:rec": 3}
+
+
+def test_batch_escalates_only_unconfident_plates():
+    class _Mixed(_FakePaddle):
+        def _read(self, img, det):
+            text, score = super()._read(img, det)
+            return text, score if img.shape[1] == 160 or _profile_of(img) == "full" else 0.1
+
+    engine = _Mixed({"none": 0.95, "light": 0.95, "full": 0.8}, text=None)
+    ocr = VNPlateOCR(profile="auto", escalate_conf=0.9, engine=engine)
+    results = ocr.read_plates_with_prob([_plate(w=120), _plate(w=160)])
+
+    assert results == [("51A120", 0.8), ("51A160", 0.95)]
+    # bước 1: cả 2 biển (1 lần gọi), bước 2: biển 120 (1 lần), bước 3 full + det: biển 120 (1 lần)
+    assert engine.invocations == 3
+    assert ocr.stats() == {"none:rec": 1, "full:det": 1}
+    assert ocr.read_plate_with_prob(_plate(w=160)) == results[1]
+
+
+def test_flat_list_return_shape_is_one_page_per_image():
+    # Hợp đồng của fake = PaddleOCR 2.7.3: list phẳng → mỗi ảnh một trang riêng
+    engine = _FakePaddle({"none": 0.9})
+    out = engine.ocr([_plate(w=120), _plate(w=160)], det=False)
+    assert out == [[("51A12345", 0.9)], [("51A12345", 0.9)]]
+
+
+def test_batch_populates_every_plate_and_both_lines_of_two_line_plate():
+    engine = _FakePaddle({"none": 0.95}, text=None)
+    ocr = VNPlateOCR(profile="auto", escalate_conf=0.9, engine=engine)
+    results = ocr.read_plates_with_prob([_plate(w=120), _plate(h=120, w=140), _plate(w=160)])
+
+    assert results == [("51A120", 0.95), ("51A14051A140", 0.95), ("51A160", 0.95)]
+    assert engine.invocations == 1, "Không biển nào phải leo thang lên full:det"
+    assert ocr.stats() == {"none:rec": 3}
@@ -0,0 +1,234 @@
+"""
+deploy/tests/test_pipeline_engine.py – Unit tests for PipelineEngine (model giả + stand-in in-memory)
+Run: python -m pytest deploy/tests/test_pipeline_engine.py -v
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+import core.pipeline_engine as pipeline_engine
+from core.event_sink import EventSink
+from core.pipeline_engine import PipelineEngine, resolve_class_ids
+from core.plate_whitelist_cache import PlateWhitelistCache
+from core.replay_bench import InMemoryDatabase, InMemoryMQTT, RecordingNotifier
+
+LINE_Y = 100
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+class _Box:
+    def __init__(self, xyxy, cls, track_id=None):
+        self.xyxy = [np.array(xyxy, dtype=np.float32)]
+        self.cls = [np.float32(cls)]
+        self.id = None if track_id is None else [np.float32(track_id)]
+
+
+class _Result:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class _ScriptedModel:
+    """Trả về lần lượt list box cho từng frame (như model.track / model(frame))."""
+
+    names = {0: "person", 2: "car"}
+
+    def __init__(self, script):
+        self._script = list(script)
+        self.calls = 0
+
+    def _next(self):
+        boxes = self._script[min(self.calls, len(self._script) - 1)] if self._script else []
+        self.calls += 1
+        return [_Result(boxes)]
+
+    def track(self, frame, **kwargs):
+        return self._next()
+
+    def __call__(self, frame, **kwargs):
+        return self._next()
+
+
+class _Streamer:
+    def __init__(self):
+        self.frames = 0
+
+    def update_frame(self, frame):
+        self.frames += 1
+
+
+def _car_at(cy, track_id=7):
+    return _Box((100, cy - 40, 300, cy + 40), cls=2, track_id=track_id)
+
+
+@pytest.fixture
+def harness(monkeypatch):
+    monkeypatch.setattr(pipeline_engine, "LINE_Y_PIXELS", LINE_Y)
+    monkeypatch.setattr(pipeline_engine, "PROCESS_WIDTH", 0)
+    monkeypatch.setattr(pipeline_engine, "PLATE_DETECT_EVERY_N_FRAMES", 1)
+
+    db = InMemoryDatabase()
+    notifier = RecordingNotifier()
+    sink = EventSink(db, notifier.notify, notifier.notify_photo, flush_interval=0.01)
+    sink.start()
+    mqtt = InMemoryMQTT()
+    whitelist = PlateWhitelistCache(db)
+    whitelist.resync()
+
+    def build(track_script, plate_script=(), ocr=("51A12345", 0.95), door="unknown", **engine_kwargs):
+        ocr_calls = []
+
+        def ocr_fn(crop):
+            ocr_calls.append(crop.shape)
+            return ocr
+
+        engine = PipelineEngine(
+            _ScriptedModel(track_script),
+            _ScriptedModel(plate_script),
+            ocr_fn,
+            sink,
+            mqtt,
+            whitelist,
+            _Streamer(),
+            db=db,
+            door_state_fn=lambda frame: door,
+            **{"face_enabled": False, **engine_kwargs},
+        )
+        return engine, ocr_calls
+
+    yield build, db, sink, mqtt
+    sink.stop()
+
+
+def _run(engine, n):
+    for _ in range(n):
+        frame = np.zeros((240, 400, 3), dtype=np.uint8)
+        frame[:, ::4] = 255  # có cạnh → crop biển số có độ nét > 0 như ảnh thật
+        engine.process_frame(frame)
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+def test_resolve_class_ids_from_model_names():
+    person_ids, vehicle_ids = resolve_class_ids(_ScriptedModel([]))
+    assert person_ids == {0} and vehicle_ids == {2}
+
+
+def test_vehicle_crossing_counts_and_logs_event(harness):
+    build, db, sink, mqtt = harness
+    script = [[_car_at(60)]] * 3 + [[_car_at(160)]] * 3
+    engine, _ = build(script)
+    _run(engine, 6)
+    sink.stop()
+
+    assert engine.truck_count == 1 and engine.person_count == 0
+    assert db.events["IN"] == 1
+    assert mqtt.state_publishes == 6
+    assert engine.metrics.frames_total == 6
+    assert engine.streamer.frames == 6
+
+
+def test_plate_is_read_once_per_track_and_reported_as_unknown(harness):
+    build, db, sink, mqtt = harness
+    plate = _Box((150, 60, 250, 90), cls=1)
+    engine, ocr_calls = build([[_car_at(60)]], plate_script=[[plate]])
+    _run(engine, 5)
+    sink.stop()
+
+    assert len(ocr_calls) == 1, "Xe đã có biển số đủ tin cậy → không OCR lại"
+    assert db.events["UNKNOWN_PLATE"] == 1
+    assert len(db.pending_plates) == 1 and db.pending_plates[0]["plate_norm"]
+    assert mqtt.open_triggers == 0
+
+
+def test_whitelisted_plate_opens_door(harness):
+    build, db, sink, mqtt = harness
+    db.whitelist.add("51A12345")
+    engine, _ = build([[_car_at(60)]], plate_script=[[_Box((150, 60, 250, 90), cls=1)]])
+    engine.plate_whitelist.resync()
+    _run(engine, 2)
+    assert mqtt.open_triggers == 1
+    assert db.events["UNKNOWN_PLATE"] == 0
+
+
+def test_door_state_change_and_signal_loss(harness, monkeypatch):
+    build, db, sink, mqtt = harness
+    engine, _ = build([[]], door="closed")
+    _run(engine, 3)
+    assert engine.door_open is False
+
+    monkeypatch.setattr(pipeline_engine, "SIGNAL_LOSS_TIMEOUT", -1)
+    engine.on_no_frame()
+    engine.on_no_frame()
+    sink.stop()
+    assert db.events["DOOR_STATE"] == 1
+    assert db.events["SIGNAL_LOSS"] == 1, "Mất tín hiệu chỉ cảnh báo một lần"
+
+
+def test_all_plates_in_frame_are_read_with_one_batch_call(harness):
+    build, db, sink, mqtt = harness
+    plates = [_Box((150, 60, 250, 90), cls=1), _Box((160, 160, 240, 200), cls=1)]
+    engine, ocr_calls = build([[_car_at(60), _car_at(175, track_id=8)]], plate_script=[plates])
+    batches = []
+
+    def ocr_batch(crops):
+        batches.append(len(crops))
+        return [("51A12345", 0.95), ("30F99999", 0.95)][:len(crops)]
+
+    engine.ocr_batch_fn = ocr_batch
+    _run(engine, 3)
+    sink.stop()
+
+    assert batches == [2], "Frame sau dùng cache theo track, không OCR lại"
+    assert ocr_calls == []
+    assert engine.plate_cache.get(7).text == "51A12345"
+    assert engine.plate_cache.get(8).text == "30F99999"
+    assert db.events["UNKNOWN_PLATE"] == 2
+
+
+def _stranger_faces(frame, person_boxes, cache):
+    return [(tid, "STRANGER", (box[1], box[2], box[3], box[0]), True) for tid, box in person_boxes.items()]
+
+
+def test_stranger_and_low_conf_plate_saved_to_injected_dirs(harness, tmp_path):
+    build, db, sink, mqtt = harness
+    plate = _Box((150, 60, 250, 90), cls=1)
+    engine, _ = build(
+        [[_car_at(60)]], plate_script=[[plate]], ocr=("51A1234", 0.3),
+        check_faces_fn=_stranger_faces, face_cache=object(), face_enabled=True,
+        stranger_dir=str(tmp_path / "temp"), active_learning_dir=str(tmp_path / "al"),
+    )
+    frame = np.full((240, 400, 3), 80, dtype=np.uint8)
+    engine._check_faces(frame, {3: (20, 20, 60, 100)})
+    _run(engine, 1)
+    sink.stop()
+
+    assert len(list((tmp_path / "temp").glob("*_3.jpg"))) == 1
+    assert len(list((tmp_path / "al").glob("plate_*.jpg"))) == 1
+    assert db.events["STRANGER"] == 1
+
+
+def test_bench_dirs_none_write_nothing(harness, tmp_path, monkeypatch):
+    # main.py bench truyền None → không ghi vào ./config/faces/temp, ./data/active_learning
+    build, db, sink, mqtt = harness
+    monkeypatch.chdir(tmp_path)
+    plate = _Box((150, 60, 250, 90), cls=1)
+    engine, _ = build(
+        [[_car_at(60)]], plate_script=[[plate]], ocr=("51A1234", 0.3),
+        check_faces_fn=_stranger_faces, face_cache=object(), face_enabled=True,
+        stranger_dir=None, active_learning_dir=None,
+    )
+    engine._check_faces(np.full((240, 400, 3), 80, dtype=np.uint8), {3: (20, 20, 60, 100)})
+    _run(engine, 1)
+    sink.stop()
+
+    assert list(tmp_path.rglob("*")) == []
+    assert db.events["STRANGER"] == 1, "Vẫn log event để report đếm đúng"
@@ -0,0 +1,76 @@
+"""
+deploy/tests/test_plate_track_cache.py – Unit tests for PlateTrackCache
+Run: python -m pytest deploy/tests/test_plate_track_cache.py -v
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from core.plate_track_cache import PlateTrackCache, match_plate_to_track
+
+
+def _crop(h: int = 40, w: int = 120, sharp: bool = True) -> np.ndarray:
+    img = np.full((h, w, 3), 128, dtype=np.uint8)
+    if sharp:
+        img[:, ::4] = 255
+    return img
+
+
+class TestMatchPlateToTrack:
+    def test_plate_center_inside_vehicle(self):
+        tracks = {7: (0, 0, 400, 300), 9: (500, 0, 900, 300)}
+        assert match_plate_to_track((600, 200, 700, 240), tracks) == 9
+        assert match_plate_to_track((1000, 200, 1100, 240), tracks) is None
+
+    def test_smallest_overlapping_vehicle_wins(self):
+        tracks = {1: (0, 0, 1000, 1000), 2: (100, 100, 400, 400)}
+        assert match_plate_to_track((200, 300, 300, 340), tracks) == 2
+
+
+class TestPlateTrackCache:
+    def test_confident_read_is_reused(self):
+        cache = PlateTrackCache(min_conf=0.7)
+        assert cache.needs_ocr(1, _crop())
+        assert cache.update(1, "51C12345", 0.95, _crop()) is True
+        assert not cache.needs_ocr(1, _crop())
+        assert cache.get(1).text == "51C12345"
+        assert cache.stats()["cache_hits"] == 1
+
+    def test_low_confidence_is_retried(self):
+        cache = PlateTrackCache(min_conf=0.7)
+        cache.update(1, "51C1234", 0.4, _crop())
+        assert cache.needs_ocr(1, _crop())
+        assert cache.update(1, "51C12345", 0.9, _crop()) is True
+        assert not cache.needs_ocr(1, _crop())
+
+    def test_larger_or_sharper_crop_triggers_reocr(self):
+        cache = PlateTrackCache(min_conf=0.7, area_gain=1.3, sharpness_gain=1.5)
+        cache.update(1, "51C12345", 0.9, _crop(sharp=False))
+        assert cache.needs_ocr(1, _crop(h=60, w=180, sharp=False)), "Crop lớn hơn phải OCR lại"
+        assert cache.needs_ocr(1, _crop(sharp=True)), "Crop nét hơn phải OCR lại"
+
+    def test_flat_crop_is_not_re_ocred_every_frame(self):
+        # Crop phẳng có độ nét 0: 0 >= 0 * gain từng làm mọi frame đều OCR lại
+        cache = PlateTrackCache(min_conf=0.7)
+        cache.update(1, "51C12345", 0.9, _crop(sharp=False))
+        assert cache.get(1).sharpness == 0.0
+        assert not cache.needs_ocr(1, _crop(sharp=False))
+        assert not cache.needs_ocr(1, _crop(sharp=False))
+        assert cache.stats()["cache_hits"] == 2
+
+    def test_same_text_again_is_not_a_new_read(self):
+        cache = PlateTrackCache()
+        cache.update(1, "51C12345", 0.8, _crop())
+        assert cache.update(1, "51C12345", 0.9, _crop(h=80, w=240)) is False
+        assert cache.update(1, "51C99999", 0.5, _crop()) is False, "Kết quả kém hơn không ghi đè"
+        assert cache.get(1).prob == 0.9
+
+    def test_evict(self):
+        cache = PlateTrackCache()
+        cache.update(1, "51C12345", 0.9, _crop())
+        cache.update(2, "30A99999", 0.9, _crop())
+        cache.evict([1, 3])
+        assert cache.get(1) is None and cache.get(2) is not None
+        assert cache.stats()["evictions"] == 1
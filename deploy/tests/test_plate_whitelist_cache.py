@@ -0,0 +1,131 @@
+"""
+deploy/tests/test_plate_whitelist_cache.py – Unit tests for PlateWhitelistCache
+Run: python -m pytest deploy/tests/test_plate_whitelist_cache.py -v
+"""
+import socket
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from core.plate_whitelist_cache import PlateWhitelistCache
+
+_Notify = namedtuple("_Notify", "channel payload")
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+class _FakeListenConn:
+    """Giả lập connection psycopg2 đang LISTEN: select() được nhờ socketpair."""
+
+    def __init__(self):
+        self._r, self._w = socket.socketpair()
+        self.notifies = []
+
+    def fileno(self):
+        return self._r.fileno()
+
+    def send(self, payload):
+        self.notifies.append(_Notify("plate_whitelist_changed", payload))
+        self._w.send(b"x")
+
+    def poll(self):
+        self._r.recv(1024)
+
+    def close(self):
+        self._r.close()
+        self._w.close()
+
+
+class _FakeDB:
+    def __init__(self, plates=(), fail=False):
+        self.rows = {p: True for p in plates}
+        self.fail = fail
+        self.full_loads = 0
+        self.point_lookups = 0
+        self.listen_conn = _FakeListenConn()
+
+    def get_active_whitelist_plates(self):
+        if self.fail:
+            return None
+        self.full_loads += 1
+        return {p for p, active in self.rows.items() if active}
+
+    def get_whitelist_status(self, plates):
+        return {p: self.rows.get(p, False) for p in plates}
+
+    def is_plate_whitelisted(self, plate_norm):
+        self.point_lookups += 1
+        return self.rows.get(plate_norm, False)
+
+    def open_listen_connection(self, channel):
+        return self.listen_conn
+
+    def upsert(self, plate, active=True):
+        self.rows[plate] = active
+        self.listen_conn.send(plate)
+
+
+def _wait_until(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestPlateWhitelistCache:
+    def test_lookup_from_memory(self):
+        db = _FakeDB(plates=["51C12345"])
+        cache = PlateWhitelistCache(db, poll_timeout=0.05)
+        cache.start()
+        try:
+            assert cache.contains("51C12345")
+            assert not cache.contains("30A99999")
+            assert db.point_lookups == 0
+            assert db.full_loads == 1
+        finally:
+            cache.stop()
+
+    def test_notify_applies_incremental_change(self):
+        db = _FakeDB(plates=["51C12345"])
+        cache = PlateWhitelistCache(db, poll_timeout=0.05)
+        cache.start()
+        try:
+            db.upsert("30A99999")
+            assert _wait_until(lambda: cache.contains("30A99999"), timeout=1.0)
+            db.upsert("51C12345", active=False)
+            assert _wait_until(lambda: not cache.contains("51C12345"), timeout=1.0)
+            assert db.full_loads == 1, "NOTIFY chỉ được query lại biển số thay đổi"
+            assert cache.stats()["incremental_updates"] == 2
+        finally:
+            cache.stop()
+
+    def test_periodic_resync(self):
+        db = _FakeDB(plates=["51C12345"])
+        cache = PlateWhitelistCache(db, resync_interval=0.1, poll_timeout=0.02)
+        cache.start()
+        try:
+            db.rows["29B11111"] = True  # thay đổi không kèm NOTIFY
+            assert _wait_until(lambda: cache.contains("29B11111"), timeout=1.0)
+        finally:
+            cache.stop()
+
+    def test_falls_back_to_db_until_loaded(self):
+        db = _FakeDB(plates=["51C12345"], fail=True)
+        cache = PlateWhitelistCache(db)
+        assert cache.resync() is False
+        assert cache.contains("51C12345")
+        assert db.point_lookups == 1
+        db.fail = False
+        assert cache.resync() is True
+        assert cache.contains("51C12345")
+        assert db.point_lookups == 1
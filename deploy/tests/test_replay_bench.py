@@ -0,0 +1,204 @@
+"""
+deploy/tests/test_replay_bench.py – Unit tests for core/replay_bench (nguồn frame, run, baseline)
+Run: python -m pytest deploy/tests/test_replay_bench.py -v
+"""
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+import core.pipeline_engine as pipeline_engine
+from core.motion_gate import MotionGate
+from core.pipeline_engine import PipelineEngine
+from core.pipeline_metrics import PipelineMetrics
+from core.plate_whitelist_cache import PlateWhitelistCache
+from core.replay_bench import (
+    FrameClock, InMemoryDatabase, InMemoryMQTT, RecordingNotifier,
+    build_report, compare_to_baseline, iter_replay_frames, run_replay, source_fps, write_json, load_json,
+)
+from services.face_service import FaceTrackCache
+
+
+class _Engine:
+    def __init__(self):
+        self.metrics = PipelineMetrics(window=64)
+        self.frames = []
+        self.truck_count = 2
+        self.person_count = 1
+        self.plate_cache = type("_Cache", (), {"stats": lambda self: {"tracked": 0}})()
+        self.stage_runs = Counter()
+
+    def process_frame(self, frame):
+        with self.metrics.stage("track"):
+            self.frames.append(int(frame[0, 0, 0]))
+        self.metrics.frame_done()
+        return frame
+
+
+class _Box:
+    def __init__(self, xyxy, cls, track_id):
+        self.xyxy = [np.array(xyxy, dtype=np.float32)]
+        self.cls = [np.float32(cls)]
+        self.id = [np.float32(track_id)]
+
+
+class _WalkingPersonModel:
+    """model.track() giả: người (track 1) đi xuống thêm 12px mỗi lần được gọi."""
+
+    names = {0: "person", 2: "car"}
+
+    def __init__(self):
+        self.calls = 0
+
+    def track(self, frame, **kwargs):
+        self.calls += 1
+        y = 20 + 12 * self.calls
+        return [type("_Result", (), {"boxes": [_Box((100, y, 160, y + 60), 0, 1)]})()]
+
+    def __call__(self, frame, **kwargs):
+        return [type("_Result", (), {"boxes": []})()]
+
+
+class _Sink:
+    def __init__(self):
+        self.events = Counter()
+
+    def log_event(self, event_type, *args, **kwargs):
+        self.events[event_type] += 1
+
+    def notify_photo(self, *args, **kwargs):
+        pass
+
+
+def _motion_frames(n):
+    """Cảnh tĩnh, có vật chuyển động ở frame 10..24 → motion gate bật/tắt theo thời gian."""
+    for i in range(n):
+        frame = np.zeros((240, 320, 3), np.uint8)
+        if 10 <= i < 25:
+            frame[100:160, 10 * i:10 * i + 60] = 255
+        yield frame
+
+
+def _replay_with_frame_clock(frames):
+    clock = FrameClock(fps=10)
+    face_checks = []
+
+    def check_faces(frame, person_boxes, cache):
+        now = cache.clock()
+        for track_id in person_boxes:
+            if cache.needs_check(track_id, now):
+                face_checks.append(track_id)
+                cache.update(track_id, "STRANGER", now)
+        return []
+
+    sink = _Sink()
+    engine = PipelineEngine(
+        _WalkingPersonModel(), _WalkingPersonModel(), lambda crop: ("", 0.0), sink, InMemoryMQTT(),
+        PlateWhitelistCache(InMemoryDatabase()), type("_Streamer", (), {"update_frame": lambda s, f: None})(),
+        check_faces_fn=check_faces, face_cache=FaceTrackCache(stranger_recheck_secs=0.5, clock=clock),
+        face_enabled=True, door_state_fn=lambda frame: "unknown",
+        motion_gate=MotionGate(min_area=200, hold_secs=0.5, heartbeat_secs=1.0, clock=clock),
+        stranger_dir=None, active_learning_dir=None, clock=clock,
+    )
+    run_replay(engine, frames, warmup=0, clock=clock)
+    return dict(engine.stage_runs), engine.motion_gate.stats(), face_checks, dict(sink.events)
+
+
+def test_replays_of_same_frames_run_identical_stage_counts(monkeypatch):
+    monkeypatch.setattr(pipeline_engine, "LINE_Y_PIXELS", 100)
+    monkeypatch.setattr(pipeline_engine, "PROCESS_WIDTH", 0)
+    first = _replay_with_frame_clock(_motion_frames(60))
+
+    # Wall-clock nhảy 0.7s mỗi lần đọc: gate theo thời gian phải dùng FrameClock, không đổi kết quả
+    fake_now = iter(range(10_000))
+    monkeypatch.setattr(time, "time", lambda: 1e6 + 0.7 * next(fake_now))
+    monkeypatch.setattr(time, "monotonic", lambda: 0.7 * next(fake_now))
+    second = _replay_with_frame_clock(_motion_frames(60))
+
+    assert first == second
+    stage_runs, gate_stats, face_checks, events = first
+    assert 0 < stage_runs["track"] < 60, "Motion gate bỏ qua một phần frame"
+    assert stage_runs["face"] > 0 and face_checks
+    assert gate_stats["heartbeats"] > 0
+
+
+def test_frame_clock_advances_by_source_fps(tmp_path):
+    clock = FrameClock(fps=20)
+    engine = _Engine()
+    run_replay(engine, [np.zeros((4, 4, 3), np.uint8)] * 10, clock=clock)
+    assert clock() == 0.5
+    assert FrameClock(fps=0).fps > 0
+
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 12, (32, 24))
+    writer.write(np.zeros((24, 32, 3), np.uint8))
+    writer.release()
+    assert source_fps(path) == 12
+
+
+def _write_images(folder: Path, n: int) -> None:
+    for i in range(n):
+        cv2.imwrite(str(folder / f"frame_{i:03d}.png"), np.full((8, 8, 3), i, dtype=np.uint8))
+
+
+def test_image_directory_is_replayed_in_name_order_with_limit_and_loops(tmp_path):
+    _write_images(tmp_path, 3)
+    (tmp_path / "notes.txt").write_text("không phải ảnh")
+    values = [int(f[0, 0, 0]) for f in iter_replay_frames(str(tmp_path), loops=2)]
+    assert values == [0, 1, 2, 0, 1, 2]
+    assert len(list(iter_replay_frames(str(tmp_path), limit=4, loops=3))) == 4
+
+
+def test_video_file_is_replayed(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (32, 24))
+    for i in range(5):
+        writer.write(np.full((24, 32, 3), i * 40, dtype=np.uint8))
+    writer.release()
+    assert len(list(iter_replay_frames(path))) == 5
+
+
+def test_warmup_frames_are_excluded_from_metrics(tmp_path):
+    _write_images(tmp_path, 10)
+    engine = _Engine()
+    run = run_replay(engine, iter_replay_frames(str(tmp_path)), warmup=3,
+                     metrics_factory=lambda: PipelineMetrics(window=64))
+    assert run["frames"] == 7 and run["warmup_frames"] == 3
+    assert engine.frames == list(range(10))
+    assert engine.metrics.frames_total == 7
+    assert run["fps"] > 0
+
+
+def test_report_contains_stages_events_and_rss(tmp_path):
+    db, mqtt, notifier = InMemoryDatabase(), InMemoryMQTT(), RecordingNotifier()
+    db.log_events_batch([("IN", "x", 1, 0, None), ("IN", "y", 2, 0, None), ("ALERT", "z", 2, 0, None)])
+    engine = _Engine()
+    run = run_replay(engine, [np.zeros((4, 4, 3), np.uint8)] * 5)
+    report = build_report(run, engine, db, mqtt, notifier, source="mem")
+
+    assert report["events"] == {"ALERT": 1, "IN": 2}
+    assert report["stages"]["track"]["count"] == 5
+    assert report["peak_rss_mb"] > 0
+    assert report["counts"] == {"trucks": 2, "people": 1}
+
+    path = str(tmp_path / "bench" / "report.json")
+    write_json(path, report)
+    assert load_json(path) == json.loads(json.dumps(report))
+
+
+def test_compare_to_baseline_flags_regressions_only_beyond_tolerance():
+    baseline = {"fps": 20.0, "peak_rss_mb": 500.0, "stages": {"track": {"p95_ms": 30.0}, "door": {"p95_ms": 0.1}}}
+    ok = {"fps": 19.0, "peak_rss_mb": 520.0, "stages": {"track": {"p95_ms": 32.0}, "door": {"p95_ms": 0.3}}}
+    assert compare_to_baseline(ok, baseline, tolerance=0.10) == []
+
+    slow = {"fps": 15.0, "peak_rss_mb": 600.0, "stages": {"track": {"p95_ms": 40.0}, "door": {"p95_ms": 0.2}}}
+    regressions = compare_to_baseline(slow, baseline, tolerance=0.10)
+    assert len(regressions) == 3
+    assert any("fps" in r for r in regressions)
+    assert any("track" in r for r in regressions)
+    assert any("RSS" in r for r in regressions)
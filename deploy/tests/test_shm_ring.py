@@ -0,0 +1,167 @@
+"""
+deploy/tests/test_shm_ring.py – Unit tests for parking_hpc FrameRing (N-slot SharedMemory ring + seqlock)
+Run: python -m pytest deploy/tests/test_shm_ring.py -v
+"""
+import sys
+import uuid
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from parking_hpc import shm_ring
+from parking_hpc.shm_ring import FrameRing
+
+SHAPE = (8, 12, 3)
+
+
+@pytest.fixture
+def rings():
+    name = f"test_ring_{uuid.uuid4().hex[:8]}"
+    writer = FrameRing.create(name, SHAPE, n_slots=3)
+    reader = FrameRing.attach(name)
+    yield writer, reader
+    reader.close()
+    writer.close()
+    writer.unlink()
+
+
+def _frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+
+def test_reader_gets_exact_token_frame_after_newer_writes(rings):
+    writer, reader = rings
+    assert reader.n_slots == 3 and reader.shape == SHAPE
+
+    slot, seq = writer.write(_frame(10), frame_idx=0, ts=1.5)
+    writer.write(_frame(11), frame_idx=1)
+    writer.write(_frame(12), frame_idx=2)
+
+    frame = reader.read(slot, seq)
+    assert frame is not None and np.all(frame == 10)
+    assert reader.slot_info(slot) == (seq, 0)
+    assert reader.counters == {"read_ok": 1}
+
+
+def test_overwritten_token_is_detected_and_counted(rings):
+    writer, reader = rings
+    slot, seq = writer.write(_frame(1), frame_idx=0)
+    writer.mark_token(slot, seq)
+    for i in range(1, 4):  # 3 slots → frame 3 lands on the token's slot
+        writer.write(_frame(1 + i), frame_idx=i)
+
+    assert reader.read(slot, seq) is None
+    assert reader.counters["read_stale"] == 1
+    stats = writer.stats()
+    assert stats["frames_written"] == 4 and stats["tokens_issued"] == 1 and stats["tokens_overwritten"] == 1
+
+
+def test_consumed_token_is_not_counted_as_overwritten(rings):
+    writer, reader = rings
+    slot, seq = writer.write(_frame(1), frame_idx=0)
+    writer.mark_token(slot, seq)
+    assert reader.read(slot, seq) is not None
+    for i in range(1, 4):
+        writer.write(_frame(1 + i), frame_idx=i)
+    assert writer.stats()["tokens_overwritten"] == 0
+
+
+def test_torn_copy_is_rejected(rings, monkeypatch):
+    writer, reader = rings
+    slot, seq = writer.write(_frame(5), frame_idx=0)
+
+    # Writer lands on the same slot in the middle of the reader's copy
+    real_copyto = np.copyto
+
+    def _racing_copyto(dst, src, **kw):
+        real_copyto(dst, src, **kw)
+        writer._meta[slot, shm_ring._M_SEQ] = seq + 1
+
+    monkeypatch.setattr(shm_ring.np, "copyto", _racing_copyto)
+    assert reader.read(slot, seq) is None
+    assert reader.counters["read_torn"] == 1 and reader.counters["read_stale"] == 1
+
+
+def test_read_latest_retries_past_slot_being_written(rings, monkeypatch):
+    writer, reader = rings
+    assert reader.read_latest() is None, "Ring rỗng"
+    writer.write(_frame(7), frame_idx=0)
+    writer.write(_frame(8), frame_idx=1, ts=2.0)
+
+    frame, frame_idx, ts = reader.read_latest()
+    assert np.all(frame == 8) and frame_idx == 1 and ts == pytest.approx(2.0)
+
+    # Newest slot stuck mid-write (odd seq) → retries and gives up without returning torn data
+    newest = 1
+    writer._meta[newest, shm_ring._M_SEQ] += np.uint64(1)
+    assert reader.read_latest(retries=2) is None
+    assert reader.counters["latest_retry"] == 3
+
+
+def test_create_replaces_leftover_segment_and_attach_rejects_foreign_shm():
+    name = f"test_ring_{uuid.uuid4().hex[:8]}"
+    first = FrameRing.create(name, SHAPE, n_slots=2)
+    first.write(_frame(1), frame_idx=0)
+    first.close()  # crashed grabber: closed but never unlinked
+
+    second = FrameRing.create(name, (4, 4, 3), n_slots=4)
+    reader = FrameRing.attach(name)
+    assert reader.n_slots == 4 and reader.shape == (4, 4, 3) and second.stats()["frames_written"] == 0
+    reader.close()
+    second.close()
+    second.unlink()
+
+    foreign = shared_memory.SharedMemory(create=True, size=4096)
+    try:
+        with pytest.raises(ValueError):
+            FrameRing.attach(foreign.name)
+    finally:
+        foreign.close()
+        foreign.unlink()
+
+
+def test_view_is_zero_copy_and_validated_afterwards(rings):
+    writer, reader = rings
+    slot, seq = writer.write(_frame(3), frame_idx=0)
+    view = reader.view(slot, seq)
+    assert view is not None and not view.flags.writeable and np.all(view == 3)
+    assert reader.is_valid(slot, seq)
+
+    view = reader.view(slot, seq)
+    for i in range(1, 4):  # lap the ring while the view is "in use"
+        writer.write(_frame(20 + i), frame_idx=i)
+    assert np.all(view == 23), "view nhìn thẳng vào slot, không phải bản copy"
+    assert not reader.is_valid(slot, seq)
+    assert reader.counters["read_ok"] == 1 and reader.counters["read_torn"] == 1
+    assert reader.latest() == (slot, seq + 2, 3)
+
+
+def test_attachments_are_cached_and_reattached_on_new_generation():
+    name = f"test_ring_{uuid.uuid4().hex[:8]}"
+    attachments = shm_ring.RingAttachments()
+    assert attachments.get(name) is None, "Grabber chưa chạy"
+
+    first = FrameRing.create(name, SHAPE, n_slots=2)
+    ring = attachments.get(name)
+    assert ring is attachments.get(name) and ring.generation == first.generation
+
+    # Grabber crash: segment left behind, new grabber retires and replaces it
+    first.close()
+    second = FrameRing.create(name, SHAPE, n_slots=2)
+    assert not ring.is_current() and second.generation != first.generation
+    slot, seq = second.write(_frame(9), frame_idx=0)
+
+    fresh = attachments.get(name)
+    assert fresh is not ring and fresh.generation == second.generation
+    assert np.all(fresh.view(slot, seq) == 9)
+    assert attachments.stats()["attach"] == 2 and attachments.stats()["reattach"] == 1
+
+    # Clean grabber exit also retires the generation
+    second.unlink()
+    second.close()
+    assert not fresh.is_current()
+    assert attachments.get(name) is None
+    attachments.close()
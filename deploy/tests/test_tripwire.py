@@ -10,7 +10,7 @@ import pytest
 
 # Cho phép import core/ từ gốc project
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
-from core.tripwire import TripwireTracker
+from core.tripwire import MultiTripwireTracker, TripwireLine, TripwireTracker, TripwireZone
 
 
 # ---------------------------------------------------------------------------
@@ -113,6 +113,17 @@ class TestTripwireCleanup:
         t.cleanup_stale(None)
         assert t.active_count() == 0
 
+    def test_cleanup_stale_calls_on_evict(self):
+        """on_evict nhận đúng các obj_id bị xóa (dùng để dọn cache OCR theo track)."""
+        evicted = []
+        t = TripwireTracker(line_y_fn=lambda: 100, on_evict=evicted.extend)
+        _feed(t, 1, [80])
+        _feed(t, 2, [80])
+        t.cleanup_stale(active_ids={2})
+        assert evicted == [1]
+        t.cleanup_stale(active_ids={2})
+        assert evicted == [1], "Không có object bị xóa thì không gọi on_evict"
+
 
 class TestTripwireMultiObject:
     def test_two_objects_independent(self):
@@ -124,3 +135,101 @@ class TestTripwireMultiObject:
         r2 = _feed(t, 2, [70, 70, 70])  # obj2 OUT
         assert "IN" in r1
         assert "OUT" in r2
+
+
+# ---------------------------------------------------------------------------
+# MultiTripwireTracker (batch, nhiều vạch/vùng)
+# ---------------------------------------------------------------------------
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TestMultiTripwire:
+    def test_matches_single_line_tracker(self, monkeypatch):
+        """Một vạch ngang: kết quả trùng khớp TripwireTracker (buffer, cooldown, round-trip)."""
+        import numpy as np
+        import core.tripwire as tripwire_mod
+
+        clock = _FakeClock()
+        monkeypatch.setattr(tripwire_mod, "time", clock)
+        single = TripwireTracker(line_y_fn=lambda: 100, buffer_frames=3, cooldown_secs=0.5)
+        multi = MultiTripwireTracker([TripwireLine.horizontal("red", 100)], buffer_frames=3, cooldown_secs=0.5)
+
+        rng = np.random.default_rng(7)
+        ids = np.arange(40)
+        ys = rng.uniform(60, 140, size=ids.size)
+        for _ in range(300):
+            clock.now += 0.1
+            ys = np.clip(ys + rng.normal(0, 12, size=ids.size), 0, 200).round()
+            ys[rng.random(ids.size) < 0.05] = 100  # đứng đúng trên vạch
+            expected = {}
+            for oid, y in zip(ids, ys):
+                direction = single.update(int(oid), int(y))
+                if direction:
+                    expected[int(oid)] = direction
+            got = {e.track_id: e.direction for e in multi.update_batch(ids, np.zeros(ids.size), ys)}
+            assert got == expected
+
+    def test_both_trackers_follow_injected_clock(self):
+        clock = _FakeClock()
+        single = TripwireTracker(line_y_fn=lambda: 100, buffer_frames=1, cooldown_secs=5.0, clock=clock.monotonic)
+        multi = MultiTripwireTracker(
+            [TripwireLine.horizontal("red", 100)], buffer_frames=1, cooldown_secs=5.0, clock=clock.monotonic
+        )
+        fired = []
+        for y in (50, 150, 50, 150):  # IN, OUT trong cooldown, rồi IN sau cooldown
+            clock.now += 3.0
+            fired.append((single.update(1, y), [e.direction for e in multi.update_batch([1], [0], [y])]))
+        assert fired == [(None, []), ("IN", ["IN"]), (None, []), ("IN", ["IN"])]
+
+    def test_first_fire_cooldown_matches_single_tracker_at_start(self):
+        # Chưa từng fire = 0.0 ở cả hai tracker → vượt vạch trong cooldown_secs đầu tiên của clock bị chặn
+        clock = _FakeClock()
+        clock.now = 0.0
+        single = TripwireTracker(line_y_fn=lambda: 100, buffer_frames=1, cooldown_secs=3.0, clock=clock.monotonic)
+        multi = MultiTripwireTracker(
+            [TripwireLine.horizontal("red", 100)], buffer_frames=1, cooldown_secs=3.0, clock=clock.monotonic
+        )
+        for y in (50, 150):
+            clock.now += 0.5
+            assert single.update(1, y) is None
+            assert multi.update_batch([1], [0], [y]) == []
+
+    def test_polyline_uses_nearest_segment(self):
+        # Vạch gãy: đoạn trái ở y=100, đoạn phải ở y=200
+        line = TripwireLine("gate", [(0, 100), (300, 100), (300, 200), (600, 200)])
+        t = MultiTripwireTracker([line], buffer_frames=1)
+        sides = t.sides([100, 100, 500, 500], [50, 150, 150, 250])
+        assert sides[:, 0].tolist() == [False, True, False, True]
+
+    def test_zone_enter_and_leave(self):
+        zone = TripwireZone("dock", [(0.25, 0.25), (0.75, 0.25), (0.75, 0.75), (0.25, 0.75)], normalized=True)
+        t = MultiTripwireTracker([zone], buffer_frames=2, cooldown_secs=0.0)
+        size = (400, 200)
+        path = [(20, 20), (20, 20), (200, 100), (200, 100), (390, 190), (390, 190)]
+        events = []
+        for i, (x, y) in enumerate(path):
+            events += t.update_batch([5], [x], [y], frame_size=size, now=float(i))
+        assert [(e.track_id, e.wire, e.direction) for e in events] == [(5, "dock", "IN"), (5, "dock", "OUT")]
+
+    def test_each_wire_fires_independently(self):
+        wires = [TripwireLine.horizontal("a", 100), TripwireLine.horizontal("b", 200)]
+        t = MultiTripwireTracker(wires, buffer_frames=1, cooldown_secs=0.0)
+        t.update_batch([1, 2], [0, 0], [50, 150], now=0.0)
+        events = t.update_batch([1, 2], [0, 0], [150, 250], now=1.0)
+        assert sorted((e.track_id, e.wire, e.direction) for e in events) == [(1, "a", "IN"), (2, "b", "IN")]
+
+    def test_cleanup_stale_compacts_state(self):
+        evicted = []
+        t = MultiTripwireTracker([TripwireLine.horizontal("a", 100)], on_evict=evicted.extend)
+        t.update_batch([3, 1, 2], [0, 0, 0], [80, 80, 80])
+        t.cleanup_stale(active_ids={2})
+        assert sorted(evicted) == [1, 3]
+        assert t.active_count() == 1
+        t.update_batch([9, 2], [0, 0], [80, 80])
+        assert t.active_count() == 2
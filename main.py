@@ -1,163 +1,188 @@
 """
 Smart Door System - Main Entry Point
 Chỉ chứa main loop nhận diện. Tất cả logic đã tách vào core/ và services/.
+
+    python main.py                                      # chạy thật (camera, MQTT, Postgres, Telegram)
+    python main.py bench --source ./samples/gate.mp4    # replay offline, report JSON (xem core/replay_bench.py)
 """
+import argparse
 import cv2
+import json
+import numpy as np
 import os
-import time
+import sys
 import threading
-import uuid
-from datetime import datetime
-from ultralytics import YOLO
+import time
 
 # --- Core ---
 from core.config import (
-    GENERAL_MODEL_PATH, PLATE_MODEL_PATH, LINE_Y_PIXELS, LINE_Y_RATIO, RTSP_URL, OCR_SOURCE,
-    SIGNAL_LOSS_TIMEOUT, FACE_RECOGNITION_AVAILABLE,
-    authorized_plates, normalize_plate,
+    GENERAL_MODEL_PATH, PLATE_MODEL_PATH, RTSP_URL, OCR_SOURCE,
     CAMERA_SHIFT_CHECK_EVERY_FRAMES,
     CAMERA_SHIFT_MIN_INLIER_RATIO,
     CAMERA_SHIFT_MAX_ROTATION_DEG,
     CAMERA_SHIFT_MAX_TRANSLATION_PX,
     CAMERA_SHIFT_MAX_SCALE_DELTA,
     CAMERA_SHIFT_ALERT_CONSECUTIVE,
-    PROCESS_WIDTH, STREAM_WIDTH, STREAM_FPS, STREAM_JPEG_QUALITY,
-    GENERAL_DETECT_IMGSZ, GENERAL_DETECT_CONF, PLATE_DETECT_EVERY_N_FRAMES,
-    TRIPWIRE_BUFFER_FRAMES, TRIPWIRE_COOLDOWN_SECS,
+    CAMERA_BASELINE_PATH, FACES_TEMP_DIR, ACTIVE_LEARNING_DIR,
+    STREAM_WIDTH, STREAM_FPS, STREAM_JPEG_QUALITY,
+    GENERAL_DETECT_IMGSZ, GENERAL_DETECT_CONF,
+    MULTI_CAMERA_DETECTION, MULTI_CAMERA_TRACKER_CFG,
+    MOTION_GATE_ENABLED, MOTION_ROI_POLYGON_NORM, MOTION_MIN_AREA, MOTION_HOLD_SECS, MOTION_HEARTBEAT_SECS,
+    EVENT_QUEUE_MAXSIZE, EVENT_BATCH_SIZE, EVENT_FLUSH_INTERVAL_SECS, EVENT_NOTIFY_WORKERS,
+    WHITELIST_RESYNC_SECS, PLATE_OCR_MIN_CONF, PIPELINE_METRICS_WINDOW, PIPELINE_METRICS_JSONL,
+    PLATE_OCR_PROFILE, PLATE_OCR_REC_ONLY, PLATE_OCR_BATCH,
+    BENCH_REPORT_PATH, BENCH_REGRESSION_TOLERANCE, STARTUP_TIMELINE_PATH,
+    FACE_RECOGNITION_AVAILABLE, USE_AI_DOOR_DETECTION,
 )
 from core.database import DatabaseManager
 from core.door_controller import DoorController
+from core.event_sink import EventSink
+from core.mjpeg_streamer import MJPEGStreamer
+from core.model_backend import LOADED_MODELS, load_model
+from core.model_registry import registry, warmup_yolo
 from core.mqtt_manager import MQTTManager
+from core.motion_gate import MotionGate
+from core.multi_camera import MultiCameraDetector
+from core.pipeline_engine import PipelineEngine
+from core.pipeline_metrics import PipelineMetrics
+from core.plate_track_cache import PlateTrackCache
+from core.plate_whitelist_cache import PlateWhitelistCache
 from core.camera_orientation_monitor import CameraOrientationMonitor
-from core.tripwire import TripwireTracker
+from core.frame_grabber import LatestFrameGrabber
+from core import replay_bench
 
 # --- Services ---
-from services.telegram_service import notify_telegram, start_telegram_threads
-from services.face_service import load_faces, check_face, check_plate
-from services.door_service import check_door_state
+from services.telegram_service import notify_telegram, notify_telegram_photo, start_telegram_threads
+from services.face_service import FaceTrackCache, load_faces, check_faces, check_plate
+from services.door_service import DoorStateDetector, check_door_state, door_state_stats
 from services.system_monitor import get_cpu_temp, system_monitor_loop
 from services.api_server import start_api_server
 from services.camera_manager import CameraManager
 
-# ========== KHỞI TẠO ==========
-db = DatabaseManager()
-door_controller = DoorController()
-mqtt_manager = MQTTManager(door_controller)
-mqtt_manager.start()
-print("✅ MQTT Manager started")
-
-# --- CameraManager (multi-camera) ---
-camera_manager = CameraManager()
-camera_manager.add_camera("main", RTSP_URL, name="Camera Chính")
-for _idx, _env_key in enumerate(["CAMERA_2_URL", "CAMERA_3_URL", "CAMERA_4_URL"], start=2):
-    _url = os.environ.get(_env_key, "").strip()
-    if _url:
-        camera_manager.add_camera(f"cam{_idx}", _url, name=f"Camera {_idx}")
-
-# Backward compat: streamer chính vẫn là camera "main"
-streamer = camera_manager.get_streamer("main")
-
-# --- Trạng thái toàn cục ---
-truck_count = 0
-person_count = 0
-door_open = True
-
-
-def get_state():
-    """Trả về trạng thái hiện tại cho API và Telegram."""
-    return person_count, truck_count, door_open
-
-
-def get_counts():
-    """Trả về số lượng cho Telegram."""
-    return truck_count, person_count
-
-
-# --- Khởi chạy threads ---
-start_telegram_threads(db, load_faces, mqtt_manager, get_cpu_temp, get_counts)
-threading.Thread(target=start_api_server, args=(streamer, get_state, mqtt_manager), kwargs={"camera_manager": camera_manager}, daemon=True).start()
-threading.Thread(target=system_monitor_loop, daemon=True).start()
-
-print("🚀 Smart Door System STARTED.")
-print("✅ API Server started at http://0.0.0.0:8000/video_feed")
-
-# --- Khởi tạo mô hình YOLO ---
-general_model = YOLO(GENERAL_MODEL_PATH)
-plate_model = YOLO(PLATE_MODEL_PATH)
-
-
-def _resolve_class_ids(model):
-    """Tìm class id cho person/xe từ model names để tránh hard-code sai model."""
-    names = getattr(model, "names", {}) or {}
-    person_ids = set()
-    vehicle_ids = set()
-
-    person_aliases = {"person", "nguoi", "người"}
-    vehicle_aliases = {
-        "truck",
-        "car",
-        "vehicle",
-        "van",
-        "bus",
-        "motorcycle",
-        "motorbike",
-        "bike",
-        "bicycle",
-        "xe",
-        "xe_tai",
-        "xe tai",
-        "oto",
-        "ô tô",
-    }
-
-    for idx, raw_name in names.items():
-        label = str(raw_name).strip().lower()
-        if label in person_aliases:
-            person_ids.add(int(idx))
-        if label in vehicle_aliases or label.startswith("xe"):
-            vehicle_ids.add(int(idx))
-
-    # fallback cho model COCO nếu names không có/khớp như kỳ vọng
-    if not person_ids:
-        person_ids.add(0)
-    if not vehicle_ids:
-        coco_vehicle_ids = {1, 2, 3, 5, 7}
-        vehicle_ids = {idx for idx in coco_vehicle_ids if idx < len(names)} or {7}
-
-    return person_ids, vehicle_ids
-
-
-PERSON_CLASS_IDS, VEHICLE_CLASS_IDS = _resolve_class_ids(general_model)
-print(f"ℹ️ person class ids: {sorted(PERSON_CLASS_IDS)} | vehicle class ids: {sorted(VEHICLE_CLASS_IDS)}")
-
-# --- PaddleOCR ---
-from util.ocr_utils import VNPlateOCR
-plate_ocr = VNPlateOCR()
-print("✅ PaddleOCR initialized for Vietnamese plates")
-
-
-def ocr_plate(image):
-    text, prob = plate_ocr.read_plate_with_prob(image)
-    return text, prob
-
-
-# --- Parse OCR source ---
-
-
-def resize_for_process(frame, target_width):
-    if target_width <= 0 or frame.shape[1] <= target_width:
-        return frame
-    ratio = target_width / float(frame.shape[1])
-    new_h = max(1, int(frame.shape[0] * ratio))
-    return cv2.resize(frame, (target_width, new_h), interpolation=cv2.INTER_AREA)
-
+# Độ trễ end-to-end: từ lúc frame được decode tới khi đẩy lên streamer, in định kỳ
+LAG_REPORT_EVERY_FRAMES = 300
+# Nghỉ ngắn khi RTSP không có frame (read() có thể trả None ngay, vd. grabber đã stop)
+NO_FRAME_RETRY_DELAY_S = 0.5
+
+
+def _load_plate_ocr():
+    from util.ocr_utils import VNPlateOCR
+    return VNPlateOCR(profile=PLATE_OCR_PROFILE, rec_only=PLATE_OCR_REC_ONLY, escalate_conf=PLATE_OCR_MIN_CONF)
+
+
+def _warmup_plate_ocr(plate_ocr):
+    plate_ocr.read_plate_with_prob(np.full((48, 160, 3), 255, dtype=np.uint8))
+
+
+def register_models():
+    """Đăng ký YOLO người/xe + YOLO biển số + PaddleOCR vào registry (load song song khi registry.start())."""
+    # Backend nhanh nhất có sẵn (OpenVINO/ONNX/NCNN, fallback .pt); batch đa camera cần shape động
+    registry.register(
+        "general",
+        lambda: load_model(
+            GENERAL_MODEL_PATH, imgsz=GENERAL_DETECT_IMGSZ, dynamic=MULTI_CAMERA_DETECTION, name="general"
+        ),
+        warmup=warmup_yolo(GENERAL_DETECT_IMGSZ),
+    )
+    registry.register("plate", lambda: load_model(PLATE_MODEL_PATH, name="plate"), warmup=warmup_yolo())
+    registry.register("ocr", _load_plate_ocr, warmup=_warmup_plate_ocr)
+
+
+def load_models():
+    """Chờ model đã đăng ký load + warm-up xong.
+
+    Trả về (general_model, plate_model, ocr_fn, ocr_batch_fn); ocr_batch_fn None khi tắt PLATE_OCR_BATCH.
+    """
+    general_model = registry.get("general")
+    plate_model = registry.get("plate")
+    for name, path in (("general", GENERAL_MODEL_PATH), ("plate", PLATE_MODEL_PATH)):
+        print(f"✅ Model {name} ({path}): backend {LOADED_MODELS[name]['backend']}")
+
+    plate_ocr = registry.get("ocr")
+    print(f"✅ PaddleOCR initialized for Vietnamese plates (profile {PLATE_OCR_PROFILE})")
+
+    def ocr_plate(image):
+        text, prob = plate_ocr.read_plate_with_prob(image)
+        return text, prob
+
+    ocr_plates = plate_ocr.read_plates_with_prob if PLATE_OCR_BATCH else None
+    return general_model, plate_model, ocr_plate, ocr_plates
+
+
+def build_engine(general_model, plate_model, ocr_fn, db, event_sink, mqtt_manager, plate_whitelist, streamer,
+                 metrics, camera_manager=None, camera_baseline_path=CAMERA_BASELINE_PATH, ocr_batch_fn=None,
+                 stranger_dir=FACES_TEMP_DIR, active_learning_dir=ACTIVE_LEARNING_DIR, clock=time.monotonic,
+                 door_detector=None):
+    """Dựng PipelineEngine với cấu hình từ core/config (dùng chung cho chạy thật và bench).
+
+    clock: nguồn thời gian chung cho engine, motion gate, cache khuôn mặt, tripwire (bench: theo frame).
+    door_detector: DoorStateDetector riêng (None = detector dùng chung của services.door_service).
+    """
+    camera_monitor = CameraOrientationMonitor(
+        check_every_n_frames=CAMERA_SHIFT_CHECK_EVERY_FRAMES,
+        min_inlier_ratio=CAMERA_SHIFT_MIN_INLIER_RATIO,
+        max_rotation_deg=CAMERA_SHIFT_MAX_ROTATION_DEG,
+        max_translation_px=CAMERA_SHIFT_MAX_TRANSLATION_PX,
+        max_scale_delta=CAMERA_SHIFT_MAX_SCALE_DELTA,
+        required_consecutive_alerts=CAMERA_SHIFT_ALERT_CONSECUTIVE,
+        baseline_path=camera_baseline_path,
+    )
+
+    # --- Motion gate: cảnh tĩnh thì bỏ qua YOLO camera chính (vẫn chạy heartbeat) ---
+    motion_gate = None
+    if MOTION_GATE_ENABLED:
+        motion_gate = MotionGate(
+            roi_polygon_norm=MOTION_ROI_POLYGON_NORM,
+            min_area=MOTION_MIN_AREA,
+            hold_secs=MOTION_HOLD_SECS,
+            heartbeat_secs=MOTION_HEARTBEAT_SECS,
+            clock=clock,
+        )
 
-def resolve_line_y(frame_height: int) -> int:
-    """Tính vị trí vạch đỏ theo pixel override hoặc theo % chiều cao frame."""
-    if LINE_Y_PIXELS > 0:
-        return max(0, min(frame_height - 1, LINE_Y_PIXELS))
-    ratio = max(0.0, min(1.0, LINE_Y_RATIO))
-    return max(0, min(frame_height - 1, int(frame_height * ratio)))
+    engine = PipelineEngine(
+        general_model,
+        plate_model,
+        ocr_fn,
+        event_sink,
+        mqtt_manager,
+        plate_whitelist,
+        streamer,
+        db=db,
+        camera_monitor=camera_monitor,
+        check_faces_fn=check_faces,
+        # Cache nhận diện khuôn mặt theo track ID người
+        face_cache=FaceTrackCache(clock=clock),
+        check_plate_fn=check_plate,
+        door_state_fn=door_detector.check if door_detector is not None else check_door_state,
+        door_stats_fn=door_detector.stats if door_detector is not None else door_state_stats,
+        metrics=metrics,
+        # Cache OCR biển số theo track ID xe (xóa cùng TripwireTracker.cleanup_stale)
+        plate_cache=PlateTrackCache(min_conf=PLATE_OCR_MIN_CONF),
+        motion_gate=motion_gate,
+        camera_manager=camera_manager,
+        ocr_batch_fn=ocr_batch_fn,
+        stranger_dir=stranger_dir,
+        active_learning_dir=active_learning_dir,
+        clock=clock,
+    )
+    print(f"ℹ️ person class ids: {sorted(engine.person_class_ids)} | vehicle class ids: {sorted(engine.vehicle_class_ids)}")
+    if engine.camera_baseline_ready:
+        print(f"✅ Đã nạp camera baseline: {camera_monitor.baseline_names()}")
+
+    # --- Multi-camera: một batch YOLO cho mọi camera, tracker + tripwire riêng từng camera ---
+    if MULTI_CAMERA_DETECTION and camera_manager is not None:
+        engine.multi_detector = MultiCameraDetector(
+            general_model,
+            imgsz=GENERAL_DETECT_IMGSZ,
+            conf=GENERAL_DETECT_CONF,
+            tracker_cfg=MULTI_CAMERA_TRACKER_CFG,
+            tripwire_factory=lambda st: engine.make_tripwire(
+                lambda: st.frame_height,
+                on_evict=engine.evict_track_caches if st.cam_id == "main" else None,
+            ),
+        )
+        print(f"✅ Multi-camera detection bật ({MULTI_CAMERA_TRACKER_CFG})")
+    return engine
 
 
 def parse_ocr_source(source):
@@ -173,297 +198,228 @@ def parse_ocr_source(source):
     return "rtsp", RTSP_URL
 
 
-ocr_mode, ocr_payload = parse_ocr_source(OCR_SOURCE)
-cap = None
-image_frame = None
-if ocr_mode == "image":
-    image_frame = cv2.imread(ocr_payload)
-    if image_frame is None:
-        print(f"Lỗi đọc ảnh OCR: {ocr_payload}")
-        exit()
-else:
-    cap = cv2.VideoCapture(ocr_payload)
-    if not cap.isOpened():
-        print("Lỗi kết nối Video.")
-        exit()
-
-notify_telegram("Hệ thống cửa cuốn thông minh đã khởi động.", important=True)
-
-# --- Biến trạng thái main loop ---
-last_frame_time = time.time()
-last_person_seen_time = time.time()
-notification_sent = False
-signal_loss_alerted = False
-
-# --- Tripwire tracker (thay thế tracked_ids inline) ---
-_tripwire_tracker: TripwireTracker | None = None  # khởi tạo lazy sau khi có frame đầu tiên
-
-# Màu hiển thị vùng nhận diện theo yêu cầu vận hành
-PERSON_BOX_COLOR = (0, 255, 255)  # vàng
-VEHICLE_BOX_COLOR = (255, 0, 0)   # xanh dương
-
-frame_count = 0
-camera_shift_alerted = False
-camera_monitor = CameraOrientationMonitor(
-    check_every_n_frames=CAMERA_SHIFT_CHECK_EVERY_FRAMES,
-    min_inlier_ratio=CAMERA_SHIFT_MIN_INLIER_RATIO,
-    max_rotation_deg=CAMERA_SHIFT_MAX_ROTATION_DEG,
-    max_translation_px=CAMERA_SHIFT_MAX_TRANSLATION_PX,
-    max_scale_delta=CAMERA_SHIFT_MAX_SCALE_DELTA,
-    required_consecutive_alerts=CAMERA_SHIFT_ALERT_CONSECUTIVE,
-)
-camera_baseline_ready = False
-
-# ========== MAIN LOOP ==========
-while True:
-    if ocr_mode == "image":
-        ret = True
-        frame = image_frame.copy()
-    else:
-        ret, frame = cap.read()
-
-    # Kiểm tra mất tín hiệu
-    if not ret and ocr_mode != "image":
-        if not signal_loss_alerted and (time.time() - last_frame_time) > SIGNAL_LOSS_TIMEOUT:
-            msg = "CẢNH BÁO: Mất tín hiệu camera!"
-            db.log_event("SIGNAL_LOSS", msg, truck_count, person_count)
-            notify_telegram(msg, important=True)
-            signal_loss_alerted = True
-        time.sleep(1)
-        continue
-
-    signal_loss_alerted = False
-    last_frame_time = time.time()
-    frame_count += 1
-
-    frame = resize_for_process(frame, PROCESS_WIDTH)
-    line_y = resolve_line_y(frame.shape[0])
-
-    # 0. Giám sát camera có lệch khỏi góc ban đầu hay không
-    if not camera_baseline_ready:
-        camera_baseline_ready = camera_monitor.set_baseline(frame)
-        if camera_baseline_ready:
-            print("✅ Camera baseline đã được chụp để theo dõi lệch góc.")
-    else:
-        shift_result = camera_monitor.evaluate(frame)
-        if shift_result is not None:
-            if shift_result.is_shifted and not camera_shift_alerted:
-                camera_shift_alerted = True
-                msg = (
-                    "🚨 CẢNH BÁO: Camera có dấu hiệu lệch góc khỏi vị trí ban đầu "
-                    f"(rot={shift_result.rotation_deg:.2f}°, "
-                    f"trans={shift_result.translation_px:.1f}px, "
-                    f"inlier={shift_result.inlier_ratio:.2f})."
-                )
-                print(msg)
-                db.log_event("CAMERA_SHIFT", msg, truck_count, person_count)
-                notify_telegram(msg, important=True)
-            elif not shift_result.is_shifted and camera_shift_alerted:
-                camera_shift_alerted = False
-                msg = "✅ Camera đã quay lại gần góc ban đầu."
-                print(msg)
-                db.log_event("CAMERA_SHIFT_RECOVERED", msg, truck_count, person_count)
-                notify_telegram(msg)
-
-    # 1. Nhận diện người/xe (YOLO tracking)
-    results = general_model.track(frame, persist=True, verbose=False, imgsz=GENERAL_DETECT_IMGSZ, conf=GENERAL_DETECT_CONF)
-
-    save_active_learning = False
-
-    # Khởi tạo TripwireTracker lần đầu (cần biết line_y_fn runtime)
-    if _tripwire_tracker is None:
-        _line_y_cache = line_y  # capture giá trị hiện tại; fn gọi lại mỗi frame
-        _tripwire_tracker = TripwireTracker(
-            line_y_fn=lambda: resolve_line_y(frame.shape[0]),
-            buffer_frames=TRIPWIRE_BUFFER_FRAMES,
-            cooldown_secs=TRIPWIRE_COOLDOWN_SECS,
-        )
-        print(f"✅ TripwireTracker khởi tạo: buffer={TRIPWIRE_BUFFER_FRAMES} frames, cooldown={TRIPWIRE_COOLDOWN_SECS}s")
-
-    active_ids: set[int] = set()
-
-    for r in results:
-        for bbox in r.boxes:
-            x1, y1, x2, y2 = map(int, bbox.xyxy[0])
-            obj_id = int(bbox.id[0]) if bbox.id is not None else None
-            cls = int(bbox.cls[0])
-            center_y = (y1 + y2) // 2
-            is_person = cls in PERSON_CLASS_IDS
-            is_vehicle = cls in VEHICLE_CLASS_IDS
-
-            if obj_id is not None:
-                active_ids.add(obj_id)
-
-            crossed_red_line = False
-            if obj_id is not None and (is_person or is_vehicle):
-                direction = _tripwire_tracker.update(obj_id, center_y)
-                if direction is not None:
-                    crossed_red_line = True
-                    event_msg = ""
-                    if direction == "IN":
-                        if is_vehicle:
-                            truck_count += 1
-                            event_msg = f"🚛 Xe #{obj_id} đi VÀO (IN). Tổng xe: {truck_count}"
-                        elif is_person:
-                            person_count += 1
-                            event_msg = f"🚶 Người #{obj_id} đi VÀO (IN). Tổng người: {person_count}"
-                    elif direction == "OUT":
-                        if is_vehicle:
-                            truck_count = max(0, truck_count - 1)
-                            event_msg = f"🚛 Xe #{obj_id} đi RA (OUT). Tổng xe: {truck_count}"
-                        elif is_person:
-                            person_count = max(0, person_count - 1)
-                            event_msg = f"🚶 Người #{obj_id} đi RA (OUT). Tổng người: {person_count}"
-
-                    if event_msg:
-                        db.log_event(direction, event_msg, truck_count, person_count)
-                        notify_telegram(event_msg)
-
-            if is_person:
-                last_person_seen_time = time.time()
-                notification_sent = False
-
-            # Hiển thị label vùng nhận diện: người vàng, xe xanh
-            if is_person or is_vehicle:
-                box_color = PERSON_BOX_COLOR if is_person else VEHICLE_BOX_COLOR
-                label_name = "NGUOI" if is_person else "XE"
-                if crossed_red_line:
-                    label_name += " QUA VACH DO"
-                display_id = obj_id if obj_id is not None else "NA"
-                cv2.rectangle(frame, (x1, y1), (x2, y2), box_color, 2)
-                cv2.putText(
-                    frame,
-                    f"{label_name} #{display_id}",
-                    (x1, max(20, y1 - 8)),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.55,
-                    box_color,
-                    2,
-                )
-
-    # Xóa tracking của object đã biến mất
-    if _tripwire_tracker is not None:
-        _tripwire_tracker.cleanup_stale(active_ids)
-
-    # 2. Nhận diện khuôn mặt (mỗi 2 giây)
-    if FACE_RECOGNITION_AVAILABLE and int(time.time()) % 2 == 0:
-        name, loc = check_face(frame)
-        if name == "STRANGER":
-            face_id = str(int(time.time()))
-            temp_dir = "./config/faces/temp"
-            os.makedirs(temp_dir, exist_ok=True)
-            temp_path = os.path.join(temp_dir, f"{face_id}.jpg")
-
-            top, right, bottom, left = loc
-            face_img = frame[top:bottom, left:right]
-            if face_img.size > 0:
-                cv2.imwrite(temp_path, face_img)
-
-                msg = f"Người lạ phát hiện! ID: `{face_id}`\nDuyệt: `/staff_face {face_id} Ten_Nhan_Vien`"
-                db.log_event("STRANGER", msg, truck_count, person_count)
-
-                try:
-                    from core.config import TOKEN, CHAT_REGULAR
-                    url = f"https://api.telegram.org/bot{TOKEN}/sendPhoto"
-                    with open(temp_path, "rb") as f:
-                        import requests
-                        requests.post(url, data={"chat_id": CHAT_REGULAR, "caption": msg}, files={"photo": f})
-                except Exception as e:
-                    print(f"Lỗi gửi ảnh Telegram: {e}")
-                    notify_telegram(msg, important=True)
-
-        elif name:
-            cv2.putText(frame, name, (loc[3], loc[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-
-    # 3. Nhận diện biển số (chỉ chạy nếu OCR được bật)
-    if mqtt_manager.ocr_enabled and frame_count % max(1, PLATE_DETECT_EVERY_N_FRAMES) == 0:
-        plate_results = plate_model(frame, verbose=False)
-        for pr in plate_results:
-            for pbox in pr.boxes:
-                px1, py1, px2, py2 = map(int, pbox.xyxy[0])
-                cls = int(pbox.cls[0])
-                if cls == 1:  # license_plate
-                    plate_crop = frame[py1:py2, px1:px2]
-                    if plate_crop.size > 0:
-                        plate_text, prob = ocr_plate(plate_crop)
-
-                        if prob < 0.7 and plate_text:
-                            save_path = f"./data/active_learning/plate_{int(time.time())}.jpg"
-                            os.makedirs("./data/active_learning", exist_ok=True)
-                            cv2.imwrite(save_path, plate_crop)
-                            print(f"📀 Saved Active Learning sample: {plate_text} ({prob:.2f})")
-
-                    if plate_text:
-                        plate_norm = normalize_plate(plate_text)
-                        if plate_norm:
-                            is_auth, matched = check_plate(plate_text, authorized_plates)
-                            is_whitelisted = is_auth or db.is_plate_whitelisted(plate_norm)
-                            if not is_whitelisted:
-                                msg = f"Xe lạ phát hiện: {plate_norm}"
-                                event_id = db.log_event("UNKNOWN_PLATE", msg, truck_count, person_count)
-                                pending_id = str(uuid.uuid4())
-                                db.add_pending_plate(
-                                    pending_id=pending_id,
-                                    event_id=event_id,
-                                    plate_raw=plate_text,
-                                    plate_norm=plate_norm,
-                                    first_seen_utc=datetime.utcnow().isoformat()
-                                )
-                                notify_telegram(
-                                    f"{msg}\nXác nhận:\n/mine {plate_norm}\n/staff {plate_norm}\n/reject {plate_norm}",
-                                    important=False
-                                )
-                            else:
-                                print(f"✅ Xe quen: {plate_norm} -> MỞ CỬA")
-                                mqtt_manager.publish_trigger_open()
-                                cv2.putText(frame, "BIEN SO HOP LE - MO CUA!", (px1, py1 - 30),
-                                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-                        cv2.putText(frame, f"BS: {plate_text}", (px1, py1 - 10),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 200, 255), 2)
-                    cv2.rectangle(frame, (px1, py1), (px2, py2), (255, 0, 255), 2)
-
-    # 4. Kiểm tra trạng thái cửa cuốn
-    current_door_state = check_door_state(frame)
-    if current_door_state != 'unknown':
-        new_door_open = (current_door_state == 'open')
-
-        if new_door_open != door_open:
-            door_open = new_door_open
-            state_msg = "Cửa cuốn đã MỞ." if door_open else "Cửa cuốn đã ĐÓNG."
-            db.log_event("DOOR_STATE", state_msg, truck_count, person_count)
-            notify_telegram(state_msg)
-
-    # 5. Cảnh báo cửa mở quá 5 phút không có người
-    if door_open and person_count == 0:
-        if (time.time() - last_person_seen_time) / 60 > 5 and not notification_sent:
-            msg = "CẢNH BÁO: Cửa mở nhưng không có người quá 5 phút!"
-            db.log_event("ALERT", msg, truck_count, person_count)
-            notify_telegram(msg, important=True)
-            notification_sent = True
-
-    # MQTT Update
-    mqtt_manager.publish_state(person_count, truck_count, door_open)
-
-    # GUI
-    door_status = "🔓 MỞ" if door_open else "🔒 ĐÓNG"
-    cv2.line(frame, (0, line_y), (frame.shape[1], line_y), (0, 0, 255), 5)
-    cv2.putText(frame, f"Qua vach do - Xe: {truck_count} | Nguoi: {person_count}", (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.85, (0, 0, 255), 2)
-    cv2.putText(frame, f"Cua: {door_status}", (10, 80), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3)
-    
-    # Cập nhật thông tin thời gian thực
-    now_str = datetime.now().strftime("%H:%M:%S - %d/%m/%Y")
-    cv2.putText(frame, now_str, (frame.shape[1] - 380, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-
-    # Cập nhật Streamer
-    streamer.update_frame(frame)
-
-    # Disable GUI for headless Linux servers
-    # cv2.imshow("Smart Door System", frame)
-    # if (cv2.waitKey(1) & 0xFF) == ord(" "):
-    #     break
-    if ocr_mode == "image":
-        break
-
-if cap is not None:
-    cap.release()
-cv2.destroyAllWindows()
+def run_live():
+    # ========== KHỞI TẠO ==========
+    # Model load + warm-up song song ở nền; capture, DB, MQTT, API khởi động trong lúc chờ
+    register_models()
+    registry.start()
+
+    with registry.step("database"):
+        db = DatabaseManager()
+    # Ghi event + gửi Telegram qua queue nền để main loop không bao giờ block vì I/O
+    event_sink = EventSink(
+        db,
+        notify_telegram,
+        notify_telegram_photo,
+        max_queue=EVENT_QUEUE_MAXSIZE,
+        batch_size=EVENT_BATCH_SIZE,
+        flush_interval=EVENT_FLUSH_INTERVAL_SECS,
+        notify_workers=EVENT_NOTIFY_WORKERS,
+    )
+    event_sink.start()
+    # Whitelist biển số giữ trong RAM, Telegram /mine /staff cập nhật qua LISTEN/NOTIFY
+    with registry.step("plate whitelist"):
+        plate_whitelist = PlateWhitelistCache(db, resync_interval=WHITELIST_RESYNC_SECS)
+        plate_whitelist.start()
+    with registry.step("mqtt"):
+        door_controller = DoorController()
+        mqtt_manager = MQTTManager(door_controller)
+        mqtt_manager.start()
+    print("✅ MQTT Manager started")
+
+    # --- CameraManager (multi-camera) ---
+    with registry.step("cameras"):
+        camera_manager = CameraManager()
+        camera_manager.add_camera("main", RTSP_URL, name="Camera Chính")
+        for idx, env_key in enumerate(["CAMERA_2_URL", "CAMERA_3_URL", "CAMERA_4_URL"], start=2):
+            url = os.environ.get(env_key, "").strip()
+            if url:
+                camera_manager.add_camera(f"cam{idx}", url, name=f"Camera {idx}")
+
+    # Backward compat: streamer chính vẫn là camera "main"
+    streamer = camera_manager.get_streamer("main")
+
+    # --- Đo latency từng stage main loop (xuất ở /api/metrics) ---
+    pipeline_metrics = PipelineMetrics(window=PIPELINE_METRICS_WINDOW, jsonl_path=PIPELINE_METRICS_JSONL or None)
+    # Histogram chờ pool / latency query DB cũng xuất qua /api/metrics
+    pipeline_metrics.add_collector(db.render_prometheus)
+
+    # --- API chạy ngay, trạng thái rỗng tới khi engine sẵn sàng ---
+    engine = None
+
+    def get_state():
+        return engine.get_state() if engine is not None else (0, 0, True)
+
+    threading.Thread(target=start_api_server, args=(streamer, get_state, mqtt_manager), kwargs={"camera_manager": camera_manager, "pipeline_metrics": pipeline_metrics}, daemon=True).start()
+    threading.Thread(target=system_monitor_loop, daemon=True).start()
+    print("✅ API Server started at http://0.0.0.0:8000/video_feed")
+
+    # --- Nguồn frame: decode bắt đầu trong lúc model còn load ---
+    ocr_mode, ocr_payload = parse_ocr_source(OCR_SOURCE)
+    grabber = None
+    image_frame = None
+    with registry.step("capture"):
+        if ocr_mode == "image":
+            image_frame = cv2.imread(ocr_payload)
+            if image_frame is None:
+                print(f"Lỗi đọc ảnh OCR: {ocr_payload}")
+                exit()
+        else:
+            # Decode trong thread riêng: RTSP/webcam lấy frame mới nhất; file video đọc tuần tự
+            # không bỏ frame và dừng ở cuối file (mất tín hiệu như trước), không phát lại
+            grabber = LatestFrameGrabber(ocr_payload)
+            if not grabber.start():
+                print("Lỗi kết nối Video.")
+                exit()
+            if grabber.file_mode:
+                print(f"ℹ️ Nguồn là file video, đọc tuần tự: {ocr_payload}")
+
+    # --- Chờ model + dựng engine xử lý frame ---
+    with registry.step("wait models"):
+        general_model, plate_model, ocr_fn, ocr_batch_fn = load_models()
+    engine = build_engine(
+        general_model, plate_model, ocr_fn, db, event_sink, mqtt_manager, plate_whitelist, streamer,
+        metrics=pipeline_metrics, camera_manager=camera_manager, ocr_batch_fn=ocr_batch_fn,
+    )
+
+    # --- Khởi chạy threads ---
+    start_telegram_threads(db, load_faces, mqtt_manager, get_cpu_temp, engine.get_counts)
+
+    print("🚀 Smart Door System STARTED.")
+    event_sink.notify("Hệ thống cửa cuốn thông minh đã khởi động.", important=True)
+    registry.mark("engine ready")
+    timeline_written = False
+
+    # ========== MAIN LOOP ==========
+    while True:
+        grabbed = None
+        if ocr_mode == "image":
+            frame = image_frame.copy()
+        else:
+            grabbed = grabber.read(timeout=1.0)
+            if grabbed is None:
+                if grabber.file_mode and grabber.finished:
+                    print("ℹ️ Hết file video, dừng main loop.")
+                    break
+                # Kiểm tra mất tín hiệu
+                engine.on_no_frame()
+                time.sleep(NO_FRAME_RETRY_DELAY_S)
+                continue
+            frame = grabbed.frame
+
+        engine.process_frame(frame)
+
+        if not timeline_written:
+            timeline_written = True
+            registry.mark("first frame")
+            for line in registry.report_lines():
+                print(line)
+            registry.write_timeline(STARTUP_TIMELINE_PATH)
+
+        if grabbed is not None and engine.frame_count % LAG_REPORT_EVERY_FRAMES == 0:
+            gs = grabber.stats()
+            print(
+                f"ℹ️ Pipeline lag: {grabbed.age() * 1000:.0f}ms | seq={grabbed.seq} "
+                f"decoded={gs['decoded']} processed={gs['consumed']} dropped={gs['dropped']}"
+            )
+            for line in engine.report_lines():
+                print(line)
+
+        # Disable GUI for headless Linux servers
+        # cv2.imshow("Smart Door System", frame)
+        # if (cv2.waitKey(1) & 0xFF) == ord(" "):
+        #     break
+        if ocr_mode == "image":
+            break
+
+    if grabber is not None:
+        grabber.stop()
+    plate_whitelist.stop()
+    pipeline_metrics.close()
+    event_sink.stop()
+    cv2.destroyAllWindows()
+
+
+def run_bench(argv=None):
+    """Replay video/thư mục ảnh qua pipeline với DB/MQTT/Telegram in-memory; trả về exit code."""
+    parser = argparse.ArgumentParser(prog="main.py bench", description="Replay offline + report hiệu năng JSON")
+    parser.add_argument("--source", required=True, help="File video, thư mục ảnh hoặc một ảnh")
+    parser.add_argument("--limit", type=int, default=0, help="Số frame tối đa (0 = hết nguồn)")
+    parser.add_argument("--loops", type=int, default=1, help="Lặp lại nguồn bao nhiêu lần")
+    parser.add_argument("--warmup", type=int, default=10, help="Số frame đầu không tính vào số đo")
+    parser.add_argument("--fps", type=float, default=0.0,
+                        help="FPS của đồng hồ replay (0 = lấy từ video, ảnh dùng mặc định)")
+    parser.add_argument("--report", default=BENCH_REPORT_PATH, help="Nơi ghi report JSON")
+    parser.add_argument("--baseline", help="Report baseline để so sánh; có regression → exit code 1")
+    parser.add_argument("--save-baseline", help="Lưu report này làm baseline")
+    parser.add_argument("--tolerance", type=float, default=BENCH_REGRESSION_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    register_models()
+    registry.start()
+    db = replay_bench.InMemoryDatabase()
+    mqtt_manager = replay_bench.InMemoryMQTT()
+    notifier = replay_bench.RecordingNotifier()
+    event_sink = EventSink(
+        db,
+        notifier.notify,
+        notifier.notify_photo,
+        max_queue=EVENT_QUEUE_MAXSIZE,
+        batch_size=EVENT_BATCH_SIZE,
+        flush_interval=EVENT_FLUSH_INTERVAL_SECS,
+        notify_workers=EVENT_NOTIFY_WORKERS,
+    )
+    event_sink.start()
+    plate_whitelist = PlateWhitelistCache(db)
+    plate_whitelist.resync()
+    streamer = MJPEGStreamer(stream_width=STREAM_WIDTH, fps=STREAM_FPS, jpeg_quality=STREAM_JPEG_QUALITY)
+
+    def metrics_factory():
+        return PipelineMetrics(window=replay_bench.BENCH_METRICS_WINDOW)
+
+    # Gate theo thời gian đọc đồng hồ theo số frame → hai lần replay cùng nguồn chạy cùng số stage
+    clock = replay_bench.FrameClock(args.fps or replay_bench.source_fps(args.source))
+    general_model, plate_model, ocr_fn, ocr_batch_fn = load_models()
+    # Không ghi đè camera baseline, không ghi ảnh người lạ / active learning vào thư mục của hệ thống thật
+    engine = build_engine(
+        general_model, plate_model, ocr_fn, db, event_sink, mqtt_manager, plate_whitelist, streamer,
+        metrics=metrics_factory(), camera_baseline_path=None, ocr_batch_fn=ocr_batch_fn,
+        stranger_dir=None, active_learning_dir=None, clock=clock, door_detector=DoorStateDetector(clock=clock),
+    )
+
+    # Model lazy (cửa, khuôn mặt) load xong trước frame đầu: frame chuyển từ fallback sang model
+    # không phụ thuộc tốc độ máy → hai lần replay chạy cùng số stage
+    with registry.step("wait lazy models"):
+        if USE_AI_DOOR_DETECTION:
+            registry.get("door", wait=True)
+        if FACE_RECOGNITION_AVAILABLE:
+            registry.get("faces", wait=True)
+
+    frames = replay_bench.iter_replay_frames(args.source, limit=args.limit, loops=args.loops)
+    run = replay_bench.run_replay(engine, frames, warmup=args.warmup, metrics_factory=metrics_factory, clock=clock)
+    event_sink.stop()  # ghi hết event còn trong queue trước khi đếm
+    streamer.stop()
+
+    report = replay_bench.build_report(run, engine, db, mqtt_manager, notifier, source=args.source)
+    report["startup"] = registry.timeline()
+    replay_bench.write_json(args.report, report)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"✅ Bench report: {args.report}")
+    if args.save_baseline:
+        replay_bench.write_json(args.save_baseline, report)
+        print(f"✅ Đã lưu baseline: {args.save_baseline}")
+
+    if args.baseline:
+        regressions = replay_bench.compare_to_baseline(report, replay_bench.load_json(args.baseline), args.tolerance)
+        for line in regressions:
+            print(f"❌ Regression: {line}")
+        if regressions:
+            return 1
+        print(f"✅ Không có regression so với baseline (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        sys.exit(run_bench(sys.argv[2:]))
+    run_live()
@@ -29,6 +29,13 @@ PLATE_MODEL_PATH  = os.path.join(BASE_DIR, "models", "bien_so_xe.pt")
 FACE_MODEL_DIR    = os.path.join(BASE_DIR, "models", "insightface")  # buffalo_sc or w600k_r50
 KNOWN_FACES_DIR   = os.path.join(BASE_DIR, "config", "faces")
 
+# ── Inference Backend ─────────────────────────────────────────────────────────
+# "auto" picks the fastest exported backend (NCNN/ONNX/OpenVINO) with PyTorch fallback;
+# exports are cached by weights hash + imgsz + opset (see core/model_backend.py).
+PLATE_MODEL_BACKENDS   = os.getenv("MODEL_BACKENDS", "auto")
+MODEL_CACHE_DIR        = os.path.join(BASE_DIR, "models", "cache")
+MODEL_PARITY_SAMPLES   = os.path.join(BASE_DIR, "data", "parity_samples")
+
 # ── Inference Tuning ──────────────────────────────────────────────────────────
 PLATE_DETECT_IMGSZ   = 640
 PLATE_DETECT_CONF    = 0.45
@@ -36,6 +43,8 @@ PLATE_DETECT_EVERY_N = 3        # run plate model every N frames (CPU budget)
 FRAME_BUFFER_SIZE    = 5        # frames to buffer for voting
 VOTE_MIN_CONF        = 0.70     # minimum OCR confidence to count a vote
 FACE_RECOG_EVERY_N   = 10       # run face recognition every N frames
+FACE_MATCH_THRESHOLD = 0.35     # cosine similarity above which a face is a known identity
+FACE_TOP_K           = 3        # identities returned per face by FaceRecognizer.search
 
 # ── Motion Detection ──────────────────────────────────────────────────────────
 MOTION_THRESHOLD     = 1500     # contour area px² to trigger AI
@@ -54,11 +63,25 @@ RTSP_RECONNECT_DELAY = 3        # seconds before reconnect attempt
 SHM_FRAME_BYTES = GRAB_WIDTH * GRAB_HEIGHT * 3
 SHM_NAME_CAM1   = "hpc_cam1_frame"
 SHM_NAME_CAM2   = "hpc_cam2_frame"
+SHM_RING_SLOTS  = 4        # frames kept per camera; a token stays readable for N-1 newer frames
+SHM_DISPLAY_CAM1  = "hpc_cam1_display"   # last inferred frames for the UI (metadata goes via result_queue)
+SHM_DISPLAY_CAM2  = "hpc_cam2_display"
+SHM_DISPLAY_SLOTS = 3
+SHM_STATS_LOG_INTERVAL = 60.0  # seconds between ring read-stats log lines in inference
 
 # ── Queue Sizes ───────────────────────────────────────────────────────────────
-INFER_QUEUE_MAXSIZE  = 4   # frames waiting for inference
+INFER_QUEUE_MAXSIZE  = 4   # motion tokens waiting for inference, per camera
 RESULT_QUEUE_MAXSIZE = 32  # inference results waiting for UI
 
+# ── Inference Pool ────────────────────────────────────────────────────────────
+# Each worker is a process with its own models (~300-500 MB). Cameras keep an
+# affinity to one worker; idle workers steal a backlogged camera (see dispatch.py).
+INFER_WORKERS            = int(os.getenv("INFER_WORKERS", "2"))
+INFER_STEAL_INTERVAL     = 0.05       # s — how often an idle worker looks for backlog to steal
+INFER_STATS_LOG_INTERVAL = 60.0       # s — per-camera queue/drop counters log line in main
+CAMERA_STATE_BYTES       = 64 * 1024  # per-camera voter state handed between workers
+SEEN_PLATES_MAX          = 2000       # plates remembered per camera for new-plate snapshots
+
 # ── Storage ───────────────────────────────────────────────────────────────────
 SNAPSHOT_DIR = "./data/snapshots"
 DB_PATH      = os.getenv("DB_PATH", os.path.join(BASE_DIR, "db", "door_events.db"))
@@ -66,8 +89,9 @@ DB_PATH      = os.getenv("DB_PATH", os.path.join(BASE_DIR, "db", "door_events.db
 # ── Web UI ────────────────────────────────────────────────────────────────────
 UI_HOST      = "0.0.0.0"   # bind all interfaces (Tailscale + LAN)
 UI_PORT      = 5050
-UI_STREAM_FPS = 8           # JPEG frames pushed via SocketIO per second
+UI_STREAM_FPS = 8           # JPEG frames pushed via SocketIO per second (per subscribed camera)
 UI_JPEG_QUALITY = 70
+UI_ACK_TIMEOUT = 5.0        # s — resend to a client whose last frame was never acknowledged
 
 # ── Telegram ──────────────────────────────────────────────────────────────────
 TELEGRAM_TOKEN         = os.getenv("TELEGRAM_TOKEN", "")
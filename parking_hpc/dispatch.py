@@ -0,0 +1,174 @@
+"""
+parking_hpc/dispatch.py
+Per-camera token dispatch for the inference worker pool.
+
+  - Each camera has its own bounded token queue. A full queue drops the new
+    token and counts it per camera instead of failing silently.
+  - A camera is owned by exactly one worker at a time and at most one of its
+    tokens is in flight, so a camera's tokens are processed in order and its
+    PlateVoter sees frames in sequence.
+  - Affinity: camera i starts on worker i % n_workers. A worker whose own
+    cameras are idle steals a camera that has a backlog while its owner is busy
+    on another camera. Ownership moves with it, and so does the camera's
+    voter state (a small pickled blob in shared memory, saved after every token).
+
+Grabbers call submit(); workers loop acquire() → process → release().
+Every structure here is created before the processes are spawned and passed
+to them as Process args (multiprocessing queues, locks and RawArrays).
+"""
+import multiprocessing as mp
+import queue
+import time
+from typing import Optional
+
+from parking_hpc import config as cfg
+
+# Per-camera counters (one row of the shared stats table per camera)
+COUNTERS = ("enqueued", "dropped", "processed", "stolen", "depth")
+_ENQUEUED, _DROPPED, _PROCESSED, _STOLEN, _DEPTH = range(len(COUNTERS))
+
+_NO_WORKER = -1
+
+
+class CameraDispatch:
+    def __init__(
+        self,
+        cam_ids: list[str],
+        n_workers: int,
+        queue_maxsize: int = cfg.INFER_QUEUE_MAXSIZE,
+        state_bytes: int = cfg.CAMERA_STATE_BYTES,
+        ctx=mp,
+    ):
+        if n_workers < 1:
+            raise ValueError("Inference pool needs at least one worker")
+        self.cam_ids = list(cam_ids)
+        self.n_workers = n_workers
+        n_cams = len(self.cam_ids)
+        self._index = {cam_id: i for i, cam_id in enumerate(self.cam_ids)}
+        self._queues = [ctx.Queue(maxsize=queue_maxsize) for _ in range(n_cams)]
+        self._doorbells = [ctx.Semaphore(0) for _ in range(n_workers)]
+        self._lock = ctx.Lock()
+
+        # All guarded by self._lock
+        self._owner = ctx.RawArray("i", [i % n_workers for i in range(n_cams)])
+        self._last_worker = ctx.RawArray("i", [_NO_WORKER] * n_cams)
+        self._in_flight = ctx.RawArray("b", n_cams)
+        self._busy = ctx.RawArray("b", n_workers)
+        self._stats = ctx.RawArray("q", n_cams * len(COUNTERS))
+        self._state_len = ctx.RawArray("q", n_cams)
+        self._state = [ctx.RawArray("B", state_bytes) for _ in range(n_cams)]
+
+    # ── Grabber side ─────────────────────────────────────────────────────────
+
+    def submit(self, cam_id: str, token: dict) -> bool:
+        """Queue a motion token for cam_id. False (and counted) if its queue is full."""
+        c = self._index[cam_id]
+        try:
+            self._queues[c].put_nowait(token)
+        except queue.Full:
+            with self._lock:
+                self._bump(c, _DROPPED)
+            return False
+        with self._lock:
+            self._bump(c, _ENQUEUED)
+            self._bump(c, _DEPTH)
+            owner = self._owner[c]
+        self._doorbells[owner].release()
+        return True
+
+    # ── Worker side ──────────────────────────────────────────────────────────
+
+    def acquire(self, worker_id: int, timeout: float = 0.5) -> Optional[tuple[str, dict, bool]]:
+        """
+        Next token this worker may process: (cam_id, token, handover) or None on timeout.
+        handover=True means another worker (or an earlier incarnation of this one)
+        processed the camera last — load its state with load_state() first.
+        Must be paired with release() once the token is done.
+        """
+        deadline = time.monotonic() + timeout
+        doorbell = self._doorbells[worker_id]
+        while True:
+            with self._lock:
+                picked = self._pick(worker_id)
+            if picked is not None:
+                c, handover = picked
+                try:
+                    # depth was counted after a successful put, so the item is on its way
+                    token = self._queues[c].get(timeout=1.0)
+                except queue.Empty:
+                    with self._lock:
+                        self._in_flight[c] = 0
+                        self._busy[worker_id] = 0
+                    return None
+                return self.cam_ids[c], token, handover
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            # Own cameras wake us immediately; other cameras' backlog is polled for stealing
+            doorbell.acquire(timeout=min(remaining, cfg.INFER_STEAL_INTERVAL))
+
+    def _pick(self, worker_id: int) -> Optional[tuple[int, bool]]:
+        """Choose a camera under the lock; marks it in flight. Returns (index, handover)."""
+        candidates = [c for c in range(len(self.cam_ids)) if self._stats_at(c, _DEPTH) > 0 and not self._in_flight[c]]
+        chosen = next((c for c in candidates if self._owner[c] == worker_id), None)
+        if chosen is None:
+            # Steal only from a busy owner — an idle owner is about to take the token itself
+            chosen = next((c for c in candidates if self._busy[self._owner[c]]), None)
+            if chosen is None:
+                return None
+            self._owner[chosen] = worker_id
+            self._bump(chosen, _STOLEN)
+        self._bump(chosen, _DEPTH, -1)
+        self._in_flight[chosen] = 1
+        self._busy[worker_id] = 1
+        handover = self._last_worker[chosen] != worker_id
+        self._last_worker[chosen] = worker_id
+        return chosen, handover
+
+    def release(self, worker_id: int, cam_id: str, state: Optional[bytes] = None) -> None:
+        """Token done: store the camera's state for a future owner and free the camera."""
+        c = self._index[cam_id]
+        with self._lock:
+            if state is not None:
+                if len(state) <= len(self._state[c]):
+                    self._state[c][:len(state)] = state
+                    self._state_len[c] = len(state)
+                else:
+                    self._state_len[c] = 0  # too big to hand over — next owner starts fresh
+            self._bump(c, _PROCESSED)
+            self._in_flight[c] = 0
+            self._busy[worker_id] = 0
+
+    def load_state(self, cam_id: str) -> Optional[bytes]:
+        c = self._index[cam_id]
+        with self._lock:
+            n = self._state_len[c]
+            return bytes(self._state[c][:n]) if n else None
+
+    def reset_worker(self, worker_id: int) -> None:
+        """Watchdog: a worker died. Free whatever it held; its cameras stay with its replacement."""
+        with self._lock:
+            for c in range(len(self.cam_ids)):
+                if self._last_worker[c] == worker_id:
+                    self._in_flight[c] = 0
+                    self._last_worker[c] = _NO_WORKER  # replacement must reload state
+            self._busy[worker_id] = 0
+
+    # ── Stats ────────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict[str, dict]:
+        """Per-camera counters + current owner, e.g. for the periodic log line."""
+        with self._lock:
+            return {
+                cam_id: {
+                    **{name: self._stats_at(c, i) for i, name in enumerate(COUNTERS)},
+                    "owner": self._owner[c],
+                }
+                for c, cam_id in enumerate(self.cam_ids)
+            }
+
+    def _stats_at(self, c: int, field: int) -> int:
+        return self._stats[c * len(COUNTERS) + field]
+
+    def _bump(self, c: int, field: int, delta: int = 1) -> None:
+        self._stats[c * len(COUNTERS) + field] += delta
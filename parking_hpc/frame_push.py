@@ -0,0 +1,170 @@
+"""
+parking_hpc/frame_push.py
+Per-camera binary frame fan-out for dashboard clients.
+
+  - Clients subscribe to individual cameras; a camera with zero subscribers is
+    never encoded (publish() returns before calling the encoder).
+  - Each frame is encoded once and sent as raw JPEG bytes (a binary WebSocket
+    frame with Socket.IO) to every subscriber — no base64.
+  - Flow control is ack-based, latest-frame-wins: each (client, camera) has at
+    most one frame in flight. Frames produced meanwhile replace a single pending
+    slot and the one they replace is counted as dropped, so a slow client never
+    builds a backlog in the server's send buffers.
+  - stats(): per camera encode count/CPU, per viewer bytes, bandwidth, drops and
+    CPU share (encode CPU split across that frame's viewers + own send CPU).
+
+Transport-agnostic: the UI server injects send(sid, cam_id, jpeg, ack), where
+ack() must be called once the client has taken the frame.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from parking_hpc import config as cfg
+
+SendFn = Callable[[str, str, bytes, Callable[[], None]], None]
+
+
+@dataclass
+class _Viewer:
+    connected_at: float = field(default_factory=time.monotonic)
+    cams: set = field(default_factory=set)
+    in_flight: dict = field(default_factory=dict)   # cam_id → monotonic send time
+    pending: dict = field(default_factory=dict)     # cam_id → newest unsent JPEG
+    frames_sent: int = 0
+    bytes_sent: int = 0
+    dropped: int = 0
+    cpu_s: float = 0.0
+
+
+@dataclass
+class _CameraStats:
+    encodes: int = 0
+    encode_cpu_s: float = 0.0
+    jpeg_bytes: int = 0
+    skipped_no_viewers: int = 0
+
+
+class FramePush:
+    def __init__(self, send: SendFn, ack_timeout: float = cfg.UI_ACK_TIMEOUT):
+        self._send = send
+        self._ack_timeout = ack_timeout
+        self._lock = threading.Lock()
+        self._viewers: dict[str, _Viewer] = {}
+        self._cameras: dict[str, _CameraStats] = {}
+
+    # ── Subscriptions ────────────────────────────────────────────────────────
+
+    def subscribe(self, sid: str, cam_id: str) -> None:
+        with self._lock:
+            self._viewers.setdefault(sid, _Viewer()).cams.add(cam_id)
+
+    def unsubscribe(self, sid: str, cam_id: str) -> None:
+        with self._lock:
+            viewer = self._viewers.get(sid)
+            if viewer is not None:
+                viewer.cams.discard(cam_id)
+                viewer.pending.pop(cam_id, None)
+                viewer.in_flight.pop(cam_id, None)
+
+    def disconnect(self, sid: str) -> None:
+        with self._lock:
+            self._viewers.pop(sid, None)
+
+    def subscribers(self, cam_id: str) -> list[str]:
+        with self._lock:
+            return [sid for sid, viewer in self._viewers.items() if cam_id in viewer.cams]
+
+    # ── Publishing ───────────────────────────────────────────────────────────
+
+    def publish(self, cam_id: str, encode: Callable[[], Optional[bytes]]) -> bool:
+        """Encode (only if someone watches cam_id) and offer the JPEG to every subscriber."""
+        sids = self.subscribers(cam_id)
+        with self._lock:
+            cam = self._cameras.setdefault(cam_id, _CameraStats())
+            if not sids:
+                cam.skipped_no_viewers += 1
+                return False
+        t0 = time.thread_time()
+        jpeg = encode()
+        cpu = time.thread_time() - t0
+        if jpeg is None:
+            return False
+        with self._lock:
+            cam.encodes += 1
+            cam.encode_cpu_s += cpu
+            cam.jpeg_bytes = len(jpeg)
+            for sid in sids:
+                viewer = self._viewers.get(sid)
+                if viewer is not None:
+                    viewer.cpu_s += cpu / len(sids)
+        for sid in sids:
+            self.offer(sid, cam_id, jpeg)
+        return True
+
+    def offer(self, sid: str, cam_id: str, jpeg: bytes) -> None:
+        """Send now if nothing is in flight for (sid, cam_id), else keep as the pending frame."""
+        with self._lock:
+            viewer = self._viewers.get(sid)
+            if viewer is None or cam_id not in viewer.cams:
+                return
+            sent_at = viewer.in_flight.get(cam_id)
+            if sent_at is not None and time.monotonic() - sent_at < self._ack_timeout:
+                if cam_id in viewer.pending:
+                    viewer.dropped += 1   # latest frame wins
+                viewer.pending[cam_id] = jpeg
+                return
+            viewer.in_flight[cam_id] = time.monotonic()
+        self._deliver(sid, viewer, cam_id, jpeg)
+
+    def _deliver(self, sid: str, viewer: _Viewer, cam_id: str, jpeg: bytes) -> None:
+        t0 = time.thread_time()
+        self._send(sid, cam_id, jpeg, lambda: self._acked(sid, cam_id))
+        cpu = time.thread_time() - t0
+        with self._lock:
+            viewer.frames_sent += 1
+            viewer.bytes_sent += len(jpeg)
+            viewer.cpu_s += cpu
+
+    def _acked(self, sid: str, cam_id: str) -> None:
+        with self._lock:
+            viewer = self._viewers.get(sid)
+            if viewer is None:
+                return
+            jpeg = viewer.pending.pop(cam_id, None)
+            if jpeg is None:
+                viewer.in_flight.pop(cam_id, None)
+                return
+            viewer.in_flight[cam_id] = time.monotonic()
+        self._deliver(sid, viewer, cam_id, jpeg)
+
+    # ── Stats ────────────────────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            cameras = {
+                cam_id: {
+                    "viewers": sum(1 for v in self._viewers.values() if cam_id in v.cams),
+                    "encodes": cam.encodes,
+                    "encode_ms_avg": round(cam.encode_cpu_s / cam.encodes * 1000, 2) if cam.encodes else 0.0,
+                    "jpeg_bytes": cam.jpeg_bytes,
+                    "skipped_no_viewers": cam.skipped_no_viewers,
+                }
+                for cam_id, cam in self._cameras.items()
+            }
+            viewers = {}
+            for sid, v in self._viewers.items():
+                secs = max(now - v.connected_at, 1e-6)
+                viewers[sid] = {
+                    "cams": sorted(v.cams),
+                    "connected_s": round(secs, 1),
+                    "frames_sent": v.frames_sent,
+                    "bytes_sent": v.bytes_sent,
+                    "kbps": round(v.bytes_sent * 8 / 1000 / secs, 1),
+                    "dropped": v.dropped,
+                    "cpu_ms": round(v.cpu_s * 1000, 1),
+                    "cpu_pct": round(v.cpu_s / secs * 100, 2),
+                }
+        return {"cameras": cameras, "viewers": viewers}
@@ -5,8 +5,8 @@ Process 1 — Frame Grabber
 Responsibilities:
   - Open RTSP stream(s) with hardware-accelerated decode (FFmpeg/V4L2 backend)
   - Detect motion inside the ROI polygon
-  - Write latest frame into SharedMemory (zero-copy IPC)
-  - Push (cam_id, shm_offset, timestamp) tokens into infer_queue when motion fires
+  - Write every frame into an N-slot SharedMemory ring (zero-copy IPC, see shm_ring.py)
+  - Submit (cam_id, slot, seq, frame_idx, timestamp) tokens to the camera's dispatch queue on motion
   - Reconnect automatically on stream loss
 
 Runs as a standalone multiprocessing.Process — no imports from inference.py or ui_server.py.
@@ -16,10 +16,12 @@ import logging
 import signal
 import numpy as np
 import cv2
-from multiprocessing import Process, Queue, Event, shared_memory
+from multiprocessing import Process, Event
 from typing import Optional
 
 from parking_hpc import config as cfg
+from parking_hpc.dispatch import CameraDispatch
+from parking_hpc.shm_ring import FrameRing
 
 logger = logging.getLogger("grabber")
 
@@ -53,42 +55,30 @@ def _motion_in_roi(prev_gray: np.ndarray, curr_gray: np.ndarray, mask: np.ndarra
 
 class CameraReader:
     """
-    Reads one RTSP stream, writes frames to SharedMemory, signals motion.
+    Reads one RTSP stream, writes frames to a SharedMemory ring, signals motion.
 
-    SharedMemory layout (SHM_FRAME_BYTES bytes):
-        [0..3]   : uint32 frame counter (little-endian) — reader checks for new frame
-        [4..]    : BGR uint8 flat array (GRAB_HEIGHT × GRAB_WIDTH × 3)
+    The ring holds SHM_RING_SLOTS frames; each motion token names the exact
+    (slot, seq) it refers to, so the inference process reads that frame and
+    never a half-overwritten one (see parking_hpc/shm_ring.py for the layout).
     """
 
-    HEADER_BYTES = 4  # frame counter prefix
-
     def __init__(
         self,
         cam_id: str,
         rtsp_url: str,
         shm_name: str,
-        infer_queue: Queue,
+        dispatch: CameraDispatch,
         stop_event: Event,
     ):
         self.cam_id = cam_id
         self.rtsp_url = rtsp_url
         self.shm_name = shm_name
-        self.infer_queue = infer_queue
+        self.dispatch = dispatch
         self.stop_event = stop_event
 
-        total = self.HEADER_BYTES + cfg.SHM_FRAME_BYTES
-        try:
-            self._shm = shared_memory.SharedMemory(name=shm_name, create=True, size=total)
-        except FileExistsError:
-            # Previous run didn't clean up — reuse
-            self._shm = shared_memory.SharedMemory(name=shm_name, create=False, size=total)
-        self._buf = np.ndarray(
-            (cfg.GRAB_HEIGHT, cfg.GRAB_WIDTH, 3),
-            dtype=np.uint8,
-            buffer=self._shm.buf[self.HEADER_BYTES:],
+        self._ring = FrameRing.create(
+            shm_name, (cfg.GRAB_HEIGHT, cfg.GRAB_WIDTH, 3), cfg.SHM_RING_SLOTS
         )
-        self._counter = np.ndarray((1,), dtype=np.uint32, buffer=self._shm.buf[:self.HEADER_BYTES])
-        self._counter[0] = 0
 
     def run(self):
         logger.info("[%s] Grabber started → %s", self.cam_id, self.rtsp_url)
@@ -129,9 +119,8 @@ class CameraReader:
                 if roi_mask is None:
                     roi_mask = _build_roi_mask(cfg.GRAB_HEIGHT, cfg.GRAB_WIDTH)
 
-                # Write frame to shared memory (zero-copy for inference process)
-                np.copyto(self._buf, frame)
-                self._counter[0] = (int(self._counter[0]) + 1) & 0xFFFFFFFF
+                # Write frame into the next ring slot (zero-copy for inference process)
+                slot, seq = self._ring.write(frame, frame_idx)
 
                 # Motion detection
                 gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
@@ -140,11 +129,14 @@ class CameraReader:
                         token = {
                             "cam_id": self.cam_id,
                             "shm_name": self.shm_name,
+                            "slot": slot,
+                            "seq": seq,
+                            "gen": self._ring.generation,
                             "frame_idx": frame_idx,
                             "ts": time.time(),
                         }
-                        if not self.infer_queue.full():
-                            self.infer_queue.put_nowait(token)
+                        if self.dispatch.submit(self.cam_id, token):
+                            self._ring.mark_token(slot, seq)
                 prev_gray = gray
                 frame_idx += 1
 
@@ -153,9 +145,9 @@ class CameraReader:
                 logger.info("[%s] Reconnecting in %ds…", self.cam_id, cfg.RTSP_RECONNECT_DELAY)
                 time.sleep(cfg.RTSP_RECONNECT_DELAY)
 
-        self._shm.close()
-        self._shm.unlink()
-        logger.info("[%s] Grabber stopped", self.cam_id)
+        logger.info("[%s] Grabber stopped — ring stats: %s", self.cam_id, self._ring.stats())
+        self._ring.unlink()  # retires the generation first so readers detach
+        self._ring.close()
 
     def _open_capture(self) -> Optional[cv2.VideoCapture]:
         """Open RTSP with FFmpeg backend + hardware-friendly flags."""
@@ -180,7 +172,7 @@ def grabber_process(
     cam_id: str,
     rtsp_url: str,
     shm_name: str,
-    infer_queue: Queue,
+    dispatch: CameraDispatch,
     stop_event: Event,
 ):
     """Entry point for multiprocessing.Process(target=grabber_process, ...)."""
@@ -188,5 +180,5 @@ def grabber_process(
     signal.signal(signal.SIGINT, signal.SIG_IGN)
     logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(message)s")
 
-    reader = CameraReader(cam_id, rtsp_url, shm_name, infer_queue, stop_event)
+    reader = CameraReader(cam_id, rtsp_url, shm_name, dispatch, stop_event)
     reader.run()
@@ -3,29 +3,37 @@ parking_hpc/inference.py
 Process 2 — AI Inference
 
 Pipeline per motion token:
-  1. Read frame from SharedMemory (zero-copy)
+  1. View the token's frame in the SharedMemory ring (cached attachment, seqlock-checked)
   2. YOLOv10-small → detect license plate bounding boxes
   3. Frame Buffer: accumulate FRAME_BUFFER_SIZE detections, vote on best plate crop
   4. Plate enhancement: Gaussian Blur → Adaptive Threshold → PaddleOCR
   5. InsightFace (ONNX/OpenCL) → face recognition every FACE_RECOG_EVERY_N frames
   6. Auto-snapshot: save high-res JPEG to SNAPSHOT_DIR on new plate
-  7. Push InferenceResult to result_queue for UI/logging
+  7. Publish the frame into the camera's display ring (SharedMemory) and push a
+     metadata-only InferenceResult to result_queue; the UI draws overlays itself
+
+Runs as a pool of INFER_WORKERS processes; tokens arrive through CameraDispatch,
+which keeps each camera on one worker at a time and hands its state (votes, seen
+plates, face cadence) over when another worker steals it.
 
 Designed for RK3399: uses onnxruntime with OpenCLExecutionProvider where available.
 """
 import os
+import pickle
 import time
 import signal
 import logging
 import collections
 from dataclasses import dataclass, field
-from multiprocessing import Process, Queue, Event, shared_memory
+from multiprocessing import Process, Queue, Event
 from typing import Optional
 
 import cv2
 import numpy as np
 
 from parking_hpc import config as cfg
+from parking_hpc.dispatch import CameraDispatch
+from parking_hpc.shm_ring import FrameRing, RingAttachments
 
 logger = logging.getLogger("inference")
 
@@ -42,7 +50,33 @@ class InferenceResult:
     face_name: str = ""
     face_conf: float = 0.0
     snapshot_path: str = ""
-    annotated_frame: Optional[np.ndarray] = field(default=None, repr=False)
+    frame_idx: int = -1
+    # (x1, y1, x2, y2, text, ocr_conf) per plate box in this frame — overlay data
+    detections: list = field(default_factory=list)
+    # Where the frame itself lives: (slot, seq) in display ring display_shm.
+    # Only metadata crosses the queue; the UI maps the frame zero-copy.
+    display_shm: str = ""
+    display_slot: int = -1
+    display_seq: int = 0
+
+
+def has_overlays(result: InferenceResult) -> bool:
+    return bool(result.detections) or bool(result.face_name and result.face_name != "STRANGER")
+
+
+def draw_overlays(frame: np.ndarray, result: InferenceResult) -> None:
+    """Draw plate boxes / face label from result onto frame (in place, must be writable)."""
+    for x1, y1, x2, y2, text, ocr_conf in result.detections:
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 255), 2)
+        cv2.putText(
+            frame, f"{text} {ocr_conf:.2f}",
+            (x1, max(y1 - 8, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (255, 0, 255), 2,
+        )
+    if result.face_name and result.face_name != "STRANGER":
+        cv2.putText(
+            frame, f"FACE: {result.face_name} ({result.face_conf:.2f})",
+            (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2,
+        )
 
 
 # ── Plate enhancement ─────────────────────────────────────────────────────────
@@ -106,12 +140,19 @@ class PlateVoter:
 # ── Model wrappers ────────────────────────────────────────────────────────────
 
 class PlateDetector:
-    """YOLOv10/YOLOv11 plate detector via Ultralytics."""
+    """YOLOv10/YOLOv11 plate detector via Ultralytics (fastest available backend)."""
 
     def __init__(self):
-        from ultralytics import YOLO
-        self._model = YOLO(cfg.PLATE_MODEL_PATH)
-        logger.info("PlateDetector loaded: %s", cfg.PLATE_MODEL_PATH)
+        from core.model_backend import LOADED_MODELS, load_model
+        self._model = load_model(
+            cfg.PLATE_MODEL_PATH,
+            imgsz=cfg.PLATE_DETECT_IMGSZ,
+            backends=cfg.PLATE_MODEL_BACKENDS,
+            cache_root=cfg.MODEL_CACHE_DIR,
+            samples_dir=cfg.MODEL_PARITY_SAMPLES,
+        )
+        logger.info("PlateDetector loaded: %s (backend=%s)",
+                    cfg.PLATE_MODEL_PATH, LOADED_MODELS[cfg.PLATE_MODEL_PATH]["backend"])
 
     def detect(self, frame: np.ndarray) -> list[tuple[int, int, int, int, float]]:
         """Return list of (x1, y1, x2, y2, conf) for class=1 (license_plate)."""
@@ -153,6 +194,71 @@ class OCRReader:
         return combined, avg_conf
 
 
+class FaceGallery:
+    """
+    Enrolled face embeddings as one contiguous float32 matrix.
+
+    Rows are grouped by identity (several embeddings per person) so a single
+    matrix multiply scores every query against every row, np.maximum.reduceat
+    max-pools the rows of each identity, and argpartition picks the top-k.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.names: list[str] = []                                     # identity index → name
+        self._matrix = np.zeros((0, dim), dtype=np.float32)           # (N, dim), L2-normalised rows
+        self._ids = np.zeros(0, dtype=np.int32)                       # (N,) identity index per row
+        self._starts = np.zeros(0, dtype=np.intp)                     # first row of each identity
+
+    @classmethod
+    def from_embeddings(cls, embeddings: dict[str, list[np.ndarray]], dim: Optional[int] = None) -> "FaceGallery":
+        """Build from {name: [embedding, ...]}; identities without embeddings are skipped."""
+        items = [(name, embs) for name, embs in sorted(embeddings.items()) if len(embs)]
+        if dim is None:
+            dim = len(items[0][1][0]) if items else 512
+        gallery = cls(dim)
+        if not items:
+            return gallery
+        rows = np.concatenate([np.asarray(embs, dtype=np.float32).reshape(-1, dim) for _, embs in items])
+        counts = np.array([len(embs) for _, embs in items])
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        gallery._matrix = np.ascontiguousarray(rows / np.maximum(norms, 1e-12))
+        gallery._ids = np.repeat(np.arange(len(items), dtype=np.int32), counts)
+        gallery._starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.intp)
+        gallery.names = [name for name, _ in items]
+        return gallery
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def num_embeddings(self) -> int:
+        return self._matrix.shape[0]
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """(M, num_identities) best cosine similarity of each query to each identity."""
+        q = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if not len(self.names) or not len(q):
+            return np.zeros((len(q), len(self.names)), dtype=np.float32)
+        q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+        sims = q @ self._matrix.T                                      # (M, N)
+        return np.maximum.reduceat(sims, self._starts, axis=1)         # (M, identities)
+
+    def search(self, queries: np.ndarray, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k identities per query: (indices (M, k), similarities (M, k)), best first."""
+        scores = self.scores(queries)
+        k = min(k, scores.shape[1])
+        if k == 0:
+            return np.zeros((scores.shape[0], 0), dtype=np.intp), np.zeros((scores.shape[0], 0), dtype=np.float32)
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(k), (scores.shape[0], k))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
 class FaceRecognizer:
     """
     InsightFace with ONNX Runtime.
@@ -174,14 +280,16 @@ class FaceRecognizer:
             providers=preferred,
         )
         self._app.prepare(ctx_id=0, det_size=(320, 320))
-        self._known: dict[str, np.ndarray] = {}  # name → embedding
+        self._gallery = FaceGallery()
         self._load_known_faces()
-        logger.info("FaceRecognizer ready. Known faces: %d", len(self._known))
+        logger.info("FaceRecognizer ready. Known faces: %d (%d embeddings)",
+                    len(self._gallery), self._gallery.num_embeddings)
 
     def _load_known_faces(self):
-        """Load face embeddings from KNOWN_FACES_DIR/{name}/*.jpg"""
+        """Load face embeddings from KNOWN_FACES_DIR/{name}/*.jpg (every image kept, no averaging)."""
         if not os.path.isdir(cfg.KNOWN_FACES_DIR):
             return
+        known: dict[str, list[np.ndarray]] = {}
         for person in os.listdir(cfg.KNOWN_FACES_DIR):
             person_dir = os.path.join(cfg.KNOWN_FACES_DIR, person)
             if not os.path.isdir(person_dir):
@@ -197,22 +305,31 @@ class FaceRecognizer:
                 if faces:
                     embeddings.append(faces[0].normed_embedding)
             if embeddings:
-                self._known[person] = np.mean(embeddings, axis=0)
+                known[person] = embeddings
+        self._gallery = FaceGallery.from_embeddings(known)
+
+    def search(self, frame: np.ndarray, k: int = cfg.FACE_TOP_K) -> list[list[tuple[str, float]]]:
+        """Top-k (name, similarity) candidates for every face in the frame."""
+        faces = self._app.get(frame)
+        if not faces:
+            return []
+        idx, sims = self._gallery.search(np.stack([f.normed_embedding for f in faces]), k)
+        names = self._gallery.names
+        return [[(names[i], float(s)) for i, s in zip(row_i, row_s)] for row_i, row_s in zip(idx, sims)]
 
     def identify(self, frame: np.ndarray) -> tuple[str, float]:
         """Return (name, similarity) for the most prominent face, or ('', 0)."""
         faces = self._app.get(frame)
         if not faces:
             return "", 0.0
-        best_name, best_sim = "STRANGER", 0.0
-        for face in faces:
-            emb = face.normed_embedding
-            for name, ref_emb in self._known.items():
-                sim = float(np.dot(emb, ref_emb))
-                if sim > best_sim:
-                    best_sim = sim
-                    best_name = name if sim > 0.35 else "STRANGER"
-        return best_name, best_sim
+        idx, sims = self._gallery.search(np.stack([f.normed_embedding for f in faces]), k=1)
+        if sims.size == 0:
+            return "STRANGER", 0.0
+        best = int(sims[:, 0].argmax())
+        best_sim = max(0.0, float(sims[best, 0]))
+        if best_sim > cfg.FACE_MATCH_THRESHOLD:
+            return self._gallery.names[int(idx[best, 0])], best_sim
+        return "STRANGER", best_sim
 
 
 # ── Snapshot helper ───────────────────────────────────────────────────────────
@@ -231,115 +348,198 @@ def save_snapshot(frame: np.ndarray, cam_id: str, plate_text: str) -> str:
 # ── Inference worker ──────────────────────────────────────────────────────────
 
 class InferenceWorker:
-    def __init__(self, infer_queue: Queue, result_queue: Queue, stop_event: Event):
-        self.infer_queue = infer_queue
+    def __init__(
+        self,
+        dispatch: CameraDispatch,
+        result_queue: Queue,
+        stop_event: Event,
+        worker_id: int = 0,
+        display_shm: Optional[dict[str, str]] = None,
+    ):
+        self.dispatch = dispatch
         self.result_queue = result_queue
         self.stop_event = stop_event
+        self.worker_id = worker_id
+        self.display_shm = display_shm or {}  # cam_id → display ring created by main
 
         self._plate_detector = PlateDetector()
         self._ocr = OCRReader()
         self._face_recog = FaceRecognizer()
 
-        # Per-camera voters
+        # Per-camera state — travels with the camera when another worker steals it
         self._voters: dict[str, PlateVoter] = {}
-        self._seen_plates: set[str] = set()
-        self._frame_counter = 0
+        self._seen_plates: dict[str, dict[str, None]] = {}  # insertion-ordered, capped at SEEN_PLATES_MAX
+        self._frame_counters: dict[str, int] = {}
+
+        # Ring attachments opened once per camera, reattached on grabber restart
+        self._rings = RingAttachments()
+        self._fallbacks = 0
+        self._shm_stats_logged = time.monotonic()
 
     def _get_voter(self, cam_id: str) -> PlateVoter:
         if cam_id not in self._voters:
             self._voters[cam_id] = PlateVoter()
         return self._voters[cam_id]
 
-    def _read_shm_frame(self, shm_name: str) -> Optional[np.ndarray]:
-        try:
-            shm = shared_memory.SharedMemory(name=shm_name, create=False)
-            arr = np.ndarray(
-                (cfg.GRAB_HEIGHT, cfg.GRAB_WIDTH, 3),
-                dtype=np.uint8,
-                buffer=shm.buf[4:],  # skip 4-byte counter header
-            ).copy()  # copy before closing shm
-            shm.close()
-            return arr
-        except Exception as e:
-            logger.warning("SHM read error (%s): %s", shm_name, e)
+    def _camera_state(self, cam_id: str) -> bytes:
+        """Pickled per-camera state stored in the dispatch after every token."""
+        return pickle.dumps({
+            "votes": list(self._get_voter(cam_id)._buffer),
+            "seen": list(self._seen_plates.get(cam_id, ())),
+            "frames": self._frame_counters.get(cam_id, 0),
+        })
+
+    def _load_camera_state(self, cam_id: str, blob: Optional[bytes]) -> None:
+        """Take over a camera: replace local state with the previous owner's (or start fresh)."""
+        state = pickle.loads(blob) if blob else {}
+        voter = PlateVoter()
+        for text, conf in state.get("votes", ()):
+            voter.add(text, conf)
+        self._voters[cam_id] = voter
+        self._seen_plates[cam_id] = dict.fromkeys(state.get("seen", ()))
+        self._frame_counters[cam_id] = state.get("frames", 0)
+
+    def _mark_seen(self, cam_id: str, plate: str) -> bool:
+        """Remember plate for cam_id; True if it was not seen before."""
+        seen = self._seen_plates.setdefault(cam_id, {})
+        if plate in seen:
+            return False
+        seen[plate] = None
+        if len(seen) > cfg.SEEN_PLATES_MAX:
+            del seen[next(iter(seen))]
+        return True
+
+    def _token_view(self, token: dict) -> Optional[tuple[FrameRing, np.ndarray, int, int]]:
+        """
+        Zero-copy view of the frame a motion token refers to, from the cached ring
+        attachment. If the token predates a grabber restart or its slot was already
+        overwritten (inference fell N frames behind), fall back to the newest frame
+        so the token still gets processed. Returns (ring, view, slot, seq) or None.
+        """
+        ring = self._rings.get(token["shm_name"])
+        if ring is None:
             return None
+        slot, seq = token["slot"], token["seq"]
+        view = ring.view(slot, seq) if token["gen"] == ring.generation else None
+        if view is None:
+            latest = ring.latest()
+            if latest is None:
+                return None
+            slot, seq, _ = latest
+            view = ring.view(slot, seq)
+            if view is None:
+                return None
+            self._fallbacks += 1
+        return ring, view, slot, seq
+
+    def _log_shm_stats(self) -> None:
+        now = time.monotonic()
+        if now - self._shm_stats_logged < cfg.SHM_STATS_LOG_INTERVAL:
+            return
+        self._shm_stats_logged = now
+        stats = self._rings.stats()
+        if stats:
+            logger.info("SHM ring reads: %s fallback_latest=%d", stats, self._fallbacks)
 
     def run(self):
-        logger.info("Inference worker started")
+        logger.info("Inference worker %d started", self.worker_id)
         while not self.stop_event.is_set():
-            try:
-                token = self.infer_queue.get(timeout=0.5)
-            except Exception:
+            lease = self.dispatch.acquire(self.worker_id, timeout=0.5)
+            if lease is None:
                 continue
+            cam_id, token, handover = lease
+            if handover or cam_id not in self._voters:
+                self._load_camera_state(cam_id, self.dispatch.load_state(cam_id))
+            try:
+                self._process(token)
+            finally:
+                self.dispatch.release(self.worker_id, cam_id, self._camera_state(cam_id))
+            self._log_shm_stats()
+
+        self._rings.close()
+        logger.info("Inference worker %d stopped", self.worker_id)
 
-            cam_id: str = token["cam_id"]
-            shm_name: str = token["shm_name"]
-            ts: float = token["ts"]
+    def _process(self, token: dict) -> None:
+        cam_id: str = token["cam_id"]
+        ts: float = token["ts"]
 
-            frame = self._read_shm_frame(shm_name)
-            if frame is None:
+        read = self._token_view(token)
+        if read is None:
+            return
+        ring, frame, slot, seq = read
+
+        # ── Plate detection + OCR (directly on the shared view) ──────────────
+        detections = []
+        for x1, y1, x2, y2, det_conf in self._plate_detector.detect(frame):
+            crop = frame[y1:y2, x1:x2]
+            if crop.size == 0:
                 continue
+            text, ocr_conf = self._ocr.read(enhance_plate(crop))
+            detections.append((x1, y1, x2, y2, det_conf, text, ocr_conf))
+
+        # ── Face recognition (every N frames) ────────────────────────────────
+        n_frames = self._frame_counters.get(cam_id, 0) + 1
+        self._frame_counters[cam_id] = n_frames
+        face = None
+        if n_frames % cfg.FACE_RECOG_EVERY_N == 0:
+            face = self._face_recog.identify(frame)
+
+        # Pixels leave this method only for the UI (skipped when the result queue is
+        # full anyway) or a new-plate snapshot: one shm → shm copy into the display
+        # ring, which the UI maps directly. No pickled frame crosses the queue.
+        result = InferenceResult(cam_id=cam_id, ts=ts, frame_idx=token["frame_idx"])
+        publish = not self.result_queue.full()
+        owned = None
+        if publish or detections:
+            display_name = self.display_shm.get(cam_id)
+            display = self._rings.get(display_name) if display_name else None
+            if display is not None:
+                result.display_slot, result.display_seq = display.write(frame, token["frame_idx"], ts)
+                result.display_shm = display.name
+                owned = display.view(result.display_slot, result.display_seq)
+            else:
+                owned = frame.copy()
+        if not ring.is_valid(slot, seq):
+            # Grabber lapped the ring mid-inference: everything above may come from a torn frame.
+            # A display slot written from it is never referenced, so the UI can't show it.
+            return
+        del frame  # never touch the shared slot past the validity check
 
-            result = InferenceResult(cam_id=cam_id, ts=ts)
-            result.annotated_frame = frame.copy()
+        voter = self._get_voter(cam_id)
+        for x1, y1, x2, y2, det_conf, text, ocr_conf in detections:
+            voter.add(text, ocr_conf * det_conf)
+            result.detections.append((x1, y1, x2, y2, text, ocr_conf))
 
-            # ── Plate detection ───────────────────────────────────────────────
-            boxes = self._plate_detector.detect(frame)
-            voter = self._get_voter(cam_id)
+        if voter.is_ready():
+            best_text, best_conf = voter.best()
+            voter.reset()
+            if best_text:
+                result.plate_text = best_text
+                result.plate_conf = best_conf
+                # Auto-snapshot on new plate (raw pixels — overlays are drawn by the UI)
+                if self._mark_seen(cam_id, best_text):
+                    result.snapshot_path = save_snapshot(owned, cam_id, best_text)
+                    logger.info("[%s] New plate: %s (%.2f) → %s",
+                                cam_id, best_text, best_conf, result.snapshot_path)
 
-            for x1, y1, x2, y2, det_conf in boxes:
-                crop = frame[y1:y2, x1:x2]
-                if crop.size == 0:
-                    continue
-                enhanced = enhance_plate(crop)
-                text, ocr_conf = self._ocr.read(enhanced)
-                voter.add(text, ocr_conf * det_conf)
-
-                # Draw box on annotated frame
-                cv2.rectangle(result.annotated_frame, (x1, y1), (x2, y2), (255, 0, 255), 2)
-                cv2.putText(
-                    result.annotated_frame, f"{text} {ocr_conf:.2f}",
-                    (x1, max(y1 - 8, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (255, 0, 255), 2,
-                )
-
-            if voter.is_ready():
-                best_text, best_conf = voter.best()
-                voter.reset()
-                if best_text:
-                    result.plate_text = best_text
-                    result.plate_conf = best_conf
-                    # Auto-snapshot on new plate
-                    if best_text not in self._seen_plates:
-                        self._seen_plates.add(best_text)
-                        result.snapshot_path = save_snapshot(frame, cam_id, best_text)
-                        logger.info("[%s] New plate: %s (%.2f) → %s",
-                                    cam_id, best_text, best_conf, result.snapshot_path)
-
-            # ── Face recognition (every N frames) ────────────────────────────
-            self._frame_counter += 1
-            if self._frame_counter % cfg.FACE_RECOG_EVERY_N == 0:
-                name, sim = self._face_recog.identify(frame)
-                result.face_name = name
-                result.face_conf = sim
-                if name and name != "STRANGER":
-                    cv2.putText(
-                        result.annotated_frame, f"FACE: {name} ({sim:.2f})",
-                        (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2,
-                    )
-
-            # Push to UI/logging
-            if not self.result_queue.full():
-                result_queue_safe = result
-                result_queue_safe.annotated_frame = result.annotated_frame  # keep ndarray
-                self.result_queue.put_nowait(result)
-
-        logger.info("Inference worker stopped")
+        if face is not None:
+            result.face_name, result.face_conf = face
+
+        # Push metadata to UI/logging
+        if publish and not self.result_queue.full():
+            self.result_queue.put_nowait(result)
 
 
 # ── Process entry point ───────────────────────────────────────────────────────
 
-def inference_process(infer_queue: Queue, result_queue: Queue, stop_event: Event):
+def inference_process(
+    worker_id: int,
+    dispatch: CameraDispatch,
+    result_queue: Queue,
+    stop_event: Event,
+    display_shm: dict[str, str],
+):
     signal.signal(signal.SIGINT, signal.SIG_IGN)
     logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(message)s")
-    worker = InferenceWorker(infer_queue, result_queue, stop_event)
+    worker = InferenceWorker(dispatch, result_queue, stop_event, worker_id=worker_id, display_shm=display_shm)
     worker.run()
@@ -5,11 +5,12 @@ Orchestrator — entry point for the high-performance parking monitor.
 Startup sequence:
   1. Force CPU governor to 'performance' on all cores (RK3399: 6 cores)
   2. Optionally set up ZRAM (if not already active)
-  3. Allocate SharedMemory segments for frame IPC
+  3. Allocate per-camera dispatch queues and display rings (SharedMemory frames
+     inference publishes for the UI; grabbers own their capture rings)
   4. Spawn Process 1 (grabber) × N cameras
-  5. Spawn Process 2 (inference)
+  5. Spawn Process 2 (inference) × INFER_WORKERS
   6. Spawn Process 3 (UI server)
-  7. Monitor child processes; restart on unexpected exit
+  7. Monitor child processes; restart each on unexpected exit, log dispatch stats
   8. Graceful shutdown on SIGINT/SIGTERM
 
 Run:
@@ -26,6 +27,8 @@ import multiprocessing as mp
 from multiprocessing import Queue, Event
 
 from parking_hpc import config as cfg
+from parking_hpc.dispatch import CameraDispatch
+from parking_hpc.shm_ring import FrameRing
 from parking_hpc.grabber import grabber_process
 from parking_hpc.inference import inference_process
 from parking_hpc.ui_server import ui_process
@@ -71,10 +74,10 @@ def setup_zram():
 
 # ── Process management ────────────────────────────────────────────────────────
 
-def _spawn_grabber(cam_id, rtsp_url, shm_name, infer_queue, stop_event) -> mp.Process:
+def _spawn_grabber(cam_id, rtsp_url, shm_name, dispatch, stop_event) -> mp.Process:
     p = mp.Process(
         target=grabber_process,
-        args=(cam_id, rtsp_url, shm_name, infer_queue, stop_event),
+        args=(cam_id, rtsp_url, shm_name, dispatch, stop_event),
         name=f"grabber-{cam_id}",
         daemon=True,
     )
@@ -82,11 +85,11 @@ def _spawn_grabber(cam_id, rtsp_url, shm_name, infer_queue, stop_event) -> mp.Pr
     return p
 
 
-def _spawn_inference(infer_queue, result_queue, stop_event) -> mp.Process:
+def _spawn_inference(worker_id, dispatch, result_queue, stop_event, display_shm) -> mp.Process:
     p = mp.Process(
         target=inference_process,
-        args=(infer_queue, result_queue, stop_event),
-        name="inference",
+        args=(worker_id, dispatch, result_queue, stop_event, display_shm),
+        name=f"inference-{worker_id}",
         daemon=True,
     )
     p.start()
@@ -116,27 +119,37 @@ def main():
 
     stop_event = Event()
 
-    # Queues
-    infer_queue: Queue = Queue(maxsize=cfg.INFER_QUEUE_MAXSIZE)
-    result_queue: Queue = Queue(maxsize=cfg.RESULT_QUEUE_MAXSIZE)
-
     # Build camera list
     cameras = [("cam1", cfg.RTSP_CAM1, cfg.SHM_NAME_CAM1)]
+    display_shm = {"cam1": cfg.SHM_DISPLAY_CAM1}
     if cfg.RTSP_CAM2:
         cameras.append(("cam2", cfg.RTSP_CAM2, cfg.SHM_NAME_CAM2))
+        display_shm["cam2"] = cfg.SHM_DISPLAY_CAM2
+
+    # Queues
+    dispatch = CameraDispatch([cam_id for cam_id, _, _ in cameras], n_workers=cfg.INFER_WORKERS)
+    result_queue: Queue = Queue(maxsize=cfg.RESULT_QUEUE_MAXSIZE)
+
+    # Display rings live here so they outlive any single inference worker
+    display_rings = [
+        FrameRing.create(name, (cfg.GRAB_HEIGHT, cfg.GRAB_WIDTH, 3), cfg.SHM_DISPLAY_SLOTS)
+        for name in display_shm.values()
+    ]
 
     # Spawn processes
     grabbers = [
-        _spawn_grabber(cam_id, url, shm, infer_queue, stop_event)
+        _spawn_grabber(cam_id, url, shm, dispatch, stop_event)
         for cam_id, url, shm in cameras
     ]
-    infer_proc = _spawn_inference(infer_queue, result_queue, stop_event)
+    workers = [
+        _spawn_inference(worker_id, dispatch, result_queue, stop_event, display_shm)
+        for worker_id in range(cfg.INFER_WORKERS)
+    ]
     ui_proc = _spawn_ui(result_queue, stop_event)
 
-    all_procs = grabbers + [infer_proc, ui_proc]
     logger.info(
-        "Spawned %d grabber(s) + inference + UI. Dashboard → http://0.0.0.0:%d",
-        len(grabbers), cfg.UI_PORT,
+        "Spawned %d grabber(s) + %d inference worker(s) + UI. Dashboard → http://0.0.0.0:%d",
+        len(grabbers), len(workers), cfg.UI_PORT,
     )
 
     # Graceful shutdown handler
@@ -151,35 +164,44 @@ def main():
     restart_counts: dict[str, int] = {}
     MAX_RESTARTS = 5
 
+    def _may_restart(key: str, p: mp.Process) -> bool:
+        if p.is_alive() or stop_event.is_set() or restart_counts.get(key, 0) > MAX_RESTARTS:
+            return False
+        restart_counts[key] = restart_counts.get(key, 0) + 1
+        if restart_counts[key] > MAX_RESTARTS:
+            logger.error("%s crashed too many times — giving up", key)
+            return False
+        logger.warning("%s died (exit %s) — restarting (#%d)", key, p.exitcode, restart_counts[key])
+        return True
+
+    stats_logged = time.monotonic()
     while not stop_event.is_set():
         time.sleep(2)
-        for i, p in enumerate(list(grabbers)):
-            if not p.is_alive() and not stop_event.is_set():
-                cam_id, url, shm = cameras[i]
-                key = f"grabber-{cam_id}"
-                restart_counts[key] = restart_counts.get(key, 0) + 1
-                if restart_counts[key] > MAX_RESTARTS:
-                    logger.error("%s crashed too many times — giving up", key)
-                    continue
-                logger.warning("%s died (exit %s) — restarting (#%d)",
-                               key, p.exitcode, restart_counts[key])
-                new_p = _spawn_grabber(cam_id, url, shm, infer_queue, stop_event)
-                grabbers[i] = new_p
-                all_procs[i] = new_p
-
-        if not infer_proc.is_alive() and not stop_event.is_set():
-            key = "inference"
-            restart_counts[key] = restart_counts.get(key, 0) + 1
-            if restart_counts[key] <= MAX_RESTARTS:
-                logger.warning("inference died — restarting (#%d)", restart_counts[key])
-                infer_proc = _spawn_inference(infer_queue, result_queue, stop_event)
+        for i, p in enumerate(grabbers):
+            cam_id, url, shm = cameras[i]
+            if _may_restart(f"grabber-{cam_id}", p):
+                grabbers[i] = _spawn_grabber(cam_id, url, shm, dispatch, stop_event)
+
+        for worker_id, p in enumerate(workers):
+            if _may_restart(f"inference-{worker_id}", p):
+                # Free the camera it died holding; its replacement keeps the affinity
+                dispatch.reset_worker(worker_id)
+                workers[worker_id] = _spawn_inference(worker_id, dispatch, result_queue, stop_event, display_shm)
+
+        if time.monotonic() - stats_logged >= cfg.INFER_STATS_LOG_INTERVAL:
+            stats_logged = time.monotonic()
+            for cam_id, counters in dispatch.stats().items():
+                logger.info("[%s] dispatch: %s", cam_id, counters)
 
     # Teardown
     logger.info("Waiting for processes to exit…")
-    for p in all_procs:
+    for p in grabbers + workers + [ui_proc]:
         p.join(timeout=5)
         if p.is_alive():
             p.terminate()
+    for ring in display_rings:
+        ring.unlink()
+        ring.close()
     logger.info("All processes stopped. Bye.")
 
 
@@ -0,0 +1,336 @@
+"""
+parking_hpc/shm_ring.py
+N-slot SharedMemory frame ring with a per-slot seqlock.
+
+One grabber process writes frames round-robin into N slots; inference readers
+copy a specific slot out by (slot, seq) taken from the motion token. Because the
+writer never touches the slot it wrote last until N-1 newer frames have arrived,
+a reader that keeps up with the camera never races the writer.
+
+SharedMemory layout (all uint64, 64-byte aligned):
+    header [16]       : magic, n_slots, height, width, channels,
+                        frames_written, tokens_issued, tokens_overwritten,
+                        generation, (pad)
+    slot meta [N × 8] : seq, frame_idx, ts_ns, token_seq, consumed_seq, (pad)
+    slot data [N]     : BGR uint8 frame (height × width × channels), 64-byte aligned
+
+Seqlock protocol (single writer per ring):
+    writer : seq += 1 (odd = write in progress) → copy frame → frame_idx/ts → seq += 1 (even)
+    reader : s1 = seq; s1 even? → copy frame → seq == s1? else the copy is torn
+A token carries the even seq of the frame it refers to; if the slot's seq no
+longer matches, the frame was overwritten before it was consumed.
+
+Generation: every create() stamps a new generation (tokens carry it too) and the
+grabber zeroes it before unlinking — also on a crashed predecessor's segment it
+finds at startup. Readers keep their attachment for the process lifetime
+(RingAttachments) and only reattach when the generation they mapped changes.
+
+The seq check relies on aligned 8-byte stores being atomic and not reordered
+with the frame copy, which holds on x86 and in practice on ARM (every numpy call
+crosses the interpreter, which issues full barriers around the GIL).
+"""
+import collections
+import time
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+MAGIC = 0x5250484E47524E47  # "GNRGNHPR" — guards against attaching to a foreign segment
+
+# Header fields
+_H_MAGIC, _H_SLOTS, _H_HEIGHT, _H_WIDTH, _H_CHANNELS = 0, 1, 2, 3, 4
+_H_WRITTEN, _H_TOKENS, _H_OVERWRITTEN = 5, 6, 7
+_H_GENERATION = 8
+_HEADER_WORDS = 16
+
+RETIRED = 0  # generation of a segment whose grabber has gone away
+
+# Per-slot meta fields
+_M_SEQ, _M_FRAME_IDX, _M_TS_NS, _M_TOKEN_SEQ, _M_CONSUMED_SEQ = 0, 1, 2, 3, 4
+_META_WORDS = 8
+
+_ALIGN = 64
+
+
+def _align(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def ring_size(shape: tuple, n_slots: int) -> int:
+    """Total SharedMemory bytes for n_slots frames of the given (h, w, c) shape."""
+    meta_bytes = _HEADER_WORDS * 8 + n_slots * _META_WORDS * 8
+    return _align(meta_bytes) + n_slots * _align(int(np.prod(shape)))
+
+
+class FrameRing:
+    """
+    View over a frame ring segment. Use FrameRing.create() in the grabber
+    (sole writer) and FrameRing.attach() in readers.
+
+    Reader-side counters (per instance) are in self.counters:
+        read_ok, read_torn (copy raced the writer), read_stale (token's frame
+        already overwritten), latest_retry (read_latest hit a slot mid-write).
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool = False):
+        # Checked on a bytes copy so no buffer is exported if we bail out
+        if int.from_bytes(bytes(shm.buf[:8]), "little") != MAGIC:
+            raise ValueError(f"SharedMemory '{shm.name}' is not a frame ring")
+        self._shm = shm
+        self._owner = owner
+        header = np.ndarray((_HEADER_WORDS,), dtype=np.uint64, buffer=shm.buf)
+        self.n_slots = int(header[_H_SLOTS])
+        self.shape = (int(header[_H_HEIGHT]), int(header[_H_WIDTH]), int(header[_H_CHANNELS]))
+        self.generation = int(header[_H_GENERATION])
+        self._header = header
+        self._meta = np.ndarray(
+            (self.n_slots, _META_WORDS), dtype=np.uint64,
+            buffer=shm.buf, offset=_HEADER_WORDS * 8,
+        )
+        data_offset = _align(_HEADER_WORDS * 8 + self.n_slots * _META_WORDS * 8)
+        slot_bytes = _align(int(np.prod(self.shape)))
+        self._frames = [
+            np.ndarray(self.shape, dtype=np.uint8, buffer=shm.buf, offset=data_offset + i * slot_bytes)
+            for i in range(self.n_slots)
+        ]
+        self.counters: collections.Counter = collections.Counter()
+
+    # ── Construction ─────────────────────────────────────────────────────────
+
+    @classmethod
+    def create(cls, name: str, shape: tuple, n_slots: int) -> "FrameRing":
+        """Create (or recreate, if a previous run left it behind) the ring segment."""
+        if n_slots < 2:
+            raise ValueError("A frame ring needs at least 2 slots")
+        size = ring_size(shape, n_slots)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Previous run didn't clean up — its layout may differ, so start fresh.
+            # Retire it first: readers still mapping it must notice and reattach.
+            _retire_segment(name)
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((_HEADER_WORDS,), dtype=np.uint64, buffer=shm.buf)
+        header[:] = 0
+        np.ndarray((n_slots, _META_WORDS), dtype=np.uint64, buffer=shm.buf, offset=_HEADER_WORDS * 8)[:] = 0
+        header[_H_SLOTS] = n_slots
+        header[_H_HEIGHT], header[_H_WIDTH], header[_H_CHANNELS] = shape
+        header[_H_GENERATION] = time.time_ns()
+        header[_H_MAGIC] = MAGIC  # last: readers only trust a fully initialised header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "FrameRing":
+        """Attach to an existing ring; raises FileNotFoundError if the grabber isn't up."""
+        shm = shared_memory.SharedMemory(name=name, create=False)
+        try:
+            return cls(shm)
+        except ValueError:
+            shm.close()
+            raise
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def close(self) -> None:
+        # Drop ndarray views first — SharedMemory.close() fails while buffers are exported
+        self._frames = []
+        self._meta = self._header = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A caller still holds a view(); the mapping goes away when that view does
+            pass
+
+    def unlink(self) -> None:
+        """Owner only: retire the ring (readers reattach) and remove the segment name."""
+        if self._owner:
+            if self._header is not None:
+                self._header[_H_GENERATION] = RETIRED
+            self._shm.unlink()
+
+    def is_current(self) -> bool:
+        """False once the grabber that created this mapping retired it (restart / exit)."""
+        return int(self._header[_H_GENERATION]) == self.generation
+
+    # ── Writer ───────────────────────────────────────────────────────────────
+
+    def write(self, frame: np.ndarray, frame_idx: int, ts: Optional[float] = None) -> tuple[int, int]:
+        """Copy frame into the next slot. Returns (slot, seq) for the motion token."""
+        header = self._header
+        slot = int(header[_H_WRITTEN]) % self.n_slots
+        meta = self._meta[slot]
+
+        token_seq = int(meta[_M_TOKEN_SEQ])
+        if token_seq and int(meta[_M_CONSUMED_SEQ]) != token_seq:
+            header[_H_OVERWRITTEN] += np.uint64(1)
+        meta[_M_TOKEN_SEQ] = 0
+
+        seq = int(meta[_M_SEQ]) + 1
+        meta[_M_SEQ] = seq                       # odd: write in progress
+        np.copyto(self._frames[slot], frame)
+        meta[_M_FRAME_IDX] = frame_idx
+        meta[_M_TS_NS] = int((time.time() if ts is None else ts) * 1e9)
+        meta[_M_SEQ] = seq + 1                   # even: published
+        header[_H_WRITTEN] += np.uint64(1)
+        return slot, seq + 1
+
+    def mark_token(self, slot: int, seq: int) -> None:
+        """Record that a token for (slot, seq) was queued — feeds the overwritten metric."""
+        self._meta[slot, _M_TOKEN_SEQ] = seq
+        self._header[_H_TOKENS] += np.uint64(1)
+
+    # ── Reader ───────────────────────────────────────────────────────────────
+
+    def _copy_slot(self, slot: int, seq: int, out: np.ndarray) -> bool:
+        """Seqlock read of one slot: True if out holds the complete frame for seq."""
+        meta = self._meta[slot]
+        if int(meta[_M_SEQ]) != seq:
+            return False
+        np.copyto(out, self._frames[slot])
+        if int(meta[_M_SEQ]) != seq:
+            self.counters["read_torn"] += 1
+            return False
+        return True
+
+    def view(self, slot: int, seq: int) -> Optional[np.ndarray]:
+        """
+        Read-only zero-copy view of the token's frame, or None if already overwritten.
+        The writer may reuse the slot while the view is in use — call is_valid()
+        after the last access and discard anything derived from it if that fails.
+        """
+        if int(self._meta[slot, _M_SEQ]) != seq:
+            self.counters["read_stale"] += 1
+            return None
+        frame = self._frames[slot].view()
+        frame.flags.writeable = False
+        return frame
+
+    def is_valid(self, slot: int, seq: int) -> bool:
+        """True if slot still holds the frame for seq (seqlock check closing a view())."""
+        if int(self._meta[slot, _M_SEQ]) != seq:
+            self.counters["read_torn"] += 1
+            return False
+        self._meta[slot, _M_CONSUMED_SEQ] = seq
+        self.counters["read_ok"] += 1
+        return True
+
+    def latest(self) -> Optional[tuple[int, int, int]]:
+        """(slot, seq, frame_idx) of the newest published frame; None if empty or mid-write."""
+        written = int(self._header[_H_WRITTEN])
+        if written == 0:
+            return None
+        slot = (written - 1) % self.n_slots
+        meta = self._meta[slot]
+        seq, frame_idx = int(meta[_M_SEQ]), int(meta[_M_FRAME_IDX])
+        if seq % 2:
+            self.counters["latest_retry"] += 1
+            return None
+        return slot, seq, frame_idx
+
+    def read(self, slot: int, seq: int, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """Copy the exact frame a token refers to; None if it was overwritten first."""
+        if out is None:
+            out = np.empty(self.shape, dtype=np.uint8)
+        if not self._copy_slot(slot, seq, out):
+            # The writer only moves forward, so a torn or mismatched seq means the
+            # token's frame is gone for good — retrying the same slot can't help.
+            self.counters["read_stale"] += 1
+            return None
+        self._meta[slot, _M_CONSUMED_SEQ] = seq
+        self.counters["read_ok"] += 1
+        return out
+
+    def read_latest(self, out: Optional[np.ndarray] = None, retries: int = 3) -> Optional[tuple[np.ndarray, int, float]]:
+        """Copy the newest complete frame. Returns (frame, frame_idx, ts) or None if empty / too contended."""
+        if out is None:
+            out = np.empty(self.shape, dtype=np.uint8)
+        for _ in range(retries + 1):
+            written = int(self._header[_H_WRITTEN])
+            if written == 0:
+                return None
+            slot = (written - 1) % self.n_slots
+            meta = self._meta[slot]
+            seq = int(meta[_M_SEQ])
+            frame_idx, ts_ns = int(meta[_M_FRAME_IDX]), int(meta[_M_TS_NS])
+            if seq % 2 == 0 and self._copy_slot(slot, seq, out):
+                # frame_idx/ts were read before the copy; still valid because seq didn't move
+                return out, frame_idx, ts_ns / 1e9
+            self.counters["latest_retry"] += 1
+        return None
+
+    def slot_info(self, slot: int) -> tuple[int, int]:
+        """(seq, frame_idx) currently published in slot."""
+        meta = self._meta[slot]
+        return int(meta[_M_SEQ]), int(meta[_M_FRAME_IDX])
+
+    def stats(self) -> dict:
+        """Writer-side counters from the shared header + this instance's reader counters."""
+        header = self._header
+        return {
+            "generation": self.generation,
+            "frames_written": int(header[_H_WRITTEN]),
+            "tokens_issued": int(header[_H_TOKENS]),
+            "tokens_overwritten": int(header[_H_OVERWRITTEN]),
+            **self.counters,
+        }
+
+
+def _retire_segment(name: str) -> None:
+    """Mark a leftover ring as retired (if it is one) and unlink it."""
+    stale = shared_memory.SharedMemory(name=name, create=False)
+    if int.from_bytes(bytes(stale.buf[:8]), "little") == MAGIC:
+        offset = _H_GENERATION * 8
+        stale.buf[offset:offset + 8] = RETIRED.to_bytes(8, "little")
+    stale.close()
+    stale.unlink()
+
+
+class RingAttachments:
+    """
+    Reader-side cache of FrameRing attachments, one per shm name, kept for the
+    process lifetime instead of an open/mmap/munmap cycle per token.
+    A ring whose generation changed (grabber restarted) is closed and reattached.
+    """
+
+    def __init__(self):
+        self._rings: dict[str, FrameRing] = {}
+        self.counters: collections.Counter = collections.Counter()
+
+    def get(self, name: str) -> Optional[FrameRing]:
+        """Current ring for name, or None while its grabber isn't up."""
+        ring = self._rings.get(name)
+        if ring is not None:
+            if ring.is_current():
+                return ring
+            del self._rings[name]
+            self.counters["reattach"] += 1
+            self.counters.update(ring.counters)  # keep reader counters across generations
+            ring.close()
+        try:
+            ring = FrameRing.attach(name)
+        except (FileNotFoundError, ValueError):
+            self.counters["attach_failed"] += 1
+            return None
+        if ring.generation == RETIRED:  # attached in the instant between retire and unlink
+            ring.close()
+            self.counters["attach_failed"] += 1
+            return None
+        self.counters["attach"] += 1
+        self._rings[name] = ring
+        return ring
+
+    def stats(self) -> dict:
+        """Attach/reattach counts + reader counters summed over every ring ever attached."""
+        total = collections.Counter(self.counters)
+        for ring in self._rings.values():
+            total.update(ring.counters)
+        return dict(total)
+
+    def close(self) -> None:
+        for ring in self._rings.values():
+            self.counters.update(ring.counters)
+            ring.close()
+        self._rings.clear()
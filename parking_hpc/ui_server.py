@@ -3,9 +3,11 @@ parking_hpc/ui_server.py
 Process 3 — Flask-SocketIO Dashboard
 
 Responsibilities:
-  - Consume InferenceResult objects from result_queue
-  - JPEG-encode annotated frames and push via SocketIO (low-latency streaming)
-  - Serve event log, snapshot gallery, and live stats
+  - Consume metadata-only InferenceResult objects from result_queue
+  - Map each camera's display ring (SharedMemory) zero-copy, draw overlays from the
+    result metadata only when there is something to draw, JPEG-encode and push as
+    binary SocketIO messages to the camera's subscribers only (see frame_push.py)
+  - Serve event log, snapshot gallery, live stats and per-viewer stream stats
   - Bind to 0.0.0.0 so it's reachable via Tailscale IP
 
 Accessible at: http://<tailscale-ip>:5050
@@ -22,11 +24,13 @@ from typing import Optional
 
 import cv2
 import numpy as np
-from flask import Flask, render_template_string, jsonify
+from flask import Flask, render_template_string, jsonify, request
 from flask_socketio import SocketIO
 
 from parking_hpc import config as cfg
-from parking_hpc.inference import InferenceResult
+from parking_hpc.frame_push import FramePush
+from parking_hpc.inference import InferenceResult, draw_overlays, has_overlays
+from parking_hpc.shm_ring import RingAttachments
 
 logger = logging.getLogger("ui_server")
 
@@ -36,11 +40,16 @@ flask_app.config["SECRET_KEY"] = os.urandom(24)
 socketio = SocketIO(flask_app, cors_allowed_origins="*", async_mode="threading")
 
 # Shared state (written by background thread, read by Flask routes)
-_latest_frames: dict[str, Optional[np.ndarray]] = {"cam1": None, "cam2": None}
+_latest_results: dict[str, Optional[InferenceResult]] = {"cam1": None, "cam2": None}
 _event_log: deque = deque(maxlen=50)
 _stats: dict = {"plates_today": 0, "faces_today": 0, "snapshots": []}
 _lock = threading.Lock()
 
+# Display rings (created by main, written by inference) mapped once for the process
+_display_rings = RingAttachments()
+_canvas: dict[str, np.ndarray] = {}   # per-camera overlay buffer, reused across frames
+_render_lock = threading.Lock()
+
 
 # ── Background consumer thread ────────────────────────────────────────────────
 
@@ -58,8 +67,8 @@ def _consume_results(result_queue: Queue, stop_event: Event):
         cam_id = result.cam_id
 
         with _lock:
-            if result.annotated_frame is not None:
-                _latest_frames[cam_id] = result.annotated_frame.copy()
+            if result.display_shm:
+                _latest_results[cam_id] = result
 
             if result.plate_text:
                 _stats["plates_today"] += 1
@@ -89,21 +98,76 @@ def _consume_results(result_queue: Queue, stop_event: Event):
         now = time.monotonic()
         if now - t_last_push.get(cam_id, 0) >= frame_interval:
             t_last_push[cam_id] = now
-            frame = _latest_frames.get(cam_id)
-            if frame is not None:
-                _push_frame(cam_id, frame)
+            _push_frame(cam_id)  # no-op (no render, no encode) without subscribers
 
 
-def _push_frame(cam_id: str, frame: np.ndarray):
-    """JPEG-encode frame and emit via SocketIO."""
-    ok, buf = cv2.imencode(
-        ".jpg", frame,
-        [cv2.IMWRITE_JPEG_QUALITY, cfg.UI_JPEG_QUALITY],
-    )
-    if not ok:
+def _render_jpeg(cam_id: str, quality: int) -> Optional[bytes]:
+    """
+    JPEG of the latest result's frame with its overlays, read from the display ring.
+    Without overlays the encoder reads the shared slot directly (zero-copy); with
+    overlays the frame is copied once into a reused per-camera canvas.
+    None if there is no frame yet or the slot was reused while we read it.
+    """
+    with _lock:
+        result = _latest_results.get(cam_id)
+    if result is None:
+        return None
+    with _render_lock:
+        ring = _display_rings.get(result.display_shm)
+        if ring is None:
+            return None
+        view = ring.view(result.display_slot, result.display_seq)
+        if view is None:
+            return None  # overwritten — the newer frame's result is on its way
+        frame = view
+        if has_overlays(result):
+            canvas = _canvas.get(cam_id)
+            if canvas is None or canvas.shape != view.shape:
+                canvas = _canvas[cam_id] = np.empty_like(view)
+            np.copyto(canvas, view)
+            draw_overlays(canvas, result)
+            frame = canvas
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok or not ring.is_valid(result.display_slot, result.display_seq):
+            return None
+        return buf.tobytes()
+
+
+def _emit_frame(sid: str, cam_id: str, jpeg: bytes, ack) -> None:
+    """Binary Socket.IO message to one client; the browser acks once the image is shown."""
+    socketio.emit("frame", {"cam": cam_id, "data": jpeg}, to=sid, callback=lambda *_: ack())
+
+
+_push = FramePush(_emit_frame)
+
+
+def _push_frame(cam_id: str):
+    """JPEG-encode the camera's latest frame once and send it to its subscribers."""
+    _push.publish(cam_id, lambda: _render_jpeg(cam_id, cfg.UI_JPEG_QUALITY))
+
+
+# ── SocketIO events ───────────────────────────────────────────────────────────
+
+@socketio.on("subscribe")
+def on_subscribe(data):
+    cam_id = (data or {}).get("cam")
+    if cam_id not in _latest_results:
         return
-    b64 = base64.b64encode(buf.tobytes()).decode("ascii")
-    socketio.emit("frame", {"cam": cam_id, "data": b64})
+    _push.subscribe(request.sid, cam_id)
+    # Show the current frame right away instead of waiting for the next result
+    jpeg = _render_jpeg(cam_id, cfg.UI_JPEG_QUALITY)
+    if jpeg is not None:
+        _push.offer(request.sid, cam_id, jpeg)
+
+
+@socketio.on("unsubscribe")
+def on_unsubscribe(data):
+    _push.unsubscribe(request.sid, (data or {}).get("cam"))
+
+
+@socketio.on("disconnect")
+def on_disconnect():
+    _push.disconnect(request.sid)
 
 
 # ── Flask routes ──────────────────────────────────────────────────────────────
@@ -129,16 +193,19 @@ def api_stats():
         })
 
 
+@flask_app.route("/api/stream_stats")
+def api_stream_stats():
+    """Per camera: viewers, encodes, encode time; per viewer: bandwidth, drops, CPU share."""
+    return jsonify(_push.stats())
+
+
 @flask_app.route("/api/snapshot/latest/<cam_id>")
 def latest_snapshot(cam_id: str):
     """Return base64 JPEG of the latest frame for a camera."""
-    frame = _latest_frames.get(cam_id)
-    if frame is None:
+    jpeg = _render_jpeg(cam_id, 85)
+    if jpeg is None:
         return jsonify({"error": "no frame"}), 404
-    ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-    if not ok:
-        return jsonify({"error": "encode failed"}), 500
-    return jsonify({"data": base64.b64encode(buf.tobytes()).decode("ascii")})
+    return jsonify({"data": base64.b64encode(jpeg).decode("ascii")})
 
 
 # ── Process entry point ───────────────────────────────────────────────────────
@@ -212,9 +279,19 @@ _DASHBOARD_HTML = """<!DOCTYPE html>
 </div>
 <script>
 const socket = io();
-socket.on('frame', ({cam, data}) => {
+// Subscribe only to cameras that are on the page; frames arrive as binary JPEG
+socket.on('connect', () => {
+  document.querySelectorAll('img[id^="img-"]').forEach(img =>
+    socket.emit('subscribe', {cam: img.id.slice(4)}));
+});
+socket.on('frame', ({cam, data}, ack) => {
   const img = document.getElementById('img-' + cam);
-  if (img) img.src = 'data:image/jpeg;base64,' + data;
+  if (!img) { ack && ack(); return; }
+  const url = URL.createObjectURL(new Blob([data], {type: 'image/jpeg'}));
+  const done = () => { URL.revokeObjectURL(url); ack && ack(); };
+  img.onload = done;
+  img.onerror = done;
+  img.src = url;
 });
 
 async function refreshStats() {
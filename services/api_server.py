@@ -4,7 +4,7 @@ import sqlite3
 import uvicorn
 from fastapi import FastAPI, Request, Response
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
-from core.config import DB_PATH
+from core.config import DB_PATH, METRICS_PUBLIC
 
 app = FastAPI()
 
@@ -29,7 +29,8 @@ def _auth_redirect(request: Request):
     return None
 
 
-def create_api_server(streamer, get_state_fn, mqtt_manager, camera_manager=None, settings_store=None):
+def create_api_server(streamer, get_state_fn, mqtt_manager, camera_manager=None, settings_store=None,
+                      pipeline_metrics=None):
     """Tạo API server với dashboard và endpoints.
 
     Args:
@@ -37,6 +38,7 @@ def create_api_server(streamer, get_state_fn, mqtt_manager, camera_manager=None,
         get_state_fn: Hàm trả về (person_count, truck_count, door_open)
         mqtt_manager: MQTTManager instance
         camera_manager: CameraManager instance (optional, multi-camera)
+        pipeline_metrics: PipelineMetrics instance (optional, GET /api/metrics)
     """
 
     # ── Auth routes ──────────────────────────────────────────────────────────
@@ -203,6 +205,16 @@ def create_api_server(streamer, get_state_fn, mqtt_manager, camera_manager=None,
             return camera_manager.get_all_status()
         return [{"id": "main", "name": "Camera Chính", "online": True, "last_frame_age": None}]
 
+    @app.get("/api/metrics")
+    def prometheus_metrics(request: Request):
+        # Mặc định cần đăng nhập như các API khác; METRICS_PUBLIC=1 để Prometheus scrape không cần session
+        if not METRICS_PUBLIC:
+            redir = _auth_redirect(request)
+            if redir:
+                return redir
+        body = pipeline_metrics.render_prometheus() if pipeline_metrics is not None else ""
+        return Response(content=body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
     @app.post("/api/ptz/{command}")
     def ptz_control(command: str, request: Request):
         redir = _auth_redirect(request)
@@ -285,9 +297,9 @@ def create_api_server(streamer, get_state_fn, mqtt_manager, camera_manager=None,
     return app
 
 
-def start_api_server(streamer, get_state_fn, mqtt_manager, camera_manager=None):
+def start_api_server(streamer, get_state_fn, mqtt_manager, camera_manager=None, pipeline_metrics=None):
     """Khởi chạy API server trên port 8080."""
-    create_api_server(streamer, get_state_fn, mqtt_manager, camera_manager)
+    create_api_server(streamer, get_state_fn, mqtt_manager, camera_manager, pipeline_metrics=pipeline_metrics)
     uvicorn.run(app, host="0.0.0.0", port=8080, log_level="warning")
 
 
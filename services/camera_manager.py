@@ -31,6 +31,9 @@ class CameraStream:
     thread: Optional[threading.Thread] = None
     last_frame_time: float = 0.0
     online: bool = False
+    # Frame mới nhất (đã resize) cho multi-camera detection; seq tăng mỗi frame
+    latest_frame: Optional[object] = None
+    frame_seq: int = 0
     _stop: threading.Event = field(default_factory=threading.Event)
     # Gap tracking
     _gap_start: Optional[float] = field(default=None)
@@ -63,6 +66,22 @@ class CameraManager:
             cam = self._cameras.get(cam_id)
         return cam.streamer if cam else None
 
+    def get_latest_frames(self, exclude=()) -> dict[str, tuple[int, object]]:
+        """Trả về {cam_id: (frame_seq, frame)} của các camera đang online (bỏ qua `exclude`)."""
+        with self._lock:
+            cams = [c for c in self._cameras.values() if c.cam_id not in exclude]
+        result = {}
+        for cam in cams:
+            frame = cam.latest_frame
+            if cam.online and frame is not None:
+                result[cam.cam_id] = (cam.frame_seq, frame)
+        return result
+
+    def get_camera_name(self, cam_id: str) -> str:
+        with self._lock:
+            cam = self._cameras.get(cam_id)
+        return cam.name if cam else cam_id
+
     def get_all_status(self) -> list[dict]:
         """Trả về list trạng thái tất cả cameras."""
         result = []
@@ -122,6 +141,8 @@ class CameraManager:
                     frame = cv2.resize(frame, (STREAM_WIDTH, new_h), interpolation=cv2.INTER_AREA)
 
                 cam.streamer.update_frame(frame)
+                cam.latest_frame = frame
+                cam.frame_seq += 1
                 now = time.time()
 
                 # Close any open gap when frames resume
@@ -1,24 +1,35 @@
+import time
 import numpy as np
 import cv2
-from ultralytics import YOLO
-from core.config import DOOR_MODEL_PATH, USE_AI_DOOR_DETECTION, DOOR_ROI, BRIGHTNESS_THRESHOLD
+from core.config import (
+    DOOR_MODEL_PATH, USE_AI_DOOR_DETECTION, DOOR_ROI, BRIGHTNESS_THRESHOLD,
+    DOOR_CHANGE_THRESHOLD, DOOR_MAX_STALENESS_SECS,
+)
+from core.model_backend import load_model
+from core.model_registry import registry, warmup_yolo
 
-# --- Load door model ---
-door_model = None
+# Kích thước "chữ ký" ROI (ảnh xám thu nhỏ) dùng để phát hiện thay đổi
+DOOR_SIGNATURE_SIZE = (32, 24)
+
+
+def _load_door_model():
+    model = load_model(DOOR_MODEL_PATH, name="door")
+    print(f"✅ Loaded door detection model: {DOOR_MODEL_PATH}")
+    return model
+
+
+# --- Door model: load lười ở nền lần đầu cần tới, tới lúc đó dùng phương pháp độ sáng ---
 if USE_AI_DOOR_DETECTION:
-    try:
-        door_model = YOLO(DOOR_MODEL_PATH)
-        print(f"✅ Loaded door detection model: {DOOR_MODEL_PATH}")
-    except Exception as e:
-        print(f"⚠️ Không thể load door model: {e}. Dùng phương pháp độ sáng.")
+    registry.register("door", _load_door_model, warmup=warmup_yolo(), lazy=True, required=False)
 
 
-def check_door_state(frame):
+def classify_door_state(frame):
     """
-    Kiểm tra trạng thái cửa cuốn.
+    Phân loại trạng thái cửa cuốn (chạy model / tính độ sáng, không cache).
     Returns: 'open', 'closed', hoặc 'unknown'
     """
-    # Phương pháp 1: AI Model (nếu có)
+    # Phương pháp 1: AI Model (nếu đã load xong)
+    door_model = registry.get("door", wait=False) if USE_AI_DOOR_DETECTION else None
     if door_model is not None:
         results = door_model(frame, verbose=False)
         for r in results:
@@ -47,3 +58,102 @@ def check_door_state(frame):
             return 'closed'
 
     return 'unknown'
+
+
+def door_model_ready():
+    """Model cửa lazy đã load xong (classify_door_state đang dùng model thay vì độ sáng)."""
+    return USE_AI_DOOR_DETECTION and registry.is_ready("door")
+
+
+def _roi_signature(frame):
+    """Ảnh xám thu nhỏ của DOOR_ROI (float32), None nếu ROI nằm ngoài frame."""
+    x1, y1, x2, y2 = DOOR_ROI
+    h, w = frame.shape[:2]
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(w, x2), min(h, y2)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    gray = cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, DOOR_SIGNATURE_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+class DoorStateDetector:
+    """
+    Chỉ phân loại lại trạng thái cửa khi DOOR_ROI thay đổi.
+
+    So sánh chữ ký ROI hiện tại với chữ ký lúc phân loại gần nhất (sai khác tuyệt đối
+    trung bình, thang 0-255). Dưới `change_threshold` và chưa quá `max_staleness_secs`
+    → trả lại trạng thái cũ, không chạy model. `clock` là nguồn thời gian cho hạn staleness.
+
+    Trạng thái phân loại bằng fallback độ sáng lúc model cửa còn đang load không được giữ lại:
+    frame đầu tiên sau khi `model_ready_fn()` thành True luôn được phân loại lại bằng model.
+    """
+
+    def __init__(self, classify_fn=classify_door_state, change_threshold=DOOR_CHANGE_THRESHOLD,
+                 max_staleness_secs=DOOR_MAX_STALENESS_SECS, clock=time.monotonic,
+                 model_ready_fn=door_model_ready):
+        self._classify = classify_fn
+        self._clock = clock
+        self._model_ready = model_ready_fn
+        self._from_model = False  # trạng thái hiện tại do model phân loại (không phải fallback)
+        self._threshold = change_threshold
+        self._max_staleness = max_staleness_secs
+        self._ref_signature = None
+        self._state = 'unknown'
+        self._classified_at = 0.0
+        self._last_diff = 0.0
+        self._counters = {
+            "frames": 0,
+            "model_runs": 0,
+            "skipped": 0,
+            "runs_on_change": 0,
+            "runs_on_staleness": 0,
+            "runs_on_model_ready": 0,
+        }
+
+    def check(self, frame):
+        self._counters["frames"] += 1
+        signature = _roi_signature(frame)
+        now = self._clock()
+        model_ready = self._model_ready()
+        if signature is not None and self._ref_signature is not None:
+            self._last_diff = float(cv2.absdiff(signature, self._ref_signature).mean())
+            if model_ready and not self._from_model:
+                self._counters["runs_on_model_ready"] += 1
+            elif self._last_diff >= self._threshold:
+                self._counters["runs_on_change"] += 1
+            elif now - self._classified_at >= self._max_staleness:
+                self._counters["runs_on_staleness"] += 1
+            else:
+                self._counters["skipped"] += 1
+                return self._state
+
+        self._state = self._classify(frame)
+        self._from_model = model_ready
+        self._counters["model_runs"] += 1
+        self._ref_signature = signature
+        self._classified_at = now
+        return self._state
+
+    def stats(self):
+        data = dict(self._counters)
+        data["skip_ratio"] = round(data["skipped"] / data["frames"], 3) if data["frames"] else 0.0
+        data["last_diff"] = round(self._last_diff, 2)
+        data["state"] = self._state
+        return data
+
+
+_door_detector = DoorStateDetector()
+
+
+def check_door_state(frame):
+    """
+    Kiểm tra trạng thái cửa cuốn (chỉ chạy model khi ROI thay đổi hoặc quá hạn).
+    Returns: 'open', 'closed', hoặc 'unknown'
+    """
+    return _door_detector.check(frame)
+
+
+def door_state_stats():
+    """Số lần chạy model / bỏ qua của check_door_state."""
+    return _door_detector.stats()
@@ -1,53 +1,358 @@
+import hashlib
 import os
+import threading
+import time
 import cv2
-from core.config import FACES_DIR, FACE_RECOGNITION_AVAILABLE
+import numpy as np
+from core.config import FACES_DIR, FACE_EMBEDDING_CACHE_PATH, FACE_RECOGNITION_AVAILABLE
+from core.model_registry import registry
 
 if FACE_RECOGNITION_AVAILABLE:
     import face_recognition
 
+FACE_MATCH_TOLERANCE = 0.6
+FACE_EMBEDDING_DIM = 128
+FACE_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# Vùng tìm mặt: phần trên của bbox người (đầu + vai)
+FACE_UPPER_RATIO = 0.45
+# Chiều cao chuẩn hóa mỗi crop trong ảnh ghép (mosaic) trước khi detect, và hệ số phóng to tối đa
+FACE_CROP_HEIGHT = 160
+FACE_MAX_UPSCALE = 2.0
+
 # --- Dữ liệu khuôn mặt ---
 authorized_face_encodings = []
 authorized_face_names = []
+# (ma trận (N, 128), list tên) dùng để so khớp một lần bằng NumPy; thay cả cặp bằng một phép gán
+_gallery = (np.zeros((0, FACE_EMBEDDING_DIM), dtype=np.float64), [])
+# Tăng mỗi lần load_faces → cache theo track biết cần kiểm tra lại người lạ
+faces_version = 0
+# Telegram /staff_face và lần nạp lười đầu tiên có thể gọi load_faces cùng lúc
+_load_lock = threading.Lock()
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_embedding_cache(path):
+    """{filename: {"size", "mtime_ns", "sha256", "encoding" | None}} từ file .npz (lỗi/không có → rỗng)."""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return {
+                str(name): {
+                    "size": int(size),
+                    "mtime_ns": int(mtime_ns),
+                    "sha256": str(sha),
+                    "encoding": enc.copy() if has_face else None,
+                }
+                for name, size, mtime_ns, sha, enc, has_face in zip(
+                    data["names"], data["sizes"], data["mtimes_ns"], data["sha256"],
+                    data["encodings"], data["has_face"],
+                )
+            }
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Cache embedding khuôn mặt hỏng ({e}), encode lại toàn bộ")
+        return {}
+
 
+def _write_embedding_cache(path, entries):
+    names = sorted(entries)
+    encodings = np.zeros((len(names), FACE_EMBEDDING_DIM), dtype=np.float64)
+    has_face = np.zeros(len(names), dtype=bool)
+    for i, name in enumerate(names):
+        if entries[name]["encoding"] is not None:
+            encodings[i] = entries[name]["encoding"]
+            has_face[i] = True
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            names=np.array(names, dtype=str),
+            sizes=np.array([entries[n]["size"] for n in names], dtype=np.int64),
+            mtimes_ns=np.array([entries[n]["mtime_ns"] for n in names], dtype=np.int64),
+            sha256=np.array([entries[n]["sha256"] for n in names], dtype=str),
+            encodings=encodings,
+            has_face=has_face,
+        )
+    os.replace(tmp_path, path)
+
+
+def _encode_face_file(filepath):
+    img = face_recognition.load_image_file(filepath)
+    encodings = face_recognition.face_encodings(img)
+    return np.asarray(encodings[0], dtype=np.float64) if encodings else None
+
+
+def load_faces(cache_path=FACE_EMBEDDING_CACHE_PATH):
+    """Load/Reload danh sách khuôn mặt từ thư mục config/faces.
+
+    Embedding được cache trên đĩa (cache_path, None = tắt): ảnh có cùng size + mtime dùng lại
+    ngay; đổi size/mtime nhưng cùng sha256 (touch, đổi tên) cũng dùng lại; chỉ ảnh mới / sửa
+    nội dung mới phải encode. Ảnh đã xóa bị bỏ khỏi cache.
+    """
+    global authorized_face_encodings, authorized_face_names, _gallery, faces_version
+    with _load_lock:
+        if not FACE_RECOGNITION_AVAILABLE:
+            entries, encoded = {}, 0
+        else:
+            entries, encoded = _scan_faces_dir(cache_path)
 
-def load_faces():
-    """Load/Reload danh sách khuôn mặt từ thư mục config/faces."""
-    global authorized_face_encodings, authorized_face_names
-    authorized_face_encodings = []
-    authorized_face_names = []
-    if FACE_RECOGNITION_AVAILABLE and os.path.exists(FACES_DIR):
+        names_list = []
+        encodings_list = []
+        for filename in sorted(entries):
+            encoding = entries[filename]["encoding"]
+            if encoding is not None:
+                encodings_list.append(encoding)
+                names_list.append(os.path.splitext(filename)[0].replace("_", " "))
+
+        # Thay cả bộ một lần để thread main loop không thấy danh sách đang dựng dở
+        _gallery = (np.array(encodings_list, dtype=np.float64).reshape(-1, FACE_EMBEDDING_DIM), names_list)
+        authorized_face_encodings = encodings_list
+        authorized_face_names = names_list
+        faces_version += 1
+    print(
+        f"✅ Loaded {len(names_list)} authorized faces ({encoded} encoded, "
+        f"{len(entries) - encoded} from cache): {names_list}"
+    )
+    return len(names_list)
+
+
+def _scan_faces_dir(cache_path):
+    """Đối chiếu FACES_DIR với cache, encode ảnh mới/đổi; trả về (entries, số ảnh vừa encode)."""
+    cached = _read_embedding_cache(cache_path)
+    by_sha = {entry["sha256"]: entry for entry in cached.values()}
+    entries = {}
+    encoded = 0
+    changed = False
+    if os.path.exists(FACES_DIR):
         for filename in os.listdir(FACES_DIR):
-            if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-                filepath = os.path.join(FACES_DIR, filename)
-                try:
-                    img = face_recognition.load_image_file(filepath)
-                    encodings = face_recognition.face_encodings(img)
-                    if encodings:
-                        authorized_face_encodings.append(encodings[0])
-                        name = os.path.splitext(filename)[0].replace("_", " ")
-                        authorized_face_names.append(name)
-                except Exception as e:
-                    print(f"Lỗi load face {filename}: {e}")
-    print(f"✅ Loaded {len(authorized_face_names)} authorized faces: {authorized_face_names}")
+            if not filename.lower().endswith(FACE_IMAGE_EXTENSIONS):
+                continue
+            filepath = os.path.join(FACES_DIR, filename)
+            try:
+                st = os.stat(filepath)
+                entry = cached.get(filename)
+                if entry is None or entry["size"] != st.st_size or entry["mtime_ns"] != st.st_mtime_ns:
+                    sha = _file_sha256(filepath)
+                    reused = by_sha.get(sha)
+                    if reused is not None:
+                        encoding = reused["encoding"]
+                    else:
+                        encoding = _encode_face_file(filepath)
+                        encoded += 1
+                    entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha, "encoding": encoding}
+                    changed = True
+                entries[filename] = entry
+            except Exception as e:
+                print(f"Lỗi load face {filename}: {e}")
+
+    # Ảnh bị xóa cũng làm cache đổi
+    if cache_path and (changed or entries.keys() != cached.keys()):
+        try:
+            _write_embedding_cache(cache_path, entries)
+        except OSError as e:
+            print(f"⚠️ Không ghi được cache embedding khuôn mặt: {e}")
+    return entries, encoded
+
+
+def _faces_ready():
+    """Đã nạp danh sách khuôn mặt chưa; lần đầu được hỏi → nạp ở nền (entry 'faces' của registry).
+
+    Chưa nạp xong thì bỏ qua nhận diện thay vì coi mọi người là người lạ.
+    """
+    if faces_version > 0:
+        return True
+    registry.get("faces", wait=False)
+    return False
+
+
+def match_encodings(face_encs, tolerance=FACE_MATCH_TOLERANCE):
+    """So khớp M encoding với toàn bộ khuôn mặt đã biết bằng một ma trận khoảng cách (M, N).
+
+    Trả về list tên (hoặc "STRANGER") theo thứ tự face_encs.
+    """
+    known, names = _gallery
+    if len(face_encs) == 0:
+        return []
+    if len(known) == 0:
+        return ["STRANGER"] * len(face_encs)
+    encs = np.asarray(face_encs, dtype=np.float64).reshape(-1, known.shape[1])
+    distances = np.linalg.norm(encs[:, None, :] - known[None, :, :], axis=2)
+    best = distances.argmin(axis=1)
+    best_dist = distances[np.arange(len(encs)), best]
+    return [names[idx] if dist <= tolerance else "STRANGER" for idx, dist in zip(best, best_dist)]
 
 
 def check_face(frame):
     """Nhận diện khuôn mặt và kiểm tra trong danh sách ủy quyền."""
-    if not FACE_RECOGNITION_AVAILABLE or not authorized_face_encodings:
+    if not FACE_RECOGNITION_AVAILABLE or not _faces_ready() or not authorized_face_encodings:
         return None, None
 
     rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     face_locations = face_recognition.face_locations(rgb_frame)
+    if not face_locations:
+        return None, None
     face_encs = face_recognition.face_encodings(rgb_frame, face_locations)
+    names = match_encodings(face_encs)
 
-    for face_enc, loc in zip(face_encs, face_locations):
-        matches = face_recognition.compare_faces(authorized_face_encodings, face_enc, tolerance=0.6)
-        if True in matches:
-            name = authorized_face_names[matches.index(True)]
+    # Ưu tiên người quen; nếu không có ai quen thì báo người lạ đầu tiên
+    for name, loc in zip(names, face_locations):
+        if name != "STRANGER":
             return name, loc
+    return ("STRANGER", face_locations[0]) if names else (None, None)
+
+
+class FaceTrackCache:
+    """Kết quả nhận diện khuôn mặt theo track ID người.
+
+    - Người quen: giữ tới khi track biến mất (không embed lại).
+    - Người lạ: kiểm tra lại sau `stranger_recheck_secs` hoặc khi load_faces() chạy lại.
+    - Chưa thấy mặt (quay lưng...): thử lại sau `retry_secs`.
+    - `clock`: nguồn thời gian (mặc định time.monotonic; bench dùng đồng hồ theo frame).
+    """
+
+    def __init__(self, stranger_recheck_secs=10.0, retry_secs=1.0, clock=time.monotonic):
+        self._stranger_recheck = stranger_recheck_secs
+        self._retry = retry_secs
+        self.clock = clock
+        self._entries = {}  # track_id -> (name | None, checked_at, faces_version)
+        self.embeds = 0
+        self.hits = 0
+
+    def get(self, track_id):
+        entry = self._entries.get(track_id)
+        return entry[0] if entry else None
+
+    def needs_check(self, track_id, now=None):
+        entry = self._entries.get(track_id)
+        if entry is None:
+            return True
+        name, checked_at, version = entry
+        now = self.clock() if now is None else now
+        if name is None:
+            due = now - checked_at >= self._retry
+        elif name == "STRANGER":
+            due = version != faces_version or now - checked_at >= self._stranger_recheck
         else:
-            return "STRANGER", loc
-    return None, None
+            due = False
+        if not due:
+            self.hits += 1
+        return due
+
+    def update(self, track_id, name, now=None):
+        """Lưu kết quả; trả về True nếu tên của track thay đổi (người mới / mới nhận ra)."""
+        prev = self.get(track_id)
+        if name is None and prev is not None:
+            name = prev  # lần này không thấy mặt → giữ kết quả cũ
+        now = self.clock() if now is None else now
+        self._entries[track_id] = (name, now, faces_version)
+        return name is not None and name != prev
+
+    def evict(self, track_ids):
+        for track_id in track_ids:
+            self._entries.pop(track_id, None)
+
+
+def _upper_body_crop(frame, box):
+    x1, y1, x2, y2 = box
+    h, w = frame.shape[:2]
+    x1, x2 = max(0, x1), min(w, x2)
+    y1 = max(0, y1)
+    y2 = min(h, y1 + int((y2 - y1) * FACE_UPPER_RATIO))
+    if x2 - x1 < 8 or y2 - y1 < 8:
+        return None, (x1, y1)
+    return frame[y1:y2, x1:x2], (x1, y1)
+
+
+def check_faces(frame, person_boxes, cache):
+    """Nhận diện khuôn mặt trong phần trên bbox người (từ YOLO tracker), có cache theo track.
+
+    Các crop cần kiểm tra được ghép ngang thành một ảnh → một lần face_locations +
+    một lần face_encodings, rồi so khớp bằng một ma trận khoảng cách.
+
+    Args:
+        person_boxes: {track_id: (x1, y1, x2, y2)} của người trong frame hiện tại.
+        cache: FaceTrackCache.
+
+    Returns:
+        list (track_id, name, loc, is_new): loc = (top, right, bottom, left) trên frame
+        khi vừa detect, None khi lấy từ cache; is_new = tên của track vừa thay đổi.
+    """
+    if not FACE_RECOGNITION_AVAILABLE or not person_boxes or not _faces_ready() or not authorized_face_encodings:
+        return []
+
+    now = cache.clock()
+    results = []
+    pending = []  # (track_id, resized_crop, scale, origin)
+    for track_id, box in person_boxes.items():
+        if not cache.needs_check(track_id, now):
+            name = cache.get(track_id)
+            if name is not None:
+                results.append((track_id, name, None, False))
+            continue
+        crop, origin = _upper_body_crop(frame, box)
+        if crop is None:
+            continue
+        # Cùng một tỉ lệ cho hai chiều: crop thấp bị giới hạn upscale sẽ thấp hơn
+        # FACE_CROP_HEIGHT và được pad khi ghép mosaic, không bị kéo giãn dọc
+        scale = min(FACE_MAX_UPSCALE, FACE_CROP_HEIGHT / float(crop.shape[0]))
+        resized = cv2.resize(
+            crop, (max(1, int(crop.shape[1] * scale)), max(1, int(crop.shape[0] * scale)))
+        )
+        pending.append((track_id, resized, scale, origin))
+
+    if not pending:
+        return results
+
+    # Ghép ngang các crop (pad cho cùng chiều cao) → detect + embed một lần
+    mosaic_h = max(p[1].shape[0] for p in pending)
+    offsets = []
+    x = 0
+    for _, resized, _, _ in pending:
+        offsets.append(x)
+        x += resized.shape[1]
+    mosaic = np.zeros((mosaic_h, x, 3), dtype=np.uint8)
+    for (_, resized, _, _), off in zip(pending, offsets):
+        mosaic[:resized.shape[0], off:off + resized.shape[1]] = resized
+
+    rgb_mosaic = cv2.cvtColor(mosaic, cv2.COLOR_BGR2RGB)
+    locations = face_recognition.face_locations(rgb_mosaic)
+    encs = face_recognition.face_encodings(rgb_mosaic, locations) if locations else []
+    cache.embeds += len(encs)
+    names = match_encodings(encs)
+
+    found = {}
+    for (top, right, bottom, left), name in zip(locations, names):
+        cx = (left + right) / 2.0
+        idx = int(np.searchsorted(offsets, cx, side="right")) - 1
+        if idx < 0:
+            continue
+        track_id, _, scale, (ox, oy) = pending[idx]
+        off = offsets[idx]
+        loc = (
+            int(top / scale) + oy,
+            int((right - off) / scale) + ox,
+            int(bottom / scale) + oy,
+            int((left - off) / scale) + ox,
+        )
+        # Một track có nhiều mặt → ưu tiên người quen
+        if track_id not in found or (found[track_id][0] == "STRANGER" and name != "STRANGER"):
+            found[track_id] = (name, loc)
+
+    for track_id, _, _, _ in pending:
+        name, loc = found.get(track_id, (None, None))
+        is_new = cache.update(track_id, name, now)
+        name = cache.get(track_id)
+        if name is not None:
+            results.append((track_id, name, loc, is_new))
+    return results
 
 
 def check_plate(plate_text, authorized_plates):
@@ -59,5 +364,6 @@ def check_plate(plate_text, authorized_plates):
     return False, None
 
 
-# Load danh sách khuôn mặt lúc khởi tạo
-load_faces()
+# Encode toàn bộ ảnh khuôn mặt tốn nhiều giây → không làm lúc import, nạp lười lần đầu cần nhận diện
+if FACE_RECOGNITION_AVAILABLE:
+    registry.register("faces", load_faces, lazy=True, required=False)
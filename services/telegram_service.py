@@ -44,6 +44,18 @@ def notify_telegram(message, important=False):
             print(f"Lỗi gửi Telegram fallback: {e}")
 
 
+def notify_telegram_photo(photo_path, caption, important=False):
+    """Gửi ảnh kèm caption qua bot mặc định; lỗi thì fallback gửi text quan trọng."""
+    chat_id = CHAT_IMPORTANT if important else CHAT_REGULAR
+    url = f"https://api.telegram.org/bot{TOKEN}/sendPhoto"
+    try:
+        with open(photo_path, "rb") as f:
+            requests.post(url, data={"chat_id": chat_id, "caption": caption}, files={"photo": f}, timeout=10)
+    except Exception as e:
+        print(f"Lỗi gửi ảnh Telegram: {e}")
+        notify_telegram(caption, important=True)
+
+
 def handle_telegram_command(text, chat_id, user_id, db, load_faces_fn, mqtt_manager):
     """Xử lý lệnh từ Telegram."""
     parts = text.strip().split()
@@ -54,7 +54,7 @@ class TestAuthSecurity(unittest.TestCase):
         create_api_server(mock_streamer, mock_get_state, mock_mqtt)
         client = TestClient(app, follow_redirects=False)
 
-        protected_routes = ["/dashboard", "/api/status", "/api/cameras/status"]
+        protected_routes = ["/dashboard", "/api/status", "/api/cameras/status", "/api/metrics"]
         for route in protected_routes:
             resp = client.get(route)
             self.assertIn(resp.status_code, [302, 307],
@@ -99,6 +99,23 @@ class TestAuthSecurity(unittest.TestCase):
         self.assertIn("httponly", set_cookie.lower(),
                       "Session cookie phải có HttpOnly flag")
 
+    def test_metrics_public_only_when_opted_in(self):
+        """/api/metrics chỉ bỏ qua auth khi bật METRICS_PUBLIC."""
+        from fastapi.testclient import TestClient
+        from services import api_server
+        from services.api_server import create_api_server, app
+
+        mock_streamer = MagicMock()
+        mock_streamer.generate.return_value = iter([])
+        create_api_server(mock_streamer, MagicMock(return_value=(0,0,False)), MagicMock())
+        client = TestClient(app, follow_redirects=False)
+
+        self.assertIn(client.get("/api/metrics").status_code, [302, 307])
+        with patch.object(api_server, "METRICS_PUBLIC", True):
+            resp = client.get("/api/metrics")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("text/plain", resp.headers.get("content-type", ""))
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # 2. PATH TRAVERSAL — Snapshot endpoint
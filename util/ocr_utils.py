@@ -3,14 +3,23 @@ Vietnamese License Plate OCR using PaddleOCR
 Tối ưu cho biển số xe tải 2 dòng màu vàng (VD: 88C 073.04)
 
 Target: Ubuntu/Linux
+
+Profile tiền xử lý (rẻ → đắt):
+    none  : chỉ phóng to crop nhỏ, giữ ảnh màu
+    light : grayscale + CLAHE
+    full  : grayscale + adaptive threshold + fastNlMeansDenoising (cách cũ, chậm nhất)
+    auto  : thử lần lượt ESCALATION_STEPS, dừng ở bước đầu tiên đủ tin cậy
+
+rec_only=True: crop từ YOLO biển số đã bó sát → bỏ bước det/cls của PaddleOCR, chỉ chạy rec.
+Bước cuối của auto luôn là full + det (như trước đây) nên độ chính xác không kém hơn.
 """
 
 import os
 import re
 import logging
+from collections import Counter
 import cv2
 import numpy as np
-from paddleocr import PaddleOCR
 
 # Tắt check model source để khởi động nhanh hơn
 os.environ.setdefault('PADDLE_PDX_DISABLE_MODEL_SOURCE_CHECK', 'True')
@@ -32,13 +41,36 @@ class VNPlateOCR:
     # Ký tự hợp lệ cho biển số VN
     VALID_CHARS = set("ABCDEFGHKLMNPSTUVXYZ0123456789")
 
-    def __init__(self):
-        """Khởi tạo PaddleOCR cho biển số VN."""
-        self.ocr = PaddleOCR(
-            lang='en',
-            use_textline_orientation=True,
-        )
-        logger.info("VNPlateOCR initialized")
+    PREPROCESS_PROFILES = ("none", "light", "full")
+
+    # Thang leo thang của profile "auto": (profile, rec_only)
+    ESCALATION_STEPS = (("none", True), ("light", True), ("full", False))
+
+    def __init__(self, profile: str = "full", rec_only: bool = False, escalate_conf: float = 0.7,
+                 engine=None):
+        """Khởi tạo PaddleOCR cho biển số VN.
+
+        profile: "none" / "light" / "full" / "auto" (xem docstring module).
+        rec_only: chỉ nhận dạng (bỏ det) khi profile cố định; "auto" tự chọn theo ESCALATION_STEPS.
+        escalate_conf: "auto" dừng ở bước đầu tiên có text và độ tin cậy >= ngưỡng này.
+        engine: đối tượng có .ocr() kiểu PaddleOCR (mặc định tạo PaddleOCR).
+        """
+        if profile not in self.PREPROCESS_PROFILES and profile != "auto":
+            raise ValueError(f"Profile tiền xử lý không hợp lệ: {profile}")
+        self.profile = profile
+        self.rec_only = rec_only
+        self.escalate_conf = escalate_conf
+        # Số lần đọc kết thúc ở từng bước (profile:rec|det) → chỉnh ngưỡng / thang leo
+        self.step_counts: Counter[str] = Counter()
+        self._clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 4))
+        if engine is None:
+            from paddleocr import PaddleOCR
+            engine = PaddleOCR(
+                lang='en',
+                use_textline_orientation=True,
+            )
+        self.ocr = engine
+        logger.info("VNPlateOCR initialized (profile=%s, rec_only=%s)", profile, rec_only)
 
     def is_two_line_plate(self, plate_img: np.ndarray) -> bool:
         """
@@ -54,23 +86,30 @@ class VNPlateOCR:
         
         return (h / w) > self.TWO_LINE_RATIO_THRESHOLD
 
-    def preprocess(self, plate_img: np.ndarray) -> np.ndarray:
-        """Tiền xử lý ảnh để tăng độ chính xác OCR."""
+    def preprocess(self, plate_img: np.ndarray, profile: str = "full") -> np.ndarray:
+        """Tiền xử lý ảnh để tăng độ chính xác OCR theo profile none / light / full."""
         if plate_img is None or plate_img.size == 0:
             return plate_img
-        
+
+        # Phóng to nếu ảnh quá nhỏ
+        h, w = plate_img.shape[:2]
+        if w < 100:
+            scale = 100 / w
+            plate_img = cv2.resize(plate_img, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+
+        if profile == "none":
+            return plate_img
+
         # Chuyển grayscale
         if len(plate_img.shape) == 3:
             gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
         else:
             gray = plate_img
-        
-        # Phóng to nếu ảnh quá nhỏ
-        h, w = gray.shape[:2]
-        if w < 100:
-            scale = 100 / w
-            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
-        
+
+        if profile == "light":
+            # CLAHE: cân bằng sáng cục bộ, rẻ hơn denoise nhiều lần
+            return self._clahe.apply(gray)
+
         # Adaptive threshold
         thresh = cv2.adaptiveThreshold(
             gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
@@ -95,27 +134,61 @@ class VNPlateOCR:
         
         return top, bottom
 
-    def ocr_image(self, img: np.ndarray) -> tuple:
-        """OCR một ảnh đơn. Trả về (text, prob)"""
-        if img is None or img.size == 0:
-            return "", 0.0
-        
+    def ocr_image(self, img: np.ndarray, rec_only: bool = False) -> tuple:
+        """OCR một ảnh đơn. Trả về (text, prob)
+
+        rec_only=True: ảnh đã là một dòng chữ bó sát → chỉ chạy recognition (det=False, cls=False).
+        """
+        return self.ocr_images([img], rec_only)[0]
+
+    def ocr_images(self, imgs: list, rec_only: bool = False) -> list:
+        """OCR nhiều ảnh, trả về [(text, prob), ...] đúng thứ tự đầu vào.
+
+        rec_only=True: một lần gọi recognition cho cả list (PaddleOCR tự chia batch rec_batch_num);
+        có det thì PaddleOCR không nhận list → gọi lần lượt từng ảnh.
+        """
+        results = [("", 0.0)] * len(imgs)
+        valid = [i for i, img in enumerate(imgs) if img is not None and img.size > 0]
+        if not valid:
+            return results
+
         # Chuyển sang BGR nếu là grayscale
-        if len(img.shape) == 2:
-            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
-        
+        batch = [self._to_bgr(imgs[i]) for i in valid]
+
         # PaddleOCR dùng ocr() hoặc predict(). Trong script này dùng ocr([..., det=True, rec=True, cls=True])
         # PaddleOCR mặc định truyền list các boxes: [ [ [coords], (text, score) ], ... ]
-        result = self.ocr.ocr(img, det=True, rec=True, cls=True)
-        
-        if not result or not result[0]:
-            return "", 0.0
-        
+        # Với det=False, mỗi phần tử của list đầu vào là một "trang":
+        #   ocr([a, b])   → [[(text a)], [(text b)]]   (từng ảnh nhận riêng)
+        #   ocr([[a, b]]) → [[(text a), (text b)]]     (một trang = cả batch, rec theo rec_batch_num)
+        # → bọc batch trong một list để result[0] là kết quả từng ảnh theo thứ tự.
+        if rec_only:
+            result = self.ocr.ocr([batch], det=False, rec=True, cls=False)
+            lines = result[0] if result and result[0] else []
+            for i, line in zip(valid, lines):
+                results[i] = self._join_lines([line])
+        else:
+            for i, img in zip(valid, batch):
+                result = self.ocr.ocr(img, det=True, rec=True, cls=True)
+                if result and result[0]:
+                    results[i] = self._join_lines([line[1] for line in result[0]])
+        return results
+
+    @staticmethod
+    def _to_bgr(img: np.ndarray) -> np.ndarray:
+        if len(img.shape) == 2:
+            return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        return img
+
+    @staticmethod
+    def _join_lines(lines) -> tuple:
+        """[(text, score), ...] → (text ghép, score trung bình), bỏ dòng rỗng."""
         texts = []
         scores = []
-        for line in result[0]:
-            texts.append(line[1][0])
-            scores.append(line[1][1])
+        for text, score in lines:
+            if not text:
+                continue
+            texts.append(text)
+            scores.append(float(score))
         
         avg_score = sum(scores) / len(scores) if scores else 0.0
         return "".join(texts), avg_score
@@ -143,32 +216,84 @@ class VNPlateOCR:
         
         return "".join(result)
 
-    def read_plate_with_prob(self, plate_img: np.ndarray, preprocess: bool = True) -> tuple:
+    def _read_step(self, plate_imgs: list, profile: str, rec_only: bool) -> list:
+        """Một bước đọc (profile / chế độ cố định) cho nhiều biển: [(text_chuẩn_hóa, độ_tin_cậy), ...].
+
+        Mọi dòng của mọi biển (biển 2 dòng → 2 ảnh) đi chung một lần ocr_images.
+        """
+        pieces, owners = [], []
+        for idx, plate_img in enumerate(plate_imgs):
+            if self.is_two_line_plate(plate_img):
+                lines = self.segment_two_line(plate_img)
+            else:
+                lines = (plate_img,)
+            for line in lines:
+                pieces.append(self.preprocess(line, profile))
+                owners.append(idx)
+
+        texts = [[] for _ in plate_imgs]
+        scores = [[] for _ in plate_imgs]
+        for idx, (text, score) in zip(owners, self.ocr_images(pieces, rec_only)):
+            texts[idx].append(text)
+            scores[idx].append(score)
+        return [
+            (self.normalize_result("".join(t)), sum(s) / len(s))
+            for t, s in zip(texts, scores)
+        ]
+
+    def read_plates_with_prob(self, plate_imgs: list, preprocess: bool = True,
+                              profile: str = None) -> list:
+        """
+        Đọc nhiều biển số (vd. mọi biển trong một frame) trong ít lần gọi PaddleOCR nhất.
+        Trả về [(biển_số_chuẩn_hóa, độ_tin_cậy), ...] đúng thứ tự đầu vào.
+
+        profile=None dùng self.profile; preprocess=False tương đương profile "none".
+        "auto": đi theo ESCALATION_STEPS; mỗi bước chỉ đọc lại các biển chưa đủ escalate_conf,
+        mỗi biển giữ kết quả tin cậy nhất.
+        """
+        results = [("", 0.0)] * len(plate_imgs)
+        pending = [i for i, img in enumerate(plate_imgs) if img is not None and img.size > 0]
+        if not pending:
+            return results
+
+        profile = profile or self.profile
+        if not preprocess:
+            profile = "none"
+        if profile != "auto":
+            steps = ((profile, self.rec_only),)
+        else:
+            steps = self.ESCALATION_STEPS
+
+        for step_profile, rec_only in steps:
+            step = f"{step_profile}:{'rec' if rec_only else 'det'}"
+            still_pending = []
+            for i, (text, score) in zip(pending, self._read_step([plate_imgs[i] for i in pending],
+                                                                 step_profile, rec_only)):
+                best = results[i]
+                if text and (score > best[1] or not best[0]):
+                    results[i] = (text, score)
+                if text and score >= self.escalate_conf:
+                    self.step_counts[step] += 1
+                else:
+                    still_pending.append(i)
+            pending = still_pending
+            if not pending:
+                break
+        # Biển chưa đủ tin cậy sau bước cuối được tính vào bước cuối
+        self.step_counts[step] += len(pending)
+        return results
+
+    def read_plate_with_prob(self, plate_img: np.ndarray, preprocess: bool = True,
+                             profile: str = None) -> tuple:
         """
         Đọc biển số xe kèm theo độ tin cậy.
         Trả về: (biển_số_chuẩn_hóa, độ_tin_cậy_trung_bình)
         """
-        if plate_img is None or plate_img.size == 0:
-            return "", 0.0
-        
-        if self.is_two_line_plate(plate_img):
-            top, bottom = self.segment_two_line(plate_img)
-            if preprocess:
-                top = self.preprocess(top)
-                bottom = self.preprocess(bottom)
-            
-            t1, s1 = self.ocr_image(top)
-            t2, s2 = self.ocr_image(bottom)
-            combined_text = self.normalize_result(t1 + t2)
-            avg_score = (s1 + s2) / 2
-        else:
-            if preprocess:
-                plate_img = self.preprocess(plate_img)
-            t, s = self.ocr_image(plate_img)
-            combined_text = self.normalize_result(t)
-            avg_score = s
-            
-        return combined_text, avg_score
+        return self.read_plates_with_prob([plate_img], preprocess, profile)[0]
+
+    def stats(self) -> dict:
+        """Số lần đọc dừng ở từng bước của thang leo (hoặc profile cố định)."""
+        return dict(self.step_counts)
 
     def read_plate(self, plate_img: np.ndarray, preprocess: bool = True) -> str:
         """
@@ -181,28 +306,4 @@ class VNPlateOCR:
         Returns:
             Biển số đã chuẩn hóa (VD: "88C07304")
         """
-        if plate_img is None or plate_img.size == 0:
-            return ""
-        
-        # Kiểm tra biển 2 dòng
-        if self.is_two_line_plate(plate_img):
-            logger.debug("Detected 2-line plate")
-            top, bottom = self.segment_two_line(plate_img)
-            
-            if preprocess:
-                top = self.preprocess(top)
-                bottom = self.preprocess(bottom)
-            
-            # OCR từng dòng
-            top_text = self.ocr_image(top)
-            bottom_text = self.ocr_image(bottom)
-            combined = top_text + bottom_text
-            logger.debug(f"2-line: '{top_text}' + '{bottom_text}' = '{combined}'")
-        else:
-            # Biển 1 dòng
-            if preprocess:
-                plate_img = self.preprocess(plate_img)
-            combined = self.ocr_image(plate_img)
-            logger.debug(f"1-line: '{combined}'")
-        
-        return self.normalize_result(combined)
+        return self.read_plate_with_prob(plate_img, preprocess)[0]